@@ -0,0 +1,73 @@
+"""add profiles keyset and trigram indexes
+
+Revision ID: 5b2c9e4d7a10
+Revises: 33881aa523cf
+Create Date: 2025-07-18 10:15:42.118305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b2c9e4d7a10"
+down_revision: Union[str, None] = "33881aa523cf"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Индексы для keyset пагинации: (колонка сортировки, id)
+KEYSET_INDEXES = {
+    "idx_profiles_created_at_id": "created_at, id",
+    "idx_profiles_updated_at_id": "updated_at, id",
+    "idx_profiles_last_used_id": "COALESCE(last_used, '1970-01-01'::timestamp), id",
+    "idx_profiles_name_id": "name, id",
+}
+
+
+def upgrade() -> None:
+    """Индексы для keyset пагинации, поиска по подстроке и статистики профилей"""
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for index_name, columns in KEYSET_INDEXES.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                f"ON profiles ({columns})"
+            )
+
+        # Trigram индексы для ILIKE '%...%'
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_profiles_name_trgm "
+            "ON profiles USING gin (name gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_profiles_user_agent_trgm "
+            "ON profiles USING gin (user_agent gin_trgm_ops)"
+        )
+
+        # Испорченных профилей мало - частичный индекс для счетчика статистики
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_profile_lifecycle_corrupted "
+            "ON profile_lifecycle (profile_id) WHERE is_corrupted = true"
+        )
+
+    print("✅ Added keyset, trigram and stats indexes for profiles")
+
+
+def downgrade() -> None:
+    """Удаляем индексы профилей"""
+
+    with op.get_context().autocommit_block():
+        for index_name in [
+            "idx_profile_lifecycle_corrupted",
+            "idx_profiles_user_agent_trgm",
+            "idx_profiles_name_trgm",
+            *KEYSET_INDEXES.keys(),
+        ]:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+    print("✅ Removed keyset, trigram and stats indexes for profiles")
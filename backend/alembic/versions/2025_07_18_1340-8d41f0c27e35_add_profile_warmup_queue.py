@@ -0,0 +1,99 @@
+"""add profile warmup queue
+
+Revision ID: 8d41f0c27e35
+Revises: 5b2c9e4d7a10
+Create Date: 2025-07-18 13:40:07.552914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "8d41f0c27e35"
+down_revision: Union[str, None] = "5b2c9e4d7a10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Создаем очередь догуливания профилей"""
+
+    op.create_table(
+        "profile_warmup_queue",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("profile_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("device_type", sa.String(length=20), nullable=False),
+        sa.Column("reason", sa.String(length=50), nullable=True),
+        sa.Column("request_count", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("first_requested_at", sa.DateTime(), nullable=False),
+        sa.Column("last_requested_at", sa.DateTime(), nullable=False),
+        sa.Column("not_before", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["profile_id"], ["profiles.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("profile_id", name="uq_profile_warmup_queue_profile"),
+    )
+    op.create_index(
+        "idx_profile_warmup_queue_not_before",
+        "profile_warmup_queue",
+        ["not_before"],
+    )
+
+    # Переносим уже накопившиеся каскадные задачи в очередь (по одной на профиль)
+    op.execute(
+        """
+        INSERT INTO profile_warmup_queue (
+            id, profile_id, device_type, reason, request_count, attempts,
+            first_requested_at, last_requested_at, not_before,
+            created_at, updated_at
+        )
+        SELECT
+            gen_random_uuid(),
+            (parameters->>'profile_id')::uuid,
+            COALESCE(MAX(parameters->>'device_type'), 'desktop'),
+            'cascade',
+            COUNT(*),
+            0,
+            MIN(created_at),
+            MAX(created_at),
+            now(),
+            now(),
+            now()
+        FROM tasks
+        WHERE task_type = 'warmup_profile'
+          AND status = 'pending'
+          AND parameters->>'cascade_mode' = 'true'
+          AND parameters->>'profile_id' IS NOT NULL
+          AND (parameters->>'profile_id')::uuid IN (SELECT id FROM profiles)
+        GROUP BY parameters->>'profile_id'
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM tasks
+        WHERE task_type = 'warmup_profile'
+          AND status = 'pending'
+          AND parameters->>'cascade_mode' = 'true'
+        """
+    )
+
+    print("✅ Created profile_warmup_queue and moved pending cascade tasks into it")
+
+
+def downgrade() -> None:
+    """Удаляем очередь догуливания профилей"""
+
+    op.drop_index(
+        "idx_profile_warmup_queue_not_before", table_name="profile_warmup_queue"
+    )
+    op.drop_table("profile_warmup_queue")
+
+    print("✅ Dropped profile_warmup_queue")
@@ -0,0 +1,88 @@
+"""add profile health scoring
+
+Revision ID: c3f7a92e0b64
+Revises: 8d41f0c27e35
+Create Date: 2025-07-18 16:55:31.804127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f7a92e0b64"
+down_revision: Union[str, None] = "8d41f0c27e35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Добавляем затухающие метрики здоровья профилей"""
+
+    op.add_column(
+        "profiles",
+        sa.Column("health_score", sa.Float(), nullable=False, server_default="0.8"),
+    )
+    op.add_column(
+        "profiles",
+        sa.Column("health_weight", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "profiles",
+        sa.Column("decayed_success", sa.Float(), nullable=False, server_default="1"),
+    )
+    op.add_column(
+        "profiles",
+        sa.Column("decayed_captcha", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "profiles",
+        sa.Column(
+            "decayed_latency_ms", sa.Float(), nullable=False, server_default="0"
+        ),
+    )
+    op.add_column(
+        "profiles", sa.Column("health_updated_at", sa.DateTime(), nullable=True)
+    )
+
+    # success_rate писался то в 0-1, то в 0-100 - приводим к доле
+    op.execute("UPDATE profiles SET success_rate = success_rate / 100 WHERE success_rate > 1")
+
+    # Начальная оценка из накопленной статистики
+    op.execute(
+        """
+        UPDATE profiles
+        SET decayed_success = success_rate,
+            health_weight = LEAST(total_usage_count, 20),
+            health_score = success_rate,
+            health_updated_at = now()
+        WHERE total_usage_count > 0
+        """
+    )
+
+    # Индекс для выбора лучшего готового профиля
+    op.execute(
+        """
+        CREATE INDEX idx_profiles_ready_health
+        ON profiles (device_type, health_score DESC, last_used ASC NULLS FIRST)
+        WHERE status = 'ready' AND is_warmed_up = true
+        """
+    )
+
+    print("✅ Added profile health scoring columns and selection index")
+
+
+def downgrade() -> None:
+    """Удаляем метрики здоровья профилей"""
+
+    op.drop_index("idx_profiles_ready_health", table_name="profiles")
+    op.drop_column("profiles", "health_updated_at")
+    op.drop_column("profiles", "decayed_latency_ms")
+    op.drop_column("profiles", "decayed_captcha")
+    op.drop_column("profiles", "decayed_success")
+    op.drop_column("profiles", "health_weight")
+    op.drop_column("profiles", "health_score")
+
+    print("✅ Removed profile health scoring columns")
@@ -0,0 +1,173 @@
+"""partition position_history by month
+
+Revision ID: e7a1d5b38c92
+Revises: c3f7a92e0b64
+Create Date: 2025-07-19 11:20:14.663021
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a1d5b38c92"
+down_revision: Union[str, None] = "c3f7a92e0b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Секции от самого старого месяца данных до текущего месяца + 2
+CREATE_MONTHLY_PARTITIONS = """
+DO $$
+DECLARE
+    m date;
+BEGIN
+    FOR m IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE(
+                (SELECT min(COALESCE(check_date, created_at)) FROM position_history_legacy),
+                now()
+            )),
+            date_trunc('month', now()) + interval '2 months',
+            interval '1 month'
+        )::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF position_history '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'position_history_' || to_char(m, 'YYYY_MM'),
+            m,
+            (m + interval '1 month')::date
+        );
+    END LOOP;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    """Переводим position_history на месячные секции по check_date"""
+
+    # Старую таблицу переименовываем, ее индексы больше не нужны
+    op.execute("ALTER TABLE position_history RENAME TO position_history_legacy")
+    op.execute(
+        "ALTER TABLE position_history_legacy "
+        "RENAME CONSTRAINT position_history_pkey TO position_history_legacy_pkey"
+    )
+    op.execute("DROP INDEX IF EXISTS ix_position_history_domain_keyword")
+    op.execute("DROP INDEX IF EXISTS ix_position_history_check_date")
+    op.execute("DROP INDEX IF EXISTS ix_position_history_user_domain_date")
+
+    # Узкая секционированная таблица: bigint id, smallint позиция, без FK
+    op.execute(
+        """
+        CREATE TABLE position_history (
+            id bigint GENERATED ALWAYS AS IDENTITY,
+            check_date timestamp NOT NULL,
+            user_id uuid NOT NULL,
+            domain_id uuid NOT NULL,
+            keyword_id uuid NOT NULL,
+            position smallint,
+            url text,
+            serp_features json,
+            PRIMARY KEY (id, check_date)
+        ) PARTITION BY RANGE (check_date)
+        """
+    )
+    op.execute(
+        "CREATE TABLE position_history_default "
+        "PARTITION OF position_history DEFAULT"
+    )
+    op.execute(CREATE_MONTHLY_PARTITIONS)
+
+    # Индексы на родителе автоматически создаются в каждой секции
+    op.execute(
+        "CREATE INDEX ix_position_history_check_date_brin "
+        "ON position_history USING brin (check_date) WITH (pages_per_range = 32)"
+    )
+    op.execute(
+        "CREATE INDEX ix_position_history_keyword_date "
+        "ON position_history (keyword_id, check_date)"
+    )
+    op.execute(
+        "CREATE INDEX ix_position_history_domain_date "
+        "ON position_history (domain_id, check_date)"
+    )
+
+    # Переносим данные
+    op.execute(
+        """
+        INSERT INTO position_history (
+            check_date, user_id, domain_id, keyword_id, position, url, serp_features
+        )
+        SELECT
+            COALESCE(check_date, created_at),
+            user_id,
+            domain_id,
+            keyword_id,
+            LEAST(GREATEST(position, 0), 32767)::smallint,
+            url,
+            serp_features
+        FROM position_history_legacy
+        ORDER BY COALESCE(check_date, created_at)
+        """
+    )
+    op.execute("ANALYZE position_history")
+    op.execute("DROP TABLE position_history_legacy")
+
+    print("✅ position_history converted to monthly range partitions")
+
+
+def downgrade() -> None:
+    """Возвращаем обычную таблицу position_history"""
+
+    op.execute("ALTER TABLE position_history RENAME TO position_history_partitioned")
+    op.execute(
+        """
+        CREATE TABLE position_history (
+            user_id uuid NOT NULL REFERENCES users (id),
+            domain_id uuid NOT NULL REFERENCES user_domains (id),
+            keyword_id uuid NOT NULL REFERENCES user_keywords (id),
+            position integer,
+            url text,
+            check_date timestamp,
+            serp_features json,
+            id uuid NOT NULL,
+            created_at timestamp NOT NULL,
+            updated_at timestamp NOT NULL
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO position_history (
+            user_id, domain_id, keyword_id, position, url, check_date,
+            serp_features, id, created_at, updated_at
+        )
+        SELECT
+            h.user_id, h.domain_id, h.keyword_id, h.position, h.url, h.check_date,
+            h.serp_features, gen_random_uuid(), h.check_date, h.check_date
+        FROM position_history_partitioned h
+        WHERE EXISTS (SELECT 1 FROM user_keywords k WHERE k.id = h.keyword_id)
+        """
+    )
+    op.execute("DROP TABLE position_history_partitioned CASCADE")
+    op.execute(
+        "ALTER TABLE position_history "
+        "ADD CONSTRAINT position_history_pkey PRIMARY KEY (id)"
+    )
+    op.create_index(
+        "ix_position_history_domain_keyword",
+        "position_history",
+        ["domain_id", "keyword_id"],
+    )
+    op.create_index(
+        "ix_position_history_check_date", "position_history", ["check_date"]
+    )
+    op.create_index(
+        "ix_position_history_user_domain_date",
+        "position_history",
+        ["user_id", "domain_id", "check_date"],
+    )
+
+    print("✅ position_history converted back to a plain table")
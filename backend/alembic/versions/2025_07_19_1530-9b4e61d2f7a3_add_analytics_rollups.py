@@ -0,0 +1,115 @@
+"""add analytics rollups
+
+Revision ID: 9b4e61d2f7a3
+Revises: e7a1d5b38c92
+Create Date: 2025-07-19 15:30:12.417903
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "9b4e61d2f7a3"
+down_revision: Union[str, None] = "e7a1d5b38c92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> (имя ограничения, ключевые колонки)
+ROLLUP_KEYS = {
+    "business_metrics": ("uq_business_metrics_date_metric", ["date", "metric_name"]),
+    "user_activity_stats": ("uq_user_activity_stats_user_date", ["user_id", "date"]),
+    "task_analytics": (
+        "uq_task_analytics_date_type_server",
+        ["date", "task_type", "server_id"],
+    ),
+    "parsing_analytics": (
+        "uq_parsing_analytics_date_user_domain",
+        ["date", "user_id", "domain_id"],
+    ),
+}
+
+
+def upgrade() -> None:
+    """Добавляем водяные знаки и уникальные ключи дневных агрегатов"""
+
+    op.create_table(
+        "analytics_watermarks",
+        sa.Column("source", sa.String(length=100), nullable=False),
+        sa.Column("last_timestamp", sa.DateTime(), nullable=True),
+        sa.Column("last_id", sa.String(length=64), nullable=True),
+        sa.Column("rows_processed", sa.BigInteger(), nullable=True),
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("source"),
+    )
+
+    op.execute("UPDATE task_analytics SET server_id = 'unassigned' WHERE server_id IS NULL")
+    op.alter_column(
+        "task_analytics",
+        "server_id",
+        existing_type=sa.String(length=255),
+        nullable=False,
+    )
+
+    for table, (name, columns) in ROLLUP_KEYS.items():
+        # Оставляем последнюю строку по каждому ключу - агрегаты все равно
+        # будут пересчитаны сверткой
+        key = ", ".join(columns)
+        op.execute(
+            f"""
+            DELETE FROM {table} t
+            USING (
+                SELECT id, row_number() OVER (
+                    PARTITION BY {key} ORDER BY updated_at DESC, id
+                ) AS rn
+                FROM {table}
+            ) d
+            WHERE t.id = d.id AND d.rn > 1
+            """
+        )
+        op.create_unique_constraint(name, table, columns)
+
+    # Keyset-чтение новых задач и пересчет дня по типу задачи
+    op.create_index("ix_tasks_updated_at_id", "tasks", ["updated_at", "id"])
+    op.create_index("ix_tasks_type_created_at", "tasks", ["task_type", "created_at"])
+    op.create_index(
+        "ix_tasks_type_completed_at", "tasks", ["task_type", "completed_at"]
+    )
+    op.create_index(
+        "ix_balance_transactions_user_created",
+        "balance_transactions",
+        ["user_id", "created_at"],
+    )
+
+    print("✅ Added analytics watermarks and rollup unique keys")
+
+
+def downgrade() -> None:
+    """Удаляем водяные знаки и уникальные ключи дневных агрегатов"""
+
+    op.drop_index(
+        "ix_balance_transactions_user_created", table_name="balance_transactions"
+    )
+    op.drop_index("ix_tasks_type_completed_at", table_name="tasks")
+    op.drop_index("ix_tasks_type_created_at", table_name="tasks")
+    op.drop_index("ix_tasks_updated_at_id", table_name="tasks")
+
+    for table, (name, _) in ROLLUP_KEYS.items():
+        op.drop_constraint(name, table, type_="unique")
+
+    op.alter_column(
+        "task_analytics",
+        "server_id",
+        existing_type=sa.String(length=255),
+        nullable=True,
+    )
+
+    op.drop_table("analytics_watermarks")
+
+    print("✅ Removed analytics watermarks and rollup unique keys")
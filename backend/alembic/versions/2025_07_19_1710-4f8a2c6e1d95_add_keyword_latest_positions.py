@@ -0,0 +1,108 @@
+"""add keyword latest positions
+
+Revision ID: 4f8a2c6e1d95
+Revises: 9b4e61d2f7a3
+Create Date: 2025-07-19 17:10:44.208611
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "4f8a2c6e1d95"
+down_revision: Union[str, None] = "9b4e61d2f7a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Создаем таблицу последних позиций ключевых слов"""
+
+    op.create_table(
+        "keyword_latest_positions",
+        sa.Column("keyword_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("domain_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("position", sa.SmallInteger(), nullable=True),
+        sa.Column("url", sa.Text(), nullable=True),
+        sa.Column("last_check_date", sa.DateTime(), nullable=False),
+        sa.Column("previous_position", sa.SmallInteger(), nullable=True),
+        sa.Column("previous_check_date", sa.DateTime(), nullable=True),
+        sa.Column("best_position_30d", sa.SmallInteger(), nullable=True),
+        sa.Column("worst_position_30d", sa.SmallInteger(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["keyword_id"], ["user_keywords.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("keyword_id"),
+    )
+    op.create_index(
+        "ix_keyword_latest_positions_domain",
+        "keyword_latest_positions",
+        ["domain_id"],
+    )
+
+    # Заполняем из истории: две последние проверки и окно 30 дней
+    op.execute(
+        """
+        WITH ranked AS (
+            SELECT h.keyword_id, h.user_id, h.domain_id, h.position, h.url,
+                   h.check_date,
+                   row_number() OVER (
+                       PARTITION BY h.keyword_id ORDER BY h.check_date DESC, h.id DESC
+                   ) AS rn
+            FROM position_history h
+            JOIN user_keywords k ON k.id = h.keyword_id
+        )
+        INSERT INTO keyword_latest_positions (
+            keyword_id, user_id, domain_id, position, url, last_check_date,
+            previous_position, previous_check_date,
+            best_position_30d, worst_position_30d, created_at, updated_at
+        )
+        SELECT cur.keyword_id, cur.user_id, cur.domain_id, cur.position, cur.url,
+               cur.check_date, prev.position, prev.check_date,
+               w.best, w.worst, now(), now()
+        FROM ranked cur
+        LEFT JOIN ranked prev ON prev.keyword_id = cur.keyword_id AND prev.rn = 2
+        CROSS JOIN LATERAL (
+            SELECT min(h.position) AS best, max(h.position) AS worst
+            FROM position_history h
+            WHERE h.keyword_id = cur.keyword_id
+              AND h.check_date > cur.check_date - interval '30 days'
+              AND h.check_date <= cur.check_date
+        ) AS w
+        WHERE cur.rn = 1
+        """
+    )
+
+    # Keyset пагинация ключевых слов домена
+    op.create_index(
+        "ix_user_keywords_domain_created_id",
+        "user_keywords",
+        ["domain_id", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_user_keywords_domain_keyword_id",
+        "user_keywords",
+        ["domain_id", "keyword", "id"],
+    )
+
+    print("✅ Created keyword_latest_positions and keyword pagination indexes")
+
+
+def downgrade() -> None:
+    """Удаляем таблицу последних позиций ключевых слов"""
+
+    op.drop_index("ix_user_keywords_domain_keyword_id", table_name="user_keywords")
+    op.drop_index("ix_user_keywords_domain_created_id", table_name="user_keywords")
+    op.drop_index(
+        "ix_keyword_latest_positions_domain", table_name="keyword_latest_positions"
+    )
+    op.drop_table("keyword_latest_positions")
+
+    print("✅ Dropped keyword_latest_positions")
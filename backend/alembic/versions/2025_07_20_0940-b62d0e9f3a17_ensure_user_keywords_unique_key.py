@@ -0,0 +1,65 @@
+"""ensure user keywords unique key
+
+Revision ID: b62d0e9f3a17
+Revises: 4f8a2c6e1d95
+Create Date: 2025-07-20 09:40:27.551930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b62d0e9f3a17"
+down_revision: Union[str, None] = "4f8a2c6e1d95"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Гарантируем уникальный ключ (user_id, domain_id, keyword, device_type).
+
+    В e1fffc129580 ограничение создавалось с подавлением ошибок, поэтому на
+    части баз его нет, а дубликаты могли накопиться. Пакетная вставка
+    ключевых слов опирается на него в ON CONFLICT.
+    """
+
+    # Оставляем самое раннее из одинаковых ключевых слов
+    op.execute(
+        """
+        DELETE FROM user_keywords k
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id, domain_id, keyword, device_type
+                ORDER BY created_at, id
+            ) AS rn
+            FROM user_keywords
+        ) d
+        WHERE k.id = d.id AND d.rn > 1
+        """
+    )
+
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = 'uq_user_keywords_user_domain_keyword_device'
+            ) THEN
+                ALTER TABLE user_keywords
+                ADD CONSTRAINT uq_user_keywords_user_domain_keyword_device
+                UNIQUE (user_id, domain_id, keyword, device_type);
+            END IF;
+        END $$;
+        """
+    )
+
+    print("✅ Ensured unique key on user_keywords")
+
+
+def downgrade() -> None:
+    """Ограничение могло существовать до миграции - оставляем его"""
+
+    print("✅ Nothing to downgrade for user_keywords unique key")
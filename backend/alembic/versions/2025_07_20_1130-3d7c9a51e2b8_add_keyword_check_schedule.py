@@ -0,0 +1,57 @@
+"""add keyword check schedule
+
+Revision ID: 3d7c9a51e2b8
+Revises: b62d0e9f3a17
+Create Date: 2025-07-20 11:30:12.804417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "3d7c9a51e2b8"
+down_revision: Union[str, None] = "b62d0e9f3a17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Добавляем next_check_at для планировщика регулярных проверок.
+
+    Существующие ключи раскладываются по суткам хэшем id, чтобы после
+    включения планировщика все проверки не созрели одновременно.
+    """
+
+    op.add_column(
+        "user_keywords", sa.Column("next_check_at", sa.DateTime(), nullable=True)
+    )
+
+    op.execute(
+        """
+        UPDATE user_keywords
+        SET next_check_at = date_trunc('day', now() AT TIME ZONE 'UTC')
+            + (abs(hashtext(id::text)) % 86400) * interval '1 second'
+        WHERE is_active = true
+        """
+    )
+
+    op.create_index(
+        "ix_user_keywords_next_check_active",
+        "user_keywords",
+        ["next_check_at"],
+        postgresql_where=sa.text("is_active"),
+    )
+
+    print("✅ Added next_check_at to user_keywords")
+
+
+def downgrade() -> None:
+    """Удаляем расписание проверок"""
+
+    op.drop_index("ix_user_keywords_next_check_active", table_name="user_keywords")
+    op.drop_column("user_keywords", "next_check_at")
+
+    print("✅ Removed next_check_at from user_keywords")
@@ -0,0 +1,101 @@
+"""add billing ledger
+
+Revision ID: a84f2e6b0c53
+Revises: 3d7c9a51e2b8
+Create Date: 2025-07-20 13:15:48.209173
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a84f2e6b0c53"
+down_revision: Union[str, None] = "3d7c9a51e2b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Журнал расчетов по задачам и отметка settled_at.
+
+    Раньше резервы задач не списывались и не снимались. Историю задним
+    числом не списываем: завершенные задачи отмечаются рассчитанными, а
+    reserved_balance пересчитывается как сумма резервов незавершенных задач.
+    """
+
+    op.create_table(
+        "billing_ledger",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("task_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("idempotency_key", sa.String(length=100), nullable=False),
+        sa.Column(
+            "reserved_amount",
+            sa.Numeric(precision=10, scale=2),
+            nullable=False,
+            server_default="0",
+        ),
+        sa.Column(
+            "charged_amount",
+            sa.Numeric(precision=10, scale=2),
+            nullable=False,
+            server_default="0",
+        ),
+        sa.Column("transaction_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["transaction_id"], ["balance_transactions.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("idempotency_key"),
+    )
+    op.create_index(
+        "ix_billing_ledger_user_created", "billing_ledger", ["user_id", "created_at"]
+    )
+
+    op.add_column("tasks", sa.Column("settled_at", sa.DateTime(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE tasks
+        SET settled_at = COALESCE(completed_at, now() AT TIME ZONE 'UTC')
+        WHERE status IN ('completed', 'failed')
+        """
+    )
+
+    op.execute(
+        """
+        UPDATE user_balance b
+        SET reserved_balance = COALESCE((
+            SELECT sum(t.reserved_amount)
+            FROM tasks t
+            WHERE t.user_id = b.user_id
+              AND t.settled_at IS NULL
+              AND t.reserved_amount > 0
+        ), 0)
+        """
+    )
+
+    op.create_index(
+        "ix_tasks_unsettled",
+        "tasks",
+        ["user_id", "completed_at"],
+        postgresql_where=sa.text("settled_at IS NULL AND reserved_amount > 0"),
+    )
+
+    print("✅ Added billing_ledger and tasks.settled_at")
+
+
+def downgrade() -> None:
+    """Удаляем журнал расчетов"""
+
+    op.drop_index("ix_tasks_unsettled", table_name="tasks")
+    op.drop_column("tasks", "settled_at")
+    op.drop_index("ix_billing_ledger_user_created", table_name="billing_ledger")
+    op.drop_table("billing_ledger")
+
+    print("✅ Removed billing_ledger and tasks.settled_at")
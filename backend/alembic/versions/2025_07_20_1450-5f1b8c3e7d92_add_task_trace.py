@@ -0,0 +1,41 @@
+"""add task trace
+
+Revision ID: 5f1b8c3e7d92
+Revises: a84f2e6b0c53
+Create Date: 2025-07-20 14:50:12.418305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5f1b8c3e7d92"
+down_revision: Union[str, None] = "a84f2e6b0c53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Трасса выполнения задачи по спанам (только отобранные задачи)"""
+
+    op.add_column("tasks", sa.Column("trace", sa.JSON(), nullable=True))
+    op.create_index(
+        "ix_tasks_traced",
+        "tasks",
+        ["created_at"],
+        postgresql_where=sa.text("trace IS NOT NULL"),
+    )
+
+    print("✅ Added tasks.trace")
+
+
+def downgrade() -> None:
+    """Удаляем трассы задач"""
+
+    op.drop_index("ix_tasks_traced", table_name="tasks")
+    op.drop_column("tasks", "trace")
+
+    print("✅ Removed tasks.trace")
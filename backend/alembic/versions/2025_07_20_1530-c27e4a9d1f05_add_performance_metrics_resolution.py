@@ -0,0 +1,52 @@
+"""add performance metrics resolution
+
+Revision ID: c27e4a9d1f05
+Revises: 5f1b8c3e7d92
+Create Date: 2025-07-20 15:30:41.027716
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c27e4a9d1f05"
+down_revision: Union[str, None] = "5f1b8c3e7d92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Разрешение агрегатов performance_metrics (1m / 1h).
+
+    Прежние строки - поминутные замеры, поэтому получают разрешение 1m и
+    удаляются по сроку хранения минутных агрегатов.
+    """
+
+    op.add_column(
+        "performance_metrics",
+        sa.Column(
+            "resolution", sa.String(length=10), nullable=False, server_default="1m"
+        ),
+    )
+    op.create_index(
+        "ix_performance_metrics_server_resolution_time",
+        "performance_metrics",
+        ["server_id", "resolution", "measurement_time"],
+    )
+
+    print("✅ Added performance_metrics.resolution")
+
+
+def downgrade() -> None:
+    """Удаляем разрешение агрегатов"""
+
+    op.drop_index(
+        "ix_performance_metrics_server_resolution_time",
+        table_name="performance_metrics",
+    )
+    op.drop_column("performance_metrics", "resolution")
+
+    print("✅ Removed performance_metrics.resolution")
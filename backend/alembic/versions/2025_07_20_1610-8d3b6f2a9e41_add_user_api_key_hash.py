@@ -0,0 +1,51 @@
+"""add user api key hash
+
+Revision ID: 8d3b6f2a9e41
+Revises: c27e4a9d1f05
+Create Date: 2025-07-20 16:10:12.503187
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "8d3b6f2a9e41"
+down_revision: Union[str, None] = "c27e4a9d1f05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Хеш API ключа для аутентификации по индексу.
+
+    Существующие ключи хешируются на месте (sha256 в hex, как
+    AuthService.hash_api_key).
+    """
+
+    op.add_column(
+        "users", sa.Column("api_key_hash", sa.String(length=64), nullable=True)
+    )
+    op.execute(
+        """
+        UPDATE users
+        SET api_key_hash = encode(sha256(convert_to(api_key, 'UTF8')), 'hex')
+        WHERE api_key IS NOT NULL
+        """
+    )
+    op.create_index(
+        "ix_users_api_key_hash", "users", ["api_key_hash"], unique=True
+    )
+
+    print("✅ Added users.api_key_hash")
+
+
+def downgrade() -> None:
+    """Удаляем хеш API ключа"""
+
+    op.drop_index("ix_users_api_key_hash", table_name="users")
+    op.drop_column("users", "api_key_hash")
+
+    print("✅ Removed users.api_key_hash")
@@ -0,0 +1,61 @@
+"""add worker node capacity
+
+Revision ID: e41a7c9b3d26
+Revises: 8d3b6f2a9e41
+Create Date: 2025-07-20 16:50:27.318904
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e41a7c9b3d26"
+down_revision: Union[str, None] = "8d3b6f2a9e41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Емкость и сервер worker node для маршрутизации задач.
+
+    Привязка пользователей к серверу (user_server_preferences) ищется по
+    пользователю при выборе каждой задачи, поэтому нужен индекс по user_id.
+    """
+
+    op.add_column(
+        "worker_nodes", sa.Column("server_id", sa.String(length=255), nullable=True)
+    )
+    op.add_column(
+        "worker_nodes",
+        sa.Column("active_tasks", sa.Integer(), nullable=True, server_default="0"),
+    )
+    op.add_column(
+        "worker_nodes",
+        sa.Column("free_slots", sa.Integer(), nullable=True, server_default="0"),
+    )
+    op.create_index("ix_worker_nodes_server_id", "worker_nodes", ["server_id"])
+    op.create_index(
+        "ix_user_server_preferences_user_id",
+        "user_server_preferences",
+        ["user_id"],
+        postgresql_where=sa.text("is_active"),
+    )
+
+    print("✅ Added worker_nodes capacity and server_id")
+
+
+def downgrade() -> None:
+    """Удаляем емкость и сервер worker node"""
+
+    op.drop_index(
+        "ix_user_server_preferences_user_id", table_name="user_server_preferences"
+    )
+    op.drop_index("ix_worker_nodes_server_id", table_name="worker_nodes")
+    op.drop_column("worker_nodes", "free_slots")
+    op.drop_column("worker_nodes", "active_tasks")
+    op.drop_column("worker_nodes", "server_id")
+
+    print("✅ Removed worker_nodes capacity and server_id")
@@ -0,0 +1,63 @@
+"""add task lease
+
+Revision ID: 5b9e2c7d4a18
+Revises: e41a7c9b3d26
+Create Date: 2025-07-20 17:30:41.118406
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5b9e2c7d4a18"
+down_revision: Union[str, None] = "e41a7c9b3d26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Аренда выполняющихся задач.
+
+    Уже выполняющимся задачам выдается аренда на стандартный срок, чтобы
+    reaper не вернул их в очередь сразу после обновления.
+    """
+
+    op.add_column("tasks", sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+    op.execute(
+        """
+        UPDATE tasks
+        SET lease_expires_at = (now() AT TIME ZONE 'UTC') + interval '120 seconds'
+        WHERE status = 'running'
+        """
+    )
+
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_running_lease",
+            "tasks",
+            ["lease_expires_at"],
+            postgresql_where=sa.text("status = 'running'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    print("✅ Added tasks.lease_expires_at")
+
+
+def downgrade() -> None:
+    """Удаляем аренду задач"""
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_running_lease",
+            table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column("tasks", "lease_expires_at")
+
+    print("✅ Removed tasks.lease_expires_at")
@@ -0,0 +1,172 @@
+"""add tasks archive
+
+Revision ID: a3d8f61c2e47
+Revises: 5b9e2c7d4a18
+Create Date: 2025-07-20 18:10:27.934115
+
+"""
+
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d8f61c2e47"
+down_revision: Union[str, None] = "5b9e2c7d4a18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Таблицы, чьи ссылки на задачу должны пережить перенос задачи в архив
+DETACHED_REFERENCES = (
+    "parse_results",
+    "strategy_execution_log",
+    "profile_nurture_progress",
+    "debug_vnc_sessions",
+)
+
+# Внешние ключи на tasks созданы без имен - ищем их по каталогу
+DROP_TASK_FOREIGN_KEYS = """
+DO $$
+DECLARE
+    fk record;
+BEGIN
+    FOR fk IN
+        SELECT c.conname, c.conrelid::regclass AS tbl
+        FROM pg_constraint c
+        WHERE c.contype = 'f'
+          AND c.confrelid = 'tasks'::regclass
+          AND c.conrelid::regclass::text IN ({tables})
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.tbl, fk.conname);
+    END LOOP;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    """Архив завершенных задач и индекс живой очереди.
+
+    tasks_archive секционирована по месяцам created_at, секции создает
+    архиватор (app/core/task_archive.py). Внешние ключи на tasks у
+    результатов парсинга, журналов стратегий и debug VNC сессий снимаются:
+    после переноса задачи их task_id указывает на строку архива (а ON DELETE
+    CASCADE у debug_vnc_sessions удалял бы сессии вместе с задачей).
+    """
+
+    op.execute(
+        """
+        CREATE TABLE tasks_archive (
+            id uuid NOT NULL,
+            created_at timestamp NOT NULL,
+            task_type varchar(50) NOT NULL,
+            device_type varchar(20),
+            status varchar(50) NOT NULL,
+            priority integer,
+            user_id uuid,
+            strategy_id uuid,
+            profile_id uuid,
+            worker_id varchar(255),
+            reserved_amount numeric(10, 2),
+            error_message text,
+            started_at timestamp,
+            completed_at timestamp,
+            settled_at timestamp,
+            archived_at timestamp NOT NULL,
+            payload bytea,
+            payload_size integer,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    # Индексы на родителе автоматически создаются в каждой секции
+    op.execute("CREATE INDEX ix_tasks_archive_id ON tasks_archive (id)")
+    op.execute(
+        "CREATE INDEX ix_tasks_archive_user_created "
+        "ON tasks_archive (user_id, created_at)"
+    )
+
+    tables = ", ".join(f"'{table}'" for table in DETACHED_REFERENCES)
+    op.execute(DROP_TASK_FOREIGN_KEYS.format(tables=tables))
+
+    # Выбор задачи и поиск выполняющихся - только по живым статусам.
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live "
+            "ON tasks (status, priority DESC, created_at) "
+            "WHERE status IN ('pending', 'running')"
+        )
+
+    print("✅ Added tasks_archive and ix_tasks_live")
+
+
+def downgrade() -> None:
+    """Возвращаем архивные задачи в tasks и удаляем архив.
+
+    payload сжат на стороне приложения, поэтому parameters/result/trace
+    распаковываются здесь же. Внешние ключи восстанавливаются как NOT VALID
+    (старые ссылки могут указывать на удаленные секции архива).
+    """
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tasks_live")
+    op.execute(
+        """
+        INSERT INTO tasks (
+            id, created_at, updated_at, task_type, device_type, status, priority,
+            user_id, strategy_id, profile_id, worker_id, reserved_amount,
+            error_message, started_at, completed_at, settled_at
+        )
+        SELECT
+            id, created_at, archived_at, task_type, COALESCE(device_type, 'desktop'),
+            status, priority, user_id, strategy_id, profile_id, worker_id,
+            reserved_amount, error_message, started_at, completed_at, settled_at
+        FROM tasks_archive
+        ON CONFLICT (id) DO NOTHING
+        """
+    )
+
+    bind = op.get_bind()
+    restore = sa.text(
+        "UPDATE tasks SET parameters = CAST(:parameters AS json), "
+        "result = CAST(:result AS json), trace = CAST(:trace AS json) "
+        "WHERE id = :id"
+    )
+    rows = bind.execute(
+        sa.text("SELECT id, payload FROM tasks_archive WHERE payload IS NOT NULL")
+    ).all()
+    for task_id, payload in rows:
+        data = json.loads(zlib.decompress(payload).decode("utf-8"))
+        values = {
+            key: json.dumps(data[key]) if data.get(key) is not None else None
+            for key in ("parameters", "result", "trace")
+        }
+        bind.execute(restore, {"id": task_id, **values})
+
+    op.execute("DROP TABLE tasks_archive")
+
+    op.execute(
+        "ALTER TABLE parse_results ADD CONSTRAINT parse_results_task_id_fkey "
+        "FOREIGN KEY (task_id) REFERENCES tasks (id) NOT VALID"
+    )
+    op.execute(
+        "ALTER TABLE strategy_execution_log "
+        "ADD CONSTRAINT strategy_execution_log_task_id_fkey "
+        "FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE SET NULL NOT VALID"
+    )
+    op.execute(
+        "ALTER TABLE profile_nurture_progress "
+        "ADD CONSTRAINT profile_nurture_progress_task_id_fkey "
+        "FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE SET NULL NOT VALID"
+    )
+    op.execute(
+        "ALTER TABLE debug_vnc_sessions "
+        "ADD CONSTRAINT debug_vnc_sessions_task_id_fkey "
+        "FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE CASCADE NOT VALID"
+    )
+
+    print("✅ Removed tasks_archive")
@@ -0,0 +1,107 @@
+"""add strategy nurture counters
+
+Revision ID: 6c4f9a2d8b13
+Revises: a3d8f61c2e47
+Create Date: 2025-07-20 18:50:09.274551
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "6c4f9a2d8b13"
+down_revision: Union[str, None] = "a3d8f61c2e47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Счетчики задач нагула по стратегиям.
+
+    Задачам нагула проставляется tasks.strategy_id из parameters, затем
+    счетчики заполняются по tasks и tasks_archive.
+    """
+
+    op.create_table(
+        "strategy_nurture_counters",
+        sa.Column("strategy_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("pending", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("running", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("nurtured", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("failed", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(
+            ["strategy_id"], ["user_strategies.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("strategy_id"),
+    )
+
+    op.execute(
+        """
+        UPDATE tasks t
+        SET strategy_id = s.id
+        FROM user_strategies s
+        WHERE t.task_type = 'profile_nurture'
+          AND t.strategy_id IS NULL
+          AND t.parameters ->> 'strategy_id' = s.id::text
+        """
+    )
+
+    op.execute(
+        """
+        INSERT INTO strategy_nurture_counters (strategy_id, pending, running, nurtured, failed)
+        SELECT
+            strategy_id,
+            count(*) FILTER (WHERE status = 'pending'),
+            count(*) FILTER (WHERE status = 'running'),
+            count(*) FILTER (WHERE status = 'completed'),
+            count(*) FILTER (WHERE status = 'failed')
+        FROM (
+            SELECT strategy_id, status FROM tasks
+            WHERE task_type = 'profile_nurture' AND strategy_id IS NOT NULL
+            UNION ALL
+            SELECT a.strategy_id, a.status FROM tasks_archive a
+            JOIN user_strategies s ON s.id = a.strategy_id
+            WHERE a.task_type = 'profile_nurture'
+        ) nurture_tasks
+        GROUP BY strategy_id
+        """
+    )
+
+    # Индекс строится после бэкфилла отдельно: autocommit_block фиксирует
+    # транзакцию с UPDATE, а CONCURRENTLY не блокирует запись в tasks
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_strategy_status",
+            "tasks",
+            ["strategy_id", "status"],
+            postgresql_where=sa.text("strategy_id IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    print("✅ Added strategy_nurture_counters")
+
+
+def downgrade() -> None:
+    """Удаляем счетчики задач нагула"""
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_strategy_status",
+            table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table("strategy_nurture_counters")
+
+    print("✅ Removed strategy_nurture_counters")
@@ -0,0 +1,41 @@
+"""add check scheduler buckets
+
+Revision ID: 8d2b5e7f1a36
+Revises: 6c4f9a2d8b13
+Create Date: 2025-07-20 19:20:41.518203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2b5e7f1a36"
+down_revision: Union[str, None] = "6c4f9a2d8b13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Общие для кластера token buckets планировщика проверок"""
+
+    op.create_table(
+        "check_scheduler_buckets",
+        sa.Column("region_code", sa.String(length=20), nullable=False),
+        sa.Column("device_type", sa.String(length=20), nullable=False),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("region_code", "device_type"),
+    )
+
+    print("✅ Added check_scheduler_buckets")
+
+
+def downgrade() -> None:
+    """Удаляем token buckets планировщика проверок"""
+
+    op.drop_table("check_scheduler_buckets")
+
+    print("✅ Removed check_scheduler_buckets")
@@ -0,0 +1,124 @@
+# backend/app/api/admin/cache.py
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.auth import get_current_admin_user, log_admin_action
+from app.core.response_cache import response_cache, CACHE_POLICIES
+from app.database import get_session
+from app.models import CacheSettings, User
+
+router = APIRouter(prefix="/cache", tags=["Admin Cache"])
+
+CACHE_TYPES = ("serp", "stats", "config")
+
+
+@router.get("/settings")
+async def get_cache_settings(
+    current_admin: User = Depends(get_current_admin_user),
+) -> Dict[str, Any]:
+    """Действующие политики кэша (по умолчанию и из cache_settings)"""
+    await response_cache.reload_policies(force=True)
+    return {"success": True, "policies": response_cache.list_policies()}
+
+
+@router.put("/settings/{cache_key}")
+async def update_cache_settings(
+    cache_key: str,
+    ttl_seconds: Optional[int] = Query(None, ge=0, le=86400),
+    is_enabled: Optional[bool] = Query(None),
+    cache_type: Optional[str] = Query(None, description="serp, stats, config"),
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, Any]:
+    """Изменение TTL/включения кэша; применяется во всех процессах сразу"""
+    if cache_type is not None and cache_type not in CACHE_TYPES:
+        raise HTTPException(status_code=400, detail="Неизвестный тип кэша")
+
+    result = await session.execute(
+        select(CacheSettings).where(CacheSettings.cache_key == cache_key)
+    )
+    row = result.scalar_one_or_none()
+
+    if row is None:
+        default_type, default_ttl = CACHE_POLICIES.get(cache_key, (None, None))
+        if ttl_seconds is None and default_ttl is None:
+            raise HTTPException(status_code=400, detail="Не задан ttl_seconds")
+        row = CacheSettings(
+            cache_key=cache_key,
+            cache_type=cache_type or default_type or "stats",
+            ttl_seconds=ttl_seconds if ttl_seconds is not None else default_ttl,
+            is_enabled=True if is_enabled is None else is_enabled,
+        )
+        session.add(row)
+    else:
+        if ttl_seconds is not None:
+            row.ttl_seconds = ttl_seconds
+        if is_enabled is not None:
+            row.is_enabled = is_enabled
+        if cache_type is not None:
+            row.cache_type = cache_type
+
+    await session.commit()
+    await response_cache.settings_changed(cache_key)
+
+    await log_admin_action(
+        "update_cache_settings",
+        "cache_settings",
+        cache_key,
+        current_admin,
+        session,
+        details={
+            "ttl_seconds": row.ttl_seconds,
+            "is_enabled": row.is_enabled,
+            "cache_type": row.cache_type,
+        },
+    )
+
+    return {"success": True, "policies": response_cache.list_policies()}
+
+
+@router.delete("/settings/{cache_key}")
+async def reset_cache_settings(
+    cache_key: str,
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, Any]:
+    """Удаляет переопределение: кэш возвращается к политике по умолчанию"""
+    result = await session.execute(
+        select(CacheSettings).where(CacheSettings.cache_key == cache_key)
+    )
+    row = result.scalar_one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Настройка кэша не найдена")
+
+    await session.delete(row)
+    await session.commit()
+    await response_cache.settings_changed(cache_key)
+
+    await log_admin_action(
+        "reset_cache_settings", "cache_settings", cache_key, current_admin, session
+    )
+
+    return {"success": True, "policies": response_cache.list_policies()}
+
+
+@router.get("/stats")
+async def get_cache_stats(
+    current_admin: User = Depends(get_current_admin_user),
+) -> Dict[str, Any]:
+    """Попадания по уровням, объединенные запросы и hit ratio по кэшам"""
+    return response_cache.get_stats()
+
+
+@router.post("/invalidate")
+async def invalidate_cache(
+    cache_key: str = Query(..., description="Имя кэша"),
+    key: Optional[str] = Query(None, description="Ключ; пусто - все ключи кэша"),
+    current_admin: User = Depends(get_current_admin_user),
+) -> Dict[str, Any]:
+    """Сброс данных кэша"""
+    await response_cache.invalidate(cache_key, key)
+    return {"success": True}
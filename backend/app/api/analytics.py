@@ -0,0 +1,297 @@
+# backend/app/api/analytics.py
+
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.auth import get_current_admin_user
+from app.database import get_session
+from app.dependencies import get_current_user
+from app.models import (
+    User,
+    UserDomain,
+    ParsingAnalytics,
+    UserActivityStats,
+    TaskAnalytics,
+    BusinessMetrics,
+    PerformanceMetrics,
+)
+from app.services.analytics_rollup_service import AnalyticsRollupService
+from app.core.resource_sampler import resource_sampler
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def _date_range(date_from: Optional[date], date_to: Optional[date]):
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=30)
+    return date_from, date_to
+
+
+@router.get("/parsing")
+async def get_parsing_analytics(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    domain_id: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Дневная статистика проверок позиций по доменам пользователя"""
+    date_from, date_to = _date_range(date_from, date_to)
+
+    query = (
+        select(ParsingAnalytics, UserDomain.domain)
+        .join(UserDomain, UserDomain.id == ParsingAnalytics.domain_id)
+        .where(
+            ParsingAnalytics.user_id == current_user.id,
+            ParsingAnalytics.date >= date_from,
+            ParsingAnalytics.date <= date_to,
+        )
+        .order_by(ParsingAnalytics.date.desc(), UserDomain.domain)
+    )
+    if domain_id:
+        query = query.where(ParsingAnalytics.domain_id == domain_id)
+
+    result = await session.execute(query)
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "items": [
+            {
+                "date": row.date.isoformat(),
+                "domain_id": str(row.domain_id),
+                "domain": domain,
+                "successful_checks": row.successful_checks,
+                "failed_checks": row.failed_checks,
+                "total_cost": float(row.total_cost or 0),
+                "avg_position": (
+                    float(row.avg_position) if row.avg_position is not None else None
+                ),
+            }
+            for row, domain in result.all()
+        ],
+    }
+
+
+@router.get("/activity")
+async def get_activity_analytics(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Дневная активность пользователя"""
+    date_from, date_to = _date_range(date_from, date_to)
+
+    result = await session.execute(
+        select(UserActivityStats)
+        .where(
+            UserActivityStats.user_id == current_user.id,
+            UserActivityStats.date >= date_from,
+            UserActivityStats.date <= date_to,
+        )
+        .order_by(UserActivityStats.date.desc())
+    )
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "items": [
+            {
+                "date": row.date.isoformat(),
+                "checks_count": row.checks_count,
+                "domains_count": row.domains_count,
+                "total_spent": float(row.total_spent or 0),
+            }
+            for row in result.scalars().all()
+        ],
+    }
+
+
+@router.get("/tasks")
+async def get_task_analytics(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    task_type: Optional[str] = Query(None),
+    by_server: bool = Query(False, description="Разбивка по серверам"),
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Дневная статистика задач (только для администраторов)"""
+    date_from, date_to = _date_range(date_from, date_to)
+
+    group_columns = [TaskAnalytics.date, TaskAnalytics.task_type]
+    if by_server:
+        group_columns.append(TaskAnalytics.server_id)
+
+    query = (
+        select(
+            *group_columns,
+            func.sum(TaskAnalytics.total_created).label("total_created"),
+            func.sum(TaskAnalytics.total_completed).label("total_completed"),
+            func.sum(TaskAnalytics.total_failed).label("total_failed"),
+            # Среднее, взвешенное по числу завершенных задач
+            (
+                func.sum(TaskAnalytics.avg_execution_time * TaskAnalytics.total_completed)
+                / func.nullif(func.sum(TaskAnalytics.total_completed), 0)
+            ).label("avg_execution_time"),
+        )
+        .where(TaskAnalytics.date >= date_from, TaskAnalytics.date <= date_to)
+        .group_by(*group_columns)
+        .order_by(TaskAnalytics.date.desc(), TaskAnalytics.task_type)
+    )
+    if task_type:
+        query = query.where(TaskAnalytics.task_type == task_type)
+
+    result = await session.execute(query)
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "items": [
+            {
+                "date": row.date.isoformat(),
+                "task_type": row.task_type,
+                "server_id": row.server_id if by_server else None,
+                "total_created": int(row.total_created or 0),
+                "total_completed": int(row.total_completed or 0),
+                "total_failed": int(row.total_failed or 0),
+                "avg_execution_time": (
+                    round(float(row.avg_execution_time), 2)
+                    if row.avg_execution_time is not None
+                    else None
+                ),
+            }
+            for row in result.all()
+        ],
+    }
+
+
+@router.get("/business")
+async def get_business_metrics(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Дневные бизнес-метрики (только для администраторов)"""
+    date_from, date_to = _date_range(date_from, date_to)
+
+    result = await session.execute(
+        select(BusinessMetrics)
+        .where(BusinessMetrics.date >= date_from, BusinessMetrics.date <= date_to)
+        .order_by(BusinessMetrics.date.desc(), BusinessMetrics.metric_name)
+    )
+
+    days = {}
+    for row in result.scalars().all():
+        days.setdefault(row.date.isoformat(), {})[row.metric_name] = float(row.value)
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "items": [{"date": day, "metrics": metrics} for day, metrics in days.items()],
+    }
+
+
+@router.get("/rollup/status")
+async def get_rollup_status(
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Состояние водяных знаков свертки (только для администраторов)"""
+    service = AnalyticsRollupService(session)
+    return {"watermarks": await service.get_watermarks()}
+
+
+@router.get("/resources/recent")
+async def get_recent_resources(
+    seconds: int = Query(600, ge=5, le=86400),
+    processes: bool = Query(False, description="Процессы Chromium в каждом сэмпле"),
+    server_id: Optional[str] = Query(
+        None, description="Узел; без него - буфер процесса, обслужившего запрос"
+    ),
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Последние сэмплы ресурсов.
+
+    Без server_id отдается кольцевой буфер в памяти процесса API (полное
+    разрешение, только этот процесс). Буферы воркеров и узлов Chromium
+    отсюда недоступны - для них указывается server_id, и отдаются минутные
+    агрегаты узла из БД.
+    """
+    if server_id is None:
+        samples = resource_sampler.recent(seconds)
+        return {
+            "source": "memory",
+            "interval_seconds": resource_sampler.interval,
+            "count": len(samples),
+            "items": [sample.to_dict(with_processes=processes) for sample in samples],
+        }
+
+    result = await session.execute(
+        select(
+            PerformanceMetrics.measurement_time,
+            PerformanceMetrics.metric_type,
+            PerformanceMetrics.value,
+        )
+        .where(
+            PerformanceMetrics.server_id == server_id,
+            PerformanceMetrics.resolution == "1m",
+            PerformanceMetrics.measurement_time
+            >= datetime.utcnow() - timedelta(seconds=seconds),
+        )
+        .order_by(PerformanceMetrics.measurement_time)
+    )
+    minutes = {}
+    for measured_at, metric_type, value in result.all():
+        minutes.setdefault(measured_at, {"time": measured_at})[metric_type] = float(value)
+
+    return {
+        "source": "database",
+        "server_id": server_id,
+        "interval_seconds": 60,
+        "count": len(minutes),
+        "items": list(minutes.values()),
+    }
+
+
+@router.get("/resources/history")
+async def get_resource_history(
+    server_id: str = Query(...),
+    metric_type: str = Query("cpu_percent"),
+    resolution: str = Query("1m", pattern="^(1m|1h)$"),
+    hours: int = Query(24, ge=1, le=24 * 180),
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Минутные или часовые агрегаты ресурсов сервера из БД"""
+    result = await session.execute(
+        select(
+            PerformanceMetrics.measurement_time,
+            PerformanceMetrics.value,
+            PerformanceMetrics.details,
+        )
+        .where(
+            PerformanceMetrics.server_id == server_id,
+            PerformanceMetrics.metric_type == metric_type,
+            PerformanceMetrics.resolution == resolution,
+            PerformanceMetrics.measurement_time
+            >= datetime.utcnow() - timedelta(hours=hours),
+        )
+        .order_by(PerformanceMetrics.measurement_time)
+    )
+    return {
+        "server_id": server_id,
+        "metric_type": metric_type,
+        "resolution": resolution,
+        "items": [
+            {"time": measured_at, "value": float(value), **(details or {})}
+            for measured_at, value, details in result.all()
+        ],
+    }
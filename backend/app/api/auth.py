@@ -5,6 +5,7 @@ from typing import Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.auth_cache import auth_cache
 from app.core.user_service import UserService
 from app.database import get_session
 from app.dependencies import get_current_user
@@ -260,3 +261,45 @@ async def log_admin_action(
 
         logger = structlog.get_logger(__name__)
         logger.error("Failed to log admin action", error=str(e))
+
+
+@router.post("/users/{user_id}/active", response_model=dict)
+async def set_user_active(
+    user_id: str,
+    is_active: bool,
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Активация/деактивация пользователя (токены и ключи отзываются сразу)"""
+    user_service = UserService(session)
+    result = await user_service.set_user_active(user_id, is_active)
+
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=result["errors"]
+        )
+
+    await log_admin_action(
+        "set_user_active",
+        "user",
+        user_id,
+        admin_user,
+        session,
+        details={"is_active": is_active},
+    )
+    return result
+
+
+@router.get("/cache/stats", response_model=dict)
+async def get_auth_cache_stats(admin_user: User = Depends(get_current_admin_user)):
+    """Статистика кэша аутентификации"""
+    return auth_cache.get_stats()
+
+
+@router.post("/cache/invalidate", response_model=dict)
+async def invalidate_auth_cache(
+    user_id: str, admin_user: User = Depends(get_current_admin_user)
+):
+    """Отзыв кэшированных токенов пользователя после изменений в обход API"""
+    await auth_cache.invalidate_user(user_id)
+    return {"success": True}
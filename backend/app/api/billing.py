@@ -4,6 +4,8 @@ from typing import List, Optional
 
 from app.database import get_session
 from app.core.billing_service import BillingService
+from app.core.billing_cache import billing_cache
+from app.api.auth import get_current_admin_user
 from app.dependencies import get_current_user, require_api_key
 from app.schemas.user import (
     BalanceTopup, BalanceResponse, TransactionHistory, TariffInfo
@@ -20,23 +22,15 @@ async def get_balance(
 ):
     """Получение баланса пользователя"""
     billing_service = BillingService(session)
+    balance = await billing_service.get_balance(str(current_user.id))
 
-    # Получаем детальную информацию о балансе
-    from app.core.user_service import UserService
-    user_service = UserService(session)
-    profile = await user_service.get_user_profile(str(current_user.id))
-
-    if not profile:
+    if not balance:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Профиль пользователя не найден"
         )
 
-    return {
-        "current_balance": profile["current_balance"],
-        "reserved_balance": profile["reserved_balance"],
-        "available_balance": profile["current_balance"] - profile["reserved_balance"]
-    }
+    return balance
 
 
 @router.post("/topup", response_model=BalanceResponse)
@@ -121,18 +115,35 @@ async def api_get_balance(
     """Получение баланса через API"""
     current_user = await require_api_key(api_key=api_key, session=session)
 
-    from app.core.user_service import UserService
-    user_service = UserService(session)
-    profile = await user_service.get_user_profile(str(current_user.id))
+    balance = await BillingService(session).get_balance(str(current_user.id))
 
-    if not profile:
+    if not balance:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Профиль пользователя не найден"
         )
 
-    return {
-        "current_balance": profile["current_balance"],
-        "reserved_balance": profile["reserved_balance"],
-        "available_balance": profile["current_balance"] - profile["reserved_balance"]
-    }
\ No newline at end of file
+    return balance
+
+
+@router.get("/cache/stats", response_model=dict)
+async def get_billing_cache_stats(
+        admin_user: User = Depends(get_current_admin_user)
+):
+    """Статистика кэша тарифов (попадания по уровням)"""
+    return billing_cache.get_stats()
+
+
+@router.post("/cache/invalidate", response_model=dict)
+async def invalidate_billing_cache(
+        tariff_name: Optional[str] = Query(None, description="Тариф; пусто - все тарифы"),
+        user_id: Optional[str] = Query(None, description="Сбросить план пользователя"),
+        admin_user: User = Depends(get_current_admin_user)
+):
+    """Сброс кэша после изменения тарифов в обход API"""
+    if user_id:
+        await billing_cache.invalidate_user(user_id)
+    else:
+        await billing_cache.invalidate_tariff(tariff_name)
+
+    return {"success": True}
@@ -1,18 +1,16 @@
-import os
-import requests
-import tempfile
 from operator import and_
-from typing import List
-from docx import Document
-import openpyxl
-from io import StringIO, BytesIO
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import logger, UserDomain, UserKeyword
-from app.core.user_service import UserService
+from app.core.user_service import UserService, KEYWORDS_PAGE_LIMIT
+from app.core.keyword_file_extractor import keyword_file_extractor
+from app.core.region_search_index import region_search_index
+from app.core.response_cache import response_cache
+from app.services.keyword_ingest_service import KeywordIngestService
 from app.database import get_session
 from app.dependencies import get_current_user, require_api_key
 from app.models import User, Region, YandexRegion, DeviceType
@@ -21,11 +19,13 @@ from app.schemas.domain import (
     DomainResponse,
     KeywordAdd,
     KeywordResponse,
+    KeywordListResponse,
     RegionResponse,
     BulkKeywordsAdd,
     WordFileLoad,
     ExcelFileLoad,
     TextFileLoad,
+    KeywordFileImport,
     KeywordUpdate,
     BulkDeleteKeywords,
     BulkEditKeywords,
@@ -43,23 +43,34 @@ async def get_regions(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    """Получение списка доступных регионов"""
-    result = await session.execute(
-        select(YandexRegion)
-        .where(YandexRegion.is_active == True)
-        .order_by(YandexRegion.region_name)
-        .limit(limit)
+    """Получение списка доступных регионов (кэш domain_regions)"""
+    regions = await response_cache.get_or_load(
+        "domain_regions", limit, lambda: _load_regions(session, limit)
     )
-    regions = result.scalars().all()
+    return [RegionResponse(**region) for region in regions]
+
+
+async def _load_regions(session: AsyncSession, limit: int) -> List[dict]:
+    """Активные регионы по алфавиту (из индекса или из БД)"""
+    if region_search_index.is_loaded:
+        regions = region_search_index.list_regions(limit)
+    else:
+        result = await session.execute(
+            select(YandexRegion)
+            .where(YandexRegion.is_active == True)
+            .order_by(YandexRegion.region_name)
+            .limit(limit)
+        )
+        regions = result.scalars().all()
 
     return [
-        RegionResponse(
-            id=str(region.id),
-            code=region.region_code,
-            name=region.display_name or region.region_name,
-            country_code=region.country_code,
-            region_type=region.region_type,
-        )
+        {
+            "id": str(region.id),
+            "code": region.region_code,
+            "name": region.display_name or region.region_name,
+            "country_code": region.country_code,
+            "region_type": region.region_type,
+        }
         for region in regions
     ]
 
@@ -75,8 +86,13 @@ async def search_regions(
 ):
     """Поиск регионов по названию или коду"""
     try:
-        # Используем улучшенный метод поиска с приоритизацией
-        regions = await YandexRegion.search_with_region_type_priority(session, q, limit)
+        # Индекс в памяти повторяет приоритеты search_with_region_type_priority
+        if region_search_index.is_loaded:
+            regions = region_search_index.search(q, limit)
+        else:
+            regions = await YandexRegion.search_with_region_type_priority(
+                session, q, limit
+            )
 
         return [
             RegionResponse(
@@ -167,19 +183,35 @@ async def add_keyword(
     }
 
 
-@router.get("/{domain_id}/keywords", response_model=List[KeywordResponse])
+@router.get("/{domain_id}/keywords", response_model=KeywordListResponse)
 async def get_domain_keywords(
     domain_id: str,
+    limit: int = Query(KEYWORDS_PAGE_LIMIT, ge=1, le=5000),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    sort_by: str = Query("created_at", description="created_at, keyword или position"),
+    include_total: bool = Query(False),
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Получение ключевых слов домена"""
+    """Получение ключевых слов домена с последними позициями (keyset пагинация)"""
     user_service = UserService(session)
-    keywords = await user_service.get_domain_keywords(
-        user_id=str(current_user.id), domain_id=domain_id
-    )
+    try:
+        page = await user_service.get_domain_keywords(
+            user_id=str(current_user.id),
+            domain_id=domain_id,
+            limit=limit,
+            cursor=cursor,
+            sort_by=sort_by,
+            include_total=include_total,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    return [KeywordResponse(**keyword) for keyword in keywords]
+    return KeywordListResponse(
+        keywords=[KeywordResponse(**keyword) for keyword in page["keywords"]],
+        next_cursor=page["next_cursor"],
+        total=page["total"],
+    )
 
 
 @router.get("/{domain_id}/proxy-settings")
@@ -421,44 +453,29 @@ async def api_get_domains(
     return [DomainResponse(**domain) for domain in domains]
 
 
+async def _extract_keywords(url: str, kind: str, empty_detail: str, **options):
+    """Извлекает ключевые слова из файла по URL в пуле процессов"""
+    try:
+        result = await keyword_file_extractor.extract_from_url(url, kind, **options)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if not result.keywords:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=empty_detail)
+
+    return result
+
+
 @router.post("/load-keywords/text-file", response_model=dict)
 async def load_keywords_from_text_file(
     file_data: TextFileLoad,
     current_user: User = Depends(get_current_user),
 ):
     """Загрузка ключевых слов из текстового файла"""
-    try:
-        # Загружаем файл
-        content = download_file(file_data.url)
-
-        # Определяем кодировку и декодируем
-        text_content = content.decode("utf-8")
-
-        # Извлекаем ключевые слова
-        keywords = extract_keywords_from_text(text_content)
-
-        if not keywords:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="В файле не найдено ключевых слов",
-            )
-
-        return {"success": True, "keywords": keywords, "count": len(keywords)}
-
-    except UnicodeDecodeError:
-        # Пробуем другие кодировки
-        try:
-            text_content = content.decode("cp1251")
-            keywords = extract_keywords_from_text(text_content)
-
-            return {"success": True, "keywords": keywords, "count": len(keywords)}
-        except:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Не удалось определить кодировку файла",
-            )
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    result = await _extract_keywords(
+        file_data.url, "text", "В файле не найдено ключевых слов"
+    )
+    return {"success": True, "keywords": result.keywords, "count": len(result.keywords)}
 
 
 @router.post("/load-keywords/excel", response_model=dict)
@@ -467,25 +484,14 @@ async def load_keywords_from_excel(
     current_user: User = Depends(get_current_user),
 ):
     """Загрузка ключевых слов из Excel файла"""
-    try:
-        # Загружаем файл
-        content = download_file(file_data.url)
-
-        # Извлекаем ключевые слова
-        keywords = extract_keywords_from_excel(
-            content, file_data.sheet, file_data.start_row
-        )
-
-        if not keywords:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="В файле не найдено ключевых слов",
-            )
-
-        return {"success": True, "keywords": keywords, "count": len(keywords)}
-
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    result = await _extract_keywords(
+        file_data.url,
+        "excel",
+        "В файле не найдено ключевых слов",
+        sheet=file_data.sheet,
+        start_row=file_data.start_row,
+    )
+    return {"success": True, "keywords": result.keywords, "count": len(result.keywords)}
 
 
 @router.post("/load-keywords/word", response_model=dict)
@@ -494,23 +500,71 @@ async def load_keywords_from_word(
     current_user: User = Depends(get_current_user),
 ):
     """Загрузка ключевых слов из Word документа"""
-    try:
-        # Загружаем файл
-        content = download_file(file_data.url)
+    result = await _extract_keywords(
+        file_data.url, "word", "В документе не найдено ключевых слов"
+    )
+    return {"success": True, "keywords": result.keywords, "count": len(result.keywords)}
 
-        # Извлекаем ключевые слова
-        keywords = extract_keywords_from_word(content)
 
-        if not keywords:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="В документе не найдено ключевых слов",
-            )
+@router.post("/{domain_id}/keywords/import", response_model=dict)
+async def import_keywords_from_file(
+    domain_id: str,
+    import_data: KeywordFileImport,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Импорт ключевых слов из файла сразу в домен (без передачи списка клиенту)"""
+    domain = await session.execute(
+        select(UserDomain).where(
+            and_(UserDomain.id == domain_id, UserDomain.user_id == current_user.id)
+        )
+    )
+    if not domain.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Домен не найден"
+        )
 
-        return {"success": True, "keywords": keywords, "count": len(keywords)}
+    options = (
+        {"sheet": import_data.sheet, "start_row": import_data.start_row}
+        if import_data.file_type == "excel"
+        else {}
+    )
+    extracted = await _extract_keywords(
+        import_data.url,
+        import_data.file_type,
+        "В файле не найдено ключевых слов",
+        **options,
+    )
 
+    try:
+        result = await KeywordIngestService(session).ingest(
+            user_id=str(current_user.id),
+            domain_id=domain_id,
+            keywords=extracted.keywords,
+            device_type=DeviceType(import_data.device_type),
+            check_frequency=import_data.check_frequency,
+        )
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        await session.rollback()
+        logger.error(
+            f"Failed to import keywords for user {current_user.id}, domain {domain_id}, error: {str(e)}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при добавлении ключевых слов",
+        )
+
+    stats = result["stats"]
+    stats["rows_scanned"] = extracted.rows_scanned
+    stats["duplicate_keywords"] += extracted.duplicates
+    stats["invalid_keywords"] += extracted.invalid
+
+    return {
+        "success": True,
+        "message": f"Добавлено {stats['added_keywords']} ключевых слов",
+        "stats": stats,
+        "skipped_keywords": result["skipped_keywords"],
+    }
 
 
 @router.post("/{domain_id}/keywords/bulk", response_model=dict)
@@ -520,9 +574,7 @@ async def add_bulk_keywords(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Массовое добавление ключевых слов"""
-    user_service = UserService(session)
-
+    """Массовое добавление ключевых слов (регион берется из домена)"""
     # Проверяем принадлежность домена пользователю
     domain = await session.execute(
         select(UserDomain).where(
@@ -535,78 +587,22 @@ async def add_bulk_keywords(
             status_code=status.HTTP_404_NOT_FOUND, detail="Домен не найден"
         )
 
-    # Проверяем существование региона
-    region = await session.get(YandexRegion, keywords_data.region_id)
-    if not region:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Регион не найден"
-        )
-
-    # Статистика добавления
-    stats = {
-        "total_keywords": len(keywords_data.keywords),
-        "added_keywords": 0,
-        "skipped_keywords": 0,
-        "errors": [],
-    }
-
-    added_keyword_ids = []
-    skipped_keywords = []
-
     try:
-        for keyword in keywords_data.keywords:
-            try:
-                # Проверяем, существует ли уже такое ключевое слово
-                existing_keyword = await session.execute(
-                    select(UserKeyword).where(
-                        UserKeyword.user_id == current_user.id,
-                        UserKeyword.domain_id == domain_id,
-                        UserKeyword.keyword == keyword,
-                        UserKeyword.region_id == keywords_data.region_id,
-                        UserKeyword.device_type
-                        == DeviceType(keywords_data.device_type),
-                    )
-                )
-
-                if existing_keyword.scalar_one_or_none():
-                    skipped_keywords.append(keyword)
-                    stats["skipped_keywords"] += 1
-                    continue
-
-                # Добавляем новое ключевое слово
-                user_keyword = UserKeyword(
-                    user_id=current_user.id,
-                    domain_id=domain_id,
-                    keyword=keyword,
-                    region_id=keywords_data.region_id,
-                    device_type=DeviceType(keywords_data.device_type),
-                    check_frequency=keywords_data.check_frequency,
-                    is_active=True,
-                )
-
-                session.add(user_keyword)
-                await session.flush()  # Получаем ID без коммита
-
-                added_keyword_ids.append(str(user_keyword.id))
-                stats["added_keywords"] += 1
-
-            except Exception as e:
-                stats["errors"].append(f"Ошибка при добавлении '{keyword}': {str(e)}")
-                continue
-
-        # Коммитим все изменения
-        await session.commit()
-
-        logger.info(
-            f"Bulk keywords added for user {current_user.id}, domain {domain_id}, stats: {stats}"
+        result = await KeywordIngestService(session).ingest(
+            user_id=str(current_user.id),
+            domain_id=domain_id,
+            keywords=keywords_data.keywords,
+            device_type=DeviceType(keywords_data.device_type),
+            check_frequency=keywords_data.check_frequency,
         )
 
+        stats = result["stats"]
         return {
             "success": True,
             "message": f"Добавлено {stats['added_keywords']} ключевых слов",
             "stats": stats,
-            "added_keyword_ids": added_keyword_ids,
-            "skipped_keywords": skipped_keywords,
+            "added_keyword_ids": result["added_keyword_ids"],
+            "skipped_keywords": result["skipped_keywords"],
         }
 
     except Exception as e:
@@ -734,112 +730,6 @@ async def bulk_edit_keywords(
         )
 
 
-# Вспомогательные функции
-def download_file(url: str, max_size: int = 10 * 1024 * 1024) -> bytes:
-    """Загружает файл по URL с ограничением размера"""
-    try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-
-        # Проверяем размер файла
-        content_length = response.headers.get("content-length")
-        if content_length and int(content_length) > max_size:
-            raise ValueError(f"Файл слишком большой (максимум {max_size} байт)")
-
-        # Загружаем файл по частям
-        content = b""
-        for chunk in response.iter_content(chunk_size=8192):
-            content += chunk
-            if len(content) > max_size:
-                raise ValueError(f"Файл слишком большой (максимум {max_size} байт)")
-
-        return content
-    except requests.RequestException as e:
-        raise ValueError(f"Ошибка загрузки файла: {str(e)}")
-
-
-def extract_keywords_from_text(content: str) -> List[str]:
-    """Извлекает ключевые слова из текста"""
-    lines = content.split("\n")
-    keywords = []
-
-    for line in lines:
-        line = line.strip()
-        if line and len(line) <= 500:  # Ограничение длины ключевого слова
-            keywords.append(line)
-
-    return keywords
-
-
-def extract_keywords_from_excel(
-    content: bytes, sheet: int = 1, start_row: int = 1
-) -> List[str]:
-    """Извлекает ключевые слова из Excel файла"""
-    try:
-        # Создаем временный файл
-        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp_file:
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-
-        try:
-            # Читаем Excel файл
-            workbook = openpyxl.load_workbook(tmp_file_path)
-
-            # Получаем лист
-            if sheet > len(workbook.sheetnames):
-                raise ValueError(
-                    f"Лист {sheet} не найден. Доступно листов: {len(workbook.sheetnames)}"
-                )
-
-            worksheet = workbook.worksheets[sheet - 1]
-
-            keywords = []
-            for row in worksheet.iter_rows(
-                min_row=start_row, max_col=1, values_only=True
-            ):
-                if row[0] and isinstance(row[0], str):
-                    keyword = str(row[0]).strip()
-                    if keyword and len(keyword) <= 500:
-                        keywords.append(keyword)
-
-            return keywords
-
-        finally:
-            # Удаляем временный файл
-            os.unlink(tmp_file_path)
-
-    except Exception as e:
-        raise ValueError(f"Ошибка обработки Excel файла: {str(e)}")
-
-
-def extract_keywords_from_word(content: bytes) -> List[str]:
-    """Извлекает ключевые слова из Word документа"""
-    try:
-        # Создаем временный файл
-        with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as tmp_file:
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-
-        try:
-            # Читаем Word документ
-            doc = Document(tmp_file_path)
-
-            keywords = []
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if text and len(text) <= 500:
-                    keywords.append(text)
-
-            return keywords
-
-        finally:
-            # Удаляем временный файл
-            os.unlink(tmp_file_path)
-
-    except Exception as e:
-        raise ValueError(f"Ошибка обработки Word документа: {str(e)}")
-
-
 @router.put("/{domain_id}", response_model=dict)
 async def update_domain(
     domain_id: str,
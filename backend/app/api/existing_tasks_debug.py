@@ -9,6 +9,7 @@ from datetime import datetime, timezone
 from app.database import async_session_maker
 from app.models import Task, DeviceType
 from app.core.task_manager import TaskManager
+from app.core.strategy_nurture_counters import strategy_nurture_counters
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -288,13 +289,17 @@ async def restart_task_debug(
         except ValueError:
             device_type_enum = DeviceType.DESKTOP
 
-        # Получаем задачу
-        result = await db.execute(select(Task).where(Task.id == task_id))
+        # Получаем задачу (под блокировкой - сдвигаем счетчики нагула)
+        result = await db.execute(
+            select(Task).where(Task.id == task_id).with_for_update()
+        )
         task = result.scalar_one_or_none()
 
         if not task:
             raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
 
+        old_status = task.status
+
         # Останавливаем существующую VNC сессию
         try:
             from app.core.enhanced_vnc_manager import enhanced_vnc_manager
@@ -325,6 +330,7 @@ async def restart_task_debug(
             }
         )
 
+        await strategy_nurture_counters.apply_task(db, task, old_status)
         await db.commit()
 
         logger.info(
@@ -0,0 +1,131 @@
+# backend/app/api/exports.py
+
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_session
+from app.dependencies import get_current_user
+from app.models import User, UserDomain
+from app.services.export_service import (
+    EXPORT_FORMATS,
+    ExportSpec,
+    export_limiter,
+    position_history_export,
+    parse_results_export,
+)
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+
+def _date_range(date_from: Optional[date], date_to: Optional[date]):
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=30)
+
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата начала позже даты окончания",
+        )
+    if (date_to - date_from).days > settings.export_max_days:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Период выгрузки не может превышать {settings.export_max_days} дней",
+        )
+    return date_from, date_to
+
+
+def _check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Формат должен быть одним из: {', '.join(EXPORT_FORMATS)}",
+        )
+
+
+async def _get_user_domain(
+    session: AsyncSession, user: User, domain_id: str
+) -> UserDomain:
+    result = await session.execute(
+        select(UserDomain).where(
+            and_(UserDomain.id == domain_id, UserDomain.user_id == user.id)
+        )
+    )
+    domain = result.scalar_one_or_none()
+    if not domain:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Домен не найден"
+        )
+    return domain
+
+
+async def _streaming_response(spec: ExportSpec, export_format: str) -> StreamingResponse:
+    slot = await export_limiter.try_acquire()
+    if slot is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много одновременных выгрузок, повторите позже",
+        )
+
+    # Слот освобождает генератор выгрузки, а если тело так и не читалось
+    # (клиент отключился сразу) - фоновая задача ответа или ExportSlot.__del__
+    return StreamingResponse(
+        export_limiter.stream(spec, export_format, slot),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename={spec.filename}.{export_format}"
+            )
+        },
+        background=BackgroundTask(slot.release),
+    )
+
+
+@router.get("/positions")
+async def export_position_history(
+    domain_id: str = Query(..., description="ID домена"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    export_format: str = Query("csv", alias="format", description="csv, ndjson, xlsx"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Потоковая выгрузка истории позиций домена"""
+    _check_format(export_format)
+    date_from, date_to = _date_range(date_from, date_to)
+    await _get_user_domain(session, current_user, domain_id)
+
+    spec = position_history_export(str(current_user.id), domain_id, date_from, date_to)
+    return await _streaming_response(spec, export_format)
+
+
+@router.get("/parse-results")
+async def export_parse_results(
+    task_id: Optional[str] = Query(None, description="ID задачи парсинга"),
+    domain_id: Optional[str] = Query(
+        None, description="Только результаты с доменом пользователя"
+    ),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    export_format: str = Query("csv", alias="format", description="csv, ndjson, xlsx"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Потоковая выгрузка результатов парсинга SERP"""
+    _check_format(export_format)
+    date_from, date_to = _date_range(date_from, date_to)
+
+    domain = None
+    if domain_id:
+        domain = (await _get_user_domain(session, current_user, domain_id)).domain
+
+    spec = parse_results_export(
+        str(current_user.id), date_from, date_to, task_id=task_id, domain=domain
+    )
+    return await _streaming_response(spec, export_format)
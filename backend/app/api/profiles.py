@@ -1,16 +1,21 @@
 # backend/app/api/profiles.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, tuple_, literal_column
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from datetime import datetime
+import base64
+import json
+import uuid
 
 from app.database import get_session
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.profile import Profile, ProfileFingerprint, ProfileLifecycle, DeviceType
 from app.models.proxy import ProfileProxyAssignment
+from app.core.profile_snapshot_store import profile_snapshot_store
+from app.core.response_cache import response_cache
 
 from pydantic import BaseModel
 
@@ -67,16 +72,49 @@ class ProfileDetailResponse(BaseModel):
 
 class ProfilesListResponse(BaseModel):
     profiles: List[ProfileResponse]
-    total: int
+    total: Optional[int]
     page: int
     per_page: int
-    total_pages: int
+    total_pages: Optional[int]
+    next_cursor: Optional[str] = None
+
+
+# Колонки, по которым поддерживается сортировка (и keyset пагинация)
+SORT_COLUMNS = {
+    "created_at": Profile.created_at,
+    "updated_at": Profile.updated_at,
+    "last_used": func.coalesce(
+        Profile.last_used, literal_column("'1970-01-01'::timestamp")
+    ),
+    "name": Profile.name,
+}
+
+
+def _encode_cursor(sort_value, profile_id) -> str:
+    """Кодирует позицию последней строки страницы в курсор"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, str(profile_id)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, sort_by: str):
+    """Декодирует курсор в (значение сортировки, id профиля)"""
+    try:
+        sort_value, profile_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if sort_by != "name":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, uuid.UUID(profile_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
 
 
 @router.get("/", response_model=ProfilesListResponse)
 async def get_profiles(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
     search: Optional[str] = Query(None),
     device_type: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
@@ -86,28 +124,31 @@ async def get_profiles(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Получение списка профилей с фильтрацией, поиском и сортировкой"""
+    """Получение списка профилей с фильтрацией, поиском и сортировкой.
 
-    # Базовый запрос
-    query = select(Profile).options(
-        selectinload(Profile.fingerprint_data),
-        selectinload(Profile.lifecycle),
-        selectinload(Profile.assigned_warmup_proxy),
-    )
+    Если передан cursor - используется keyset пагинация (page игнорируется),
+    курсор следующей страницы возвращается в next_cursor.
+    """
+
+    # Базовый запрос (в списке нужен только lifecycle)
+    query = select(Profile).options(selectinload(Profile.lifecycle))
 
     # Условия фильтрации
     conditions = []
 
-    # Поиск
+    # Поиск (ILIKE использует trigram индексы)
     if search:
-        search_term = f"%{search.lower()}%"
-        conditions.append(
-            or_(
-                func.lower(Profile.name).like(search_term),
-                func.lower(Profile.user_agent).like(search_term),
-                func.lower(Profile.device_type).like(search_term),
-            )
-        )
+        search_term = f"%{search}%"
+        search_conditions = [
+            Profile.name.ilike(search_term),
+            Profile.user_agent.ilike(search_term),
+        ]
+        matched_device_types = [
+            dt for dt in DeviceType if search.lower() in dt.value
+        ]
+        if matched_device_types:
+            search_conditions.append(Profile.device_type.in_(matched_device_types))
+        conditions.append(or_(*search_conditions))
 
     # Фильтр по типу устройства
     if device_type:
@@ -121,32 +162,53 @@ async def get_profiles(
     if is_warmed_up is not None:
         conditions.append(Profile.is_warmed_up == is_warmed_up)
 
+    # Подсчет общего количества (только для постраничного режима или по запросу)
+    total = None
+    if include_total and not cursor:
+        count_query = select(func.count(Profile.id))
+        if conditions:
+            count_query = count_query.where(and_(*conditions))
+
+        total_result = await session.execute(count_query)
+        total = total_result.scalar() or 0
+
+    # Сортировка по (колонка, id) - стабильный порядок для keyset пагинации
+    if sort_by not in SORT_COLUMNS:
+        sort_by = "created_at"
+    sort_column = SORT_COLUMNS[sort_by]
+    descending = sort_order == "desc"
+
+    if cursor:
+        sort_value, last_id = _decode_cursor(cursor, sort_by)
+        position = tuple_(sort_column, Profile.id)
+        conditions.append(
+            position < tuple_(sort_value, last_id)
+            if descending
+            else position > tuple_(sort_value, last_id)
+        )
+
     # Применяем условия
     if conditions:
         query = query.where(and_(*conditions))
 
-    # Сортировка
-    sort_column = getattr(Profile, sort_by, Profile.created_at)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
+    if descending:
+        query = query.order_by(sort_column.desc(), Profile.id.desc())
     else:
-        query = query.order_by(sort_column.asc())
-
-    # Подсчет общего количества
-    count_query = select(func.count(Profile.id))
-    if conditions:
-        count_query = count_query.where(and_(*conditions))
-
-    total_result = await session.execute(count_query)
-    total = total_result.scalar() or 0
+        query = query.order_by(sort_column.asc(), Profile.id.asc())
 
     # Пагинация
-    offset = (page - 1) * per_page
-    query = query.offset(offset).limit(per_page)
+    if not cursor:
+        query = query.offset((page - 1) * per_page)
+    query = query.add_columns(sort_column).limit(per_page)
 
     # Выполнение запроса
     result = await session.execute(query)
-    profiles = result.scalars().all() or []
+    rows = result.all()
+    profiles = [row[0] for row in rows]
+
+    next_cursor = None
+    if len(rows) == per_page:
+        next_cursor = _encode_cursor(rows[-1][1], rows[-1][0].id)
 
     # Формирование ответа
     profile_responses = []
@@ -190,7 +252,7 @@ async def get_profiles(
             )
         )
 
-    total_pages = (total + per_page - 1) // per_page
+    total_pages = (total + per_page - 1) // per_page if total is not None else None
 
     return ProfilesListResponse(
         profiles=profile_responses,
@@ -198,6 +260,7 @@ async def get_profiles(
         page=page,
         per_page=per_page,
         total_pages=total_pages,
+        next_cursor=next_cursor,
     )
 
 
@@ -309,6 +372,9 @@ async def delete_profile(
     await session.delete(profile)
     await session.commit()
 
+    # Снапшоты удаленного профиля больше не нужны
+    await profile_snapshot_store.delete_profile(profile_id)
+
     return {"success": True, "message": "Профиль успешно удален"}
 
 
@@ -339,6 +405,9 @@ async def bulk_delete_profiles(
 
     await session.commit()
 
+    for profile in profiles:
+        await profile_snapshot_store.delete_profile(str(profile.id))
+
     return {
         "success": True,
         "message": f"Успешно удалено {len(profiles)} профилей",
@@ -351,37 +420,31 @@ async def get_profiles_stats(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Получение статистики профилей"""
+    """Получение статистики профилей (кэш profiles_stats_summary)"""
 
-    # Общее количество профилей
-    total_query = select(func.count(Profile.id))
-    total_result = await session.execute(total_query)
-    total = total_result.scalar() or 0
+    return await response_cache.get_or_load(
+        "profiles_stats_summary", "global", lambda: _load_profiles_stats(session)
+    )
 
-    # Количество прогретых профилей
-    warmed_query = select(func.count(Profile.id)).where(Profile.is_warmed_up == True)
-    warmed_result = await session.execute(warmed_query)
-    warmed = warmed_result.scalar() or 0
 
-    # Количество по типам устройств
-    desktop_query = select(func.count(Profile.id)).where(
-        Profile.device_type == DeviceType.DESKTOP
-    )
-    desktop_result = await session.execute(desktop_query)
-    desktop = desktop_result.scalar() or 0
+async def _load_profiles_stats(session: AsyncSession) -> dict:
+    """Счетчики профилей по всей таблице"""
 
-    mobile_query = select(func.count(Profile.id)).where(
-        Profile.device_type == DeviceType.MOBILE
+    # Все счетчики одним проходом по таблице
+    corrupted_subquery = (
+        select(func.count(ProfileLifecycle.id))
+        .where(ProfileLifecycle.is_corrupted == True)
+        .scalar_subquery()
     )
-    mobile_result = await session.execute(mobile_query)
-    mobile = mobile_result.scalar() or 0
-
-    # Количество испорченных профилей
-    corrupted_query = select(func.count(ProfileLifecycle.id)).where(
-        ProfileLifecycle.is_corrupted == True
+    stats_query = select(
+        func.count(Profile.id),
+        func.count(Profile.id).filter(Profile.is_warmed_up == True),
+        func.count(Profile.id).filter(Profile.device_type == DeviceType.DESKTOP),
+        func.count(Profile.id).filter(Profile.device_type == DeviceType.MOBILE),
+        corrupted_subquery,
     )
-    corrupted_result = await session.execute(corrupted_query)
-    corrupted = corrupted_result.scalar() or 0
+    stats_result = await session.execute(stats_query)
+    total, warmed, desktop, mobile, corrupted = stats_result.one()
 
     return {
         "total": total,
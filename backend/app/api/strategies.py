@@ -14,6 +14,8 @@ from app.constants.strategies import (
     validate_position_check_config,
     validate_profile_nurture_config,
 )
+from app.core.response_cache import response_cache
+from app.core.strategy_nurture_counters import strategy_nurture_counters
 from app.database import get_session
 from app.dependencies import get_current_user
 from app.models import User, UserStrategy
@@ -288,6 +290,7 @@ async def create_user_strategy(
         strategy = await strategy_service.create_user_strategy(
             str(current_user.id), strategy_data
         )
+        await _invalidate_nurture_caches(current_user.id)
         return strategy
     except Exception as e:
         print(f"Error in create_user_strategy: {e}")
@@ -702,6 +705,7 @@ async def update_user_strategy(
             str(current_user.id),
             update_dict,  # ← Передаем словарь, а не объект
         )
+        await _invalidate_nurture_caches(current_user.id)
 
         return strategy
     except Exception as e:
@@ -767,6 +771,7 @@ async def spawn_nurture_tasks(
 
     limits_service = ProfileNurtureLimitsService(session)
     result = await limits_service.spawn_nurture_tasks_if_needed(strategy_id)
+    await _invalidate_nurture_caches(current_user.id)
 
     return result
 
@@ -776,10 +781,14 @@ async def get_all_profile_nurture_status(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Получить статус всех стратегий нагула пользователя"""
+    """Получить статус всех стратегий нагула пользователя (кэш nurture_all_status)"""
 
     limits_service = ProfileNurtureLimitsService(session)
-    statuses = await limits_service.get_all_strategies_status(str(current_user.id))
+    statuses = await response_cache.get_or_load(
+        "nurture_all_status",
+        current_user.id,
+        lambda: limits_service.get_all_strategies_status(str(current_user.id)),
+    )
 
     return {"success": True, "strategies": statuses}
 
@@ -793,6 +802,7 @@ async def auto_maintain_strategies(
 
     limits_service = ProfileNurtureLimitsService(session)
     result = await limits_service.auto_maintain_all_strategies(str(current_user.id))
+    await _invalidate_nurture_caches(current_user.id)
 
     return result
 
@@ -828,7 +838,7 @@ async def get_strategy_nurture_tasks(
         .where(
             and_(
                 Task.task_type == "profile_nurture",
-                Task.parameters.op("->>")("strategy_id") == strategy_id,  # ИСПРАВЛЕНО
+                Task.strategy_id == strategy_id,
             )
         )
         .order_by(Task.created_at.desc())
@@ -846,7 +856,7 @@ async def get_strategy_nurture_tasks(
     count_query = select(func.count(Task.id)).where(
         and_(
             Task.task_type == "profile_nurture",
-            Task.parameters.op("->>")("strategy_id") == strategy_id,
+            Task.strategy_id == strategy_id,
         )
     )
     if status:
@@ -861,7 +871,7 @@ async def get_strategy_nurture_tasks(
         .where(
             and_(
                 Task.task_type == "profile_nurture",
-                Task.parameters.op("->>")("strategy_id") == strategy_id,
+                Task.strategy_id == strategy_id,
             )
         )
         .group_by(Task.status)
@@ -946,13 +956,19 @@ async def cancel_nurture_task(
     if not task:
         raise HTTPException(status_code=404, detail="Задача не найдена")
 
+    # Статус под блокировкой строки: воркер не заберет задачу во время отмены
+    previous = await strategy_nurture_counters.lock_task(session, task_id)
+
     # Можно отменить только pending задачи
-    if task.status != "pending":
+    if previous is None or previous.status != "pending":
+        await session.rollback()
         raise HTTPException(
             status_code=400,
             detail=f"Нельзя отменить задачу в статусе {task.status}",
         )
 
+    await strategy_nurture_counters.apply_locked(session, previous, "cancelled")
+
     # Обновляем статус задачи
     update_query = (
         update(Task)
@@ -966,6 +982,7 @@ async def cancel_nurture_task(
 
     await session.execute(update_query)
     await session.commit()
+    await _invalidate_nurture_caches(current_user.id)
 
     return {
         "success": True,
@@ -992,7 +1009,23 @@ async def get_nurture_queue_stats(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Получить статистику очереди задач нагула"""
+    """Получить статистику очереди задач нагула (кэш nurture_queue_stats)"""
+
+    return await response_cache.get_or_load(
+        "nurture_queue_stats",
+        current_user.id,
+        lambda: _load_nurture_queue_stats(session, current_user.id),
+    )
+
+
+async def _invalidate_nurture_caches(user_id):
+    """Сброс кэшированных статусов нагула пользователя после изменений"""
+    await response_cache.invalidate("nurture_all_status", user_id)
+    await response_cache.invalidate("nurture_queue_stats", user_id)
+
+
+async def _load_nurture_queue_stats(session: AsyncSession, user_id) -> Dict[str, Any]:
+    """Статистика очереди нагула пользователя и глобальная"""
 
     # Общая статистика по задачам пользователя
     user_stats_query = (
@@ -1000,7 +1033,7 @@ async def get_nurture_queue_stats(
         .where(
             and_(
                 Task.task_type == "profile_nurture",
-                Task.user_id == current_user.id,
+                Task.user_id == user_id,
             )
         )
         .group_by(Task.status)
@@ -1025,7 +1058,7 @@ async def get_nurture_queue_stats(
         .where(
             and_(
                 Task.task_type == "profile_nurture",
-                Task.user_id == current_user.id,
+                Task.user_id == user_id,
             )
         )
         .order_by(Task.created_at.desc())
@@ -1079,6 +1112,7 @@ async def delete_user_strategy(
     try:
         strategy_service = StrategyService(session)
         await strategy_service.delete_user_strategy(strategy_id, str(current_user.id))
+        await _invalidate_nurture_caches(current_user.id)
         return {"success": True}
     except Exception as e:
         print(f"Error in delete_user_strategy: {e}")
@@ -5,6 +5,12 @@ from typing import List, Optional
 from app.database import get_session
 from app.core.task_manager import TaskManager
 from app.core.billing_service import BillingService
+from app.core.profile_cascade_scheduler import profile_cascade_scheduler
+from app.core.check_scheduler import check_scheduler
+from app.core.task_tracing import render_trace
+from app.core.task_leases import task_lease_manager
+from app.core.task_archive import task_archiver
+from app.api.auth import get_current_admin_user
 from app.dependencies import get_current_user, require_api_key
 from app.models import User, DeviceType
 
@@ -83,21 +89,13 @@ async def create_parse_task(
     billing_service = BillingService(session)
     cost = await billing_service.calculate_check_cost(str(current_user.id), 1)
 
-    # Проверяем достаточность средств
-    from app.core.user_service import UserService
-
-    user_service = UserService(session)
-    profile = await user_service.get_user_profile(str(current_user.id))
-
-    available_balance = profile["current_balance"] - profile["reserved_balance"]
-    if available_balance < float(cost):
+    # Резервируем средства (проверка баланса - внутри атомарного резерва)
+    reserve_result = await billing_service.reserve_balance(str(current_user.id), cost)
+    if reserve_result.get("insufficient_funds"):
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
             detail="Недостаточно средств на балансе",
         )
-
-    # Резервируем средства
-    reserve_result = await billing_service.reserve_balance(str(current_user.id), cost)
     if not reserve_result["success"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -167,20 +165,14 @@ async def create_position_check_task(
         str(current_user.id), len(keyword_ids)
     )
 
-    # Проверяем и резервируем средства
-    from app.core.user_service import UserService
-
-    user_service = UserService(session)
-    profile = await user_service.get_user_profile(str(current_user.id))
-
-    available_balance = profile["current_balance"] - profile["reserved_balance"]
-    if available_balance < float(cost):
+    # Проверяем и резервируем средства одним запросом
+    reserve_result = await billing_service.reserve_balance(str(current_user.id), cost)
+    if reserve_result.get("insufficient_funds"):
+        available_balance = reserve_result["available_balance"]
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
             detail=f"Недостаточно средств. Необходимо: {cost}, доступно: {available_balance}",
         )
-
-    reserve_result = await billing_service.reserve_balance(str(current_user.id), cost)
     if not reserve_result["success"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -207,6 +199,150 @@ async def create_position_check_task(
     }
 
 
+@router.get("/queue/depth", response_model=dict)
+async def get_queue_depth(
+    current_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Глубина очереди догуливания профилей и ожидающих задач прогрева"""
+    return await profile_cascade_scheduler.get_queue_depth(session)
+
+
+@router.get("/schedule/projection", response_model=dict)
+async def get_check_schedule_projection(
+    hours: int = Query(24, ge=1, le=24 * 31, description="Горизонт прогноза в часах"),
+    bucket_minutes: int = Query(60, ge=5, le=1440, description="Размер интервала"),
+    current_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Прогноз нагрузки регулярных проверок позиций по интервалам времени"""
+    return await check_scheduler.get_projected_load(
+        session, hours=hours, bucket_minutes=bucket_minutes
+    )
+
+
+@router.get("/nodes", response_model=List[dict])
+async def list_worker_nodes(
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Рабочие узлы: емкость, возможности и инвентарь прогретых профилей"""
+
+    from sqlalchemy import select
+    from app.models import WorkerNode
+
+    result = await session.execute(
+        select(WorkerNode).order_by(WorkerNode.last_heartbeat.desc().nullslast())
+    )
+
+    return [
+        {
+            "node_id": node.node_id,
+            "server_id": node.server_id,
+            "hostname": node.hostname,
+            "status": node.status,
+            "max_workers": node.max_workers,
+            "active_tasks": node.active_tasks,
+            "free_slots": node.free_slots,
+            "capabilities": node.capabilities,
+            "last_heartbeat": (
+                node.last_heartbeat.isoformat() if node.last_heartbeat else None
+            ),
+        }
+        for node in result.scalars().all()
+    ]
+
+
+@router.get("/leases", response_model=dict)
+async def get_task_leases(
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Выполняющиеся задачи по воркерам и просроченные аренды"""
+    return await task_lease_manager.get_stats(session)
+
+
+@router.get("/archive/stats", response_model=dict)
+async def get_task_archive_stats(
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Объем архива задач, степень сжатия и задачи, готовые к переносу"""
+    return await task_archiver.get_stats(session)
+
+
+@router.post("/archive/run", response_model=dict)
+async def run_task_archive(
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Внеочередной проход архивации"""
+    return await task_archiver.run(session)
+
+
+@router.get("/traces", response_model=List[dict])
+async def list_task_traces(
+    task_type: Optional[str] = Query(None),
+    reason: Optional[str] = Query(None, description="failed, slow, sampled"),
+    limit: int = Query(50, ge=1, le=500),
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Последние задачи с сохраненной трассой выполнения"""
+
+    from sqlalchemy import select
+    from app.models import Task
+
+    query = select(Task).where(Task.trace.isnot(None))
+    if task_type:
+        query = query.where(Task.task_type == task_type)
+    if reason:
+        query = query.where(Task.trace["reason"].as_string() == reason)
+
+    result = await session.execute(
+        query.order_by(Task.created_at.desc()).limit(limit)
+    )
+
+    return [
+        {
+            "task_id": str(task.id),
+            "task_type": task.task_type,
+            "status": task.status,
+            "reason": task.trace.get("reason"),
+            "duration_ms": task.trace.get("duration_ms"),
+            "error": task.trace.get("error"),
+            "created_at": task.created_at.isoformat(),
+        }
+        for task in result.scalars().all()
+    ]
+
+
+@router.get("/{task_id}/trace", response_model=dict)
+async def get_task_trace(
+    task_id: str,
+    admin_user: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Разбивка времени выполнения задачи по спанам"""
+
+    task = await task_archiver.find_task(session, task_id)
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
+        )
+    if not task.trace:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Трасса для задачи не сохранена (задача не попала в выборку)",
+        )
+
+    return {
+        "task_id": str(task.id),
+        "status": task.status,
+        **render_trace(task.trace),
+    }
+
+
 @router.get("/status/{task_id}", response_model=dict)
 async def get_task_status(
     task_id: str,
@@ -215,12 +351,7 @@ async def get_task_status(
 ):
     """Получение статуса задачи"""
 
-    from sqlalchemy import select
-    from app.models import Task
-
-    result = await session.execute(select(Task).where(Task.id == task_id))
-
-    task = result.scalar_one_or_none()
+    task = await task_archiver.find_task(session, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
@@ -307,18 +438,11 @@ async def api_create_parse_task(
     billing_service = BillingService(session)
     cost = await billing_service.calculate_check_cost(str(current_user.id), 1)
 
-    from app.core.user_service import UserService
-
-    user_service = UserService(session)
-    profile = await user_service.get_user_profile(str(current_user.id))
-
-    available_balance = profile["current_balance"] - profile["reserved_balance"]
-    if available_balance < float(cost):
+    reserve_result = await billing_service.reserve_balance(str(current_user.id), cost)
+    if reserve_result.get("insufficient_funds"):
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED, detail="Insufficient balance"
         )
-
-    reserve_result = await billing_service.reserve_balance(str(current_user.id), cost)
     if not reserve_result["success"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to reserve funds"
@@ -347,12 +471,7 @@ async def api_get_task_status(
     """Получение статуса задачи через API"""
     current_user = await require_api_key(api_key=api_key, session=session)
 
-    from sqlalchemy import select
-    from app.models import Task
-
-    result = await session.execute(select(Task).where(Task.id == task_id))
-
-    task = result.scalar_one_or_none()
+    task = await task_archiver.find_task(session, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -13,6 +13,9 @@ import click
 import structlog
 from sqlalchemy import and_
 
+from app.config import settings
+from app.core.pipeline_metrics import start_metrics_server, mark_process_dead
+from app.core.display_pool import display_pool
 from app.core.task_manager import TaskManager
 from app.database import async_session_maker
 from app.services.profile_nurture_limits_service import ProfileNurtureLimitsService
@@ -39,6 +42,12 @@ def start_worker(workers, check_interval):
         worker_tasks = []
         workers_list = []
 
+        # Метрики нагула для Prometheus
+        start_metrics_server(settings.metrics_nurture_port)
+
+        # Xvfb серверы заранее: первый браузер с окном не ждет их запуска
+        await display_pool.start()
+
         # Создаем worker'ы
         for i in range(workers):
             worker = ProfileNurtureWorker()
@@ -69,6 +78,8 @@ def start_worker(workers, check_interval):
             # Останавливаем всех worker'ов
             stop_tasks = [worker.stop() for worker in workers_list]
             await asyncio.gather(*stop_tasks, return_exceptions=True)
+            await display_pool.stop()
+            mark_process_dead()
             logger.info("All workers stopped")
 
     click.echo(f"Starting {workers} profile nurture worker(s)...")
@@ -239,9 +250,7 @@ def list_tasks(status, strategy_id, limit):
                 query = query.where(Task.status == status)
 
             if strategy_id:
-                query = query.where(
-                    Task.parameters.op("->>")("strategy_id") == strategy_id
-                )
+                query = query.where(Task.strategy_id == strategy_id)
 
             result = await session.execute(query)
             tasks = result.scalars().all()
@@ -330,6 +339,23 @@ def cancel_task(task_id):
     asyncio.run(_cancel())
 
 
+@cli.command()
+@click.option("--strategy-id", multiple=True, help="Only these strategies")
+def rebuild_counters(strategy_id):
+    """Rebuild per-strategy nurture counters from tasks and the archive"""
+
+    async def _rebuild():
+        from app.core.strategy_nurture_counters import strategy_nurture_counters
+
+        async with async_session_maker() as session:
+            result = await strategy_nurture_counters.rebuild(
+                session, strategy_id or None
+            )
+            click.echo(f"✅ Rebuilt counters for {result['strategies']} strategies")
+
+    asyncio.run(_rebuild())
+
+
 @cli.command()
 def health_check():
     """Check the health of the nurture system"""
@@ -379,33 +405,15 @@ def health_check():
             click.echo(f"   📋 Total strategies: {total_strategies.scalar()}")
             click.echo(f"   ✅ Active strategies: {active_strategies.scalar()}")
 
-            # Проверяем критические стратегии
+            # Проверяем критические стратегии (одним запросом по счетчикам)
             limits_service = ProfileNurtureLimitsService(session)
+            statuses = await limits_service.get_strategies_status()
 
-            active_strats = await session.execute(
-                select(UserStrategy).where(
-                    and_(
-                        UserStrategy.strategy_type == "profile_nurture",
-                        UserStrategy.is_active == True,
-                    )
-                )
+            critical_count = sum(1 for st in statuses if st["status"] == "critical")
+            max_reached_count = sum(
+                1 for st in statuses if st["status"] == "max_reached"
             )
 
-            critical_count = 0
-            max_reached_count = 0
-
-            for strategy in active_strats.scalars():
-                try:
-                    status = await limits_service.check_strategy_status(
-                        str(strategy.id)
-                    )
-                    if status["status"] == "critical":
-                        critical_count += 1
-                    elif status["status"] == "max_reached":
-                        max_reached_count += 1
-                except:
-                    pass
-
             click.echo(f"\n🚨 Strategy Health:")
             click.echo(f"   🔴 Critical (below minimum): {critical_count}")
             click.echo(f"   🔵 Max reached: {max_reached_count}")
@@ -60,6 +60,144 @@ class Settings(BaseSettings):
     debug_browser_devtools: bool = True
     debug_browser_timeout: int = 30000
 
+    # Profile Snapshots (полное состояние user-data-dir профилей)
+    profile_snapshots_dir: str = "/var/www/topflight/data/profile_snapshots"
+    profile_runtime_dir: str = "/dev/shm/topflight_profiles"  # tmpfs
+    profile_snapshots_keep: int = 2  # снапшотов на профиль
+    profile_snapshot_max_age_days: int = 30
+    profile_snapshot_compress_level: int = 3
+    profile_snapshot_gc_interval: int = 3600  # 1 час
+
+    # Profile Cascade (догуливание профилей после использования)
+    cascade_debounce_seconds: int = 300  # ждем повторных запросов
+    cascade_max_delay_seconds: int = 1800  # но не дольше 30 минут
+    cascade_flush_interval: int = 60
+    cascade_batch_size: int = 20  # профилей в одной задаче прогрева
+    cascade_max_attempts: int = 3
+
+    # Profile Health (затухающие метрики качества профилей)
+    profile_health_half_life_seconds: int = 86400  # вес события падает вдвое за сутки
+    profile_health_flush_interval: int = 15
+    profile_health_flush_batch: int = 500
+    profile_health_latency_ref_ms: int = 20000  # задержка, дающая максимальный штраф
+    profile_health_retire_threshold: float = 0.25
+    profile_health_min_weight: float = 8.0  # не списываем профиль по паре событий
+    profile_health_selection_pool: int = 10
+
+    # Position History (месячные секции временного ряда)
+    position_history_partitions_ahead: int = 2  # месяцев вперед
+    position_history_retention_months: int = 24
+    position_history_detach_lock_timeout_ms: int = 3000
+
+    # Analytics Rollups (инкрементальная свертка в дневные агрегаты)
+    analytics_rollup_interval: int = 120
+    analytics_rollup_batch_size: int = 20000
+    analytics_rollup_max_batches: int = 50  # за один проход
+    analytics_rollup_lag_seconds: int = 30  # не трогаем самые свежие строки
+
+    # Keyword Files (потоковый импорт ключевых слов из файлов)
+    keyword_file_max_bytes: int = 50 * 1024 * 1024
+    keyword_file_max_rows: int = 1_000_000
+    keyword_file_workers: int = 2  # процессов разбора
+    keyword_file_max_concurrent: int = 4  # одновременных загрузок и разборов
+    keyword_file_tmp_dir: Optional[str] = None  # None - системный каталог
+
+    # Region Search (in-memory индекс автодополнения регионов)
+    region_index_refresh_interval: int = 60  # проверка изменений справочника
+
+    # Billing Settlement (пакетное списание резервов завершенных задач)
+    billing_settlement_interval: int = 30
+    billing_settlement_lag_seconds: int = 60  # даем задаче уйти на повтор
+    billing_settlement_batch_size: int = 2000  # задач пользователя за окно
+    billing_settlement_max_users: int = 500
+
+    # Billing Cache (тарифы и планы пользователей: процесс + Redis)
+    billing_cache_ttl: int = 300  # локальная копия
+    billing_cache_redis_ttl: int = 3600
+    billing_cache_max_users: int = 10000
+    billing_cache_max_tariffs: int = 100
+    billing_cache_redis_enabled: bool = True
+
+    # Exports (потоковая выгрузка позиций и результатов парсинга)
+    export_max_concurrent: int = 4
+    export_tmp_dir: Optional[str] = None  # None - системный каталог
+    export_max_days: int = 366
+
+    # Metrics (Prometheus; процессы без API отдают метрики своим HTTP сервером)
+    metrics_worker_port: int = 9200
+    metrics_nurture_port: int = 9201
+
+    # Yandex Search (адреса выдачи; переопределяются для нагрузочных тестов)
+    yandex_search_url_desktop: str = "https://yandex.ru/search/"
+    yandex_search_url_mobile: str = "https://yandex.ru/search/touch/"
+
+    # Resource Monitor (сэмплы в памяти, минутные и часовые агрегаты в БД)
+    resource_sample_interval: int = 5
+    resource_ring_size: int = 720  # час истории при замере раз в 5 секунд
+    resource_flush_interval: int = 60
+    resource_retention_minute_days: int = 7
+    resource_retention_hour_days: int = 180
+
+    # Task Tracing (трассы задач; сохраняются упавшие, медленные и доля случайных)
+    task_trace_enabled: bool = True
+    task_trace_slow_seconds: int = 120
+    task_trace_sample_rate: float = 0.01
+    task_trace_max_spans: int = 500
+
+    # Auth Cache (проверенные JWT и API ключи в памяти процесса)
+    auth_cache_enabled: bool = True
+    auth_cache_ttl: int = 60
+    auth_cache_max_entries: int = 10000
+    auth_cache_redis_enabled: bool = True  # рассылка инвалидации между процессами
+
+    # Response Cache (тяжелые read-эндпоинты; TTL и включение - в cache_settings)
+    response_cache_max_entries: int = 5000
+    response_cache_settings_refresh: int = 30  # перечитывание cache_settings
+    response_cache_redis_enabled: bool = True
+
+    # Node Routing (возможности узла и выбор задач, см. app/core/node_registry.py)
+    node_routing_enabled: bool = True
+    node_device_types: str = "desktop,mobile"
+    node_regions: str = ""  # коды регионов через запятую, которые узел предпочитает
+    node_proxy_enabled: bool = True
+    node_claim_batch: int = 20  # кандидатов на выбор за один claim
+    node_defer_seconds: int = 30  # сколько задача может ждать более подходящий узел
+    node_heartbeat_stale_seconds: int = 90
+    node_inventory_interval: int = 300  # пересчет инвентаря прогретых профилей
+
+    # Task Leases (аренда выполняющихся задач и reaper потерянных)
+    task_lease_seconds: int = 120
+    task_lease_renew_interval: int = 30
+    task_lease_grace_seconds: int = 900  # просрочка при живом узле
+    task_lease_max_requeues: int = 2
+    task_reaper_interval: int = 60
+    task_reaper_batch: int = 500
+
+    # Task Archive (перенос завершенных задач в секционированный архив)
+    task_archive_enabled: bool = True
+    task_archive_after_days: int = 14
+    task_archive_interval: int = 900
+    task_archive_batch_size: int = 500
+    task_archive_max_batches: int = 40  # за один проход
+    task_archive_retention_months: int = 12  # 0 - хранить бессрочно
+    task_archive_compress_level: int = 6
+
+    # Display Pool (Xvfb серверы для браузеров с окном, см. app/core/display_pool.py)
+    display_pool_size: int = 0  # 0 - половина ядер
+    display_max_browsers: int = 4  # браузеров на один дисплей
+    display_resolution: str = "1920x1080x24"
+    display_start_timeout: float = 10.0
+    display_acquire_timeout: float = 60.0
+
+    # Check Scheduler (регулярные проверки позиций по check_frequency)
+    check_scheduler_interval: int = 60
+    check_scheduler_max_per_tick: int = 5000
+    check_scheduler_batch_size: int = 50  # ключей в одной задаче проверки
+    check_scheduler_rate_per_minute: int = 60  # на пару (регион, устройство)
+    check_scheduler_bucket_capacity: int = 300  # допустимый всплеск
+    check_scheduler_base_priority: int = 5  # + priority_level тарифа, ниже ручных (10-15)
+    check_scheduler_unpaid_retry_seconds: int = 3600
+
     @property
     def effective_database_url(self) -> str:
         """Формирует URL базы данных из переменных окружения"""
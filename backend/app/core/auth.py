@@ -10,6 +10,7 @@ import structlog
 
 from app.models import User
 from app.config import settings
+from .auth_cache import auth_cache, credential_hash
 
 logger = structlog.get_logger(__name__)
 
@@ -41,6 +42,11 @@ class AuthService:
         """Генерирует API ключ"""
         return f"yp_{secrets.token_urlsafe(32)}"
 
+    @staticmethod
+    def hash_api_key(api_key: str) -> str:
+        """Хеш API ключа для поиска по индексу users.api_key_hash"""
+        return credential_hash(api_key)
+
     @staticmethod
     def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Создает JWT access token"""
@@ -112,8 +118,12 @@ class AuthService:
 
     @staticmethod
     async def get_user_by_token(session: AsyncSession, token: str) -> Optional[User]:
-        """Получает пользователя по токену"""
+        """Получает пользователя по токену (через кэш проверенных токенов)"""
         try:
+            cached = auth_cache.get("jwt", token)
+            if cached is not None:
+                return await session.merge(cached, load=False)
+
             payload = AuthService.verify_token(token)
             if not payload:
                 return None
@@ -122,6 +132,8 @@ class AuthService:
             if not user_id:
                 return None
 
+            # Отзыв во время SELECT не должен вернуть пользователя в кэш
+            generation = auth_cache.generation(user_id)
             result = await session.execute(
                 select(User).where(User.id == user_id)
             )
@@ -130,6 +142,13 @@ class AuthService:
             if not user or not user.is_active:
                 return None
 
+            auth_cache.put(
+                "jwt",
+                token,
+                user,
+                expires_at=payload.get("exp"),
+                generation=generation,
+            )
             return user
 
         except Exception as e:
@@ -138,16 +157,25 @@ class AuthService:
 
     @staticmethod
     async def get_user_by_api_key(session: AsyncSession, api_key: str) -> Optional[User]:
-        """Получает пользователя по API ключу"""
+        """Получает пользователя по API ключу (поиск по хешу ключа)"""
         try:
+            cached = auth_cache.get("api_key", api_key)
+            if cached is not None:
+                return await session.merge(cached, load=False)
+
+            # Владелец ключа еще неизвестен - берем общее поколение отзывов
+            generation = auth_cache.generation()
             result = await session.execute(
-                select(User).where(User.api_key == api_key)
+                select(User).where(
+                    User.api_key_hash == AuthService.hash_api_key(api_key)
+                )
             )
             user = result.scalar_one_or_none()
 
             if not user or not user.is_active:
                 return None
 
+            auth_cache.put("api_key", api_key, user, generation=generation)
             return user
 
         except Exception as e:
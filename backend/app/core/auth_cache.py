@@ -0,0 +1,257 @@
+# backend/app/core/auth_cache.py
+"""
+Кэш аутентификации запросов по JWT и API ключам.
+
+Без кэша каждый запрос с Bearer токеном или API ключом делает SELECT users.
+Здесь хранятся уже проверенные пользователи в локальном LRU с коротким
+TTL: снимок колонок User в виде отсоединенного объекта, который запрос
+присоединяет к своей сессии через merge(load=False) - без SELECT. Ключ
+записи - sha256 от токена или ключа, сами учетные данные в памяти не
+хранятся. Запись JWT живет не дольше exp токена.
+
+В кэш попадают только активные пользователи. Неудачные попытки не
+кэшируются: невалидный токен каждый раз проверяется заново.
+
+Отзыв: смена пароля, перевыпуск API ключа и деактивация вызывают
+invalidate_user - удаляются все записи пользователя (по обратному индексу
+user_id -> ключи) и в Redis канал auth:invalidate уходит сообщение, по
+которому остальные процессы API сбрасывают свои записи. Без Redis
+устаревание ограничено TTL.
+
+Гонка чтения с отзывом: invalidate_user может пройти между SELECT users
+и put, и put вернул бы в кэш уже отозванного пользователя на весь TTL.
+Поэтому до чтения из БД запрос берет generation() - поколение отзывов
+пользователя (для API ключа, чей владелец еще неизвестен, - общее), а put
+с этим поколением ничего не пишет, если оно успело измениться.
+
+Принципалы в Redis не пишутся: общий канал используется только для
+инвалидации.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.config import settings
+from app.models import User
+from .billing_cache import TTLCache, MISSING
+
+logger = structlog.get_logger(__name__)
+
+INVALIDATION_CHANNEL = "auth:invalidate"
+
+# Пауза перед повторным подключением к недоступному Redis
+REDIS_RETRY_SECONDS = 30
+
+# Порог, после которого из обратного индекса вычищаются вытесненные ключи
+USER_KEYS_PRUNE_THRESHOLD = 16
+
+
+def credential_hash(credential: str) -> str:
+    """sha256 учетных данных (ключ кэша и хеш API ключа в БД)"""
+    return hashlib.sha256(credential.encode("utf-8")).hexdigest()
+
+
+class AuthCache:
+    """LRU проверенных пользователей с отзывом по user_id"""
+
+    def __init__(self):
+        self._entries = TTLCache(
+            maxsize=settings.auth_cache_max_entries,
+            ttl=settings.auth_cache_ttl,
+        )
+        self._user_keys: Dict[str, Set[str]] = {}
+        # Поколения отзывов: по пользователям и сбросы всего кэша
+        self._generations: Dict[str, int] = {}
+        self._clears = 0
+        self._redis = None
+        self._redis_retry_at = 0.0
+        self._listener_task: Optional[asyncio.Task] = None
+        self.invalidations = 0
+
+    # ===================== ЧТЕНИЕ / ЗАПИСЬ =====================
+
+    def get(self, kind: str, credential: str) -> Optional[User]:
+        """Снимок пользователя по токену (kind="jwt") или API ключу (kind="api_key")"""
+        if not settings.auth_cache_enabled:
+            return None
+
+        cached = self._entries.get(self._key(kind, credential))
+        return None if cached is MISSING else cached
+
+    def generation(self, user_id: Optional[str] = None) -> Tuple[Optional[str], int, int]:
+        """Поколение отзывов; берется до чтения пользователя из БД.
+
+        С user_id меняется при отзыве этого пользователя, без него - при
+        любом отзыве. Оба меняются при сбросе всего кэша.
+        """
+        if user_id is None:
+            return None, self._clears, self.invalidations
+        user_id = str(user_id)
+        return user_id, self._clears, self._generations.get(user_id, 0)
+
+    def put(
+        self,
+        kind: str,
+        credential: str,
+        user: User,
+        expires_at: Optional[float] = None,
+        generation: Optional[Tuple[Optional[str], int, int]] = None,
+    ):
+        """Кэширует проверенного пользователя.
+
+        expires_at - unix-время, после которого учетные данные недействительны
+        (exp токена); запись не переживет его. generation - значение
+        generation() до чтения пользователя: если с тех пор был отзыв,
+        прочитанный снимок мог устареть и не кэшируется.
+        """
+        if not settings.auth_cache_enabled or not user.is_active:
+            return
+        if generation is not None and generation != self.generation(generation[0]):
+            return
+
+        ttl = settings.auth_cache_ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+            if ttl <= 0:
+                return
+
+        key = self._key(kind, credential)
+        self._entries.set(key, self._snapshot(user), ttl=ttl)
+
+        user_id = str(user.id)
+        keys = self._user_keys.setdefault(user_id, set())
+        keys.add(key)
+        if len(keys) > USER_KEYS_PRUNE_THRESHOLD:
+            keys.intersection_update(k for k in keys if k in self._entries)
+
+    @staticmethod
+    def _snapshot(user: User) -> User:
+        """Отсоединенная копия колонок: не связана с сессией запроса"""
+        snapshot = User(
+            **{
+                attr.key: getattr(user, attr.key)
+                for attr in inspect(User).column_attrs
+            }
+        )
+        make_transient_to_detached(snapshot)
+        return snapshot
+
+    @staticmethod
+    def _key(kind: str, credential: str) -> str:
+        return f"{kind}:{credential_hash(credential)}"
+
+    # ===================== ИНВАЛИДАЦИЯ =====================
+
+    async def invalidate_user(self, user_id: str):
+        """Отзыв всех кэшированных токенов и ключей пользователя"""
+        user_id = str(user_id)
+        self._drop_user(user_id)
+
+        client = await self._get_redis()
+        if client is None:
+            return
+
+        try:
+            await client.publish(INVALIDATION_CHANNEL, json.dumps({"user_id": user_id}))
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _drop_user(self, user_id: str):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in self._user_keys.pop(user_id, ()):
+            self._entries.delete(key)
+        self.invalidations += 1
+
+    def clear(self):
+        self._clears += 1
+        self._entries.clear()
+        self._user_keys.clear()
+
+    # ===================== REDIS =====================
+
+    async def _get_redis(self):
+        if not settings.auth_cache_redis_enabled:
+            return None
+        if self._redis is None and time.monotonic() >= self._redis_retry_at:
+            try:
+                import redis.asyncio as aioredis
+
+                self._redis = aioredis.from_url(
+                    settings.effective_redis_url, decode_responses=True
+                )
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis
+
+    def _redis_failed(self, error: Exception):
+        logger.warning("Auth cache Redis unavailable", error=str(error))
+        self._redis = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    # ===================== ПОДПИСКА НА ИНВАЛИДАЦИЮ =====================
+
+    def start(self):
+        """Запускает прослушивание канала инвалидации"""
+        if (
+            self._listener_task is None
+            and settings.auth_cache_enabled
+            and settings.auth_cache_redis_enabled
+        ):
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+
+    async def _listen(self):
+        while True:
+            client = await self._get_redis()
+            if client is None:
+                await asyncio.sleep(REDIS_RETRY_SECONDS)
+                continue
+
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        user_id = json.loads(message["data"]).get("user_id")
+                    except (TypeError, ValueError, AttributeError):
+                        continue
+                    if user_id:
+                        self._drop_user(str(user_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # За время разрыва могли пропустить отзыв - сбрасываем все
+                self._redis_failed(e)
+                self.clear()
+                await asyncio.sleep(REDIS_RETRY_SECONDS)
+
+    # ===================== МЕТРИКИ =====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.auth_cache_enabled,
+            "entries": self._entries.stats(),
+            "users": len(self._user_keys),
+            "invalidations": self.invalidations,
+            "redis": {
+                "enabled": settings.auth_cache_redis_enabled,
+                "connected": self._redis is not None,
+            },
+        }
+
+
+# Глобальный экземпляр кэша аутентификации
+auth_cache = AuthCache()
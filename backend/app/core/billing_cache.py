@@ -0,0 +1,331 @@
+# backend/app/core/billing_cache.py
+"""
+Кэш тарифов и тарифных планов пользователей для расчета стоимости.
+
+Стоимость проверки зависит от двух редко меняющихся вещей: тарифного плана
+пользователя (User.subscription_plan) и параметров тарифа (TariffPlan).
+Оба значения кэшируются в два уровня:
+  - локальный LRU с TTL в памяти процесса - попадание без сетевых обращений;
+  - Redis (общий для API и воркеров) - прогретое значение переживает
+    перезапуск процесса и не читается из БД каждым процессом отдельно.
+
+Балансы здесь не кэшируются: резерв средств атомарен и всегда идет в БД.
+
+Явная инвалидация (смена тарифа пользователя, изменение тарифов) удаляет
+ключи в Redis и рассылает сообщение в канал billing:invalidate, по которому
+все процессы сбрасывают локальные копии. TTL ограничивает устаревание, если
+Redis недоступен.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import User, TariffPlan
+
+logger = structlog.get_logger(__name__)
+
+MISSING = object()
+
+INVALIDATION_CHANNEL = "billing:invalidate"
+TARIFF_KEY = "billing:tariff:{name}"
+USER_PLAN_KEY = "billing:user_plan:{user_id}"
+
+# Пауза перед повторным подключением к недоступному Redis
+REDIS_RETRY_SECONDS = 30
+
+
+class TTLCache:
+    """LRU ограниченного размера с временем жизни записей"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Any:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[0] >= time.monotonic()
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
+
+
+class BillingCache:
+    """Двухуровневый кэш тарифов (процесс + Redis)"""
+
+    def __init__(self):
+        self._tariffs = TTLCache(
+            maxsize=settings.billing_cache_max_tariffs,
+            ttl=settings.billing_cache_ttl,
+        )
+        self._user_plans = TTLCache(
+            maxsize=settings.billing_cache_max_users,
+            ttl=settings.billing_cache_ttl,
+        )
+        self._redis = None
+        self._redis_retry_at = 0.0
+        self._listener_task: Optional[asyncio.Task] = None
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.db_loads = 0
+
+    # ===================== ЧТЕНИЕ =====================
+
+    async def get_tariff(
+        self, session: AsyncSession, name: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Тариф по имени (None, если такого тарифа нет)"""
+        if not name:
+            return None
+
+        cached = self._tariffs.get(name)
+        if cached is not MISSING:
+            return cached
+
+        key = TARIFF_KEY.format(name=name)
+        cached = await self._redis_get(key)
+        if cached is MISSING:
+            result = await session.execute(
+                select(TariffPlan).where(TariffPlan.name == name)
+            )
+            tariff = result.scalar_one_or_none()
+            self.db_loads += 1
+            cached = self._tariff_to_dict(tariff) if tariff else None
+            await self._redis_set(key, cached)
+
+        # None тоже кэшируется: неизвестный план не должен каждый раз идти в БД
+        self._tariffs.set(name, cached)
+        return cached
+
+    async def get_user_plan(self, session: AsyncSession, user_id: str) -> Optional[str]:
+        """Тарифный план пользователя (User.subscription_plan)"""
+        user_id = str(user_id)
+
+        cached = self._user_plans.get(user_id)
+        if cached is not MISSING:
+            return cached
+
+        key = USER_PLAN_KEY.format(user_id=user_id)
+        cached = await self._redis_get(key)
+        if cached is MISSING:
+            cached = await session.scalar(
+                select(User.subscription_plan).where(User.id == user_id)
+            )
+            self.db_loads += 1
+            await self._redis_set(key, cached)
+
+        self._user_plans.set(user_id, cached)
+        return cached
+
+    @staticmethod
+    def _tariff_to_dict(tariff: TariffPlan) -> Dict[str, Any]:
+        return {
+            "id": str(tariff.id),
+            "name": tariff.name,
+            "description": tariff.description,
+            "cost_per_check": float(tariff.cost_per_check),
+            "min_monthly_topup": float(tariff.min_monthly_topup),
+            "server_binding_allowed": tariff.server_binding_allowed,
+            "priority_level": tariff.priority_level,
+        }
+
+    # ===================== ИНВАЛИДАЦИЯ =====================
+
+    async def invalidate_user(self, user_id: str):
+        """Сброс плана пользователя (смена тарифа после пополнения и т.п.)"""
+        user_id = str(user_id)
+        self._user_plans.delete(user_id)
+        await self._publish_invalidation(
+            "user", user_id, USER_PLAN_KEY.format(user_id=user_id)
+        )
+
+    async def invalidate_tariff(self, name: Optional[str] = None):
+        """Сброс тарифа по имени или всех тарифов (name=None)"""
+        if name is None:
+            self._tariffs.clear()
+        else:
+            self._tariffs.delete(name)
+
+        redis_key = TARIFF_KEY.format(name=name if name is not None else "*")
+        await self._publish_invalidation("tariff", name, redis_key)
+
+    async def _publish_invalidation(self, kind: str, key: Optional[str], redis_key: str):
+        client = await self._get_redis()
+        if client is None:
+            return
+
+        try:
+            if "*" in redis_key:
+                async for found in client.scan_iter(match=redis_key):
+                    await client.delete(found)
+            else:
+                await client.delete(redis_key)
+            await client.publish(
+                INVALIDATION_CHANNEL, json.dumps({"kind": kind, "key": key})
+            )
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _apply_invalidation(self, message: Dict[str, Any]):
+        kind, key = message.get("kind"), message.get("key")
+        if kind == "user" and key:
+            self._user_plans.delete(key)
+        elif kind == "tariff":
+            if key is None:
+                self._tariffs.clear()
+            else:
+                self._tariffs.delete(key)
+
+    # ===================== REDIS =====================
+
+    async def _get_redis(self):
+        if not settings.billing_cache_redis_enabled:
+            return None
+        if self._redis is None and time.monotonic() >= self._redis_retry_at:
+            try:
+                import redis.asyncio as aioredis
+
+                self._redis = aioredis.from_url(
+                    settings.effective_redis_url, decode_responses=True
+                )
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis
+
+    def _redis_failed(self, error: Exception):
+        # Без Redis работаем только на локальном кэше
+        logger.warning("Billing cache Redis unavailable", error=str(error))
+        self._redis = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    async def _redis_get(self, key: str) -> Any:
+        client = await self._get_redis()
+        if client is None:
+            return MISSING
+
+        try:
+            raw = await client.get(key)
+        except Exception as e:
+            self._redis_failed(e)
+            return MISSING
+
+        if raw is None:
+            self.redis_misses += 1
+            return MISSING
+        self.redis_hits += 1
+        return json.loads(raw)
+
+    async def _redis_set(self, key: str, value: Any):
+        client = await self._get_redis()
+        if client is None:
+            return
+
+        try:
+            await client.set(key, json.dumps(value), ex=settings.billing_cache_redis_ttl)
+        except Exception as e:
+            self._redis_failed(e)
+
+    # ===================== ПОДПИСКА НА ИНВАЛИДАЦИЮ =====================
+
+    def start(self):
+        """Запускает прослушивание канала инвалидации"""
+        if self._listener_task is None and settings.billing_cache_redis_enabled:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+
+    async def _listen(self):
+        while True:
+            client = await self._get_redis()
+            if client is None:
+                await asyncio.sleep(REDIS_RETRY_SECONDS)
+                continue
+
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._apply_invalidation(json.loads(message["data"]))
+                    except (TypeError, ValueError):
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # За время разрыва могли пропустить сообщения - сбрасываем все
+                self._redis_failed(e)
+                self._tariffs.clear()
+                self._user_plans.clear()
+                await asyncio.sleep(REDIS_RETRY_SECONDS)
+
+    # ===================== МЕТРИКИ =====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        redis_total = self.redis_hits + self.redis_misses
+        return {
+            "tariffs": self._tariffs.stats(),
+            "user_plans": self._user_plans.stats(),
+            "redis": {
+                "enabled": settings.billing_cache_redis_enabled,
+                "connected": self._redis is not None,
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_ratio": (
+                    round(self.redis_hits / redis_total, 4) if redis_total else None
+                ),
+            },
+            "db_loads": self.db_loads,
+        }
+
+
+# Глобальный экземпляр кэша тарифов
+billing_cache = BillingCache()
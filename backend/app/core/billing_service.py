@@ -9,6 +9,7 @@ from app.models import (
     User, UserBalance, BalanceTransaction, TariffPlan,
     FinancialTransactionsLog
 )
+from app.core.billing_cache import billing_cache
 
 logger = structlog.get_logger(__name__)
 
@@ -198,8 +199,17 @@ class BillingService:
                 "errors": ["Ошибка списания средств"]
             }
 
-    async def reserve_balance(self, user_id: str, amount: Decimal) -> Dict[str, Any]:
-        """Резервирует средства на балансе"""
+    async def reserve_balance(self, user_id: str, amount: Decimal,
+                              commit: bool = True) -> Dict[str, Any]:
+        """Резервирует средства на балансе.
+
+        Проверка свободных средств и резерв - один UPDATE ... WHERE
+        available >= amount RETURNING: параллельные запросы одного пользователя
+        не читают баланс заранее и не могут вместе превысить свободную сумму.
+
+        С commit=False резерв остается в транзакции вызывающего, и ошибка
+        БД пробрасывается ему без rollback.
+        """
         try:
             amount = Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
@@ -210,43 +220,59 @@ class BillingService:
                 }
 
             result = await self.session.execute(
-                select(UserBalance).where(UserBalance.user_id == user_id)
+                update(UserBalance)
+                .where(
+                    and_(
+                        UserBalance.user_id == user_id,
+                        UserBalance.current_balance - UserBalance.reserved_balance >= amount
+                    )
+                )
+                .values(reserved_balance=UserBalance.reserved_balance + amount)
+                .returning(UserBalance.reserved_balance)
+                .execution_options(synchronize_session=False)
             )
 
-            balance = result.scalar_one_or_none()
-            if not balance:
-                return {
-                    "success": False,
-                    "errors": ["Баланс пользователя не найден"]
-                }
-
-            # Проверяем достаточность свободных средств
-            available_balance = balance.current_balance - balance.reserved_balance
-            if available_balance < amount:
+            total_reserved = result.scalar_one_or_none()
+            if total_reserved is None:
+                # Отличаем отсутствие баланса от нехватки средств только на
+                # неуспешном пути
+                available = await self.session.scalar(
+                    select(UserBalance.current_balance - UserBalance.reserved_balance)
+                    .where(UserBalance.user_id == user_id)
+                )
+                if available is None:
+                    return {
+                        "success": False,
+                        "errors": ["Баланс пользователя не найден"]
+                    }
                 return {
                     "success": False,
+                    "insufficient_funds": True,
+                    "available_balance": float(available),
                     "errors": ["Недостаточно свободных средств"]
                 }
 
-            # Резервируем средства
-            balance.reserved_balance += amount
-            await self.session.commit()
+            if commit:
+                await self.session.commit()
 
             logger.info("Balance reserved",
                         user_id=user_id,
                         amount=float(amount),
-                        reserved_balance=float(balance.reserved_balance))
+                        reserved_balance=float(total_reserved))
 
             return {
                 "success": True,
                 "reserved_amount": float(amount),
-                "total_reserved": float(balance.reserved_balance)
+                "total_reserved": float(total_reserved)
             }
 
         except Exception as e:
-            await self.session.rollback()
             logger.error("Failed to reserve balance",
                          user_id=user_id, amount=float(amount), error=str(e))
+            if not commit:
+                # Транзакция вызывающего: откатывать ее целиком - его решение
+                raise
+            await self.session.rollback()
             return {
                 "success": False,
                 "errors": ["Ошибка резервирования средств"]
@@ -258,29 +284,35 @@ class BillingService:
             amount = Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
             result = await self.session.execute(
-                select(UserBalance).where(UserBalance.user_id == user_id)
+                update(UserBalance)
+                .where(UserBalance.user_id == user_id)
+                .values(
+                    reserved_balance=func.greatest(
+                        UserBalance.reserved_balance - amount, 0
+                    )
+                )
+                .returning(UserBalance.reserved_balance)
+                .execution_options(synchronize_session=False)
             )
 
-            balance = result.scalar_one_or_none()
-            if not balance:
+            total_reserved = result.scalar_one_or_none()
+            if total_reserved is None:
                 return {
                     "success": False,
                     "errors": ["Баланс пользователя не найден"]
                 }
 
-            # Снимаем резервирование
-            balance.reserved_balance = max(Decimal('0'), balance.reserved_balance - amount)
             await self.session.commit()
 
             logger.info("Balance reservation released",
                         user_id=user_id,
                         amount=float(amount),
-                        reserved_balance=float(balance.reserved_balance))
+                        reserved_balance=float(total_reserved))
 
             return {
                 "success": True,
                 "released_amount": float(amount),
-                "total_reserved": float(balance.reserved_balance)
+                "total_reserved": float(total_reserved)
             }
 
         except Exception as e:
@@ -293,31 +325,10 @@ class BillingService:
             }
 
     async def get_current_tariff(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Получает текущий тариф пользователя"""
+        """Получает текущий тариф пользователя (через billing_cache)"""
         try:
-            # Получаем пользователя
-            user = await self.session.get(User, user_id)
-            if not user:
-                return None
-
-            # Получаем тарифный план
-            result = await self.session.execute(
-                select(TariffPlan).where(TariffPlan.name == user.subscription_plan)
-            )
-
-            tariff = result.scalar_one_or_none()
-            if not tariff:
-                return None
-
-            return {
-                "id": str(tariff.id),
-                "name": tariff.name,
-                "description": tariff.description,
-                "cost_per_check": float(tariff.cost_per_check),
-                "min_monthly_topup": float(tariff.min_monthly_topup),
-                "server_binding_allowed": tariff.server_binding_allowed,
-                "priority_level": tariff.priority_level
-            }
+            plan = await billing_cache.get_user_plan(self.session, user_id)
+            return await billing_cache.get_tariff(self.session, plan)
 
         except Exception as e:
             logger.error("Failed to get current tariff", user_id=user_id, error=str(e))
@@ -338,6 +349,22 @@ class BillingService:
                          user_id=user_id, error=str(e))
             return Decimal('1.00') * checks_count
 
+    async def get_balance(self, user_id: str) -> Optional[Dict[str, float]]:
+        """Текущий, зарезервированный и доступный баланс одним запросом"""
+        result = await self.session.execute(
+            select(UserBalance.current_balance, UserBalance.reserved_balance)
+            .where(UserBalance.user_id == user_id)
+        )
+        row = result.first()
+        if not row:
+            return None
+
+        return {
+            "current_balance": float(row.current_balance),
+            "reserved_balance": float(row.reserved_balance),
+            "available_balance": float(row.current_balance - row.reserved_balance)
+        }
+
     async def _check_tariff_upgrade(self, user_id: str):
         """Проверяет необходимость изменения тарифа пользователя"""
         try:
@@ -381,6 +408,7 @@ class BillingService:
                 )
 
                 await self.session.commit()
+                await billing_cache.invalidate_user(user_id)
 
                 logger.info("Tariff upgraded",
                             user_id=user_id,
@@ -1,7 +1,5 @@
 # backend/app/core/browser_manager.py - ИСПРАВИТЬ методы запуска браузера:
 
-import os
-import subprocess
 import asyncio
 import random
 import socket
@@ -18,6 +16,8 @@ from .fingerprint_generator import FingerprintGenerator
 from ..models.profile import DeviceType
 from playwright.async_api import Browser, BrowserContext
 from .vnc_manager import vnc_manager
+from .display_pool import display_pool
+from app.config import settings
 
 logger = structlog.get_logger(__name__)
 
@@ -49,61 +49,14 @@ class BrowserManager:
             async with async_session_maker() as session:
                 return session
 
-    def _setup_display_environment(self, vnc_session=None):
-        """Настройка окружения для отображения"""
-        if vnc_session:
-            # Для debug режима используем VNC дисплей
-            display_env = f":{vnc_session.display_num}"
-            os.environ["DISPLAY"] = display_env
-            logger.info(f"Using VNC display: {display_env}")
-        else:
-            # Для обычного режима используем виртуальный дисплей
-            if not os.environ.get("DISPLAY"):
-                # Запускаем Xvfb если его нет
-                self._ensure_xvfb_running()
-                os.environ["DISPLAY"] = ":99"
-                logger.info("Using Xvfb display: :99")
-
-    def _ensure_xvfb_running(self):
-        """Обеспечивает запуск Xvfb для headless режима"""
-        try:
-            # Проверяем, запущен ли Xvfb
-            result = subprocess.run(
-                ["pgrep", "-f", "Xvfb :99"], capture_output=True, text=True
-            )
-
-            if result.returncode != 0:
-                # Xvfb не запущен, запускаем его
-                logger.info("Starting Xvfb on display :99")
-                subprocess.Popen(
-                    [
-                        "Xvfb",
-                        ":99",
-                        "-screen",
-                        "0",
-                        "1920x1080x24",
-                        "-ac",
-                        "+extension",
-                        "GLX",
-                    ]
-                )
-                # Ждем немного для запуска
-                import time
-
-                time.sleep(2)
-            else:
-                logger.info("Xvfb already running on display :99")
-
-        except Exception as e:
-            logger.warning(f"Failed to ensure Xvfb running: {e}")
+    def _vnc_display_env(self, vnc_session) -> Dict[str, str]:
+        """Окружение браузера для VNC дисплея debug сессии"""
+        return display_pool.env(display_name=f":{vnc_session.display_num}")
 
     async def launch_browser(self, playwright, profile: Profile):
         """Запуск браузера с настройками профиля"""
         browser_settings = profile.browser_settings or {}
 
-        # Настраиваем окружение для отображения
-        self._setup_display_environment()
-
         # Настройки запуска браузера
         launch_options = {
             "headless": False,  # НЕ headless для обхода детекции
@@ -144,7 +97,34 @@ class BrowserManager:
             ),
         )
 
-        return await playwright.chromium.launch(**launch_options)
+        # Дисплей из пула Xvfb передается через env запуска
+        return await display_pool.launch(playwright, **launch_options)
+
+    async def create_context(self, browser: Browser, profile: Profile) -> BrowserContext:
+        """Контекст браузера с настройками и cookies профиля"""
+        browser_settings = profile.browser_settings or {}
+
+        context = await browser.new_context(
+            viewport=browser_settings.get("viewport", {"width": 1920, "height": 1080}),
+            user_agent=browser_settings.get("user_agent", profile.user_agent),
+            locale=browser_settings.get("locale", "ru-RU"),
+            timezone_id=browser_settings.get("timezone_id", "Europe/Moscow"),
+            device_scale_factor=browser_settings.get("device_scale_factor", 1),
+            has_touch=browser_settings.get("has_touch", False),
+            java_script_enabled=True,
+            ignore_https_errors=True,
+        )
+
+        # Восстанавливаем cookies если есть
+        if profile.cookies:
+            await context.add_cookies(profile.cookies)
+
+        # Скрываем признак автоматизации
+        await context.add_init_script(
+            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
+        )
+
+        return context
 
     async def launch_debug_browser_with_vnc(
         self, task_id: str, device_type: DeviceType, profile: Optional[Profile] = None
@@ -169,12 +149,10 @@ class BrowserManager:
                 if not profile:
                     profile = await self.create_profile(device_type=device_type)
 
-            # Настраиваем окружение для VNC
-            os.environ["DISPLAY"] = f":{vnc_session.display_num}"
-
-            # Запускаем браузер с VNC настройками
+            # Запускаем браузер с VNC настройками на дисплее сессии
             async with async_playwright() as p:
                 browser = await p.chromium.launch(
+                    env=self._vnc_display_env(vnc_session),
                     headless=False,  # ВАЖНО: НЕ headless для VNC
                     slow_mo=1000,  # Замедление для наблюдения
                     devtools=True,  # Включаем DevTools
@@ -359,7 +337,9 @@ class BrowserManager:
         session = await self.get_session()
 
         try:
-            # Ищем готовый профиль указанного типа устройства
+            # Берем несколько самых здоровых готовых профилей (индекс
+            # idx_profiles_ready_health) и выбираем из них с весом по оценке,
+            # чтобы нагрузка не ложилась целиком на один лучший профиль
             query = (
                 select(Profile)
                 .where(
@@ -369,22 +349,31 @@ class BrowserManager:
                         Profile.device_type == device_type,
                     )
                 )
-                .order_by(Profile.last_used.asc())
+                .order_by(
+                    Profile.health_score.desc(), Profile.last_used.asc().nullsfirst()
+                )
+                .limit(settings.profile_health_selection_pool)
             )
 
             result = await session.execute(query)
-            profile = result.scalar_one_or_none()
+            candidates = result.scalars().all()
+
+            if candidates:
+                profile = random.choices(
+                    candidates,
+                    weights=[max(c.health_score or 0, 0.01) for c in candidates],
+                )[0]
 
-            if profile:
                 # Обновляем время использования
+                # (счетчик использований ведет profile_health_scorer)
                 profile.last_used = datetime.utcnow()
-                profile.total_usage_count += 1
                 await session.commit()
 
                 logger.info(
                     "Ready profile retrieved",
                     profile_id=str(profile.id),
                     device_type=device_type.value,
+                    health_score=profile.health_score,
                 )
                 return profile
 
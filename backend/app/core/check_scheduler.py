@@ -0,0 +1,389 @@
+# backend/app/core/check_scheduler.py
+"""
+Планировщик регулярных проверок позиций по check_frequency.
+
+У каждого активного ключевого слова есть next_check_at. Каждый тик
+планировщик забирает созревшие ключи в пределах токенов token bucket
+каждой пары (регион, устройство): внутри пары - сначала тарифы с большим
+priority_level, затем самые просроченные, а общий лимит тика делится между
+парами по очереди, так что завал одной пары не задерживает остальные.
+Ключи собираются в пакетные задачи CHECK_POSITIONS с общим регионом и
+устройством, чтобы задача работала в одной сессии браузера. Ключи сверх
+токенов остаются созревшими и уходят в следующие тики - так всплеск
+(массовый импорт, утро понедельника) растягивается во времени, а следующая
+проверка назначается от фактического момента планирования и сохраняет
+этот разброс.
+
+Состояние buckets хранится в check_scheduler_buckets и меняется только
+под advisory lock тика, поэтому лимит пары общий для всех процессов.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Tuple
+
+import structlog
+from sqlalchemy import DateTime, String, and_, cast, literal, select, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.billing_service import BillingService
+from app.models import (
+    CheckSchedulerBucket,
+    Task,
+    User,
+    UserDomain,
+    UserKeyword,
+    TariffPlan,
+    YandexRegion,
+)
+
+logger = structlog.get_logger(__name__)
+
+DEFAULT_COST_PER_CHECK = Decimal("1.00")
+
+FREQUENCY_INTERVAL_SQL = """
+    CASE {column}
+        WHEN 'weekly' THEN interval '7 days'
+        WHEN 'monthly' THEN interval '30 days'
+        ELSE interval '1 day'
+    END
+"""
+
+ADVANCE_NEXT_CHECK = text(
+    f"""
+    UPDATE user_keywords
+    SET next_check_at = CAST(:now AS timestamp)
+        + {FREQUENCY_INTERVAL_SQL.format(column="check_frequency")}
+    WHERE id = ANY(CAST(:keyword_ids AS uuid[]))
+    """
+)
+
+POSTPONE_NEXT_CHECK = text(
+    """
+    UPDATE user_keywords
+    SET next_check_at = CAST(:until AS timestamp)
+    WHERE id = ANY(CAST(:keyword_ids AS uuid[]))
+    """
+)
+
+PROJECTED_LOAD = text(
+    f"""
+    SELECT
+        CAST(:now AS timestamp)
+            + floor(EXTRACT(EPOCH FROM (o.at - CAST(:now AS timestamp))) / :bucket_seconds)
+              * :bucket_seconds * interval '1 second' AS bucket_start,
+        lower(CAST(k.device_type AS text)) AS device_type,
+        count(*) AS checks
+    FROM user_keywords k
+    JOIN users u ON u.id = k.user_id
+    CROSS JOIN LATERAL generate_series(
+        GREATEST(COALESCE(k.next_check_at, k.created_at), CAST(:now AS timestamp)),
+        CAST(:until AS timestamp),
+        {FREQUENCY_INTERVAL_SQL.format(column="k.check_frequency")}
+    ) AS o(at)
+    WHERE k.is_active = true AND u.is_active = true
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    """
+)
+
+
+@dataclass
+class DueKeyword:
+    keyword_id: str
+    user_id: str
+    device_type: str
+    region_code: str
+    priority_level: int
+    cost_per_check: Decimal
+    bucket_tokens: float  # токены пары на момент тика
+    pair_due: int  # созревших ключей пары
+
+
+class CheckScheduler:
+    """Распределение регулярных проверок позиций по времени"""
+
+    async def tick(self, session: AsyncSession) -> Dict[str, int]:
+        """Планирует созревшие проверки. Возвращает статистику тика"""
+        stats = {"due": 0, "scheduled": 0, "throttled": 0, "unpaid": 0, "tasks": 0}
+
+        # Один тик на кластер: под этой блокировкой читаются и
+        # обновляются check_scheduler_buckets
+        locked = await session.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext('check_scheduler'))")
+        )
+        if not locked.scalar():
+            await session.rollback()
+            return stats
+
+        now = datetime.utcnow()
+        due = await self._fetch_due(session, now)
+        if not due:
+            await session.commit()
+            return stats
+
+        pairs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        accepted: Dict[str, List[DueKeyword]] = defaultdict(list)
+        for keyword in due:
+            pair = pairs.setdefault(
+                (keyword.region_code, keyword.device_type),
+                {"tokens": keyword.bucket_tokens, "due": keyword.pair_due, "taken": 0},
+            )
+            pair["taken"] += 1
+            accepted[keyword.user_id].append(keyword)
+
+        stats["due"] = sum(pair["due"] for pair in pairs.values())
+        stats["throttled"] = stats["due"] - len(due)
+
+        from app.core.task_manager import TaskType, TaskStatus
+
+        scheduled_ids: List[str] = []
+        unpaid_ids: List[str] = []
+
+        for user_id, keywords in accepted.items():
+            cost = keywords[0].cost_per_check * len(keywords)
+            reserved = await BillingService(session).reserve_balance(
+                user_id, cost, commit=False
+            )
+            if not reserved["success"]:
+                unpaid_ids.extend(k.keyword_id for k in keywords)
+                # Неоплаченные проверки токены пары не расходуют
+                for keyword in keywords:
+                    pairs[(keyword.region_code, keyword.device_type)]["taken"] -= 1
+                continue
+
+            groups: Dict[Tuple[str, str], List[DueKeyword]] = defaultdict(list)
+            for keyword in keywords:
+                groups[(keyword.region_code, keyword.device_type)].append(keyword)
+
+            for (region_code, device_type), group in groups.items():
+                for i in range(0, len(group), settings.check_scheduler_batch_size):
+                    chunk = group[i : i + settings.check_scheduler_batch_size]
+                    session.add(
+                        Task(
+                            task_type=TaskType.CHECK_POSITIONS.value,
+                            status=TaskStatus.PENDING.value,
+                            priority=settings.check_scheduler_base_priority
+                            + chunk[0].priority_level,
+                            device_type=device_type,
+                            user_id=user_id,
+                            reserved_amount=chunk[0].cost_per_check * len(chunk),
+                            parameters={
+                                "keyword_ids": [k.keyword_id for k in chunk],
+                                "device_type": device_type,
+                                "region_code": region_code,
+                                "scheduled": True,
+                            },
+                        )
+                    )
+                    stats["tasks"] += 1
+
+            scheduled_ids.extend(k.keyword_id for k in keywords)
+
+        if scheduled_ids:
+            await session.execute(
+                ADVANCE_NEXT_CHECK, {"now": now, "keyword_ids": scheduled_ids}
+            )
+        if unpaid_ids:
+            # Без средств не долбим каждый тик - повторим позже
+            await session.execute(
+                POSTPONE_NEXT_CHECK,
+                {
+                    "until": now
+                    + timedelta(seconds=settings.check_scheduler_unpaid_retry_seconds),
+                    "keyword_ids": unpaid_ids,
+                },
+            )
+        await self._save_buckets(session, pairs, now)
+
+        await session.commit()
+
+        stats["scheduled"] = len(scheduled_ids)
+        stats["unpaid"] = len(unpaid_ids)
+        if stats["scheduled"] or stats["unpaid"]:
+            logger.info("Position checks scheduled", **stats)
+        return stats
+
+    # ===================== TOKEN BUCKETS =====================
+
+    def _bucket_tokens(self, now: datetime):
+        """Токены пары на момент now: остаток + пополнение, не больше емкости"""
+        capacity = float(settings.check_scheduler_bucket_capacity)
+        rate = settings.check_scheduler_rate_per_minute / 60.0
+        elapsed = func.extract(
+            "epoch", literal(now, DateTime) - CheckSchedulerBucket.updated_at
+        )
+        return func.least(
+            capacity,
+            func.coalesce(CheckSchedulerBucket.tokens + elapsed * rate, capacity),
+        )
+
+    async def _save_buckets(
+        self,
+        session: AsyncSession,
+        pairs: Dict[Tuple[str, str], Dict[str, Any]],
+        now: datetime,
+    ):
+        rows = [
+            {
+                "region_code": region_code,
+                "device_type": device_type,
+                "tokens": max(0.0, pair["tokens"] - pair["taken"]),
+                "updated_at": now,
+            }
+            for (region_code, device_type), pair in pairs.items()
+        ]
+        if not rows:
+            return
+        statement = insert(CheckSchedulerBucket).values(rows)
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["region_code", "device_type"],
+                set_={
+                    "tokens": statement.excluded.tokens,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+
+    async def _fetch_due(self, session: AsyncSession, now: datetime) -> List[DueKeyword]:
+        """Созревшие ключи в пределах токенов своей пары (регион, устройство)"""
+        due_at = func.coalesce(UserKeyword.next_check_at, UserKeyword.created_at)
+        priority_level = func.coalesce(TariffPlan.priority_level, 0)
+        device_type = func.lower(cast(UserKeyword.device_type, String))
+        pair = (YandexRegion.region_code, UserKeyword.device_type)
+
+        ranked = (
+            select(
+                UserKeyword.id.label("keyword_id"),
+                UserKeyword.user_id,
+                UserKeyword.device_type,
+                YandexRegion.region_code,
+                priority_level.label("priority_level"),
+                TariffPlan.cost_per_check,
+                due_at.label("due_at"),
+                self._bucket_tokens(now).label("bucket_tokens"),
+                func.row_number()
+                .over(partition_by=pair, order_by=(priority_level.desc(), due_at.asc()))
+                .label("pair_rank"),
+                func.count().over(partition_by=pair).label("pair_due"),
+            )
+            .join(UserDomain, UserDomain.id == UserKeyword.domain_id)
+            .join(YandexRegion, YandexRegion.id == UserDomain.region_id)
+            .join(User, User.id == UserKeyword.user_id)
+            .outerjoin(TariffPlan, TariffPlan.name == User.subscription_plan)
+            .outerjoin(
+                CheckSchedulerBucket,
+                and_(
+                    CheckSchedulerBucket.region_code == YandexRegion.region_code,
+                    CheckSchedulerBucket.device_type == device_type,
+                ),
+            )
+            .where(
+                UserKeyword.is_active == True,
+                User.is_active == True,
+                due_at <= now,
+            )
+            .subquery()
+        )
+
+        # Сначала первые ключи каждой пары, затем вторые и т.д. - общий
+        # лимит тика делится между парами, а не достается самой большой
+        result = await session.execute(
+            select(ranked)
+            .join(UserKeyword, UserKeyword.id == ranked.c.keyword_id)
+            .where(ranked.c.pair_rank <= func.floor(ranked.c.bucket_tokens))
+            .order_by(
+                ranked.c.pair_rank,
+                ranked.c.priority_level.desc(),
+                ranked.c.due_at.asc(),
+            )
+            .limit(settings.check_scheduler_max_per_tick)
+            .with_for_update(of=UserKeyword, skip_locked=True)
+        )
+
+        return [
+            DueKeyword(
+                keyword_id=str(row.keyword_id),
+                user_id=str(row.user_id),
+                device_type=row.device_type.value,
+                region_code=row.region_code,
+                priority_level=row.priority_level,
+                cost_per_check=(
+                    Decimal(str(row.cost_per_check))
+                    if row.cost_per_check is not None
+                    else DEFAULT_COST_PER_CHECK
+                ),
+                bucket_tokens=float(row.bucket_tokens),
+                pair_due=row.pair_due,
+            )
+            for row in result.all()
+        ]
+
+    async def get_projected_load(
+        self,
+        session: AsyncSession,
+        hours: int = 24,
+        bucket_minutes: int = 60,
+    ) -> Dict[str, Any]:
+        """Прогноз числа проверок по интервалам времени на hours вперед"""
+        now = datetime.utcnow().replace(second=0, microsecond=0)
+        result = await session.execute(
+            PROJECTED_LOAD,
+            {
+                "now": now,
+                "until": now + timedelta(hours=hours),
+                "bucket_seconds": bucket_minutes * 60,
+            },
+        )
+
+        buckets: Dict[datetime, Dict[str, int]] = {}
+        for bucket_start, device_type, checks in result.all():
+            bucket = buckets.setdefault(bucket_start, {"total": 0})
+            bucket[device_type] = checks
+            bucket["total"] += checks
+
+        # Пропускная способность: каждая пара (регион, устройство) со своим bucket
+        pairs = await session.execute(
+            select(
+                func.count(
+                    func.distinct(
+                        func.concat(UserDomain.region_id, ":", UserKeyword.device_type)
+                    )
+                )
+            )
+            .select_from(UserKeyword)
+            .join(UserDomain, UserDomain.id == UserKeyword.domain_id)
+            .where(UserKeyword.is_active == True)
+        )
+        region_device_pairs = pairs.scalar() or 0
+        capacity_per_pair = settings.check_scheduler_rate_per_minute * bucket_minutes
+
+        overdue = await session.execute(
+            select(func.count(UserKeyword.id)).where(
+                UserKeyword.is_active == True,
+                func.coalesce(UserKeyword.next_check_at, UserKeyword.created_at) <= now,
+            )
+        )
+
+        return {
+            "from": now.isoformat(),
+            "hours": hours,
+            "bucket_minutes": bucket_minutes,
+            "overdue": overdue.scalar() or 0,
+            "region_device_pairs": region_device_pairs,
+            "capacity_per_region_device": capacity_per_pair,
+            "capacity_total": capacity_per_pair * region_device_pairs,
+            "timeline": [
+                {"start": start.isoformat(), **counts}
+                for start, counts in sorted(buckets.items())
+            ],
+        }
+
+
+# Глобальный экземпляр планировщика проверок
+check_scheduler = CheckScheduler()
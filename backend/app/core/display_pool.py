@@ -0,0 +1,279 @@
+# backend/app/core/display_pool.py
+"""
+Пул виртуальных X серверов (Xvfb) для браузеров с окном (headless=False).
+
+Раньше каждый запуск браузера вызывал pgrep и time.sleep(2) прямо в event
+loop и выставлял глобальный os.environ["DISPLAY"] = ":99", так что все
+браузеры процесса рисовались на одном X сервере, а параллельные задачи
+перетирали друг другу DISPLAY.
+
+Пул держит display_pool_size серверов Xvfb, принадлежащих процессу:
+  - серверы запускаются асинхронно при старте воркера (start(); иначе при
+    первом запросе дисплея); готовность определяется по -displayfd, без
+    фиксированных пауз;
+  - номер дисплея выбирает сам Xvfb (-displayfd без номера занимает первый
+    свободный) - несколько воркер-процессов на одном хосте получают разные
+    дисплеи, лимит браузеров на дисплей соблюдается, а stop() одного
+    процесса не гасит X серверы, на которых работают браузеры другого;
+  - браузер получает дисплей через env запуска playwright, глобальное
+    окружение процесса не меняется;
+  - на дисплее не больше display_max_browsers браузеров; выбирается
+    наименее загруженный, при полном пуле запрос ждет освобождения до
+    display_acquire_timeout, затем берется наименее загруженный дисплей;
+  - слот освобождается по событию disconnected браузера;
+  - упавший сервер перезапускается при следующем запросе дисплея как
+    новый дисплей с нулевым счетчиком браузеров.
+"""
+
+import asyncio
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class XvfbDisplay:
+    number: Optional[int] = None  # назначается Xvfb при запуске
+    process: Optional[asyncio.subprocess.Process] = None
+    browsers: int = 0
+
+    @property
+    def name(self) -> str:
+        return f":{self.number}"
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+
+def pool_size() -> int:
+    if settings.display_pool_size > 0:
+        return settings.display_pool_size
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+class DisplayPool:
+    """Xvfb серверы и распределение браузеров по ним"""
+
+    def __init__(self):
+        self.displays: List[XvfbDisplay] = []
+        self._condition = asyncio.Condition()
+        self._started = False
+        self._xvfb_path = shutil.which("Xvfb")
+        self._notifications = set()
+        self.waits = 0
+        self.overflows = 0
+
+    # ===================== СЕРВЕРЫ =====================
+
+    async def start(self):
+        """Запускает серверы пула (повторный вызов ничего не делает)"""
+        async with self._condition:
+            await self._start_locked()
+
+    async def _start_locked(self):
+        if self._started:
+            return
+        self._started = True
+
+        if not self._xvfb_path:
+            logger.warning("Xvfb not found, browsers will use inherited DISPLAY")
+            return
+
+        self.displays = [XvfbDisplay() for _ in range(pool_size())]
+        await asyncio.gather(*[self._spawn(display) for display in self.displays])
+        logger.info(
+            "Display pool started",
+            displays=[d.name for d in self.displays if d.alive],
+            max_browsers_per_display=settings.display_max_browsers,
+        )
+
+    async def _spawn(self, display: XvfbDisplay) -> bool:
+        """Запускает Xvfb на свободном дисплее и ждет готовности"""
+        try:
+            display.process = await asyncio.create_subprocess_exec(
+                self._xvfb_path,
+                "-screen",
+                "0",
+                settings.display_resolution,
+                "-ac",
+                "+extension",
+                "GLX",
+                "-nolisten",
+                "tcp",
+                "-displayfd",
+                "1",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            # Xvfb пишет выбранный номер дисплея в -displayfd, когда готов
+            # принимать клиентов
+            ready = await asyncio.wait_for(
+                display.process.stdout.readline(),
+                timeout=settings.display_start_timeout,
+            )
+            if not ready.strip():
+                raise RuntimeError(
+                    f"Xvfb exited with code {display.process.returncode}"
+                )
+            display.number = int(ready.strip())
+            return True
+        except Exception as e:
+            logger.error("Failed to start Xvfb", error=str(e))
+            await self._terminate(display)
+            return False
+
+    async def _terminate(self, display: XvfbDisplay):
+        process = display.process
+        display.process = None
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def stop(self):
+        """Останавливает серверы пула"""
+        async with self._condition:
+            for display in self.displays:
+                await self._terminate(display)
+            self.displays = []
+            self._started = False
+        logger.info("Display pool stopped")
+
+    # ===================== ВЫДАЧА ДИСПЛЕЕВ =====================
+
+    async def acquire(self) -> Optional[XvfbDisplay]:
+        """Наименее загруженный дисплей; None - пул недоступен (нет Xvfb)"""
+        async with self._condition:
+            await self._start_locked()
+            if not self.displays:
+                return None
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.display_acquire_timeout
+            while True:
+                await self._restart_dead()
+                alive = [d for d in self.displays if d.alive]
+                if not alive:
+                    return None
+
+                display = min(alive, key=lambda d: d.browsers)
+                if display.browsers < settings.display_max_browsers:
+                    break
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    # Лучше перегрузить дисплей, чем сорвать задачу
+                    self.overflows += 1
+                    logger.warning(
+                        "Display pool exhausted, overcommitting",
+                        display=display.name,
+                        browsers=display.browsers,
+                    )
+                    break
+
+                self.waits += 1
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            display.browsers += 1
+            return display
+
+    async def _restart_dead(self):
+        # Упавший дисплей заменяется новым объектом: браузеры со старого
+        # сервера освобождают слоты на нем (release по disconnected) и не
+        # уменьшают счетчик перезапущенного дисплея
+        for index, display in enumerate(self.displays):
+            if display.alive:
+                continue
+            logger.warning("Xvfb display died, restarting", display=display.name)
+            replacement = XvfbDisplay()
+            self.displays[index] = replacement
+            await self._spawn(replacement)
+
+    def release(self, display: Optional[XvfbDisplay]):
+        """Возвращает слот дисплея (вызывается из любого места loop'а)"""
+        if display is None:
+            return
+        display.browsers = max(0, display.browsers - 1)
+        task = asyncio.get_running_loop().create_task(self._notify())
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify()
+
+    def bind(self, browser, display: Optional[XvfbDisplay]):
+        """Освобождает слот, когда браузер закрыт или упал"""
+        if display is None:
+            return
+        browser.once("disconnected", lambda _: self.release(display))
+
+    # ===================== ОКРУЖЕНИЕ ЗАПУСКА =====================
+
+    @staticmethod
+    def env(
+        display: Optional[XvfbDisplay] = None,
+        display_name: Optional[str] = None,
+        base: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, str]:
+        """Окружение процесса браузера с нужным DISPLAY"""
+        env = dict(os.environ if base is None else base)
+        name = display.name if display is not None else display_name
+        if name:
+            env["DISPLAY"] = name
+        env.pop("WAYLAND_DISPLAY", None)
+        return env
+
+    async def launch(self, playwright, **launch_options):
+        """chromium.launch на дисплее из пула"""
+        base_env = launch_options.pop("env", None)
+        display = await self.acquire()
+        try:
+            browser = await playwright.chromium.launch(
+                **launch_options, env=self.env(display, base=base_env)
+            )
+        except BaseException:
+            self.release(display)
+            raise
+
+        self.bind(browser, display)
+        logger.debug(
+            "Browser launched on display",
+            display=display.name if display else os.environ.get("DISPLAY"),
+        )
+        return browser
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "xvfb_available": bool(self._xvfb_path),
+            "max_browsers_per_display": settings.display_max_browsers,
+            "displays": [
+                {
+                    "display": d.name,
+                    "alive": d.alive,
+                    "browsers": d.browsers,
+                }
+                for d in self.displays
+            ],
+            "waits": self.waits,
+            "overflows": self.overflows,
+        }
+
+
+# Глобальный пул дисплеев процесса
+display_pool = DisplayPool()
@@ -0,0 +1,299 @@
+# backend/app/core/keyword_file_extractor.py
+"""
+Потоковое извлечение ключевых слов из файлов (txt, xlsx, docx).
+
+Файл скачивается по частям во временный файл на диске, а разбор идет
+построчно: xlsx читается openpyxl в режиме read_only (SAX-разбор листа без
+построения модели книги), docx - iterparse word/document.xml с очисткой
+разобранных абзацев, текст - инкрементальным декодером блоками. Разбор
+выполняется в ограниченном пуле процессов, чтобы не блокировать event loop
+и не конкурировать за GIL с обработчиками запросов. Размер файла и число
+строк ограничены настройками keyword_file_*.
+"""
+
+import asyncio
+import codecs
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+from xml.etree import ElementTree
+
+import requests
+import structlog
+
+from app.config import settings
+from app.services.keyword_ingest_service import normalize_keyword, MAX_KEYWORD_LENGTH
+
+logger = structlog.get_logger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+TEXT_CHUNK_SIZE = 256 * 1024
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Кодировки текстовых файлов в порядке проверки
+TEXT_ENCODINGS = ("utf-8-sig", "cp1251")
+
+
+@dataclass
+class ExtractionResult:
+    """Результат извлечения ключевых слов из файла"""
+
+    keywords: List[str] = field(default_factory=list)
+    rows_scanned: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    encoding: Optional[str] = None
+
+
+class KeywordCollector:
+    """Нормализует и дедуплицирует строки по мере чтения"""
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.result = ExtractionResult()
+        self._seen = set()
+
+    def add(self, value) -> None:
+        self.result.rows_scanned += 1
+        if self.result.rows_scanned > self.max_rows:
+            raise ValueError(
+                f"Файл содержит больше {self.max_rows} строк"
+            )
+
+        if not isinstance(value, str):
+            if value is not None:
+                self.result.invalid += 1
+            return
+
+        keyword = normalize_keyword(value)
+        if not keyword or len(keyword) > MAX_KEYWORD_LENGTH:
+            self.result.invalid += 1
+            return
+        if keyword in self._seen:
+            self.result.duplicates += 1
+            return
+
+        self._seen.add(keyword)
+        self.result.keywords.append(keyword)
+
+
+# ===================== ПОТОКОВЫЕ ЧИТАТЕЛИ =====================
+
+
+def iter_text_lines(path: str, encoding: str) -> Iterator[str]:
+    """Читает текстовый файл блоками с инкрементальным декодированием"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ""
+
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(TEXT_CHUNK_SIZE)
+            final = not chunk
+            text = tail + decoder.decode(chunk, final=final)
+            lines = text.splitlines()
+
+            if not final and lines and not text.endswith(("\n", "\r")):
+                # Последняя строка блока может продолжиться в следующем
+                tail = lines.pop()
+            else:
+                tail = ""
+
+            yield from lines
+
+            if final:
+                break
+
+
+def iter_excel_cells(path: str, sheet: int = 1, start_row: int = 1) -> Iterator[object]:
+    """Читает первый столбец листа в режиме read_only"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet > len(workbook.sheetnames):
+            raise ValueError(
+                f"Лист {sheet} не найден. Доступно листов: {len(workbook.sheetnames)}"
+            )
+
+        worksheet = workbook.worksheets[sheet - 1]
+        for row in worksheet.iter_rows(min_row=start_row, max_col=1, values_only=True):
+            yield row[0] if row else None
+    finally:
+        workbook.close()
+
+
+def iter_word_paragraphs(path: str) -> Iterator[str]:
+    """Читает абзацы docx через iterparse, не строя дерево документа"""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as document:
+            parts: List[str] = []
+            for event, element in ElementTree.iterparse(
+                document, events=("start", "end")
+            ):
+                if element.tag == f"{WORD_NS}p":
+                    if event == "start":
+                        parts = []
+                    else:
+                        yield "".join(parts)
+                        element.clear()
+                elif event == "end":
+                    if element.tag == f"{WORD_NS}t" and element.text:
+                        parts.append(element.text)
+                    elif element.tag == f"{WORD_NS}tab":
+                        parts.append("\t")
+
+
+# ===================== ИЗВЛЕЧЕНИЕ (в процессе пула) =====================
+
+
+def extract_text(path: str, max_rows: int) -> ExtractionResult:
+    last_error: Optional[Exception] = None
+    for encoding in TEXT_ENCODINGS:
+        collector = KeywordCollector(max_rows)
+        try:
+            for line in iter_text_lines(path, encoding):
+                collector.add(line)
+        except UnicodeDecodeError as e:
+            last_error = e
+            continue
+        collector.result.encoding = encoding
+        return collector.result
+
+    raise ValueError(f"Не удалось определить кодировку файла: {last_error}")
+
+
+def extract_excel(
+    path: str, max_rows: int, sheet: int = 1, start_row: int = 1
+) -> ExtractionResult:
+    collector = KeywordCollector(max_rows)
+    try:
+        for value in iter_excel_cells(path, sheet, start_row):
+            collector.add(value)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Ошибка обработки Excel файла: {str(e)}")
+    return collector.result
+
+
+def extract_word(path: str, max_rows: int) -> ExtractionResult:
+    collector = KeywordCollector(max_rows)
+    try:
+        for paragraph in iter_word_paragraphs(path):
+            collector.add(paragraph)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Ошибка обработки Word документа: {str(e)}")
+    return collector.result
+
+
+EXTRACTORS = {
+    "text": extract_text,
+    "excel": extract_excel,
+    "word": extract_word,
+}
+
+
+# ===================== ЗАГРУЗКА =====================
+
+
+def download_to_file(url: str, path: str, max_size: int) -> int:
+    """Скачивает файл по частям прямо на диск с ограничением размера"""
+    try:
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get("content-length")
+            if content_length and int(content_length) > max_size:
+                raise ValueError(f"Файл слишком большой (максимум {max_size} байт)")
+
+            size = 0
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ValueError(
+                            f"Файл слишком большой (максимум {max_size} байт)"
+                        )
+                    f.write(chunk)
+            return size
+
+    except requests.RequestException as e:
+        raise ValueError(f"Ошибка загрузки файла: {str(e)}")
+
+
+class KeywordFileExtractor:
+    """Загрузка и разбор файлов ключевых слов вне event loop"""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.keyword_file_workers
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Загрузки держат временные файлы - ограничиваем их число вместе с разбором
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.keyword_file_max_concurrent)
+        return self._semaphore
+
+    async def extract_from_url(self, url: str, kind: str, **options) -> ExtractionResult:
+        """Скачивает файл и извлекает из него ключевые слова"""
+        if kind not in EXTRACTORS:
+            raise ValueError(f"Неподдерживаемый тип файла: {kind}")
+
+        async with self._get_semaphore():
+            fd, path = tempfile.mkstemp(
+                prefix="keywords_", dir=settings.keyword_file_tmp_dir
+            )
+            os.close(fd)
+            try:
+                size = await asyncio.to_thread(
+                    download_to_file, url, path, settings.keyword_file_max_bytes
+                )
+
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._get_executor(),
+                    _run_extractor,
+                    kind,
+                    path,
+                    settings.keyword_file_max_rows,
+                    options,
+                )
+            finally:
+                os.unlink(path)
+
+        logger.info(
+            "Keywords extracted from file",
+            kind=kind,
+            size=size,
+            rows_scanned=result.rows_scanned,
+            keywords=len(result.keywords),
+            duplicates=result.duplicates,
+            invalid=result.invalid,
+        )
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _run_extractor(kind: str, path: str, max_rows: int, options: dict) -> ExtractionResult:
+    return EXTRACTORS[kind](path, max_rows, **options)
+
+
+# Глобальный экземпляр извлечения ключевых слов
+keyword_file_extractor = KeywordFileExtractor()
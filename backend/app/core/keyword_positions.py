@@ -0,0 +1,157 @@
+# backend/app/core/keyword_positions.py
+"""
+Запись результатов проверки позиций.
+
+Пачка результатов пишется в position_history одним INSERT, а затем тем же
+запросом-пачкой обновляется keyword_latest_positions: текущая позиция
+сдвигается в previous_*, лучшая/худшая позиции за 30 дней пересчитываются
+по индексу (keyword_id, check_date). Оба шага выполняются в транзакции
+вызывающего кода, поэтому таблица последних позиций не расходится с историей.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import PositionHistory
+
+logger = structlog.get_logger(__name__)
+
+WINDOW_DAYS = 30
+
+UPSERT_LATEST_POSITIONS = text(
+    f"""
+    INSERT INTO keyword_latest_positions (
+        keyword_id, user_id, domain_id, position, url, last_check_date,
+        best_position_30d, worst_position_30d, created_at, updated_at
+    )
+    SELECT n.keyword_id, n.user_id, n.domain_id, n.position, n.url, n.check_date,
+           w.best, w.worst, now(), now()
+    FROM unnest(
+        CAST(:keyword_ids AS uuid[]),
+        CAST(:user_ids AS uuid[]),
+        CAST(:domain_ids AS uuid[]),
+        CAST(:positions AS smallint[]),
+        CAST(:urls AS text[]),
+        CAST(:check_dates AS timestamp[])
+    ) AS n(keyword_id, user_id, domain_id, position, url, check_date)
+    CROSS JOIN LATERAL (
+        SELECT min(h.position) AS best, max(h.position) AS worst
+        FROM position_history h
+        WHERE h.keyword_id = n.keyword_id
+          AND h.check_date > n.check_date - interval '{WINDOW_DAYS} days'
+          AND h.check_date <= n.check_date
+    ) AS w
+    ON CONFLICT (keyword_id) DO UPDATE SET
+        previous_position = keyword_latest_positions.position,
+        previous_check_date = keyword_latest_positions.last_check_date,
+        position = EXCLUDED.position,
+        url = EXCLUDED.url,
+        last_check_date = EXCLUDED.last_check_date,
+        best_position_30d = EXCLUDED.best_position_30d,
+        worst_position_30d = EXCLUDED.worst_position_30d,
+        updated_at = now()
+    WHERE keyword_latest_positions.last_check_date <= EXCLUDED.last_check_date
+    """
+)
+
+# Окно 30 дней сдвигается и без новых проверок - пересчитываем его раз в сутки
+REFRESH_STALE_WINDOWS = text(
+    f"""
+    UPDATE keyword_latest_positions lp
+    SET best_position_30d = w.best,
+        worst_position_30d = w.worst,
+        updated_at = now()
+    FROM keyword_latest_positions s
+    CROSS JOIN LATERAL (
+        SELECT min(h.position) AS best, max(h.position) AS worst
+        FROM position_history h
+        WHERE h.keyword_id = s.keyword_id
+          AND h.check_date > now() - interval '{WINDOW_DAYS} days'
+    ) AS w
+    WHERE lp.keyword_id = s.keyword_id
+      AND s.updated_at < CAST(:stale_before AS timestamp)
+    """
+)
+
+
+@dataclass
+class PositionCheck:
+    """Результат проверки позиции одного ключевого слова"""
+
+    keyword_id: str
+    user_id: str
+    domain_id: str
+    position: Optional[int]
+    url: Optional[str] = None
+    check_date: Optional[datetime] = None
+
+
+class KeywordPositionWriter:
+    """Пакетная запись истории позиций и последних позиций"""
+
+    async def record(self, session: AsyncSession, checks: List[PositionCheck]) -> int:
+        """Записывает пачку проверок (без commit - транзакцией владеет вызывающий)"""
+        if not checks:
+            return 0
+
+        now = datetime.utcnow()
+        for check in checks:
+            check.check_date = check.check_date or now
+
+        await session.execute(
+            insert(PositionHistory),
+            [
+                {
+                    "user_id": check.user_id,
+                    "domain_id": check.domain_id,
+                    "keyword_id": check.keyword_id,
+                    "position": check.position,
+                    "url": check.url,
+                    "check_date": check.check_date,
+                }
+                for check in checks
+            ],
+        )
+
+        # ON CONFLICT не может обновить одну строку дважды - берем последнюю проверку
+        latest: Dict[str, PositionCheck] = {}
+        for check in checks:
+            current = latest.get(str(check.keyword_id))
+            if current is None or current.check_date <= check.check_date:
+                latest[str(check.keyword_id)] = check
+
+        rows = list(latest.values())
+        await session.execute(
+            UPSERT_LATEST_POSITIONS,
+            {
+                "keyword_ids": [str(r.keyword_id) for r in rows],
+                "user_ids": [str(r.user_id) for r in rows],
+                "domain_ids": [str(r.domain_id) for r in rows],
+                "positions": [r.position for r in rows],
+                "urls": [r.url for r in rows],
+                "check_dates": [r.check_date for r in rows],
+            },
+        )
+
+        return len(checks)
+
+    async def refresh_windows(self, session: AsyncSession) -> int:
+        """Пересчитывает окно 30 дней у давно не проверявшихся ключевых слов"""
+        result = await session.execute(
+            REFRESH_STALE_WINDOWS,
+            {"stale_before": datetime.utcnow() - timedelta(days=1)},
+        )
+        await session.commit()
+
+        if result.rowcount:
+            logger.info("Refreshed latest position windows", updated=result.rowcount)
+        return result.rowcount or 0
+
+
+# Глобальный экземпляр записи позиций
+keyword_position_writer = KeywordPositionWriter()
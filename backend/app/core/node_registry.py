@@ -0,0 +1,286 @@
+# backend/app/core/node_registry.py
+"""
+Реестр рабочих узлов и выбор задач с учетом возможностей узла.
+
+Каждый узел (TaskManager воркера) на heartbeat публикует в worker_nodes:
+  - свободную емкость (active_tasks, free_slots);
+  - capabilities: типы устройств, обслуживаемые регионы, наличие прокси,
+    инвентарь прогретых профилей (число профилей со снапшотами на диске
+    узла по типам устройств).
+
+Выбор задачи (claim) идет в три шага:
+  1. SQL отбирает pending задачи, которые узел вообще может выполнить:
+     тип устройства из capabilities и привязка пользователя к серверу.
+     Задачи пользователя с активной UserServerPreferences (и тарифом с
+     server_binding_allowed) берет только узел этого сервера, пока у того
+     есть живой heartbeat; если сервер недоступен, задача уходит любому
+     узлу, чтобы не зависнуть.
+  2. Из пачки кандидатов (node_claim_batch, FOR UPDATE SKIP LOCKED)
+     выбирается лучшая для узла: при равном приоритете выше задачи,
+     привязанные к этому серверу, задачи с профилем, снапшот которого
+     лежит на этом узле, с прогретыми профилями нужного устройства и с
+     регионом из списка узла.
+  3. Задачу, которую заметно лучше выполнит другой узел со свободной
+     емкостью (у него есть прогретые профили устройства или регион, а у
+     нас нет), узел пропускает, пока она ждет меньше node_defer_seconds.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import (
+    Profile,
+    Task,
+    TariffPlan,
+    User,
+    UserServerPreferences,
+    WorkerNode,
+)
+from .profile_snapshot_store import profile_snapshot_store
+
+logger = structlog.get_logger(__name__)
+
+# Размер пачки id в запросе инвентаря профилей
+INVENTORY_CHUNK = 1000
+
+# Веса соответствия задачи узлу (сравниваются только при равном приоритете)
+SCORE_BOUND_HERE = 8
+SCORE_LOCAL_PROFILE = 4
+SCORE_WARM_DEVICE = 2
+SCORE_REGION = 1
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _task_profile_ids(task: Task) -> List[str]:
+    """Профили, на которых будет выполняться задача (если известны заранее)"""
+    parameters = task.parameters or {}
+    ids = []
+    if task.profile_id:
+        ids.append(str(task.profile_id))
+    if parameters.get("profile_id"):
+        ids.append(str(parameters["profile_id"]))
+    ids.extend(str(profile_id) for profile_id in parameters.get("profile_ids") or [])
+    return ids
+
+
+class NodeRegistry:
+    """Возможности этого узла, сведения о соседях и выбор задачи"""
+
+    def __init__(self):
+        self.device_types = _split(settings.node_device_types)
+        self.regions = set(_split(settings.node_regions))
+        self.local_profiles: Set[str] = set()
+        self.warm_profiles: Dict[str, int] = {}
+        self._inventory_at = 0.0
+        # Соседи со свободной емкостью: node_id -> capabilities
+        self.peers: Dict[str, Dict[str, Any]] = {}
+        self.deferred = 0
+
+    # ===================== ПУБЛИКАЦИЯ =====================
+
+    def capabilities(self) -> Dict[str, Any]:
+        return {
+            "browsers": ["chromium"],
+            "device_types": self.device_types,
+            "regions": sorted(self.regions),
+            "proxy": settings.node_proxy_enabled,
+            "warm_profiles": self.warm_profiles,
+        }
+
+    async def publish(
+        self,
+        session: AsyncSession,
+        node_id: str,
+        server_id: str,
+        max_workers: int,
+        active_tasks: int,
+    ):
+        """Heartbeat узла: емкость и возможности"""
+        if time.monotonic() - self._inventory_at >= settings.node_inventory_interval:
+            await self.refresh_inventory(session)
+
+        await session.execute(
+            update(WorkerNode)
+            .where(WorkerNode.node_id == node_id)
+            .values(
+                server_id=server_id,
+                status="online" if active_tasks < max_workers else "busy",
+                last_heartbeat=datetime.utcnow(),
+                max_workers=max_workers,
+                active_tasks=active_tasks,
+                free_slots=max(0, max_workers - active_tasks),
+                capabilities=self.capabilities(),
+            )
+        )
+        await session.commit()
+
+        await self.refresh_peers(session, node_id)
+
+    async def refresh_inventory(self, session: AsyncSession):
+        """Прогретые профили, снапшоты которых лежат на диске этого узла"""
+        self._inventory_at = time.monotonic()
+        try:
+            local_ids = await asyncio.to_thread(profile_snapshot_store.list_profiles)
+        except Exception as e:
+            logger.warning("Failed to list local profile snapshots", error=str(e))
+            return
+
+        warm: Dict[str, int] = {}
+        ids = list(local_ids)
+        for i in range(0, len(ids), INVENTORY_CHUNK):
+            result = await session.execute(
+                select(Profile.device_type, func.count(Profile.id))
+                .where(
+                    Profile.id.in_(ids[i : i + INVENTORY_CHUNK]),
+                    Profile.is_warmed_up == True,
+                )
+                .group_by(Profile.device_type)
+            )
+            for device_type, count in result.all():
+                key = getattr(device_type, "value", device_type)
+                warm[key] = warm.get(key, 0) + count
+
+        self.local_profiles = set(ids)
+        self.warm_profiles = warm
+
+    async def refresh_peers(self, session: AsyncSession, node_id: str):
+        """Живые соседи со свободной емкостью"""
+        result = await session.execute(
+            select(WorkerNode.node_id, WorkerNode.capabilities).where(
+                WorkerNode.node_id != node_id,
+                WorkerNode.free_slots > 0,
+                WorkerNode.last_heartbeat > self._alive_since(),
+                WorkerNode.status.in_(["online", "busy"]),
+            )
+        )
+        self.peers = {row.node_id: row.capabilities or {} for row in result.all()}
+
+    async def mark_offline(self, session: AsyncSession, node_id: str):
+        await session.execute(
+            update(WorkerNode)
+            .where(WorkerNode.node_id == node_id)
+            .values(status="offline", active_tasks=0, free_slots=0)
+        )
+        await session.commit()
+
+    @staticmethod
+    def _alive_since() -> datetime:
+        return datetime.utcnow() - timedelta(seconds=settings.node_heartbeat_stale_seconds)
+
+    # ===================== ВЫБОР ЗАДАЧИ =====================
+
+    def _binding(self, server_id: Optional[str] = None):
+        """Активная привязка пользователя задачи к серверу (с разрешающим тарифом)"""
+        conditions = [
+            UserServerPreferences.user_id == Task.user_id,
+            UserServerPreferences.is_active == True,
+            User.id == UserServerPreferences.user_id,
+            TariffPlan.name == User.subscription_plan,
+            TariffPlan.server_binding_allowed == True,
+        ]
+        if server_id is not None:
+            conditions.append(UserServerPreferences.preferred_server_id == server_id)
+        return conditions
+
+    def claim_conditions(self, server_id: str) -> list:
+        """Условия на pending задачи, которые может взять этот узел"""
+        bound_elsewhere = (
+            select(UserServerPreferences.id)
+            .where(
+                *self._binding(),
+                UserServerPreferences.preferred_server_id != server_id,
+                exists().where(
+                    WorkerNode.server_id == UserServerPreferences.preferred_server_id,
+                    WorkerNode.last_heartbeat > self._alive_since(),
+                    WorkerNode.status.in_(["online", "busy"]),
+                ),
+            )
+            .correlate(Task)
+        )
+        return [
+            Task.device_type.in_(self.device_types),
+            or_(Task.user_id.is_(None), ~bound_elsewhere.exists()),
+        ]
+
+    def bound_here(self, server_id: str):
+        """Выражение: задача привязана к этому серверу"""
+        return (
+            select(UserServerPreferences.id)
+            .where(*self._binding(server_id))
+            .correlate(Task)
+            .exists()
+            .label("bound_here")
+        )
+
+    def pick(self, candidates: List[Tuple[Task, bool]]) -> Optional[Task]:
+        """Лучшая для узла задача из кандидатов (уже отсортированных по приоритету)"""
+        best: Optional[Tuple[Tuple, Task]] = None
+        now = datetime.utcnow()
+
+        for position, (task, bound) in enumerate(candidates):
+            score = self._score(task, bound)
+            if not bound and self._better_elsewhere(task, score, now):
+                self.deferred += 1
+                continue
+
+            key = (task.priority or 0, score, -position)
+            if best is None or key > best[0]:
+                best = (key, task)
+
+        return best[1] if best else None
+
+    def _score(self, task: Task, bound: bool) -> int:
+        score = SCORE_BOUND_HERE if bound else 0
+        if any(pid in self.local_profiles for pid in _task_profile_ids(task)):
+            score += SCORE_LOCAL_PROFILE
+        if self.warm_profiles.get(task.device_type, 0) > 0:
+            score += SCORE_WARM_DEVICE
+        if self._region_match(self.regions, task):
+            score += SCORE_REGION
+        return score
+
+    @staticmethod
+    def _region_match(regions, task: Task) -> bool:
+        region = (task.parameters or {}).get("region_code")
+        return bool(regions) and region is not None and str(region) in regions
+
+    def _better_elsewhere(self, task: Task, score: int, now: datetime) -> bool:
+        """Есть свободный сосед, которому задача подходит лучше"""
+        if not self.peers or score >= SCORE_LOCAL_PROFILE:
+            return False
+        if task.created_at and (now - task.created_at).total_seconds() >= settings.node_defer_seconds:
+            return False
+
+        for capabilities in self.peers.values():
+            if task.device_type not in (capabilities.get("device_types") or []):
+                continue
+            peer_score = 0
+            if (capabilities.get("warm_profiles") or {}).get(task.device_type, 0) > 0:
+                peer_score += SCORE_WARM_DEVICE
+            if self._region_match(set(capabilities.get("regions") or []), task):
+                peer_score += SCORE_REGION
+            if peer_score > score:
+                return True
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "capabilities": self.capabilities(),
+            "local_profiles": len(self.local_profiles),
+            "peers": self.peers,
+            "deferred": self.deferred,
+        }
+
+
+# Глобальный реестр узла
+node_registry = NodeRegistry()
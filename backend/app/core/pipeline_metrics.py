@@ -0,0 +1,287 @@
+# backend/app/core/pipeline_metrics.py
+"""
+Prometheus метрики конвейера задач.
+
+Покрывают TaskManager (ожидание в очереди, длительность, задачи в работе,
+повторы), этапы выполнения (профиль, запуск браузера, навигация, поиск,
+извлечение, запись в БД), YandexParser (капчи и блокировки), нагул профилей
+и прокси-сервисы, а также периодически обновляемые gauge'и глубины очереди
+и размеров пулов профилей и прокси. Здесь же счетчик обращений к кэшу
+ответов API (response_cache).
+
+Мультипроцессный режим: если задана переменная PROMETHEUS_MULTIPROC_DIR
+(до импорта prometheus_client), каждый процесс пишет значения в mmap-файлы
+этого каталога, а /metrics собирает их через MultiProcessCollector - так
+несколько воркеров uvicorn отдают общие метрики. Каталог должен очищаться при
+старте контейнера (в docker-compose это tmpfs).
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Set, Tuple
+
+import structlog
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .task_tracing import span
+
+logger = structlog.get_logger(__name__)
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Тип текущей задачи: этапы парсера и нагула размечаются им без
+# протаскивания параметра через все вызовы
+current_task_type: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_task_type", default="direct"
+)
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+QUEUE_WAIT_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 900, 1800, 3600, 7200, 21600)
+TASK_DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+# ===================== ЗАДАЧИ =====================
+
+task_queue_wait_seconds = Histogram(
+    "task_queue_wait_seconds",
+    "Time between task creation and pickup by a worker",
+    ["task_type"],
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+
+task_duration_seconds = Histogram(
+    "task_duration_seconds",
+    "Task execution time",
+    ["task_type", "status"],  # completed, failed
+    buckets=TASK_DURATION_BUCKETS,
+)
+
+task_stage_duration_seconds = Histogram(
+    "task_stage_duration_seconds",
+    "Time spent in a task execution stage",
+    # profile_acquire, browser_launch, navigation, search, extraction,
+    # pagination, db_write, proxy_select
+    ["task_type", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+tasks_total = Counter(
+    "tasks_total",
+    "Finished tasks",
+    ["task_type", "status"],
+)
+
+task_retries_total = Counter(
+    "task_retries_total",
+    "Tasks returned to the queue for another attempt",
+    ["task_type"],
+)
+
+tasks_reaped_total = Counter(
+    "tasks_reaped_total",
+    "Running tasks with an expired lease taken back from a lost worker",
+    ["task_type", "action"],  # action: requeued, failed
+)
+
+tasks_in_flight = Gauge(
+    "tasks_in_flight",
+    "Tasks currently executing",
+    ["task_type"],
+    multiprocess_mode="livesum",
+)
+
+task_queue_depth = Gauge(
+    "task_queue_depth",
+    "Pending tasks in the database queue",
+    ["task_type"],
+    multiprocess_mode="max",
+)
+
+# ===================== ПАРСЕР И НАГУЛ =====================
+
+captchas_total = Counter(
+    "captchas_total",
+    "Captcha pages encountered",
+    ["source"],  # parser, nurture
+)
+
+blocks_total = Counter(
+    "blocks_total",
+    "Blocking pages encountered",
+    ["source", "kind"],  # kind: captcha, url, title
+)
+
+serp_pages_parsed_total = Counter(
+    "serp_pages_parsed_total",
+    "SERP pages parsed",
+    ["device_type"],
+)
+
+nurture_visits_total = Counter(
+    "nurture_visits_total",
+    "Nurture site visits and searches",
+    ["kind", "result"],  # kind: search, direct; result: success, error
+)
+
+# ===================== ПУЛЫ =====================
+
+profile_pool_size = Gauge(
+    "profile_pool_size",
+    "Profiles by device type and status",
+    ["device_type", "status"],
+    multiprocess_mode="max",
+)
+
+proxy_pool_size = Gauge(
+    "proxy_pool_size",
+    "Proxies by pool and status",
+    ["pool", "status"],  # pool: project, strategy
+    multiprocess_mode="max",
+)
+
+proxy_requests_total = Counter(
+    "proxy_requests_total",
+    "Proxy selections and source fetches",
+    ["source", "result"],  # result: selected, empty, error
+)
+
+# ===================== КЭШ ОТВЕТОВ =====================
+
+response_cache_requests_total = Counter(
+    "response_cache_requests_total",
+    "Response cache lookups by result",
+    ["cache", "result"],  # result: local_hit, redis_hit, coalesced, miss, bypass
+)
+
+
+@contextmanager
+def stage(name: str, task_type: Optional[str] = None):
+    """Замер длительности этапа: with stage("navigation"): ...
+
+    Этап одновременно пишется спаном в трассу текущей задачи.
+    """
+    started = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        task_stage_duration_seconds.labels(
+            task_type=task_type or current_task_type.get(), stage=name
+        ).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def track_task(task_type: str):
+    """Задача в работе: gauge in-flight и тип задачи для этапов"""
+    token = current_task_type.set(task_type)
+    tasks_in_flight.labels(task_type=task_type).inc()
+    try:
+        yield
+    finally:
+        tasks_in_flight.labels(task_type=task_type).dec()
+        current_task_type.reset(token)
+
+
+def record_task_finished(task_type: str, status: str, duration_seconds: float):
+    tasks_total.labels(task_type=task_type, status=status).inc()
+    task_duration_seconds.labels(task_type=task_type, status=status).observe(
+        duration_seconds
+    )
+
+
+# Метки, выставленные прошлым обновлением: пропавшие обнуляются, а не
+# удаляются - в мультипроцессном режиме значения живут в mmap-файлах
+_gauge_labels: Dict[str, Set[Tuple[str, ...]]] = {}
+
+
+def _set_gauge(gauge: Gauge, name: str, values: Dict[Tuple[str, ...], float]):
+    previous = _gauge_labels.get(name, set())
+    for labels in previous - set(values):
+        gauge.labels(*labels).set(0)
+    for labels, value in values.items():
+        gauge.labels(*labels).set(value)
+    _gauge_labels[name] = set(values)
+
+
+async def refresh_pool_gauges(session: AsyncSession):
+    """Глубина очереди и размеры пулов по данным БД"""
+    from app.models import Task, Profile, ProjectProxy, StrategyProxy
+
+    result = await session.execute(
+        select(Task.task_type, func.count(Task.id))
+        .where(Task.status == "pending")
+        .group_by(Task.task_type)
+    )
+    _set_gauge(
+        task_queue_depth,
+        "task_queue_depth",
+        {(task_type,): count for task_type, count in result.all()},
+    )
+
+    result = await session.execute(
+        select(Profile.device_type, Profile.status, func.count(Profile.id)).group_by(
+            Profile.device_type, Profile.status
+        )
+    )
+    _set_gauge(
+        profile_pool_size,
+        "profile_pool_size",
+        {
+            (getattr(device_type, "value", str(device_type)), status or "unknown"): count
+            for device_type, status, count in result.all()
+        },
+    )
+
+    proxies: Dict[Tuple[str, ...], float] = {}
+    for pool, model in (("project", ProjectProxy), ("strategy", StrategyProxy)):
+        result = await session.execute(
+            select(model.status, func.count()).group_by(model.status)
+        )
+        for status, count in result.all():
+            proxies[(pool, status or "unknown")] = count
+    _set_gauge(proxy_pool_size, "proxy_pool_size", proxies)
+
+
+# ===================== ЭКСПОРТ =====================
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def _collector_registry() -> CollectorRegistry:
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Текст метрик для /metrics и его content type"""
+    return generate_latest(_collector_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """HTTP сервер метрик для процессов без API (воркеры)"""
+    start_http_server(port, registry=_collector_registry())
+    logger.info("Metrics server started", port=port, multiprocess=is_multiprocess())
+
+
+def mark_process_dead():
+    """Убирает live-gauge'и завершившегося процесса из общего каталога"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,212 @@
+# backend/app/core/position_history_partitions.py
+"""
+Управление месячными секциями position_history.
+
+Секции называются position_history_YYYY_MM и покрывают
+[первое число месяца, первое число следующего месяца), строки вне
+созданных секций попадают в position_history_default. Менеджер заранее
+создает секции на position_history_partitions_ahead месяцев вперед и
+отсоединяет/удаляет секции старше position_history_retention_months.
+
+Если в position_history_default уже лежат строки месяца новой секции,
+они переносятся в нее в той же транзакции - иначе CREATE ... PARTITION OF
+падает на проверке ограничения default секции.
+"""
+
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_maker
+
+logger = structlog.get_logger(__name__)
+
+PARENT_TABLE = "position_history"
+DEFAULT_PARTITION = "position_history_default"
+PARTITION_NAME_RE = re.compile(r"^position_history_(\d{4})_(\d{2})$")
+
+
+def month_start(value: date, shift: int = 0) -> date:
+    """Первое число месяца со сдвигом на shift месяцев"""
+    month_index = value.year * 12 + (value.month - 1) + shift
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def partition_ddl(month: date) -> str:
+    """DDL секции (индексы наследуются от родительской таблицы)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{month_start(month, 1).isoformat()}')"
+    )
+
+
+class PositionHistoryPartitionManager:
+    """Создание и удаление секций истории позиций"""
+
+    async def maintain(self, session: Optional[AsyncSession] = None) -> Dict[str, List[str]]:
+        """Создает будущие секции и удаляет устаревшие"""
+        if session is None:
+            async with async_session_maker() as own_session:
+                return await self.maintain(own_session)
+
+        # Несколько воркеров могут обслуживать секции одновременно
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+            {"key": "position_history_partitions"},
+        )
+
+        created = await self.ensure_partitions(session)
+        dropped = await self.drop_expired_partitions(session)
+        await session.commit()
+
+        if created or dropped:
+            logger.info(
+                "Position history partitions maintained",
+                created=created,
+                dropped=dropped,
+            )
+        return {"created": created, "dropped": dropped}
+
+    async def list_partitions(self, session: AsyncSession) -> List[str]:
+        """Возвращает имена месячных секций"""
+        result = await session.execute(
+            text(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = :parent
+                ORDER BY child.relname
+                """
+            ),
+            {"parent": PARENT_TABLE},
+        )
+        return [name for name in result.scalars() if PARTITION_NAME_RE.match(name)]
+
+    async def ensure_partitions(
+        self, session: AsyncSession, until: Optional[date] = None
+    ) -> List[str]:
+        """Создает секции от текущего месяца до until (по умолчанию - N месяцев вперед)"""
+        today = datetime.utcnow().date()
+        current = month_start(today)
+        last = until or month_start(today, settings.position_history_partitions_ahead)
+
+        existing = set(await self.list_partitions(session))
+        created = []
+
+        month = current
+        while month <= last:
+            name = partition_name(month)
+            if name not in existing:
+                moved = await self._create_partition(session, month)
+                if moved:
+                    logger.info(
+                        "Rows moved from default partition",
+                        partition=name,
+                        rows=moved,
+                    )
+                created.append(name)
+            month = month_start(month, 1)
+
+        return created
+
+    async def _create_partition(self, session: AsyncSession, month: date) -> int:
+        """Создает секцию, перенося в нее строки месяца из default секции"""
+        bounds = {"start": month, "end": month_start(month, 1)}
+        has_rows = await session.scalar(
+            text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                "WHERE check_date >= :start AND check_date < :end)"
+            ),
+            bounds,
+        )
+        if not has_rows:
+            await session.execute(text(partition_ddl(month)))
+            return 0
+
+        # Удаленные этой транзакцией строки не мешают проверке default секции
+        await session.execute(
+            text(
+                "CREATE TEMP TABLE position_history_moving "
+                f"(LIKE {PARENT_TABLE}) ON COMMIT DROP"
+            )
+        )
+        result = await session.execute(
+            text(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE check_date >= :start AND check_date < :end
+                    RETURNING *
+                )
+                INSERT INTO position_history_moving SELECT * FROM moved
+                """
+            ),
+            bounds,
+        )
+        await session.execute(text(partition_ddl(month)))
+        await session.execute(
+            text(
+                f"INSERT INTO {PARENT_TABLE} OVERRIDING SYSTEM VALUE "
+                "SELECT * FROM position_history_moving"
+            )
+        )
+        await session.execute(text("DROP TABLE position_history_moving"))
+        return result.rowcount
+
+    async def drop_expired_partitions(self, session: AsyncSession) -> List[str]:
+        """Удаляет секции старше срока хранения"""
+        retention = settings.position_history_retention_months
+        if retention <= 0:
+            return []
+
+        oldest_kept = month_start(datetime.utcnow().date(), -retention)
+        dropped = []
+
+        # DETACH PARTITION берет ACCESS EXCLUSIVE на всю position_history
+        # (CONCURRENTLY недоступен: у таблицы есть default секция). Ждать
+        # блокировку за долгими запросами нельзя - очередь за ней встанет
+        # вся запись истории, поэтому секция отсоединяется с lock_timeout,
+        # а при таймауте откладывается до следующего прохода.
+        await session.execute(
+            text("SELECT set_config('lock_timeout', :timeout, true)"),
+            {"timeout": f"{settings.position_history_detach_lock_timeout_ms}ms"},
+        )
+
+        for name in await self.list_partitions(session):
+            match = PARTITION_NAME_RE.match(name)
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if month >= oldest_kept:
+                continue
+
+            try:
+                async with session.begin_nested():
+                    await session.execute(
+                        text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+                    )
+                    await session.execute(text(f"DROP TABLE {name}"))
+            except DBAPIError as e:
+                logger.warning(
+                    "Partition detach postponed", partition=name, error=str(e)
+                )
+                continue
+            dropped.append(name)
+
+        return dropped
+
+
+# Глобальный экземпляр менеджера секций
+position_history_partitions = PositionHistoryPartitionManager()
@@ -0,0 +1,219 @@
+# backend/app/core/profile_cascade_scheduler.py
+"""
+Планировщик догуливания профилей после использования.
+
+Вместо отдельной задачи WARMUP_PROFILE на каждый парсинг/проверку запрос
+складывается в profile_warmup_queue (одна строка на профиль), повторные
+запросы схлопываются в ту же строку. Периодический flush забирает созревшие
+записи и превращает их в пакетные задачи прогрева.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+import structlog
+from sqlalchemy import select, func, delete, case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Task, ProfileWarmupQueue
+
+logger = structlog.get_logger(__name__)
+
+
+class ProfileCascadeScheduler:
+    """Дедупликация и пакетирование задач догуливания профилей"""
+
+    def __init__(self):
+        self.debounce = timedelta(seconds=settings.cascade_debounce_seconds)
+        self.max_delay = timedelta(seconds=settings.cascade_max_delay_seconds)
+        self.batch_size = settings.cascade_batch_size
+        self.max_attempts = settings.cascade_max_attempts
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        profile_id: str,
+        device_type: str,
+        reason: str = "cascade",
+        attempts: int = 0,
+    ) -> bool:
+        """Ставит профиль в очередь догуливания (коммит остается за вызывающим)"""
+        if attempts >= self.max_attempts:
+            logger.warning(
+                "Profile warmup attempts exhausted, dropping from cascade",
+                profile_id=profile_id,
+                attempts=attempts,
+            )
+            return False
+
+        now = datetime.utcnow()
+        queue = ProfileWarmupQueue.__table__
+
+        stmt = insert(queue).values(
+            id=uuid.uuid4(),
+            profile_id=profile_id,
+            device_type=device_type,
+            reason=reason,
+            request_count=1,
+            attempts=attempts,
+            first_requested_at=now,
+            last_requested_at=now,
+            not_before=now + self.debounce,
+            created_at=now,
+            updated_at=now,
+        )
+
+        # Повторный запрос сдвигает окно debounce, но не дальше max_delay
+        # от первого запроса - горячий профиль не должен ждать вечно
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[queue.c.profile_id],
+            set_={
+                "request_count": queue.c.request_count + 1,
+                "attempts": func.greatest(queue.c.attempts, stmt.excluded.attempts),
+                "reason": stmt.excluded.reason,
+                "last_requested_at": now,
+                "not_before": func.least(
+                    now + self.debounce,
+                    queue.c.first_requested_at + self.max_delay,
+                ),
+                "updated_at": now,
+            },
+        )
+
+        await session.execute(stmt)
+        return True
+
+    async def flush(self, session: AsyncSession, max_batches: int = 10) -> int:
+        """Превращает созревшие записи очереди в пакетные задачи прогрева"""
+        now = datetime.utcnow()
+
+        due = (
+            select(ProfileWarmupQueue.id)
+            .where(ProfileWarmupQueue.not_before <= now)
+            .order_by(ProfileWarmupQueue.not_before)
+            .limit(self.batch_size * max_batches)
+            .with_for_update(skip_locked=True)
+        )
+
+        result = await session.execute(
+            delete(ProfileWarmupQueue)
+            .where(ProfileWarmupQueue.id.in_(due.scalar_subquery()))
+            .returning(
+                ProfileWarmupQueue.profile_id,
+                ProfileWarmupQueue.device_type,
+                ProfileWarmupQueue.attempts,
+            )
+        )
+        rows = result.all()
+
+        if not rows:
+            return 0
+
+        by_device: Dict[str, List[Any]] = {}
+        for row in rows:
+            by_device.setdefault(row.device_type, []).append(row)
+
+        # Импорт здесь, чтобы избежать циклического импорта с task_manager
+        from app.core.task_manager import TaskType, TaskStatus
+
+        tasks_created = 0
+        for device_type, device_rows in by_device.items():
+            for i in range(0, len(device_rows), self.batch_size):
+                chunk = device_rows[i : i + self.batch_size]
+                session.add(
+                    Task(
+                        task_type=TaskType.WARMUP_PROFILE.value,
+                        status=TaskStatus.PENDING.value,
+                        priority=1,  # Низкий приоритет
+                        device_type=device_type,
+                        parameters={
+                            "profile_ids": [str(row.profile_id) for row in chunk],
+                            "attempts": {
+                                str(row.profile_id): row.attempts or 0
+                                for row in chunk
+                            },
+                            "device_type": device_type,
+                            "cascade_mode": True,
+                        },
+                    )
+                )
+                tasks_created += 1
+
+        await session.commit()
+
+        logger.info(
+            "Cascade warmup batches scheduled",
+            profiles_count=len(rows),
+            tasks_created=tasks_created,
+        )
+        return tasks_created
+
+    async def get_queue_depth(self, session: AsyncSession) -> Dict[str, Any]:
+        """Возвращает глубину очереди догуливания и ожидающих задач прогрева"""
+        now = datetime.utcnow()
+
+        queue_result = await session.execute(
+            select(
+                ProfileWarmupQueue.device_type,
+                func.count(ProfileWarmupQueue.id),
+                func.count(ProfileWarmupQueue.id).filter(
+                    ProfileWarmupQueue.not_before <= now
+                ),
+                func.coalesce(func.sum(ProfileWarmupQueue.request_count), 0),
+                func.min(ProfileWarmupQueue.first_requested_at),
+            ).group_by(ProfileWarmupQueue.device_type)
+        )
+
+        by_device = {}
+        total = due = merged = 0
+        oldest: Optional[datetime] = None
+        for device_type, count, due_count, requests, first_at in queue_result.all():
+            by_device[device_type] = {"queued": count, "due": due_count}
+            total += count
+            due += due_count
+            merged += int(requests) - count
+            if first_at and (oldest is None or first_at < oldest):
+                oldest = first_at
+
+        from app.core.task_manager import TaskType, TaskStatus
+
+        tasks_result = await session.execute(
+            select(
+                func.count(Task.id),
+                func.coalesce(
+                    func.sum(
+                        case(
+                            (
+                                Task.parameters["profile_ids"].isnot(None),
+                                func.json_array_length(Task.parameters["profile_ids"]),
+                            ),
+                            else_=1,
+                        )
+                    ),
+                    0,
+                ),
+            ).where(
+                Task.task_type == TaskType.WARMUP_PROFILE.value,
+                Task.status == TaskStatus.PENDING.value,
+            )
+        )
+        pending_tasks, pending_profiles = tasks_result.one()
+
+        return {
+            "queued_profiles": total,
+            "due_profiles": due,
+            "merged_requests": merged,
+            "oldest_request_age_seconds": (
+                int((now - oldest).total_seconds()) if oldest else 0
+            ),
+            "by_device_type": by_device,
+            "pending_warmup_tasks": pending_tasks,
+            "pending_warmup_profiles": int(pending_profiles),
+        }
+
+
+# Глобальный экземпляр планировщика
+profile_cascade_scheduler = ProfileCascadeScheduler()
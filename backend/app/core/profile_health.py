@@ -0,0 +1,219 @@
+# backend/app/core/profile_health.py
+"""
+Онлайн-оценка здоровья профилей.
+
+Для каждого профиля поддерживаются экспоненциально затухающие доли успехов
+и капч и средняя задержка: вес старых событий падает вдвое каждые
+profile_health_half_life_seconds. События копятся в памяти и пишутся в БД
+пачками, после записи пересчитывается health_score, а профили с оценкой
+ниже порога переводятся в статус retired.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import async_session_maker
+
+logger = structlog.get_logger(__name__)
+
+# Вес априорной оценки для профилей с малым числом событий
+PRIOR_WEIGHT = 2.0
+PRIOR_SCORE = 0.8
+
+# Максимальный штраф за задержку (доля оценки)
+LATENCY_PENALTY = 0.3
+
+
+@dataclass
+class ProfileObservation:
+    """Накопленные с последней записи события профиля"""
+
+    events: int = 0
+    successes: int = 0
+    captchas: int = 0
+    latency_sum_ms: float = 0.0
+    latency_count: int = 0
+    last_event_at: Optional[datetime] = None
+
+
+UPDATE_DECAYED_METRICS = text(
+    """
+    UPDATE profiles AS p
+    SET health_weight = s.old_weight + :events,
+        decayed_success = (p.decayed_success * s.old_weight + :successes)
+            / (s.old_weight + :events),
+        decayed_captcha = (p.decayed_captcha * s.old_weight + :captchas)
+            / (s.old_weight + :events),
+        decayed_latency_ms = CASE
+            WHEN :latency_count > 0 THEN
+                (p.decayed_latency_ms * s.old_weight + :latency_sum_ms)
+                / (s.old_weight + :latency_count)
+            ELSE p.decayed_latency_ms
+        END,
+        total_usage_count = COALESCE(p.total_usage_count, 0) + :events,
+        last_used = GREATEST(p.last_used, CAST(:last_event_at AS timestamp)),
+        health_updated_at = CAST(:now AS timestamp)
+    FROM (
+        SELECT id,
+               health_weight * power(
+                   0.5,
+                   GREATEST(
+                       EXTRACT(EPOCH FROM (
+                           CAST(:now AS timestamp)
+                           - COALESCE(health_updated_at, CAST(:now AS timestamp))
+                       )),
+                       0
+                   ) / :half_life
+               ) AS old_weight
+        FROM profiles
+        WHERE id = CAST(:profile_id AS uuid)
+    ) AS s
+    WHERE p.id = s.id
+    """
+)
+
+UPDATE_HEALTH_SCORE = text(
+    f"""
+    UPDATE profiles
+    SET success_rate = decayed_success,
+        health_score = (
+            decayed_success
+            * (1 - decayed_captcha)
+            * (1 - {LATENCY_PENALTY} * LEAST(decayed_latency_ms / :latency_ref_ms, 1))
+            * health_weight
+            + {PRIOR_SCORE} * {PRIOR_WEIGHT}
+        ) / (health_weight + {PRIOR_WEIGHT})
+    WHERE id = ANY(CAST(:profile_ids AS uuid[]))
+    """
+)
+
+RETIRE_UNHEALTHY = text(
+    """
+    UPDATE profiles
+    SET status = 'retired'
+    WHERE id = ANY(CAST(:profile_ids AS uuid[]))
+      AND status = 'ready'
+      AND health_weight >= :min_weight
+      AND health_score < :threshold
+    RETURNING id, health_score
+    """
+)
+
+
+class ProfileHealthScorer:
+    """Буферизованный учет использования профилей и расчет их здоровья"""
+
+    def __init__(self):
+        self._buffer: Dict[str, ProfileObservation] = {}
+        self._flush_lock = asyncio.Lock()
+
+    def record(
+        self,
+        profile_id: str,
+        success: bool,
+        captcha: bool = False,
+        latency_ms: Optional[float] = None,
+    ):
+        """Учитывает одно использование профиля (запись в БД - при flush)"""
+        observation = self._buffer.setdefault(str(profile_id), ProfileObservation())
+        observation.events += 1
+        observation.successes += int(success)
+        observation.captchas += int(captcha)
+        if latency_ms is not None:
+            observation.latency_sum_ms += latency_ms
+            observation.latency_count += 1
+        observation.last_event_at = datetime.utcnow()
+
+        if len(self._buffer) >= settings.profile_health_flush_batch:
+            asyncio.create_task(self.flush())
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._buffer)
+
+    async def flush(self) -> List[str]:
+        """Записывает накопленные события пачкой. Возвращает списанные профили"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return []
+
+            buffer, self._buffer = self._buffer, {}
+            now = datetime.utcnow()
+            profile_ids = list(buffer.keys())
+
+            params = [
+                {
+                    "profile_id": profile_id,
+                    "events": obs.events,
+                    "successes": obs.successes,
+                    "captchas": obs.captchas,
+                    "latency_sum_ms": obs.latency_sum_ms,
+                    "latency_count": obs.latency_count,
+                    "last_event_at": obs.last_event_at,
+                    "now": now,
+                    "half_life": settings.profile_health_half_life_seconds,
+                }
+                for profile_id, obs in buffer.items()
+            ]
+
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(UPDATE_DECAYED_METRICS, params)
+                    await session.execute(
+                        UPDATE_HEALTH_SCORE,
+                        {
+                            "profile_ids": profile_ids,
+                            "latency_ref_ms": settings.profile_health_latency_ref_ms,
+                        },
+                    )
+                    retired_result = await session.execute(
+                        RETIRE_UNHEALTHY,
+                        {
+                            "profile_ids": profile_ids,
+                            "min_weight": settings.profile_health_min_weight,
+                            "threshold": settings.profile_health_retire_threshold,
+                        },
+                    )
+                    retired = retired_result.all()
+                    await session.commit()
+
+            except Exception as e:
+                # Возвращаем события в буфер, чтобы не потерять статистику
+                for profile_id, obs in buffer.items():
+                    self._merge(profile_id, obs)
+                logger.error(
+                    "Failed to flush profile health", profiles=len(buffer), error=str(e)
+                )
+                return []
+
+            for profile_id, score in retired:
+                logger.warning(
+                    "Profile retired due to low health score",
+                    profile_id=str(profile_id),
+                    health_score=round(score, 3),
+                )
+
+            logger.debug("Profile health flushed", profiles=len(buffer))
+            return [str(profile_id) for profile_id, _ in retired]
+
+    def _merge(self, profile_id: str, obs: ProfileObservation):
+        current = self._buffer.setdefault(profile_id, ProfileObservation())
+        current.events += obs.events
+        current.successes += obs.successes
+        current.captchas += obs.captchas
+        current.latency_sum_ms += obs.latency_sum_ms
+        current.latency_count += obs.latency_count
+        if current.last_event_at is None or (
+            obs.last_event_at and obs.last_event_at > current.last_event_at
+        ):
+            current.last_event_at = obs.last_event_at
+
+
+# Глобальный экземпляр оценщика здоровья профилей
+profile_health_scorer = ProfileHealthScorer()
@@ -0,0 +1,394 @@
+# backend/app/core/profile_snapshot_store.py
+"""
+Хранилище снапшотов user-data-dir профилей Chromium.
+
+Снапшот состоит из JSON манифеста (относительный путь -> хеш содержимого)
+и content-addressed хранилища сжатых блобов. Одинаковые файлы (общие файлы
+Chromium, словари, кэш компонентов) хранятся один раз на все профили,
+поэтому повторный снапшот профиля дописывает только изменившиеся файлы.
+
+Восстановление выполняется в tmpfs (settings.profile_runtime_dir), так что
+профиль получает обратно localStorage, IndexedDB, кэш и service workers.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Set
+
+import structlog
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Файлы и каталоги, которые не имеет смысла переносить между запусками
+EXCLUDED_NAMES = {
+    "SingletonLock",
+    "SingletonSocket",
+    "SingletonCookie",
+    "RunningChromeVersion",
+    "Crashpad",
+    "BrowserMetrics",
+    "ShaderCache",
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "DawnCache",
+}
+
+# Блобы моложе этого возраста не удаляются GC, чтобы не гоняться
+# с параллельным снапшотом, который еще не успел записать манифест
+BLOB_GC_GRACE_SECONDS = 3600
+
+RESTORE_WORKERS = 8
+
+
+@dataclass
+class ProfileSnapshot:
+    """Информация о сохраненном снапшоте профиля"""
+
+    profile_id: str
+    snapshot_id: str
+    created_at: datetime
+    files_count: int
+    total_size: int
+    new_blobs: int
+    new_bytes: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "snapshot_id": self.snapshot_id,
+            "created_at": self.created_at.isoformat(),
+            "files_count": self.files_count,
+            "total_size": self.total_size,
+            "new_blobs": self.new_blobs,
+            "new_bytes": self.new_bytes,
+        }
+
+
+class ProfileSnapshotStore:
+    """Снапшоты и восстановление полных каталогов профилей Chromium"""
+
+    def __init__(
+        self,
+        snapshots_dir: Optional[str] = None,
+        runtime_dir: Optional[str] = None,
+    ):
+        self.root = Path(snapshots_dir or settings.profile_snapshots_dir)
+        self.runtime_root = Path(runtime_dir or settings.profile_runtime_dir)
+        self.blobs_dir = self.root / "blobs"
+        self.manifests_dir = self.root / "manifests"
+        self.keep = settings.profile_snapshots_keep
+        self.max_age_days = settings.profile_snapshot_max_age_days
+        self.compress_level = settings.profile_snapshot_compress_level
+
+    # ===================== ПУБЛИЧНЫЕ МЕТОДЫ =====================
+
+    async def restore(self, profile_id: str) -> Path:
+        """Восстанавливает последний снапшот профиля в tmpfs и возвращает путь"""
+        return await asyncio.to_thread(self._restore_sync, profile_id)
+
+    async def snapshot(
+        self, profile_id: str, source_dir: Path
+    ) -> Optional[ProfileSnapshot]:
+        """Сохраняет каталог профиля как новый снапшот"""
+        try:
+            return await asyncio.to_thread(
+                self._snapshot_sync, profile_id, Path(source_dir)
+            )
+        except Exception as e:
+            logger.error(
+                "Failed to snapshot profile directory",
+                profile_id=profile_id,
+                error=str(e),
+            )
+            return None
+
+    async def release(self, profile_dir: Optional[Path]):
+        """Удаляет рабочий каталог профиля из tmpfs"""
+        if not profile_dir:
+            return
+        await asyncio.to_thread(shutil.rmtree, str(profile_dir), True)
+
+    async def delete_profile(self, profile_id: str):
+        """Удаляет все снапшоты профиля (блобы освобождаются при следующем GC)"""
+        await asyncio.to_thread(
+            shutil.rmtree, str(self.manifests_dir / profile_id), True
+        )
+
+    async def collect_garbage(self) -> Dict[str, int]:
+        """Удаляет старые снапшоты и блобы, на которые не ссылается ни один манифест"""
+        return await asyncio.to_thread(self._collect_garbage_sync)
+
+    def list_profiles(self) -> List[str]:
+        """ID профилей, у которых есть снапшоты на этом узле"""
+        if not self.manifests_dir.exists():
+            return []
+        return [p.name for p in self.manifests_dir.iterdir() if p.is_dir()]
+
+    def list_snapshots(self, profile_id: str) -> List[str]:
+        """Возвращает ID снапшотов профиля от старых к новым"""
+        profile_dir = self.manifests_dir / profile_id
+        if not profile_dir.exists():
+            return []
+        return sorted(p.stem for p in profile_dir.glob("*.json"))
+
+    # ===================== СНАПШОТ =====================
+
+    def _snapshot_sync(self, profile_id: str, source_dir: Path) -> ProfileSnapshot:
+        started = time.monotonic()
+        files: List[List[Any]] = []
+        dirs: List[str] = []
+        total_size = 0
+        new_blobs = 0
+        new_bytes = 0
+
+        for dirpath, dirnames, filenames in os.walk(source_dir):
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDED_NAMES]
+            rel_dir = os.path.relpath(dirpath, source_dir)
+            if rel_dir != ".":
+                dirs.append(rel_dir)
+
+            for filename in filenames:
+                if filename in EXCLUDED_NAMES:
+                    continue
+
+                path = os.path.join(dirpath, filename)
+                if os.path.islink(path):
+                    continue
+
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    mode = os.stat(path).st_mode & 0o777
+                except OSError:
+                    # Chromium мог удалить временный файл во время обхода
+                    continue
+
+                digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+                if self._write_blob(digest, data):
+                    new_blobs += 1
+                    new_bytes += len(data)
+
+                total_size += len(data)
+                files.append([os.path.relpath(path, source_dir), digest, mode])
+
+        created_at = datetime.utcnow()
+        snapshot_id = created_at.strftime("%Y%m%d%H%M%S%f")
+        manifest = {
+            "profile_id": profile_id,
+            "snapshot_id": snapshot_id,
+            "created_at": created_at.isoformat(),
+            "dirs": dirs,
+            "files": files,
+        }
+
+        profile_manifests = self.manifests_dir / profile_id
+        profile_manifests.mkdir(parents=True, exist_ok=True)
+        self._atomic_write(
+            profile_manifests / f"{snapshot_id}.json",
+            json.dumps(manifest, separators=(",", ":")).encode("utf-8"),
+        )
+
+        # Лишние снапшоты профиля удаляем сразу, блобы подберет GC
+        for old_id in self.list_snapshots(profile_id)[: -self.keep]:
+            (profile_manifests / f"{old_id}.json").unlink(missing_ok=True)
+
+        snapshot = ProfileSnapshot(
+            profile_id=profile_id,
+            snapshot_id=snapshot_id,
+            created_at=created_at,
+            files_count=len(files),
+            total_size=total_size,
+            new_blobs=new_blobs,
+            new_bytes=new_bytes,
+        )
+
+        logger.info(
+            "Profile snapshot saved",
+            duration_ms=int((time.monotonic() - started) * 1000),
+            **snapshot.to_dict(),
+        )
+        return snapshot
+
+    def _write_blob(self, digest: str, data: bytes) -> bool:
+        """Записывает блоб если его еще нет. Возвращает True для нового блоба"""
+        blob_path = self._blob_path(digest)
+        try:
+            # Переиспользованный блоб "молодеет": GC не удалит его, пока
+            # манифест этого снапшота еще не записан
+            os.utime(blob_path)
+            return False
+        except FileNotFoundError:
+            pass
+
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        self._atomic_write(blob_path, zlib.compress(data, self.compress_level))
+        return True
+
+    # ===================== ВОССТАНОВЛЕНИЕ =====================
+
+    def _restore_sync(self, profile_id: str) -> Path:
+        started = time.monotonic()
+        target = self.runtime_root / profile_id
+
+        if target.exists():
+            shutil.rmtree(target, ignore_errors=True)
+        target.mkdir(parents=True, exist_ok=True)
+
+        manifest = self._load_latest_manifest(profile_id)
+        if not manifest:
+            logger.info("No snapshot for profile, starting clean", profile_id=profile_id)
+            return target
+
+        for rel_dir in manifest["dirs"]:
+            (target / rel_dir).mkdir(parents=True, exist_ok=True)
+
+        def restore_file(entry: List[Any]):
+            rel_path, digest, mode = entry
+            with open(self._blob_path(digest), "rb") as f:
+                data = zlib.decompress(f.read())
+            file_path = target / rel_path
+            with open(file_path, "wb") as f:
+                f.write(data)
+            os.chmod(file_path, mode)
+
+        # zlib и файловый I/O отпускают GIL, поэтому потоки дают реальный выигрыш
+        with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as executor:
+            list(executor.map(restore_file, manifest["files"]))
+
+        logger.info(
+            "Profile snapshot restored",
+            profile_id=profile_id,
+            snapshot_id=manifest["snapshot_id"],
+            files_count=len(manifest["files"]),
+            duration_ms=int((time.monotonic() - started) * 1000),
+        )
+        return target
+
+    def _load_latest_manifest(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        # Идем от новых к старым: битый манифест не должен лишать профиль состояния
+        for snapshot_id in reversed(self.list_snapshots(profile_id)):
+            path = self.manifests_dir / profile_id / f"{snapshot_id}.json"
+            try:
+                manifest = json.loads(path.read_bytes())
+            except (OSError, ValueError) as e:
+                logger.warning(
+                    "Broken profile snapshot manifest",
+                    profile_id=profile_id,
+                    snapshot_id=snapshot_id,
+                    error=str(e),
+                )
+                continue
+
+            if all(self._blob_path(entry[1]).exists() for entry in manifest["files"]):
+                return manifest
+
+            logger.warning(
+                "Profile snapshot references missing blobs",
+                profile_id=profile_id,
+                snapshot_id=snapshot_id,
+            )
+
+        return None
+
+    # ===================== GC =====================
+
+    def _collect_garbage_sync(self) -> Dict[str, int]:
+        started = time.monotonic()
+        expire_before = (
+            datetime.utcnow().timestamp() - self.max_age_days * 86400
+        )
+        referenced: Set[str] = set()
+        removed_manifests = 0
+        removed_blobs = 0
+        freed_bytes = 0
+
+        if self.manifests_dir.exists():
+            for profile_dir in self.manifests_dir.iterdir():
+                snapshot_ids = sorted(p.stem for p in profile_dir.glob("*.json"))
+                keep_ids = set(snapshot_ids[-self.keep:])
+                # Последний снапшот не удаляется по возрасту - иначе
+                # простаивающий профиль потеряет все состояние
+                latest_id = snapshot_ids[-1] if snapshot_ids else None
+
+                for snapshot_id in snapshot_ids:
+                    path = profile_dir / f"{snapshot_id}.json"
+                    if snapshot_id not in keep_ids or (
+                        snapshot_id != latest_id
+                        and path.stat().st_mtime < expire_before
+                    ):
+                        path.unlink(missing_ok=True)
+                        removed_manifests += 1
+                        continue
+
+                    try:
+                        manifest = json.loads(path.read_bytes())
+                    except (OSError, ValueError):
+                        continue
+                    referenced.update(entry[1] for entry in manifest["files"])
+
+                if not any(profile_dir.iterdir()):
+                    profile_dir.rmdir()
+
+        if self.blobs_dir.exists():
+            grace_before = time.time() - BLOB_GC_GRACE_SECONDS
+            for blob_path in self.blobs_dir.glob("*/*"):
+                if blob_path.name in referenced:
+                    continue
+                stat = blob_path.stat()
+                if stat.st_mtime > grace_before:
+                    continue
+                blob_path.unlink(missing_ok=True)
+                removed_blobs += 1
+                freed_bytes += stat.st_size
+
+        stats = {
+            "removed_manifests": removed_manifests,
+            "removed_blobs": removed_blobs,
+            "freed_bytes": freed_bytes,
+            "live_blobs": len(referenced),
+        }
+
+        logger.info(
+            "Profile snapshot GC completed",
+            duration_ms=int((time.monotonic() - started) * 1000),
+            **stats,
+        )
+        return stats
+
+    # ===================== ВСПОМОГАТЕЛЬНЫЕ =====================
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes):
+        # Уникальное имя: один блоб могут писать несколько потоков процесса
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{path.name}.", suffix=".tmp", dir=path.parent
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+
+# Глобальный экземпляр хранилища снапшотов
+profile_snapshot_store = ProfileSnapshotStore()
@@ -18,6 +18,7 @@ from ..models.proxy import (
     ProxyProtocol,
     ProxyStatus,
 )
+from .pipeline_metrics import proxy_requests_total
 
 logger = structlog.get_logger(__name__)
 
@@ -286,8 +287,11 @@ class ProxyService:
             proxies = result.scalars().all()
 
             if not proxies:
+                proxy_requests_total.labels(source="project", result="empty").inc()
                 return None
 
+            proxy_requests_total.labels(source="project", result="selected").inc()
+
             # Выбираем случайную прокси с учетом статистики
             # Приоритет прокси с лучшим success_rate
             weighted_proxies = []
@@ -299,6 +303,7 @@ class ProxyService:
 
         except Exception as e:
             logger.error("Failed to get random proxy", error=str(e))
+            proxy_requests_total.labels(source="project", result="error").inc()
             return None
 
     async def assign_warmup_proxy(
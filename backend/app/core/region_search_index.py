@@ -0,0 +1,342 @@
+# backend/app/core/region_search_index.py
+"""
+In-memory индекс регионов Яндекса для автодополнения.
+
+Справочник регионов небольшой и почти не меняется, поэтому он целиком
+держится в памяти процесса: префиксное дерево по нормализованным полям и
+индекс n-грамм для поиска вхождений. Каждое поле индексируется также в
+латинской транслитерации, так что "moskva" находит "Москва".
+
+Ранжирование повторяет YandexRegion.search_with_region_type_priority:
+12 уровней приоритета (точное совпадение -> начало строки -> вхождение),
+затем города перед регионами, затем название. Индекс загружается при старте
+приложения и перечитывается, когда меняется отпечаток таблицы
+(число строк и max(updated_at)), то есть после импорта регионов.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import select, func
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import YandexRegion
+from .response_cache import response_cache
+
+logger = structlog.get_logger(__name__)
+
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+
+NGRAM_SIZES = (2, 3)
+
+# Приоритет, который дает совпадение в начале поля - все, что хуже,
+# может прийти только из поиска по вхождению
+BEST_CONTAINS_PRIORITY = 10
+
+TYPE_ORDER = {"city": 1, "region": 2}
+
+
+def normalize(value: Optional[str]) -> str:
+    """Нижний регистр, ё -> е, схлопнутые пробелы"""
+    if not value:
+        return ""
+    return " ".join(value.lower().replace("ё", "е").split())
+
+
+def transliterate(value: str) -> str:
+    """Кириллица -> латиница (для уже нормализованной строки)"""
+    return "".join(TRANSLIT.get(char, char) for char in value)
+
+
+def field_forms(value: Optional[str]) -> Tuple[str, ...]:
+    """Формы поля для сравнения: исходная и транслитерированная"""
+    normalized = normalize(value)
+    if not normalized:
+        return ()
+    latin = transliterate(normalized)
+    return (normalized,) if latin == normalized else (normalized, latin)
+
+
+@dataclass(frozen=True)
+class RegionEntry:
+    """Регион в индексе (атрибуты совпадают с YandexRegion)"""
+
+    id: str
+    region_code: str
+    region_name: str
+    display_name: Optional[str]
+    search_name: Optional[str]
+    country_code: str
+    region_type: Optional[str]
+
+    # Нормализованные формы полей
+    code_forms: Tuple[str, ...]
+    name_forms: Tuple[str, ...]
+    display_forms: Tuple[str, ...]
+    search_forms: Tuple[str, ...]
+
+    @classmethod
+    def from_model(cls, region: YandexRegion) -> "RegionEntry":
+        return cls(
+            id=str(region.id),
+            region_code=region.region_code,
+            region_name=region.region_name,
+            display_name=region.display_name,
+            search_name=region.search_name,
+            country_code=region.country_code,
+            region_type=region.region_type,
+            code_forms=field_forms(region.region_code),
+            name_forms=field_forms(region.region_name),
+            display_forms=field_forms(region.display_name),
+            search_forms=field_forms(region.search_name),
+        )
+
+    def all_forms(self) -> Tuple[str, ...]:
+        return self.code_forms + self.name_forms + self.display_forms + self.search_forms
+
+    def priority(self, query: str) -> Optional[int]:
+        """Приоритет совпадения (как в SQL CASE) или None, если не совпадает"""
+        code = _match(self.code_forms, query)
+        name = _match(self.name_forms, query)
+        display = _match(self.display_forms, query)
+        search = _match(self.search_forms, query)
+
+        if not (code or name or display or search):
+            return None
+
+        is_city = self.region_type == "city"
+        is_region = self.region_type == "region"
+
+        if code == 3:
+            return 1
+        if name == 3 and is_city:
+            return 2
+        if name == 3 and is_region:
+            return 3
+        if display == 3:
+            return 4
+        if code >= 2:
+            return 5
+        if name >= 2 and is_city:
+            return 6
+        if name >= 2 and is_region:
+            return 7
+        if display >= 2:
+            return 8
+        if search >= 2:
+            return 9
+        if name and is_city:
+            return 10
+        if name and is_region:
+            return 11
+        return 12
+
+    def sort_key(self, priority: int):
+        return (priority, TYPE_ORDER.get(self.region_type, 3), normalize(self.region_name))
+
+
+def _match(forms: Tuple[str, ...], query: str) -> int:
+    """3 - точное совпадение, 2 - начало строки, 1 - вхождение, 0 - нет"""
+    best = 0
+    for form in forms:
+        if form == query:
+            return 3
+        if form.startswith(query):
+            best = 2
+        elif best < 1 and query in form:
+            best = 1
+    return best
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ids: Set[int] = set()
+
+
+class RegionSearchIndex:
+    """Префиксное дерево + n-граммы по активным регионам"""
+
+    def __init__(self):
+        self.entries: List[RegionEntry] = []
+        self.by_name: List[RegionEntry] = []
+        self._trie = _TrieNode()
+        self._ngrams: Dict[str, Set[int]] = {}
+        self._fingerprint: Optional[Tuple[int, Optional[datetime]]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[datetime] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    # ===================== ПОИСК =====================
+
+    def search(self, query: str, limit: int = 10) -> List[RegionEntry]:
+        """Поиск с приоритетами search_with_region_type_priority"""
+        q = normalize(query)
+        if not q:
+            return []
+
+        prefix_ids = self._prefix_ids(q)
+        ranked = self._rank(prefix_ids, q)
+
+        # Совпадения только по вхождению имеют приоритет >= 10, поэтому если
+        # лучших совпадений по началу строки хватает на страницу - готово
+        strong = sum(1 for priority, _ in ranked if priority < BEST_CONTAINS_PRIORITY)
+        if strong < limit:
+            ranked = self._rank(prefix_ids | self._contains_ids(q), q)
+
+        ranked.sort(key=lambda item: item[1].sort_key(item[0]))
+        return [entry for _, entry in ranked[:limit]]
+
+    def list_regions(self, limit: int = 100) -> List[RegionEntry]:
+        """Регионы по названию (как ORDER BY region_name)"""
+        return self.by_name[:limit]
+
+    def _rank(self, ids: Set[int], q: str) -> List[Tuple[int, RegionEntry]]:
+        ranked = []
+        for entry_id in ids:
+            entry = self.entries[entry_id]
+            priority = entry.priority(q)
+            if priority is not None:
+                ranked.append((priority, entry))
+        return ranked
+
+    def _prefix_ids(self, q: str) -> Set[int]:
+        node = self._trie
+        for char in q:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def _contains_ids(self, q: str) -> Set[int]:
+        if len(q) < min(NGRAM_SIZES):
+            # Односимвольный запрос - проверяем все
+            return set(range(len(self.entries)))
+
+        size = max(n for n in NGRAM_SIZES if n <= len(q))
+        postings = [
+            self._ngrams.get(q[i : i + size], set()) for i in range(len(q) - size + 1)
+        ]
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+    # ===================== ЗАГРУЗКА =====================
+
+    async def load(self):
+        """Загружает активные регионы и перестраивает индекс"""
+        started = time.monotonic()
+        async with async_session_maker() as session:
+            fingerprint = await self._read_fingerprint(session)
+            result = await session.execute(
+                select(YandexRegion).where(YandexRegion.is_active == True)
+            )
+            regions = result.scalars().all()
+
+        self._build([RegionEntry.from_model(region) for region in regions])
+        self._fingerprint = fingerprint
+        self.loaded_at = datetime.utcnow()
+
+        logger.info(
+            "Region search index loaded",
+            regions=len(self.entries),
+            ngrams=len(self._ngrams),
+            duration_ms=int((time.monotonic() - started) * 1000),
+        )
+
+    async def refresh_if_changed(self) -> bool:
+        """Перечитывает индекс, если таблица регионов изменилась"""
+        async with async_session_maker() as session:
+            fingerprint = await self._read_fingerprint(session)
+
+        if fingerprint == self._fingerprint:
+            return False
+
+        await self.load()
+        # Кэшированный список регионов устарел вместе с индексом
+        await response_cache.invalidate("domain_regions")
+        return True
+
+    def _build(self, entries: List[RegionEntry]):
+        # Индекс собирается целиком и подменяется одним присваиванием,
+        # поэтому параллельные поиски видят либо старую, либо новую версию
+        trie = _TrieNode()
+        ngrams: Dict[str, Set[int]] = {}
+
+        for entry_id, entry in enumerate(entries):
+            for form in set(entry.all_forms()):
+                node = trie
+                node.ids.add(entry_id)
+                for char in form:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.ids.add(entry_id)
+
+                for size in NGRAM_SIZES:
+                    for i in range(len(form) - size + 1):
+                        ngrams.setdefault(form[i : i + size], set()).add(entry_id)
+
+        by_name = sorted(entries, key=lambda entry: normalize(entry.region_name))
+
+        self.entries, self.by_name, self._trie, self._ngrams = (
+            entries,
+            by_name,
+            trie,
+            ngrams,
+        )
+
+    @staticmethod
+    async def _read_fingerprint(session) -> Tuple[int, Optional[datetime]]:
+        result = await session.execute(
+            select(func.count(YandexRegion.id), func.max(YandexRegion.updated_at))
+        )
+        count, last_updated = result.one()
+        return count, last_updated
+
+    # ===================== ФОНОВОЕ ОБНОВЛЕНИЕ =====================
+
+    def start(self):
+        """Запускает фоновую проверку изменений справочника"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                if self.is_loaded:
+                    await self.refresh_if_changed()
+                else:
+                    await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Failed to refresh region search index", error=str(e))
+            await asyncio.sleep(settings.region_index_refresh_interval)
+
+
+# Глобальный экземпляр индекса регионов
+region_search_index = RegionSearchIndex()
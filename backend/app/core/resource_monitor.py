@@ -1,92 +1,192 @@
-import psutil
 import asyncio
-from datetime import datetime
-from typing import Dict, Any
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, delete, func, insert, text
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.models import PerformanceMetrics, ServerConfig
 from app.database import async_session_maker
+from .resource_sampler import resource_sampler, ResourceSample
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# Метрики, агрегируемые в БД: имя -> поле сэмпла
+AGGREGATED_METRICS = {
+    "cpu_percent": "cpu_percent",
+    "ram_percent": "ram_percent",
+    "disk_percent": "disk_percent",
+    "chromium_rss_mb": "chromium_rss_mb",
+    "chromium_cpu_percent": "chromium_cpu_percent",
+    "chromium_processes": "chromium_processes",
+}
+
+# Часовые агрегаты из минутных: среднее, крайние значения, число сэмплов
+HOURLY_ROLLUP_SQL = """
+INSERT INTO performance_metrics (
+    id, server_id, metric_type, resolution, value, measurement_time, details,
+    created_at, updated_at
+)
+SELECT
+    gen_random_uuid(), server_id, metric_type, '1h',
+    round(sum(value * coalesce((details->>'samples')::int, 1))
+          / sum(coalesce((details->>'samples')::int, 1)), 2),
+    date_trunc('hour', measurement_time),
+    json_build_object(
+        'min', min(coalesce((details->>'min')::numeric, value)),
+        'max', max(coalesce((details->>'max')::numeric, value)),
+        'samples', sum(coalesce((details->>'samples')::int, 1))
+    ),
+    now(), now()
+FROM performance_metrics
+WHERE server_id = :server_id
+  AND resolution = '1m'
+  AND measurement_time >= :hour_from
+  AND measurement_time < :hour_to
+GROUP BY server_id, metric_type, date_trunc('hour', measurement_time)
+"""
+
 
 class ResourceMonitor:
-    """Мониторинг ресурсов сервера для автомасштабирования"""
+    """Мониторинг ресурсов сервера для автомасштабирования.
+
+    Замеры делает resource_sampler (в потоке, кольцевой буфер в памяти);
+    монитор раз в минуту сворачивает завершенные минуты в 1m агрегаты,
+    по завершении часа строит 1h агрегаты и удаляет устаревшие строки
+    по срокам хранения.
+    """
 
     def __init__(self, server_id: str):
         self.server_id = server_id
         self.running = False
+        self._rolled_up_until: Optional[datetime] = None
+        self._retention_checked_at = 0.0
 
     async def start_monitoring(self):
         """Запуск мониторинга ресурсов"""
         self.running = True
+        resource_sampler.start()
 
         while self.running:
             try:
-                await self._collect_metrics()
-                await asyncio.sleep(60)  # Собираем метрики каждую минуту
+                await asyncio.sleep(settings.resource_flush_interval)
+                await self._flush()
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error("Error in resource monitoring", error=str(e))
-                await asyncio.sleep(5)
 
     async def stop_monitoring(self):
         """Остановка мониторинга"""
         self.running = False
+        await resource_sampler.stop()
+
+    async def _flush(self):
+        """Минутные агрегаты, часовая свертка и сроки хранения"""
+        # Сворачиваются только завершенные минуты
+        minute_start = time.time() // 60 * 60
+        current_minute = datetime.utcfromtimestamp(minute_start)
+        samples = resource_sampler.drain_pending(before=minute_start)
 
-    async def _collect_metrics(self):
-        """Сбор метрик производительности"""
         async with async_session_maker() as session:
             try:
-                # CPU метрики
-                cpu_percent = psutil.cpu_percent(interval=1)
-                cpu_count = psutil.cpu_count()
-
-                # RAM метрики
-                memory = psutil.virtual_memory()
-                ram_percent = memory.percent
-                ram_available_gb = memory.available / (1024 ** 3)
-
-                # Disk метрики
-                disk = psutil.disk_usage('/')
-                disk_percent = disk.percent
-
-                # Network метрики (базовые)
-                network = psutil.net_io_counters()
-
-                # Сохраняем метрики
-                metrics_data = [
-                    PerformanceMetrics(
-                        server_id=self.server_id,
-                        metric_type="cpu_percent",
-                        value=cpu_percent,
-                        details={"cpu_count": cpu_count}
-                    ),
-                    PerformanceMetrics(
-                        server_id=self.server_id,
-                        metric_type="ram_percent",
-                        value=ram_percent,
-                        details={"available_gb": ram_available_gb}
-                    ),
-                    PerformanceMetrics(
-                        server_id=self.server_id,
-                        metric_type="disk_percent",
-                        value=disk_percent,
-                        details={"free_gb": disk.free / (1024 ** 3)}
-                    )
-                ]
-
-                for metric in metrics_data:
-                    session.add(metric)
+                rows = self._minute_aggregates(samples)
+                if rows:
+                    await session.execute(insert(PerformanceMetrics), rows)
 
+                await self._rollup_hours(session, current_minute)
+                await self._apply_retention(session)
                 await session.commit()
 
-                # Проверяем нужно ли масштабирование
-                await self._check_scaling_needs(session, cpu_percent, ram_percent)
+                latest = resource_sampler.latest()
+                if latest is not None:
+                    await self._check_scaling_needs(
+                        session, latest.cpu_percent, latest.ram_percent
+                    )
 
             except Exception as e:
-                logger.error("Failed to collect metrics", error=str(e))
+                await session.rollback()
+                logger.error("Failed to flush resource metrics", error=str(e))
+
+    def _minute_aggregates(self, samples: List[ResourceSample]) -> List[Dict[str, Any]]:
+        """Сэмплы -> строки PerformanceMetrics по минутам"""
+        minutes: Dict[datetime, List[ResourceSample]] = {}
+        for sample in samples:
+            minute = datetime.utcfromtimestamp(sample.timestamp).replace(
+                second=0, microsecond=0
+            )
+            minutes.setdefault(minute, []).append(sample)
+
+        rows = []
+        for minute, bucket in minutes.items():
+            for metric_type, attr in AGGREGATED_METRICS.items():
+                values = [getattr(sample, attr) for sample in bucket]
+                rows.append(
+                    {
+                        "server_id": self.server_id,
+                        "metric_type": metric_type,
+                        "resolution": "1m",
+                        "value": round(sum(values) / len(values), 2),
+                        "measurement_time": minute,
+                        "details": {
+                            "min": min(values),
+                            "max": max(values),
+                            "samples": len(values),
+                        },
+                    }
+                )
+        return rows
+
+    async def _rollup_hours(self, session: AsyncSession, now: datetime):
+        """1h агрегаты за завершенные часы, еще не свернутые"""
+        current_hour = now.replace(minute=0)
+
+        if self._rolled_up_until is None:
+            last_hour = await session.scalar(
+                select(func.max(PerformanceMetrics.measurement_time)).where(
+                    PerformanceMetrics.server_id == self.server_id,
+                    PerformanceMetrics.resolution == "1h",
+                )
+            )
+            self._rolled_up_until = (
+                last_hour + timedelta(hours=1)
+                if last_hour
+                else current_hour - timedelta(hours=1)
+            )
+
+        if self._rolled_up_until >= current_hour:
+            return
+
+        await session.execute(
+            text(HOURLY_ROLLUP_SQL),
+            {
+                "server_id": self.server_id,
+                "hour_from": self._rolled_up_until,
+                "hour_to": current_hour,
+            },
+        )
+        self._rolled_up_until = current_hour
+
+    async def _apply_retention(self, session: AsyncSession):
+        """Удаляет агрегаты старше сроков хранения (не чаще раза в час)"""
+        if time.monotonic() - self._retention_checked_at < 3600:
+            return
+        self._retention_checked_at = time.monotonic()
+
+        now = datetime.utcnow()
+        for resolution, days in (
+            ("1m", settings.resource_retention_minute_days),
+            ("1h", settings.resource_retention_hour_days),
+        ):
+            await session.execute(
+                delete(PerformanceMetrics).where(
+                    PerformanceMetrics.server_id == self.server_id,
+                    PerformanceMetrics.resolution == resolution,
+                    PerformanceMetrics.measurement_time < now - timedelta(days=days),
+                )
+            )
 
     async def _check_scaling_needs(self, session: AsyncSession,
                                    cpu_percent: float, ram_percent: float):
@@ -119,12 +219,18 @@ class ResourceMonitor:
             logger.error("Failed to check scaling needs", error=str(e))
 
     async def get_current_load(self) -> Dict[str, Any]:
-        """Получает текущую загрузку системы"""
+        """Получает текущую загрузку системы (последний сэмпл из памяти)"""
+        sample = resource_sampler.latest()
+        if sample is None:
+            sample = await resource_sampler.sample()
+
         return {
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "ram_percent": psutil.virtual_memory().percent,
-            "disk_percent": psutil.disk_usage('/').percent,
-            "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
+            "cpu_percent": sample.cpu_percent,
+            "ram_percent": sample.ram_percent,
+            "disk_percent": sample.disk_percent,
+            "load_average": sample.load_average,
+            "chromium_rss_mb": sample.chromium_rss_mb,
+            "chromium_processes": sample.chromium_processes,
         }
 
     async def can_handle_more_tasks(self) -> bool:
@@ -148,4 +254,4 @@ class ResourceMonitor:
 
             except Exception as e:
                 logger.error("Failed to check task capacity", error=str(e))
-                return False
\ No newline at end of file
+                return False
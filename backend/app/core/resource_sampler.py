@@ -0,0 +1,199 @@
+# backend/app/core/resource_sampler.py
+"""
+Сэмплер ресурсов сервера с кольцевым буфером в памяти.
+
+Замер выполняется в потоке (asyncio.to_thread), event loop не блокируется:
+psutil.cpu_percent вызывается без interval и возвращает загрузку с прошлого
+замера. Каждый сэмпл содержит CPU/RAM/диск/load average и сводку по
+процессам Chromium (RSS и CPU каждого процесса), хранится в кольцевом
+буфере высокого разрешения (resource_ring_size сэмплов). Сэмплы копятся и
+в очереди на агрегацию, которую ResourceMonitor раз в минуту сворачивает
+в 1m агрегаты для БД.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+import structlog
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+CHROMIUM_NAMES = ("chrome", "chromium", "headless_shell")
+
+# Предел очереди на агрегацию, если свертка долго не вызывается
+PENDING_LIMIT_FACTOR = 2
+
+
+@dataclass
+class ChromiumProcess:
+    pid: int
+    kind: str  # browser, renderer, gpu-process, utility, ...
+    rss_mb: float
+    cpu_percent: float
+
+
+@dataclass
+class ResourceSample:
+    timestamp: float
+    cpu_percent: float
+    ram_percent: float
+    ram_available_gb: float
+    disk_percent: float
+    load_average: Optional[List[float]]
+    chromium_processes: int
+    chromium_browsers: int
+    chromium_rss_mb: float
+    chromium_cpu_percent: float
+    chromium: List[ChromiumProcess] = field(default_factory=list)
+
+    def to_dict(self, with_processes: bool = False) -> Dict[str, Any]:
+        data = asdict(self)
+        if not with_processes:
+            data.pop("chromium")
+        return data
+
+
+class ResourceSampler:
+    """Фоновый замер ресурсов с историей в памяти"""
+
+    def __init__(self):
+        self.interval = settings.resource_sample_interval
+        self._ring: Deque[ResourceSample] = deque(maxlen=settings.resource_ring_size)
+        self._pending: Deque[ResourceSample] = deque(
+            maxlen=settings.resource_ring_size * PENDING_LIMIT_FACTOR
+        )
+        # Процессы Chromium между замерами: cpu_percent считается по дельте
+        self._processes: Dict[int, psutil.Process] = {}
+        self._process_kinds: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Первый вызов cpu_percent(None) всегда 0.0 - инициализируем базу
+        psutil.cpu_percent(interval=None)
+
+    # ===================== ЗАПУСК =====================
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Resource sampling failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    async def sample(self) -> ResourceSample:
+        """Снимает сэмпл в потоке и кладет в буфер"""
+        sample = await asyncio.to_thread(self._collect)
+        self._ring.append(sample)
+        self._pending.append(sample)
+        return sample
+
+    # ===================== ЗАМЕР (в потоке) =====================
+
+    def _collect(self) -> ResourceSample:
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage("/")
+        chromium = self._collect_chromium()
+
+        return ResourceSample(
+            timestamp=time.time(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            ram_percent=memory.percent,
+            ram_available_gb=round(memory.available / (1024**3), 2),
+            disk_percent=disk.percent,
+            load_average=(
+                [round(value, 2) for value in psutil.getloadavg()]
+                if hasattr(psutil, "getloadavg")
+                else None
+            ),
+            chromium_processes=len(chromium),
+            chromium_browsers=sum(1 for p in chromium if p.kind == "browser"),
+            chromium_rss_mb=round(sum(p.rss_mb for p in chromium), 1),
+            chromium_cpu_percent=round(sum(p.cpu_percent for p in chromium), 1),
+            chromium=chromium,
+        )
+
+    def _collect_chromium(self) -> List[ChromiumProcess]:
+        alive = set()
+        processes = []
+
+        for process in psutil.process_iter(["name"]):
+            name = (process.info.get("name") or "").lower()
+            if not any(marker in name for marker in CHROMIUM_NAMES):
+                continue
+
+            pid = process.pid
+            alive.add(pid)
+            tracked = self._processes.get(pid)
+            if tracked is None:
+                # Новый процесс: cpu_percent появится со следующего замера
+                tracked = self._processes[pid] = process
+                self._process_kinds[pid] = self._process_kind(process)
+
+            try:
+                with tracked.oneshot():
+                    processes.append(
+                        ChromiumProcess(
+                            pid=pid,
+                            kind=self._process_kinds[pid],
+                            rss_mb=round(tracked.memory_info().rss / (1024**2), 1),
+                            cpu_percent=tracked.cpu_percent(interval=None),
+                        )
+                    )
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                alive.discard(pid)
+
+        for pid in set(self._processes) - alive:
+            self._processes.pop(pid, None)
+            self._process_kinds.pop(pid, None)
+
+        return processes
+
+    @staticmethod
+    def _process_kind(process: psutil.Process) -> str:
+        try:
+            for arg in process.cmdline():
+                if arg.startswith("--type="):
+                    return arg.split("=", 1)[1]
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+        return "browser"
+
+    # ===================== ЧТЕНИЕ =====================
+
+    def latest(self) -> Optional[ResourceSample]:
+        return self._ring[-1] if self._ring else None
+
+    def recent(self, seconds: Optional[float] = None) -> List[ResourceSample]:
+        """Сэмплы за последние seconds секунд (все, если не задано)"""
+        if seconds is None:
+            return list(self._ring)
+        since = time.time() - seconds
+        return [sample for sample in self._ring if sample.timestamp >= since]
+
+    def drain_pending(self, before: float) -> List[ResourceSample]:
+        """Забирает накопленные сэмплы старше before для агрегации"""
+        drained = []
+        while self._pending and self._pending[0].timestamp < before:
+            drained.append(self._pending.popleft())
+        return drained
+
+
+# Глобальный сэмплер ресурсов процесса
+resource_sampler = ResourceSampler()
@@ -0,0 +1,415 @@
+# backend/app/core/response_cache.py
+"""
+Кэш ответов тяжелых read-эндпоинтов с настройками из таблицы cache_settings.
+
+Каждый кэш - именованная политика (CacheSettings.cache_key): тип, TTL и
+флаг включения. Значения по умолчанию заданы в CACHE_POLICIES, строки
+cache_settings их переопределяют, поэтому админ меняет свежесть данных
+или отключает кэш без деплоя (PUT /admin/cache/settings/{name}).
+Процессы перечитывают таблицу раз в response_cache_settings_refresh секунд,
+а изменение через API рассылается сразу.
+
+Уровни хранения:
+  - локальный LRU с TTL в памяти процесса;
+  - Redis (общий для процессов API) с тем же TTL.
+
+Single-flight: одновременные промахи по одному ключу в процессе ждут
+одну загрузку вместо того, чтобы каждый идти в БД (защита от stampede
+при истечении TTL популярного ключа).
+
+Использование:
+    value = await response_cache.get_or_load(
+        "profiles_stats_summary", "global", lambda: compute(session)
+    )
+Загрузчик должен возвращать JSON-сериализуемое значение.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import structlog
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import CacheSettings
+from .billing_cache import TTLCache, MISSING
+from .pipeline_metrics import response_cache_requests_total
+
+logger = structlog.get_logger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+REDIS_KEY = "cache:{name}:{key}"
+
+# Пауза перед повторным подключением к недоступному Redis
+REDIS_RETRY_SECONDS = 30
+
+# Политики по умолчанию: имя -> (тип, TTL в секундах)
+CACHE_POLICIES: Dict[str, Tuple[str, int]] = {
+    "nurture_queue_stats": ("stats", 15),
+    "nurture_all_status": ("stats", 30),
+    "profiles_stats_summary": ("stats", 60),
+    "domain_regions": ("config", 600),
+}
+
+
+class CachePolicy:
+    __slots__ = ("name", "cache_type", "ttl_seconds", "is_enabled", "source")
+
+    def __init__(
+        self,
+        name: str,
+        cache_type: str,
+        ttl_seconds: int,
+        is_enabled: bool,
+        source: str,
+    ):
+        self.name = name
+        self.cache_type = cache_type
+        self.ttl_seconds = ttl_seconds
+        self.is_enabled = is_enabled
+        self.source = source  # default, db
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cache_key": self.name,
+            "cache_type": self.cache_type,
+            "ttl_seconds": self.ttl_seconds,
+            "is_enabled": self.is_enabled,
+            "source": self.source,
+        }
+
+
+class CacheCounters:
+    __slots__ = ("local_hits", "redis_hits", "misses", "coalesced", "bypassed", "load_seconds")
+
+    def __init__(self):
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.load_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        hits = self.local_hits + self.redis_hits + self.coalesced
+        total = hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "hit_ratio": round(hits / total, 4) if total else None,
+            "avg_load_ms": (
+                round(self.load_seconds / self.misses * 1000, 1) if self.misses else None
+            ),
+        }
+
+
+class ResponseCache:
+    """Двухуровневый кэш ответов с политиками из cache_settings"""
+
+    def __init__(self):
+        # TTL задается на каждую запись по политике
+        self._local = TTLCache(maxsize=settings.response_cache_max_entries, ttl=0)
+        self._policies: Dict[str, CachePolicy] = self._default_policies()
+        self._policies_loaded_at = 0.0
+        self._policies_lock = asyncio.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counters: Dict[str, CacheCounters] = {}
+        self._redis = None
+        self._redis_retry_at = 0.0
+        self._listener_task: Optional[asyncio.Task] = None
+
+    # ===================== ЧТЕНИЕ =====================
+
+    async def get_or_load(
+        self,
+        name: str,
+        key: Any,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Значение из кэша или результат loader() (с записью в кэш)"""
+        policy = await self.get_policy(name)
+        counters = self._counters_for(name)
+
+        if not policy.is_enabled or policy.ttl_seconds <= 0:
+            counters.bypassed += 1
+            response_cache_requests_total.labels(name, "bypass").inc()
+            return await loader()
+
+        cache_key = f"{name}:{key}"
+
+        cached = self._local.get(cache_key)
+        if cached is not MISSING:
+            counters.local_hits += 1
+            response_cache_requests_total.labels(name, "local_hit").inc()
+            return cached
+
+        flight = self._inflight.get(cache_key)
+        if flight is not None:
+            try:
+                value = await asyncio.shield(flight)
+                counters.coalesced += 1
+                response_cache_requests_total.labels(name, "coalesced").inc()
+                return value
+            except asyncio.CancelledError:
+                # Отменили загружающий запрос, а не нас - грузим сами
+                if not flight.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            value = await self._load(name, key, cache_key, policy, counters, loader)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Ожидающих может не быть - помечаем исключение полученным
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+
+        future.set_result(value)
+        return value
+
+    async def _load(
+        self,
+        name: str,
+        key: Any,
+        cache_key: str,
+        policy: CachePolicy,
+        counters: CacheCounters,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        redis_key = REDIS_KEY.format(name=name, key=key)
+        value = await self._redis_get(redis_key)
+        if value is not MISSING:
+            counters.redis_hits += 1
+            response_cache_requests_total.labels(name, "redis_hit").inc()
+        else:
+            counters.misses += 1
+            response_cache_requests_total.labels(name, "miss").inc()
+            started = time.perf_counter()
+            value = await loader()
+            counters.load_seconds += time.perf_counter() - started
+            await self._redis_set(redis_key, value, policy.ttl_seconds)
+
+        self._local.set(cache_key, value, ttl=policy.ttl_seconds)
+        return value
+
+    def _counters_for(self, name: str) -> CacheCounters:
+        counters = self._counters.get(name)
+        if counters is None:
+            counters = self._counters[name] = CacheCounters()
+        return counters
+
+    # ===================== ПОЛИТИКИ =====================
+
+    @staticmethod
+    def _default_policies() -> Dict[str, CachePolicy]:
+        return {
+            name: CachePolicy(name, cache_type, ttl, True, "default")
+            for name, (cache_type, ttl) in CACHE_POLICIES.items()
+        }
+
+    async def get_policy(self, name: str) -> CachePolicy:
+        if time.monotonic() - self._policies_loaded_at >= settings.response_cache_settings_refresh:
+            await self.reload_policies()
+
+        policy = self._policies.get(name)
+        if policy is None:
+            # Неизвестное имя без строки в cache_settings не кэшируется
+            policy = CachePolicy(name, "stats", 0, False, "default")
+        return policy
+
+    async def reload_policies(self, force: bool = False):
+        """Перечитывает cache_settings поверх политик по умолчанию"""
+        async with self._policies_lock:
+            if (
+                not force
+                and time.monotonic() - self._policies_loaded_at
+                < settings.response_cache_settings_refresh
+            ):
+                return
+
+            policies = self._default_policies()
+            try:
+                async with async_session_maker() as session:
+                    result = await session.execute(select(CacheSettings))
+                    for row in result.scalars().all():
+                        policies[row.cache_key] = CachePolicy(
+                            row.cache_key,
+                            row.cache_type,
+                            row.ttl_seconds,
+                            bool(row.is_enabled),
+                            "db",
+                        )
+            except Exception as e:
+                # Остаемся на прежних политиках до следующей попытки
+                logger.warning("Failed to load cache settings", error=str(e))
+                self._policies_loaded_at = time.monotonic()
+                return
+
+            self._policies = policies
+            self._policies_loaded_at = time.monotonic()
+
+    def list_policies(self) -> Dict[str, Dict[str, Any]]:
+        return {name: policy.to_dict() for name, policy in sorted(self._policies.items())}
+
+    # ===================== ИНВАЛИДАЦИЯ =====================
+
+    async def invalidate(self, name: str, key: Any = None):
+        """Сброс ключа кэша или всех ключей политики (key=None)"""
+        self._drop_local(name, None if key is None else str(key))
+        redis_key = REDIS_KEY.format(name=name, key="*" if key is None else key)
+        await self._publish({"kind": "data", "name": name, "key": key}, redis_key)
+
+    async def settings_changed(self, name: str):
+        """Политика изменена: перечитать настройки и сбросить ее данные"""
+        await self.reload_policies(force=True)
+        self._drop_local(name, None)
+        await self._publish(
+            {"kind": "settings", "name": name},
+            REDIS_KEY.format(name=name, key="*"),
+        )
+
+    def _drop_local(self, name: str, key: Optional[str]):
+        if key is not None:
+            self._local.delete(f"{name}:{key}")
+            return
+        self._local.delete_prefix(f"{name}:")
+
+    async def _publish(self, message: Dict[str, Any], redis_key: str):
+        client = await self._get_redis()
+        if client is None:
+            return
+
+        try:
+            if "*" in redis_key:
+                async for found in client.scan_iter(match=redis_key):
+                    await client.delete(found)
+            else:
+                await client.delete(redis_key)
+            await client.publish(INVALIDATION_CHANNEL, json.dumps(message, default=str))
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def _apply_invalidation(self, message: Dict[str, Any]):
+        name = message.get("name")
+        if not name:
+            return
+        if message.get("kind") == "settings":
+            await self.reload_policies(force=True)
+            self._drop_local(name, None)
+        else:
+            key = message.get("key")
+            self._drop_local(name, None if key is None else str(key))
+
+    # ===================== REDIS =====================
+
+    async def _get_redis(self):
+        if not settings.response_cache_redis_enabled:
+            return None
+        if self._redis is None and time.monotonic() >= self._redis_retry_at:
+            try:
+                import redis.asyncio as aioredis
+
+                self._redis = aioredis.from_url(
+                    settings.effective_redis_url, decode_responses=True
+                )
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis
+
+    def _redis_failed(self, error: Exception):
+        logger.warning("Response cache Redis unavailable", error=str(error))
+        self._redis = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    async def _redis_get(self, key: str) -> Any:
+        client = await self._get_redis()
+        if client is None:
+            return MISSING
+
+        try:
+            raw = await client.get(key)
+        except Exception as e:
+            self._redis_failed(e)
+            return MISSING
+
+        return MISSING if raw is None else json.loads(raw)
+
+    async def _redis_set(self, key: str, value: Any, ttl: int):
+        client = await self._get_redis()
+        if client is None:
+            return
+
+        try:
+            await client.set(key, json.dumps(value, default=str), ex=ttl)
+        except Exception as e:
+            self._redis_failed(e)
+
+    # ===================== ПОДПИСКА НА ИНВАЛИДАЦИЮ =====================
+
+    def start(self):
+        """Запускает прослушивание канала инвалидации"""
+        if self._listener_task is None and settings.response_cache_redis_enabled:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+
+    async def _listen(self):
+        while True:
+            client = await self._get_redis()
+            if client is None:
+                await asyncio.sleep(REDIS_RETRY_SECONDS)
+                continue
+
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        await self._apply_invalidation(json.loads(message["data"]))
+                    except (TypeError, ValueError):
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # За время разрыва могли пропустить сообщения - сбрасываем все
+                self._redis_failed(e)
+                self._local.clear()
+                self._policies_loaded_at = 0.0
+                await asyncio.sleep(REDIS_RETRY_SECONDS)
+
+    # ===================== МЕТРИКИ =====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "local": self._local.stats(),
+            "in_flight": len(self._inflight),
+            "caches": {
+                name: counters.to_dict()
+                for name, counters in sorted(self._counters.items())
+            },
+            "redis": {
+                "enabled": settings.response_cache_redis_enabled,
+                "connected": self._redis is not None,
+            },
+        }
+
+
+# Глобальный экземпляр кэша ответов
+response_cache = ResponseCache()
@@ -7,6 +7,7 @@ from playwright.async_api import async_playwright, Page
 import structlog
 
 from app.core.browser_manager import BrowserManager
+from app.core.display_pool import display_pool
 from app.models import Profile, Task
 from app.models.profile import DeviceType
 
@@ -372,7 +373,8 @@ class StrategyExecutor:
         if profile.browser_settings:
             browser_config.update(profile.browser_settings)
 
-        browser = await playwright.chromium.launch(**browser_config)
+        # headless=False: дисплей из пула Xvfb передается через env запуска
+        browser = await display_pool.launch(playwright, **browser_config)
 
         # Создаем контекст с cookies
         context_config = {
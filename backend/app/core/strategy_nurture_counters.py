@@ -0,0 +1,180 @@
+# backend/app/core/strategy_nurture_counters.py
+"""
+Счетчики задач нагула по стратегиям.
+
+Раньше число нагуленных профилей считалось COUNT(*) по
+tasks.parameters ->> 'strategy_id' (JSON без индекса) для каждой стратегии
+на каждом проходе планировщика. Теперь у задачи нагула заполняется
+Task.strategy_id, а каждый переход статуса задачи нагула сдвигает
+счетчики strategy_nurture_counters в той же транзакции:
+
+    pending -> running -> completed (nurtured) / failed
+
+Переходы, у которых прежний статус неизвестен вызывающему коду
+(mark_task_completed по id и т.п.), берут строку задачи FOR UPDATE через
+lock_task() - так два воркера не сдвинут счетчик дважды. Перенос задач в
+tasks_archive счетчики не меняет: nurtured/failed накопительные.
+
+rebuild() пересчитывает счетчики по tasks и tasks_archive - для
+миграции и ручного восстановления после правки задач в обход TaskManager.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+import structlog
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import StrategyNurtureCounter, Task, TaskArchive, UserStrategy
+
+logger = structlog.get_logger(__name__)
+
+NURTURE_TASK_TYPE = "profile_nurture"
+
+# Статус задачи -> колонка счетчика
+STATUS_COLUMNS = {
+    "pending": "pending",
+    "running": "running",
+    "completed": "nurtured",
+    "failed": "failed",
+}
+COUNTER_COLUMNS = ("pending", "running", "nurtured", "failed")
+
+
+def empty_counters() -> Dict[str, int]:
+    return {column: 0 for column in COUNTER_COLUMNS}
+
+
+class StrategyNurtureCounters:
+    """Транзакционное обновление и чтение счетчиков стратегий нагула"""
+
+    # ===================== ПЕРЕХОДЫ =====================
+
+    async def apply(
+        self,
+        session: AsyncSession,
+        strategy_id,
+        old_status: Optional[str],
+        new_status: Optional[str],
+        count: int = 1,
+    ):
+        """Сдвигает счетчики стратегии; commit остается за вызывающим"""
+        if strategy_id is None or old_status == new_status:
+            return
+
+        deltas = empty_counters()
+        if old_status in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[old_status]] -= count
+        if new_status in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[new_status]] += count
+        deltas = {column: delta for column, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        table = StrategyNurtureCounter.__table__
+        statement = insert(StrategyNurtureCounter).values(
+            strategy_id=strategy_id,
+            **{column: max(delta, 0) for column, delta in deltas.items()},
+        )
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["strategy_id"],
+                set_={
+                    **{
+                        column: func.greatest(table.c[column] + delta, 0)
+                        for column, delta in deltas.items()
+                    },
+                    "updated_at": func.now(),
+                },
+            )
+        )
+
+    async def apply_task(self, session: AsyncSession, task: Task, old_status: Optional[str]):
+        """Переход загруженной задачи из old_status в ее текущий статус"""
+        if task.task_type == NURTURE_TASK_TYPE:
+            await self.apply(session, task.strategy_id, old_status, task.status)
+
+    async def lock_task(self, session: AsyncSession, task_id):
+        """Прежний статус задачи под блокировкой строки (до ее UPDATE)"""
+        result = await session.execute(
+            select(Task.status, Task.strategy_id, Task.task_type)
+            .where(Task.id == task_id)
+            .with_for_update()
+        )
+        return result.one_or_none()
+
+    async def apply_locked(self, session: AsyncSession, previous, new_status: str):
+        """Переход задачи, прежнее состояние которой получено lock_task()"""
+        if previous is not None and previous.task_type == NURTURE_TASK_TYPE:
+            await self.apply(session, previous.strategy_id, previous.status, new_status)
+
+    # ===================== ЧТЕНИЕ =====================
+
+    async def get(self, session: AsyncSession, strategy_id) -> Dict[str, int]:
+        result = await session.execute(
+            select(StrategyNurtureCounter).where(
+                StrategyNurtureCounter.strategy_id == strategy_id
+            )
+        )
+        row = result.scalar_one_or_none()
+        if row is None:
+            return empty_counters()
+        return {column: getattr(row, column) for column in COUNTER_COLUMNS}
+
+    # ===================== ПЕРЕСЧЕТ =====================
+
+    async def rebuild(
+        self, session: AsyncSession, strategy_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """Пересчитывает счетчики по tasks и tasks_archive"""
+        live = select(Task.strategy_id, Task.status, func.count()).where(
+            Task.task_type == NURTURE_TASK_TYPE, Task.strategy_id.isnot(None)
+        )
+        archived = select(
+            TaskArchive.strategy_id, TaskArchive.status, func.count()
+        ).where(
+            TaskArchive.task_type == NURTURE_TASK_TYPE,
+            # В архиве нет внешнего ключа - стратегия могла быть удалена
+            TaskArchive.strategy_id.in_(select(UserStrategy.id)),
+        )
+        if strategy_ids is not None:
+            strategy_ids = list(strategy_ids)
+            live = live.where(Task.strategy_id.in_(strategy_ids))
+            archived = archived.where(TaskArchive.strategy_id.in_(strategy_ids))
+
+        counters: Dict[Any, Dict[str, int]] = {}
+        for query in (
+            live.group_by(Task.strategy_id, Task.status),
+            archived.group_by(TaskArchive.strategy_id, TaskArchive.status),
+        ):
+            for strategy_id, status, count in (await session.execute(query)).all():
+                column = STATUS_COLUMNS.get(status)
+                if column:
+                    counters.setdefault(strategy_id, empty_counters())[column] += count
+
+        # Стратегии без задач тоже обнуляются
+        existing = select(StrategyNurtureCounter.strategy_id)
+        if strategy_ids is not None:
+            existing = existing.where(StrategyNurtureCounter.strategy_id.in_(strategy_ids))
+        for strategy_id in (await session.execute(existing)).scalars().all():
+            counters.setdefault(strategy_id, empty_counters())
+
+        for strategy_id, values in counters.items():
+            statement = insert(StrategyNurtureCounter).values(
+                strategy_id=strategy_id, **values
+            )
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["strategy_id"],
+                    set_={**values, "updated_at": func.now()},
+                )
+            )
+        await session.commit()
+
+        logger.info("Strategy nurture counters rebuilt", strategies=len(counters))
+        return {"strategies": len(counters)}
+
+
+# Глобальный экземпляр счетчиков
+strategy_nurture_counters = StrategyNurtureCounters()
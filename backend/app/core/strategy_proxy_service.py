@@ -16,6 +16,7 @@ from ..models.strategy_proxy import (
 )
 from ..models.profile import Profile
 from ..core.proxy_service import ProxyParser
+from ..core.pipeline_metrics import proxy_requests_total
 from ..schemas.strategy_proxy import (
     StrategyProxyImportResponse,
     StrategyProxyStatsResponse,
@@ -189,6 +190,10 @@ class StrategyProxyService:
                 if fresh_data:
                     parsed_proxies = ProxyParser.parse_proxy_list(fresh_data)
                     all_proxies.extend(parsed_proxies)
+                else:
+                    proxy_requests_total.labels(
+                        source=source.source_type, result="error"
+                    ).inc()
 
             elif source.source_type in ["manual_list", "file_upload"]:
                 # Для статических источников получаем прокси из таблицы StrategyProxy
@@ -208,8 +213,11 @@ class StrategyProxyService:
                 )
 
         if not all_proxies:
+            proxy_requests_total.labels(source="strategy", result="empty").inc()
             return None
 
+        proxy_requests_total.labels(source="strategy", result="selected").inc()
+
         # Возвращаем случайную прокси
         return random.choice(all_proxies)
 
@@ -35,6 +35,7 @@ from app.constants.strategies import (
     StrategyType,
 )
 from app.services.profile_nurture_limits_service import ProfileNurtureLimitsService
+from app.core.strategy_nurture_counters import strategy_nurture_counters
 
 logger = structlog.get_logger()
 
@@ -639,11 +640,15 @@ class StrategyService:
             task_type="profile_nurture",
             parameters=execution_data,
             user_id=user_id,
+            strategy_id=strategy.id,
             priority=3,  # Низкий приоритет (фоновая задача)
             status="pending",
         )
 
         self.session.add(task)
+        await strategy_nurture_counters.apply(
+            self.session, strategy.id, None, "pending"
+        )
         await self.session.commit()
         await self.session.refresh(task)
 
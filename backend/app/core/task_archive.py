@@ -0,0 +1,410 @@
+# backend/app/core/task_archive.py
+"""
+Архивирование завершенных задач.
+
+Таблица tasks должна содержать только живую очередь и недавнюю историю:
+на ней работают выбор задачи (status='pending' ORDER BY priority,
+created_at), аренда и поиск последних maintenance/health-check задач.
+Архиватор периодически переносит completed/failed задачи старше
+task_archive_after_days в tasks_archive:
+  - задачи с неснятым резервом не трогаются, пока по ним не прошел расчет;
+  - parameters, result и trace сжимаются zlib в один payload;
+  - перенос идет пачками: INSERT в архив и DELETE из tasks в одной
+    транзакции, строки берутся FOR UPDATE SKIP LOCKED, так что несколько
+    воркеров могут архивировать одновременно;
+  - задачи не старше горизонта аналитики не трогаются: свертка
+    (analytics_rollup_service) пересчитывает дни целиком по tasks, и день,
+    который еще может быть пересчитан, должен видеть все свои задачи.
+    Горизонт - начало самого раннего дня, который затронет необработанная
+    свертка: дни водяных знаков и дни создания еще не свернутых или живых
+    задач;
+  - архив секционирован по месяцам created_at (tasks_archive_YYYY_MM),
+    секции старше task_archive_retention_months отсоединяются через
+    DETACH PARTITION CONCURRENTLY (без блокировки всей таблицы архива)
+    и удаляются целиком.
+
+find_task() ищет задачу сначала в tasks, затем в архиве и возвращает
+объект Task (для архивной - не привязанный к сессии), поэтому эндпоинты
+статуса и трассы работают одинаково для живых и архивных задач.
+"""
+
+import asyncio
+import json
+import re
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import structlog
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import engine
+from app.models import AnalyticsWatermark, Task, TaskArchive
+from .position_history_partitions import month_start
+
+logger = structlog.get_logger(__name__)
+
+PARENT_TABLE = "tasks_archive"
+PARTITION_NAME_RE = re.compile(r"^tasks_archive_(\d{4})_(\d{2})$")
+
+# Статусы, после которых задача уже не изменится
+ARCHIVE_STATUSES = ("completed", "failed")
+LIVE_STATUSES = ("pending", "running")
+
+# Источники свертки аналитики, читающие tasks за день
+ROLLUP_SOURCES = ("tasks", "position_history")
+
+# Колонки, переносимые в архив как есть
+PLAIN_COLUMNS = (
+    "id",
+    "created_at",
+    "task_type",
+    "device_type",
+    "status",
+    "priority",
+    "user_id",
+    "strategy_id",
+    "profile_id",
+    "worker_id",
+    "reserved_amount",
+    "error_message",
+    "started_at",
+    "completed_at",
+    "settled_at",
+)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def partition_ddl(month: date) -> str:
+    """DDL секции (индексы наследуются от родительской таблицы)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{month_start(month, 1).isoformat()}')"
+    )
+
+
+def decompress_payload(payload: Optional[bytes]) -> Dict[str, Any]:
+    if not payload:
+        return {}
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def _archive_rows(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Строки архива (выполняется в отдельном потоке - сжатие не блокирует loop)"""
+    rows = []
+    for task in tasks:
+        raw = json.dumps(
+            {
+                "parameters": task.pop("parameters"),
+                "result": task.pop("result"),
+                "trace": task.pop("trace"),
+            },
+            ensure_ascii=False,
+            default=str,
+        ).encode("utf-8")
+        task["payload"] = zlib.compress(raw, settings.task_archive_compress_level)
+        task["payload_size"] = len(raw)
+        rows.append(task)
+    return rows
+
+
+class TaskArchiver:
+    """Перенос завершенных задач в архив и чтение архивных задач"""
+
+    def _archivable(self, cutoff: datetime):
+        return and_(
+            Task.status.in_(ARCHIVE_STATUSES),
+            func.coalesce(Task.completed_at, Task.updated_at) < cutoff,
+            # Резерв должен быть списан или снят расчетом
+            or_(
+                Task.settled_at.isnot(None),
+                Task.reserved_amount.is_(None),
+                Task.reserved_amount <= 0,
+            ),
+        )
+
+    # ===================== ПЕРЕНОС =====================
+
+    async def run(self, session: AsyncSession) -> Dict[str, Any]:
+        """Один проход: до task_archive_max_batches пачек и retention секций"""
+        stats = {"archived": 0, "batches": 0, "raw_bytes": 0, "stored_bytes": 0}
+        if not settings.task_archive_enabled:
+            return stats
+
+        cutoff = await self.cutoff(session)
+        for _ in range(settings.task_archive_max_batches):
+            batch = await self.archive_batch(session, cutoff)
+            if not batch["archived"]:
+                break
+            for key in ("archived", "raw_bytes", "stored_bytes"):
+                stats[key] += batch[key]
+            stats["batches"] += 1
+            if batch["archived"] < settings.task_archive_batch_size:
+                break
+
+        stats["dropped_partitions"] = await self.drop_expired_partitions(session)
+
+        if stats["archived"] or stats["dropped_partitions"]:
+            logger.info("Task archive pass completed", **stats)
+        return stats
+
+    async def cutoff(self, session: AsyncSession) -> datetime:
+        """Граница переноса: срок хранения в tasks, но не позже горизонта свертки"""
+        cutoff = datetime.utcnow() - timedelta(days=settings.task_archive_after_days)
+        return min(cutoff, await self.rollup_horizon(session))
+
+    async def rollup_horizon(self, session: AsyncSession) -> datetime:
+        """Начало самого раннего дня, который свертка аналитики еще пересчитает"""
+        watermarks = dict(
+            (
+                await session.execute(
+                    select(
+                        AnalyticsWatermark.source, AnalyticsWatermark.last_timestamp
+                    ).where(AnalyticsWatermark.source.in_(ROLLUP_SOURCES))
+                )
+            ).all()
+        )
+        if any(watermarks.get(source) is None for source in ROLLUP_SOURCES):
+            # Свертка еще не шла - она прочитает tasks с самого начала
+            return datetime(1970, 1, 1)
+
+        tasks_watermark = watermarks["tasks"]
+        # Задачи, которые свертка еще увидит, пересчитают день своего создания
+        oldest_pending = await session.scalar(
+            select(func.min(Task.created_at)).where(
+                or_(
+                    Task.status.in_(LIVE_STATUSES),
+                    Task.updated_at > tasks_watermark,
+                )
+            )
+        )
+        horizon = min(
+            value
+            for value in (*watermarks.values(), oldest_pending)
+            if value is not None
+        )
+        return datetime.combine(horizon.date(), datetime.min.time())
+
+    async def archive_batch(
+        self, session: AsyncSession, cutoff: datetime
+    ) -> Dict[str, int]:
+        """Переносит одну пачку задач в архив"""
+        columns = [getattr(Task, name) for name in PLAIN_COLUMNS]
+        result = await session.execute(
+            select(*columns, Task.parameters, Task.result, Task.trace)
+            .where(self._archivable(cutoff))
+            .limit(settings.task_archive_batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        tasks = [dict(row._mapping) for row in result.all()]
+        if not tasks:
+            await session.rollback()
+            return {"archived": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+        rows = await asyncio.to_thread(_archive_rows, tasks)
+        archived_at = datetime.utcnow()
+        for row in rows:
+            row["archived_at"] = archived_at
+
+        await self.ensure_partitions(
+            session, {month_start(row["created_at"].date()) for row in rows}
+        )
+        await session.execute(
+            insert(TaskArchive)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["id", "created_at"])
+        )
+        await session.execute(
+            delete(Task)
+            .where(Task.id.in_([row["id"] for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+        return {
+            "archived": len(rows),
+            "raw_bytes": sum(row["payload_size"] for row in rows),
+            "stored_bytes": sum(len(row["payload"]) for row in rows),
+        }
+
+    # ===================== СЕКЦИИ =====================
+
+    async def list_partitions(self, session: AsyncSession) -> List[str]:
+        """Возвращает имена месячных секций архива"""
+        result = await session.execute(
+            text(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = :parent
+                ORDER BY child.relname
+                """
+            ),
+            {"parent": PARENT_TABLE},
+        )
+        return [name for name in result.scalars() if PARTITION_NAME_RE.match(name)]
+
+    async def ensure_partitions(self, session: AsyncSession, months) -> List[str]:
+        """Создает недостающие секции для месяцев пачки"""
+        # Несколько архиваторов могут создавать секции одновременно
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+            {"key": "tasks_archive_partitions"},
+        )
+
+        existing = set(await self.list_partitions(session))
+        created = []
+        for month in sorted(months):
+            name = partition_name(month)
+            if name not in existing:
+                await session.execute(text(partition_ddl(month)))
+                created.append(name)
+
+        if created:
+            logger.info("Task archive partitions created", created=created)
+        return created
+
+    async def drop_expired_partitions(self, session: AsyncSession) -> List[str]:
+        """Удаляет секции архива старше срока хранения"""
+        retention = settings.task_archive_retention_months
+        if retention <= 0:
+            return []
+
+        oldest_kept = month_start(datetime.utcnow().date(), -retention)
+        expired = []
+        for name in await self.list_partitions(session):
+            match = PARTITION_NAME_RE.match(name)
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if month < oldest_kept:
+                expired.append(name)
+        await session.commit()
+        if not expired:
+            return []
+
+        # DETACH ... CONCURRENTLY нельзя выполнять в транзакции: отдельное
+        # соединение в autocommit и сессионная advisory блокировка вместо
+        # транзакционной
+        dropped = []
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            locked = await connection.scalar(
+                text("SELECT pg_try_advisory_lock(hashtext(:key))"),
+                {"key": "tasks_archive_partitions"},
+            )
+            if not locked:
+                return []
+            try:
+                for name in expired:
+                    if await self._detach_partition(connection, name):
+                        await connection.execute(text(f"DROP TABLE {name}"))
+                        dropped.append(name)
+            finally:
+                await connection.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:key))"),
+                    {"key": "tasks_archive_partitions"},
+                )
+        return dropped
+
+    async def _detach_partition(self, connection, name: str) -> bool:
+        try:
+            await connection.execute(
+                text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} CONCURRENTLY")
+            )
+            return True
+        except DBAPIError as e:
+            error = e
+        # Прерванный DETACH CONCURRENTLY оставляет секцию в состоянии
+        # "detach pending" - его можно только завершить
+        try:
+            await connection.execute(
+                text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} FINALIZE")
+            )
+            return True
+        except DBAPIError:
+            logger.warning(
+                "Task archive partition detach failed", partition=name, error=str(error)
+            )
+            return False
+
+    # ===================== ЧТЕНИЕ =====================
+
+    async def find_task(self, session: AsyncSession, task_id) -> Optional[Task]:
+        """Задача из tasks или, если ее уже перенесли, из архива"""
+        result = await session.execute(select(Task).where(Task.id == task_id))
+        task = result.scalar_one_or_none()
+        if task is not None:
+            return task
+
+        result = await session.execute(
+            select(TaskArchive).where(TaskArchive.id == task_id).limit(1)
+        )
+        archived = result.scalar_one_or_none()
+        if archived is None:
+            return None
+        return self.restore(archived)
+
+    @staticmethod
+    def restore(archived: TaskArchive) -> Task:
+        """Task (не привязанный к сессии) из архивной строки"""
+        payload = decompress_payload(archived.payload)
+        task = Task(**{name: getattr(archived, name) for name in PLAIN_COLUMNS})
+        task.parameters = payload.get("parameters")
+        task.result = payload.get("result")
+        task.trace = payload.get("trace")
+        task.updated_at = archived.archived_at
+        return task
+
+    async def get_stats(self, session: AsyncSession) -> Dict[str, Any]:
+        """Объем архива и кандидаты на перенос"""
+        cutoff = await self.cutoff(session)
+
+        archive = (
+            await session.execute(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(TaskArchive.payload_size), 0),
+                    func.coalesce(func.sum(func.octet_length(TaskArchive.payload)), 0),
+                    func.min(TaskArchive.created_at),
+                )
+            )
+        ).one()
+        live = (
+            await session.execute(
+                select(Task.status, func.count()).group_by(Task.status)
+            )
+        ).all()
+        pending_archive = await session.scalar(
+            select(func.count()).select_from(Task).where(self._archivable(cutoff))
+        )
+
+        raw_bytes, stored_bytes = int(archive[1]), int(archive[2])
+        return {
+            "archived_tasks": archive[0],
+            "oldest_archived": archive[3].isoformat() if archive[3] else None,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": (
+                round(raw_bytes / stored_bytes, 2) if stored_bytes else None
+            ),
+            "live_tasks": {status: count for status, count in live},
+            "ready_to_archive": pending_archive or 0,
+            "archive_before": cutoff.isoformat(),
+            "partitions": await self.list_partitions(session),
+        }
+
+
+# Глобальный архиватор задач
+task_archiver = TaskArchiver()
@@ -0,0 +1,199 @@
+# backend/app/core/task_leases.py
+"""
+Аренда (lease) выполняющихся задач и возврат потерянных задач.
+
+Воркер, взявший задачу, ставит ей lease_expires_at и продлевает аренду
+всех своих задач раз в task_lease_renew_interval одним UPDATE. Если
+процесс убит (OOM Chromium, SIGKILL, падение машины), аренда перестает
+продлеваться, и задача остается в running только до прохода reaper'а.
+
+Задача считается потерянной, если ее аренда истекла и при этом:
+  - узел исполнителя мертв: нет строки worker_nodes, узел offline или
+    heartbeat старше node_heartbeat_stale_seconds;
+  - или аренда просрочена дольше task_lease_grace_seconds (живой процесс
+    потерял корутину задачи или завис).
+
+Потерянная задача возвращается в очередь (не больше task_lease_max_requeues
+раз, счетчик в parameters.lease_requeues) или помечается failed. Резерв
+средств упавшей задачи снимает billing_settlement_service (failed задачи
+списываются с нулевой стоимостью), у возвращенной в очередь резерв
+сохраняется до ее завершения. Мертвые узлы отмечаются offline, чтобы
+маршрутизация не считала их емкость свободной.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Set
+
+import structlog
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Task, WorkerNode
+from .pipeline_metrics import tasks_reaped_total
+from .strategy_nurture_counters import strategy_nurture_counters
+
+logger = structlog.get_logger(__name__)
+
+RUNNING = "running"
+LOST_TASK_ERROR = "Worker lost: task lease expired"
+
+
+def lease_deadline() -> datetime:
+    """Срок аренды для только что взятой или продленной задачи"""
+    return datetime.utcnow() + timedelta(seconds=settings.task_lease_seconds)
+
+
+class TaskLeaseManager:
+    """Продление аренды задач воркера и возврат потерянных задач"""
+
+    # ===================== ПРОДЛЕНИЕ =====================
+
+    async def renew(
+        self, session: AsyncSession, worker_id: str, task_ids: Iterable[str]
+    ) -> Set[str]:
+        """Продлевает аренду задач воркера; возвращает id задач, которые
+        воркеру больше не принадлежат (их забрал reaper)"""
+        task_ids = {str(task_id) for task_id in task_ids}
+        if not task_ids:
+            return set()
+
+        result = await session.execute(
+            update(Task)
+            .where(
+                Task.id.in_(task_ids),
+                Task.status == RUNNING,
+                Task.worker_id == worker_id,
+            )
+            .values(lease_expires_at=lease_deadline())
+            .returning(Task.id)
+            .execution_options(synchronize_session=False)
+        )
+        renewed = {str(task_id) for task_id in result.scalars().all()}
+        await session.commit()
+
+        lost = task_ids - renewed
+        if lost:
+            logger.warning(
+                "Task leases lost", worker_id=worker_id, task_ids=sorted(lost)
+            )
+        return lost
+
+    # ===================== REAPER =====================
+
+    async def reap(self, session: AsyncSession) -> Dict[str, Any]:
+        """Один проход: потерянные задачи в очередь или в failed"""
+        now = datetime.utcnow()
+        alive_since = now - timedelta(seconds=settings.node_heartbeat_stale_seconds)
+
+        node_alive = (
+            select(WorkerNode.id)
+            .where(
+                WorkerNode.node_id == Task.worker_id,
+                WorkerNode.status != "offline",
+                WorkerNode.last_heartbeat > alive_since,
+            )
+            .correlate(Task)
+            .exists()
+        )
+
+        result = await session.execute(
+            select(Task)
+            .where(
+                Task.status == RUNNING,
+                Task.lease_expires_at < now,
+                or_(
+                    ~node_alive,
+                    Task.lease_expires_at
+                    < now - timedelta(seconds=settings.task_lease_grace_seconds),
+                ),
+            )
+            .order_by(Task.lease_expires_at)
+            .limit(settings.task_reaper_batch)
+            .with_for_update(skip_locked=True)
+        )
+        tasks = result.scalars().all()
+
+        stats = {"requeued": 0, "failed": 0, "nodes_offline": 0}
+        for task in tasks:
+            action = self._release(task, now)
+            await strategy_nurture_counters.apply_task(session, task, RUNNING)
+            stats[action] += 1
+            tasks_reaped_total.labels(task_type=task.task_type, action=action).inc()
+            logger.warning(
+                "Orphaned task reaped",
+                task_id=str(task.id),
+                task_type=task.task_type,
+                worker_id=task.worker_id,
+                action=action,
+            )
+
+        stats["nodes_offline"] = await self._mark_dead_nodes(session, alive_since)
+        await session.commit()
+
+        if tasks or stats["nodes_offline"]:
+            logger.info("Task reaper pass completed", **stats)
+        return stats
+
+    def _release(self, task: Task, now: datetime) -> str:
+        parameters = dict(task.parameters or {})
+        requeues = parameters.get("lease_requeues", 0)
+        parameters["lease_requeues"] = requeues + 1
+        parameters["lost_worker_id"] = task.worker_id
+        task.parameters = parameters
+        task.lease_expires_at = None
+
+        if requeues < settings.task_lease_max_requeues:
+            task.status = "pending"
+            task.started_at = None
+            task.worker_id = None
+            return "requeued"
+
+        # Резерв снимет расчет по failed задаче (billing_settlement_service)
+        task.status = "failed"
+        task.completed_at = now
+        task.error_message = LOST_TASK_ERROR
+        return "failed"
+
+    @staticmethod
+    async def _mark_dead_nodes(session: AsyncSession, alive_since: datetime) -> int:
+        result = await session.execute(
+            update(WorkerNode)
+            .where(
+                WorkerNode.status != "offline",
+                or_(
+                    WorkerNode.last_heartbeat.is_(None),
+                    WorkerNode.last_heartbeat <= alive_since,
+                ),
+            )
+            .values(status="offline", active_tasks=0, free_slots=0)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount or 0
+
+    async def get_stats(self, session: AsyncSession) -> Dict[str, Any]:
+        """Выполняющиеся задачи по состоянию аренды"""
+        now = datetime.utcnow()
+        result = await session.execute(
+            select(
+                Task.worker_id,
+                Task.lease_expires_at < now,
+            ).where(Task.status == RUNNING)
+        )
+
+        workers: Dict[str, Dict[str, int]] = {}
+        for worker_id, expired in result.all():
+            item = workers.setdefault(worker_id or "unknown", {"running": 0, "expired": 0})
+            item["running"] += 1
+            if expired:
+                item["expired"] += 1
+
+        return {
+            "running": sum(item["running"] for item in workers.values()),
+            "expired": sum(item["expired"] for item in workers.values()),
+            "workers": workers,
+        }
+
+
+# Глобальный менеджер аренды задач
+task_lease_manager = TaskLeaseManager()
@@ -1,6 +1,7 @@
 import asyncio
 import random
 import socket
+import time
 import psutil
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
@@ -21,13 +22,30 @@ from app.models import (
     UserKeyword,
     UserDomain,
     ParseResult,
-    PositionHistory,
     UserStrategy,
 )
 from app.database import async_session_maker
 from .browser_manager import BrowserManager
 from .strategy_executor import StrategyExecutor
 from .vnc_manager import vnc_manager
+from .profile_cascade_scheduler import profile_cascade_scheduler
+from .check_scheduler import check_scheduler
+from .profile_health import profile_health_scorer
+from .position_history_partitions import position_history_partitions
+from .keyword_positions import keyword_position_writer, PositionCheck
+from .task_tracing import span, task_tracer
+from .node_registry import node_registry
+from .task_leases import task_lease_manager, lease_deadline
+from .strategy_nurture_counters import strategy_nurture_counters
+from .pipeline_metrics import (
+    stage,
+    track_task,
+    record_task_finished,
+    refresh_pool_gauges,
+    task_queue_wait_seconds,
+    task_retries_total,
+)
+from app.config import settings
 
 # from ..schemas.strategies import StrategyType
 from app.constants.strategies import StrategyType as StrategyTypeEnum
@@ -114,7 +132,11 @@ class TaskManager:
         await asyncio.gather(
             self._main_task_loop(),
             self._heartbeat_loop(),
+            self._lease_loop(),
             self._maintenance_loop(),
+            self._cascade_loop(),
+            self._check_scheduler_loop(),
+            self._profile_health_loop(),
             return_exceptions=True,
         )
 
@@ -130,6 +152,15 @@ class TaskManager:
             )
             await asyncio.gather(*self.current_tasks.values(), return_exceptions=True)
 
+        # Дописываем накопленную статистику профилей
+        await profile_health_scorer.flush()
+
+        try:
+            async with async_session_maker() as session:
+                await node_registry.mark_offline(session, self.worker_id)
+        except Exception as e:
+            logger.error("Failed to mark worker node offline", error=str(e))
+
         logger.info("Task manager stopped")
 
     async def _main_task_loop(self):
@@ -174,6 +205,25 @@ class TaskManager:
                 logger.error("Error in heartbeat loop", error=str(e))
                 await asyncio.sleep(5)
 
+    async def _lease_loop(self):
+        """Цикл продления аренды выполняющихся задач"""
+        while self.running:
+            try:
+                await asyncio.sleep(settings.task_lease_renew_interval)
+                async with async_session_maker() as session:
+                    lost = await task_lease_manager.renew(
+                        session, self.worker_id, list(self.current_tasks)
+                    )
+
+                # Задачу уже вернул в очередь reaper - не выполняем ее дважды
+                for task_id in lost:
+                    task_coroutine = self.current_tasks.pop(task_id, None)
+                    if task_coroutine is not None:
+                        task_coroutine.cancel()
+            except Exception as e:
+                logger.error("Error in lease loop", error=str(e))
+                await asyncio.sleep(5)
+
     async def _maintenance_loop(self):
         """Цикл maintenance задач"""
         while self.running:
@@ -185,31 +235,95 @@ class TaskManager:
                 logger.error("Error in maintenance loop", error=str(e))
                 await asyncio.sleep(60)
 
+    async def _cascade_loop(self):
+        """Цикл превращения очереди догуливания в пакетные задачи"""
+        while self.running:
+            try:
+                async with async_session_maker() as session:
+                    await profile_cascade_scheduler.flush(session)
+                await asyncio.sleep(settings.cascade_flush_interval)
+            except Exception as e:
+                logger.error("Error in cascade loop", error=str(e))
+                await asyncio.sleep(60)
+
+    async def _check_scheduler_loop(self):
+        """Цикл планирования регулярных проверок позиций"""
+        while self.running:
+            try:
+                async with async_session_maker() as session:
+                    await check_scheduler.tick(session)
+                await asyncio.sleep(settings.check_scheduler_interval)
+            except Exception as e:
+                logger.error("Error in check scheduler loop", error=str(e))
+                await asyncio.sleep(60)
+
+    async def _profile_health_loop(self):
+        """Цикл пакетной записи метрик здоровья профилей"""
+        while self.running:
+            try:
+                await asyncio.sleep(settings.profile_health_flush_interval)
+                await profile_health_scorer.flush()
+            except Exception as e:
+                logger.error("Error in profile health loop", error=str(e))
+                await asyncio.sleep(30)
+
     async def _get_next_task(self) -> Optional[Task]:
-        """Получает следующую задачу для выполнения"""
-        session = await self.get_session()
+        """Получает следующую задачу для выполнения.
 
-        try:
-            # Получаем задачу с наивысшим приоритетом
-            result = await session.execute(
-                select(Task)
-                .where(Task.status == TaskStatus.PENDING.value)
-                .order_by(Task.priority.desc(), Task.created_at.asc())
-                .limit(1)
-                .with_for_update(skip_locked=True)
-            )
+        Захват идет в отдельной короткой сессии: rollback непринятых
+        кандидатов не должен откатывать и expire'ить объекты задач, которые
+        выполняются в общей сессии self.db. Задача возвращается
+        отсоединенной, _execute_task_wrapper присоединяет ее к своей сессии.
+        """
+        async with async_session_maker() as session:
+            return await self._claim_next_task(session)
 
-            task = result.scalar_one_or_none()
+    async def _claim_next_task(self, session: AsyncSession) -> Optional[Task]:
+        try:
+            if settings.node_routing_enabled:
+                # Пачка задач, доступных узлу, и выбор лучшей по соответствию
+                result = await session.execute(
+                    select(Task, node_registry.bound_here(self.server_id))
+                    .where(
+                        Task.status == TaskStatus.PENDING.value,
+                        *node_registry.claim_conditions(self.server_id),
+                    )
+                    .order_by(Task.priority.desc(), Task.created_at.asc())
+                    .limit(settings.node_claim_batch)
+                    .with_for_update(skip_locked=True, of=Task)
+                )
+                task = node_registry.pick(result.all())
+            else:
+                # Получаем задачу с наивысшим приоритетом
+                result = await session.execute(
+                    select(Task)
+                    .where(Task.status == TaskStatus.PENDING.value)
+                    .order_by(Task.priority.desc(), Task.created_at.asc())
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                task = result.scalar_one_or_none()
 
             if task:
                 # Резервируем задачу
                 task.status = TaskStatus.RUNNING.value
                 task.started_at = datetime.now(timezone.utc)
                 task.worker_id = self.worker_id
+                task.lease_expires_at = lease_deadline()
+                await strategy_nurture_counters.apply_task(
+                    session, task, TaskStatus.PENDING.value
+                )
                 await session.commit()
 
+                if task.created_at:
+                    task_queue_wait_seconds.labels(task_type=task.task_type).observe(
+                        max(0.0, (datetime.utcnow() - task.created_at).total_seconds())
+                    )
+
                 return task
 
+            # Снимаем блокировки с непринятых кандидатов
+            await session.rollback()
             return None
 
         except Exception as e:
@@ -220,53 +334,79 @@ class TaskManager:
     async def _execute_task_wrapper(self, task: Task):
         """Обертка для выполнения задачи с обработкой ошибок"""
         session = await self.get_session()
+        # Задача захвачена в отдельной сессии - присоединяем без SELECT
+        task = await session.merge(task, load=False)
 
-        try:
-            logger.info(
-                "Executing task", task_id=str(task.id), task_type=task.task_type
-            )
+        started = time.monotonic()
 
-            # Выполняем задачу в зависимости от типа
-            if task.task_type == TaskType.WARMUP_PROFILE.value:
-                await self._execute_warmup_profile_task(task, session)
-            elif task.task_type == TaskType.PARSE_SERP.value:
-                await self._execute_parse_serp_task(task, session)
-            elif task.task_type == TaskType.CHECK_POSITIONS.value:
-                await self._execute_check_positions_task(task, session)
-            elif task.task_type == TaskType.HEALTH_CHECK.value:
-                await self._execute_health_check_task(task, session)
-            elif task.task_type == TaskType.MAINTAIN_PROFILES.value:
-                await self._execute_maintain_profiles_task(task, session)
-            elif task.task_type == TaskType.STRATEGY_WARMUP.value:
-                await self._execute_strategy_warmup_task(task, session)
-            elif task.task_type == TaskType.STRATEGY_POSITION_CHECK.value:
-                await self._execute_strategy_position_check_task(task, session)
-            else:
-                raise ValueError(f"Unknown task type: {task.task_type}")
+        with track_task(task.task_type), task_tracer.trace(
+            task.id, task.task_type
+        ) as trace:
+            try:
+                logger.info(
+                    "Executing task", task_id=str(task.id), task_type=task.task_type
+                )
 
-            # Отмечаем задачу как выполненную
-            task.status = TaskStatus.COMPLETED.value
-            task.completed_at = datetime.now(timezone.utc)
-            await session.commit()
+                # Выполняем задачу в зависимости от типа
+                if task.task_type == TaskType.WARMUP_PROFILE.value:
+                    await self._execute_warmup_profile_task(task, session)
+                elif task.task_type == TaskType.PARSE_SERP.value:
+                    await self._execute_parse_serp_task(task, session)
+                elif task.task_type == TaskType.CHECK_POSITIONS.value:
+                    await self._execute_check_positions_task(task, session)
+                elif task.task_type == TaskType.HEALTH_CHECK.value:
+                    await self._execute_health_check_task(task, session)
+                elif task.task_type == TaskType.MAINTAIN_PROFILES.value:
+                    await self._execute_maintain_profiles_task(task, session)
+                elif task.task_type == TaskType.STRATEGY_WARMUP.value:
+                    await self._execute_strategy_warmup_task(task, session)
+                elif task.task_type == TaskType.STRATEGY_POSITION_CHECK.value:
+                    await self._execute_strategy_position_check_task(task, session)
+                else:
+                    raise ValueError(f"Unknown task type: {task.task_type}")
+
+                # Отмечаем задачу как выполненную
+                task.status = TaskStatus.COMPLETED.value
+                task.completed_at = datetime.now(timezone.utc)
+                await strategy_nurture_counters.apply_task(
+                    session, task, TaskStatus.RUNNING.value
+                )
+                with stage("commit"):
+                    await session.commit()
 
-            logger.info("Task completed successfully", task_id=str(task.id))
+                record_task_finished(
+                    task.task_type, TaskStatus.COMPLETED.value, time.monotonic() - started
+                )
 
-        except Exception as e:
-            # Отмечаем задачу как неудачную
-            task.status = TaskStatus.FAILED.value
-            task.completed_at = datetime.now(timezone.utc)
-            task.error_message = str(e)
-            await session.commit()
+                logger.info("Task completed successfully", task_id=str(task.id))
+
+            except Exception as e:
+                # Отмечаем задачу как неудачную
+                task.status = TaskStatus.FAILED.value
+                task.completed_at = datetime.now(timezone.utc)
+                task.error_message = str(e)
+                await strategy_nurture_counters.apply_task(
+                    session, task, TaskStatus.RUNNING.value
+                )
+                await session.commit()
+
+                if trace is not None:
+                    trace.error = f"{type(e).__name__}: {e}"[:500]
+                record_task_finished(
+                    task.task_type, TaskStatus.FAILED.value, time.monotonic() - started
+                )
+                logger.error("Task failed", task_id=str(task.id), error=str(e))
 
-            logger.error("Task failed", task_id=str(task.id), error=str(e))
+                # Планируем повторную попытку для некоторых типов задач
+                await self._schedule_retry_if_needed(task, session)
 
-            # Планируем повторную попытку для некоторых типов задач
-            await self._schedule_retry_if_needed(task, session)
+            finally:
+                # Убираем задачу из списка активных
+                if str(task.id) in self.current_tasks:
+                    del self.current_tasks[str(task.id)]
 
-        finally:
-            # Убираем задачу из списка активных
-            if str(task.id) in self.current_tasks:
-                del self.current_tasks[str(task.id)]
+        # Отбор трассы после завершения: сохраняются только упавшие и медленные
+        await task_tracer.save(session, trace)
 
     async def _execute_warmup_profile_task(self, task: Task, session: AsyncSession):
         """Выполняет задачу прогрева профиля"""
@@ -274,6 +414,10 @@ class TaskManager:
         profile_id = parameters.get("profile_id")
         device_type = DeviceType(parameters.get("device_type", "desktop"))
 
+        if parameters.get("profile_ids"):
+            await self._execute_warmup_batch(task, session, device_type)
+            return
+
         if profile_id:
             # Получаем существующий профиль
             result = await session.execute(
@@ -300,6 +444,56 @@ class TaskManager:
         if not success:
             raise Exception("Profile warmup failed")
 
+    async def _execute_warmup_batch(
+        self, task: Task, session: AsyncSession, device_type: DeviceType
+    ):
+        """Выполняет пакетное догуливание профилей из каскадной очереди"""
+        parameters = task.parameters or {}
+        profile_ids = parameters.get("profile_ids", [])
+        attempts = parameters.get("attempts", {})
+
+        result = await session.execute(
+            select(Profile).where(Profile.id.in_(profile_ids))
+        )
+        profiles = result.scalars().all()
+
+        warmed = []
+        failed = []
+
+        for profile in profiles:
+            try:
+                success = await self.browser_manager.warmup_profile(profile)
+            except Exception as e:
+                logger.warning(
+                    "Cascade warmup failed",
+                    task_id=str(task.id),
+                    profile_id=str(profile.id),
+                    error=str(e),
+                )
+                success = False
+
+            if success:
+                warmed.append(str(profile.id))
+                continue
+
+            # Неудачный профиль возвращаем в очередь вместо новой задачи
+            failed.append(str(profile.id))
+            await profile_cascade_scheduler.enqueue(
+                session,
+                str(profile.id),
+                device_type.value,
+                reason="retry",
+                attempts=attempts.get(str(profile.id), 0) + 1,
+            )
+
+        task.result = {
+            "device_type": device_type.value,
+            "profiles_total": len(profile_ids),
+            "profiles_missing": len(profile_ids) - len(profiles),
+            "warmed": warmed,
+            "failed": failed,
+        }
+
     async def _execute_parse_serp_task(self, task: Task, session: AsyncSession):
         """Выполняет задачу парсинга SERP"""
         parameters = task.parameters
@@ -316,15 +510,17 @@ class TaskManager:
             )
             profile = result.scalar_one_or_none()
         else:
-            profile = await self.browser_manager.get_ready_profile(device_type)
+            with stage("profile_acquire"):
+                profile = await self.browser_manager.get_ready_profile(device_type)
 
         if not profile:
             raise Exception(f"No ready {device_type.value} profile available")
 
         # Парсим SERP
-        results = await self.parser.parse_serp(
-            keyword=keyword, profile=profile, pages=pages, region_code=region_code
-        )
+        async with span("parse_serp", pages=pages):
+            results = await self.parser.parse_serp(
+                keyword=keyword, profile=profile, pages=pages, region_code=region_code
+            )
 
         # Сохраняем результаты
         for result in results:
@@ -350,9 +546,9 @@ class TaskManager:
         # Получаем ключевые слова
         result = await session.execute(
             select(UserKeyword)
-            # .options(selectinload(UserKeyword.domain), selectinload(UserKeyword.region))
+            # Регион задается на уровне домена
             .options(
-                selectinload(UserKeyword.domain), selectinload(UserKeyword.region)
+                selectinload(UserKeyword.domain).selectinload(UserDomain.region)
             ).where(UserKeyword.id.in_(keyword_ids))
         )
         keywords = result.scalars().all()
@@ -361,31 +557,37 @@ class TaskManager:
             raise Exception("No keywords found")
 
         # Получаем профиль
-        profile = await self.browser_manager.get_ready_profile(device_type)
+        with stage("profile_acquire"):
+            profile = await self.browser_manager.get_ready_profile(device_type)
         if not profile:
             raise Exception(f"No ready {device_type.value} profile available")
 
         results = []
+        checks = []
 
         for keyword_obj in keywords:
             try:
                 # Проверяем позицию домена
-                position = await self.parser.check_position(
-                    keyword=keyword_obj.keyword,
-                    target_domain=keyword_obj.domain.domain,
-                    profile=profile,
-                    region_code=keyword_obj.region.region_code,
-                )
-
-                # Сохраняем результат в историю позиций
-                position_record = PositionHistory(
-                    user_id=keyword_obj.user_id,
-                    domain_id=keyword_obj.domain_id,
-                    keyword_id=keyword_obj.id,
-                    position=position,
-                    check_date=datetime.now(timezone.utc),
+                async with span(
+                    "check_position", keyword_id=str(keyword_obj.id)
+                ) as check_span:
+                    position = await self.parser.check_position(
+                        keyword=keyword_obj.keyword,
+                        target_domain=keyword_obj.domain.domain,
+                        profile=profile,
+                        region_code=keyword_obj.domain.region.region_code,
+                    )
+                    check_span.set(position=position)
+
+                checks.append(
+                    PositionCheck(
+                        keyword_id=str(keyword_obj.id),
+                        user_id=str(keyword_obj.user_id),
+                        domain_id=str(keyword_obj.domain_id),
+                        position=position,
+                        check_date=datetime.utcnow(),
+                    )
                 )
-                session.add(position_record)
 
                 results.append(
                     {
@@ -397,7 +599,8 @@ class TaskManager:
                 )
 
                 # Пауза между проверками
-                await asyncio.sleep(random.uniform(5, 15))
+                async with span("pause"):
+                    await asyncio.sleep(random.uniform(5, 15))
 
             except Exception as e:
                 logger.error(
@@ -415,6 +618,10 @@ class TaskManager:
                     }
                 )
 
+        # История и последние позиции пишутся одной пачкой в транзакции задачи
+        with stage("db_write"):
+            await keyword_position_writer.record(session, checks)
+
         task.result = {
             "device_type": device_type.value,
             "checked_keywords": len(keywords),
@@ -755,20 +962,12 @@ class TaskManager:
             if not cascade_enabled:
                 return
 
-            # Планируем задачу догуливания профиля
-            cascade_task = Task(
-                task_type=TaskType.WARMUP_PROFILE.value,
-                status=TaskStatus.PENDING.value,
-                priority=1,  # Низкий приоритет
-                parameters={
-                    "profile_id": str(profile.id),
-                    "device_type": profile.device_type.value,
-                    "cascade_mode": True,
-                },
+            # Ставим профиль в очередь догуливания - повторные запросы
+            # схлопываются, задачи создаются пакетами в _cascade_loop
+            await profile_cascade_scheduler.enqueue(
+                session, str(profile.id), profile.device_type.value
             )
 
-            session.add(cascade_task)
-
         except Exception as e:
             logger.error(
                 "Failed to handle profile cascade",
@@ -778,6 +977,10 @@ class TaskManager:
 
     async def _schedule_retry_if_needed(self, task: Task, session: AsyncSession):
         """Планирует повторную попытку для задачи если нужно"""
+        # Пакетное догуливание само возвращает неудачные профили в очередь
+        if task.parameters and task.parameters.get("profile_ids"):
+            return
+
         # Считаем количество попыток
         retry_count = task.parameters.get("retry_count", 0) if task.parameters else 0
         max_retries = 3
@@ -787,22 +990,26 @@ class TaskManager:
             TaskType.CHECK_POSITIONS.value,
             TaskType.WARMUP_PROFILE.value,
         ]:
-            # Создаем новую задачу с увеличенным счетчиком
+            # Возвращаем ту же задачу в очередь, не создавая новую строку
             retry_parameters = task.parameters.copy() if task.parameters else {}
             retry_parameters["retry_count"] = retry_count + 1
 
-            retry_task = Task(
-                task_type=task.task_type,
-                status=TaskStatus.PENDING.value,
-                priority=max(0, task.priority - 1),  # Снижаем приоритет
-                parameters=retry_parameters,
+            task.parameters = retry_parameters
+            task_retries_total.labels(task_type=task.task_type).inc()
+            task.status = TaskStatus.PENDING.value
+            task.priority = max(0, (task.priority or 0) - 1)  # Снижаем приоритет
+            task.started_at = None
+            task.completed_at = None
+            task.worker_id = None
+            await strategy_nurture_counters.apply_task(
+                session, task, TaskStatus.FAILED.value
             )
 
-            session.add(retry_task)
+            await session.commit()
 
             logger.info(
                 "Retry task scheduled",
-                original_task_id=str(task.id),
+                task_id=str(task.id),
                 retry_count=retry_count + 1,
             )
 
@@ -837,16 +1044,18 @@ class TaskManager:
                 worker_node = WorkerNode(
                     node_id=self.worker_id,
                     hostname=socket.gethostname(),
-                    max_workers=self.max_concurrent_tasks,
-                    capabilities={
-                        "browsers": ["chrome", "firefox"],
-                        "device_types": ["desktop", "mobile"],
-                    },
                 )
                 session.add(worker_node)
 
+            await node_registry.refresh_inventory(session)
+
+            worker_node.server_id = self.server_id
+            worker_node.max_workers = self.max_concurrent_tasks
+            worker_node.active_tasks = 0
+            worker_node.free_slots = self.max_concurrent_tasks
+            worker_node.capabilities = node_registry.capabilities()
             worker_node.status = "online"
-            worker_node.last_heartbeat = datetime.now(timezone.utc)
+            worker_node.last_heartbeat = datetime.utcnow()
 
             await session.commit()
 
@@ -858,13 +1067,17 @@ class TaskManager:
         session = await self.get_session()
 
         try:
-            # Обновляем статус worker node
-            await session.execute(
-                update(WorkerNode)
-                .where(WorkerNode.node_id == self.worker_id)
-                .values(last_heartbeat=datetime.now(timezone.utc), status="online")
+            # Свободная емкость и возможности узла для маршрутизации задач
+            await node_registry.publish(
+                session,
+                self.worker_id,
+                self.server_id,
+                self.max_concurrent_tasks,
+                len(self.current_tasks),
             )
-            await session.commit()
+
+            # Глубина очереди и размеры пулов для Prometheus
+            await refresh_pool_gauges(session)
 
         except Exception as e:
             logger.error("Failed to send heartbeat", error=str(e))
@@ -905,6 +1118,13 @@ class TaskManager:
             # Планируем health check задачи
             await self._schedule_health_check_tasks(session)
 
+            # Секции истории позиций на ближайшие месяцы и retention
+            await position_history_partitions.maintain()
+
+            # Окно лучшей/худшей позиции у давно не проверявшихся ключей
+            async with async_session_maker() as positions_session:
+                await keyword_position_writer.refresh_windows(positions_session)
+
         except Exception as e:
             logger.error("Failed to schedule maintenance tasks", error=str(e))
 
@@ -1528,6 +1748,7 @@ class TaskManager:
             device_type=device_type.value,
             profile_id=profile_id,
             user_id=strategy.user_id,  # ВАЖНО: привязываем к пользователю
+            strategy_id=strategy.id,
             parameters=task_parameters,
             status=TaskStatus.PENDING.value,
             reserved_amount=reserved_amount,
@@ -1535,6 +1756,9 @@ class TaskManager:
         )
 
         self.db.add(task)
+        await strategy_nurture_counters.apply(
+            self.db, strategy.id, None, TaskStatus.PENDING.value
+        )
         await self.db.commit()
         await self.db.refresh(task)
 
@@ -1581,6 +1805,8 @@ class TaskManager:
     ) -> bool:
         """Отметить задачу как запущенную"""
 
+        previous = await strategy_nurture_counters.lock_task(self.db, task_id)
+
         update_query = (
             update(Task)
             .where(
@@ -1593,10 +1819,15 @@ class TaskManager:
                 status=TaskStatus.RUNNING.value,
                 started_at=datetime.utcnow(),
                 worker_id=worker_id,
+                lease_expires_at=lease_deadline(),
             )
         )
 
         result = await self.db.execute(update_query)
+        if result.rowcount > 0:
+            await strategy_nurture_counters.apply_locked(
+                self.db, previous, TaskStatus.RUNNING.value
+            )
         await self.db.commit()
 
         return result.rowcount > 0
@@ -1606,6 +1837,8 @@ class TaskManager:
     ) -> bool:
         """Отметить задачу как завершенную"""
 
+        previous = await strategy_nurture_counters.lock_task(self.db, task_id)
+
         update_query = (
             update(Task)
             .where(Task.id == task_id)
@@ -1617,6 +1850,9 @@ class TaskManager:
         )
 
         result = await self.db.execute(update_query)
+        await strategy_nurture_counters.apply_locked(
+            self.db, previous, TaskStatus.COMPLETED.value
+        )
         await self.db.commit()
 
         return result.rowcount > 0
@@ -1629,6 +1865,8 @@ class TaskManager:
     ) -> bool:
         """Отметить задачу как неудачную"""
 
+        previous = await strategy_nurture_counters.lock_task(self.db, task_id)
+
         update_query = (
             update(Task)
             .where(Task.id == task_id)
@@ -1641,6 +1879,9 @@ class TaskManager:
         )
 
         result = await self.db.execute(update_query)
+        await strategy_nurture_counters.apply_locked(
+            self.db, previous, TaskStatus.FAILED.value
+        )
         await self.db.commit()
 
         return result.rowcount > 0
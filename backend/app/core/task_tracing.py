@@ -0,0 +1,300 @@
+# backend/app/core/task_tracing.py
+"""
+Трассировка выполнения задач по спанам.
+
+Спан - именованный участок выполнения с длительностью:
+    with span("navigation"): ...
+    async with span("check_position", keyword_id=...): ...
+Спаны вкладываются друг в друга (_execute_task_wrapper -> parse_serp ->
+шаги страницы), родитель определяется через contextvar, поэтому вложенность
+правильная и для параллельных корутин. Этапы pipeline_metrics.stage
+открывают спан автоматически.
+
+Tail-based sampling: во время выполнения спаны пишутся в память задачи
+(одна запись-список на спан), а решение о сохранении принимается после
+завершения. В Task.trace сохраняются только упавшие и медленные задачи,
+плюс небольшая доля случайных для базовой линии. Отброшенная трасса не
+сериализуется и не пишется в БД. Вне трассируемой задачи span() возвращает
+общий пустой объект.
+"""
+
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import structlog
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+TRACE_VERSION = 1
+
+# Колонки записи спана в сохраненной трассе
+SPAN_FIELDS = ["name", "parent", "start_ms", "duration_ms", "attrs", "error"]
+
+_current_trace: contextvars.ContextVar[Optional["TaskTrace"]] = contextvars.ContextVar(
+    "current_task_trace", default=None
+)
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "current_task_span", default=None
+)
+
+
+class TaskTrace:
+    """Спаны одной задачи в порядке открытия"""
+
+    __slots__ = (
+        "task_id",
+        "task_type",
+        "max_spans",
+        "started",
+        "duration_ms",
+        "spans",
+        "dropped_spans",
+        "error",
+    )
+
+    def __init__(self, task_id: str, task_type: str, max_spans: int):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.max_spans = max_spans
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[list] = []
+        self.dropped_spans = 0
+        self.error: Optional[str] = None
+
+    def to_dict(self, reason: str) -> Dict[str, Any]:
+        return {
+            "version": TRACE_VERSION,
+            "task_type": self.task_type,
+            "reason": reason,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "fields": SPAN_FIELDS,
+            "spans": self.spans,
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+class Span:
+    """Участок выполнения; работает и как with, и как async with"""
+
+    __slots__ = ("trace", "name", "attrs", "index", "token", "started")
+
+    def __init__(self, trace: TaskTrace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.index: Optional[int] = None
+        self.token = None
+        self.started = 0.0
+
+    def __enter__(self) -> "Span":
+        trace = self.trace
+        self.started = time.perf_counter()
+        if len(trace.spans) >= trace.max_spans:
+            trace.dropped_spans += 1
+            return self
+
+        self.index = len(trace.spans)
+        trace.spans.append(
+            [
+                self.name,
+                _current_span.get(),
+                round((self.started - trace.started) * 1000, 1),
+                None,
+                self.attrs or None,
+                None,
+            ]
+        )
+        self.token = _current_span.set(self.index)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.index is None:
+            return False
+
+        _current_span.reset(self.token)
+        record = self.trace.spans[self.index]
+        record[3] = round((time.perf_counter() - self.started) * 1000, 1)
+        if exc_type is not None:
+            record[5] = exc_type.__name__
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+    def set(self, **attrs):
+        """Добавляет атрибуты спану (например, результат шага)"""
+        if self.index is not None:
+            record = self.trace.spans[self.index]
+            record[4] = {**(record[4] or {}), **attrs}
+
+
+class _NoopSpan:
+    """Спан вне трассируемой задачи: ничего не делает"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """Спан в текущей трассе (или пустой объект, если трассы нет)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(trace, name, attrs)
+
+
+class TaskTracer:
+    """Запись трасс задач и tail-based решение об их сохранении"""
+
+    def __init__(self):
+        self.kept = 0
+        self.dropped = 0
+
+    @contextmanager
+    def trace(self, task_id: str, task_type: str):
+        """Трасса задачи на время выполнения"""
+        if not settings.task_trace_enabled:
+            yield None
+            return
+
+        trace = TaskTrace(str(task_id), task_type, settings.task_trace_max_spans)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            trace.duration_ms = round((time.perf_counter() - trace.started) * 1000, 1)
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+    @staticmethod
+    def sample_reason(trace: TaskTrace) -> Optional[str]:
+        """Причина сохранить трассу или None, если она отбрасывается"""
+        if trace.error is not None:
+            return "failed"
+        if trace.duration_ms >= settings.task_trace_slow_seconds * 1000:
+            return "slow"
+        if random.random() < settings.task_trace_sample_rate:
+            return "sampled"
+        return None
+
+    async def save(self, session: AsyncSession, trace: Optional[TaskTrace]):
+        """Сохраняет трассу в Task.trace, если она прошла отбор"""
+        if trace is None:
+            return
+
+        reason = self.sample_reason(trace)
+        if reason is None:
+            self.dropped += 1
+            return
+
+        from app.models import Task
+
+        try:
+            await session.execute(
+                update(Task)
+                .where(Task.id == trace.task_id)
+                .values(trace=trace.to_dict(reason))
+            )
+            await session.commit()
+            self.kept += 1
+        except Exception as e:
+            await session.rollback()
+            logger.warning(
+                "Failed to save task trace", task_id=trace.task_id, error=str(e)
+            )
+
+
+def render_trace(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Дерево спанов и разбивка времени по именам для сохраненной трассы"""
+    fields = data.get("fields") or SPAN_FIELDS
+    records = [dict(zip(fields, values)) for values in data.get("spans") or []]
+
+    nodes: List[Dict[str, Any]] = []
+    roots: List[Dict[str, Any]] = []
+    for record in records:
+        node = {
+            "name": record["name"],
+            "start_ms": record["start_ms"],
+            "duration_ms": record["duration_ms"],
+            "self_ms": record["duration_ms"],
+            "attrs": record["attrs"],
+            "error": record["error"],
+            "children": [],
+        }
+        nodes.append(node)
+
+        parent = record["parent"]
+        if parent is None or parent >= len(nodes) - 1:
+            roots.append(node)
+        else:
+            nodes[parent]["children"].append(node)
+
+    # Собственное время спана - без времени вложенных спанов
+    for node in nodes:
+        if node["duration_ms"] is None:
+            continue
+        children_ms = sum(child["duration_ms"] or 0 for child in node["children"])
+        node["self_ms"] = round(max(0.0, node["duration_ms"] - children_ms), 1)
+
+    total_ms = data.get("duration_ms") or 0
+    breakdown: Dict[str, Dict[str, Any]] = {}
+    for node in nodes:
+        item = breakdown.setdefault(
+            node["name"], {"name": node["name"], "count": 0, "total_ms": 0.0, "self_ms": 0.0}
+        )
+        item["count"] += 1
+        item["total_ms"] += node["duration_ms"] or 0
+        item["self_ms"] += node["self_ms"] or 0
+
+    # Время задачи вне спанов
+    untracked_ms = round(max(0.0, total_ms - sum(root["duration_ms"] or 0 for root in roots)), 1)
+
+    for item in breakdown.values():
+        item["total_ms"] = round(item["total_ms"], 1)
+        item["self_ms"] = round(item["self_ms"], 1)
+        item["share"] = round(item["self_ms"] / total_ms, 4) if total_ms else None
+
+    return {
+        "task_type": data.get("task_type"),
+        "reason": data.get("reason"),
+        "duration_ms": total_ms,
+        "error": data.get("error"),
+        "dropped_spans": data.get("dropped_spans", 0),
+        "untracked_ms": untracked_ms,
+        "breakdown": sorted(breakdown.values(), key=lambda i: i["self_ms"], reverse=True),
+        "timeline": roots,
+    }
+
+
+# Глобальный трассировщик задач
+task_tracer = TaskTracer()
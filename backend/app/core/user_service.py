@@ -1,10 +1,12 @@
+import base64
+import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Union
 from decimal import Decimal
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_, func
+from sqlalchemy import select, update, and_, func, tuple_
 from sqlalchemy.orm import selectinload
 import structlog
 
@@ -15,15 +17,49 @@ from app.models import (
     TariffPlan,
     UserDomain,
     UserKeyword,
+    KeywordLatestPosition,
     UserDomainSettings,
     Region,
     YandexRegion,
     DeviceType,
 )
 from .auth import AuthService, PasswordValidator, EmailValidator
+from .auth_cache import auth_cache
+from app.services.keyword_ingest_service import KeywordIngestService, normalize_keyword
 
 logger = structlog.get_logger(__name__)
 
+KEYWORDS_PAGE_LIMIT = 500
+
+# Ключи сортировки ключевых слов (все поддерживают keyset пагинацию).
+# Ненайденные позиции сортируются после найденных.
+KEYWORD_SORT_KEYS = {
+    "created_at": UserKeyword.created_at,
+    "keyword": UserKeyword.keyword,
+    "position": func.coalesce(KeywordLatestPosition.position, 32767),
+}
+
+
+def _encode_keyword_cursor(sort_value, keyword_id) -> str:
+    """Кодирует позицию последней строки страницы в курсор"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, str(keyword_id)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_keyword_cursor(cursor: str, sort_by: str):
+    """Декодирует курсор в (значение сортировки, id ключевого слова)"""
+    try:
+        sort_value, keyword_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if sort_by == "created_at":
+            sort_value = datetime.fromisoformat(sort_value)
+        elif sort_by == "position":
+            sort_value = int(sort_value)
+        return sort_value, uuid.UUID(keyword_id)
+    except (ValueError, TypeError):
+        raise ValueError("Некорректный курсор")
+
 
 class UserService:
     """Сервис для управления пользователями"""
@@ -60,11 +96,13 @@ class UserService:
                 }
 
             # Создаем пользователя
+            api_key = AuthService.generate_api_key()
             user = User(
                 email=email,
                 password_hash=AuthService.get_password_hash(password),
                 subscription_plan=subscription_plan,
-                api_key=AuthService.generate_api_key(),
+                api_key=api_key,
+                api_key_hash=AuthService.hash_api_key(api_key),
                 balance=Decimal("0.00"),
                 is_active=True,
             )
@@ -309,6 +347,7 @@ class UserService:
             # Обновляем пароль
             user.password_hash = AuthService.get_password_hash(new_password)
             await self.session.commit()
+            await auth_cache.invalidate_user(user_id)
 
             logger.info("Password changed", user_id=user_id)
 
@@ -327,7 +366,10 @@ class UserService:
                 return {"success": False, "errors": ["Пользователь не найден"]}
 
             user.api_key = AuthService.generate_api_key()
+            user.api_key_hash = AuthService.hash_api_key(user.api_key)
             await self.session.commit()
+            # Старый ключ перестает действовать во всех процессах API
+            await auth_cache.invalidate_user(user_id)
 
             logger.info("API key regenerated", user_id=user_id)
 
@@ -338,6 +380,27 @@ class UserService:
             logger.error("Failed to regenerate API key", user_id=user_id, error=str(e))
             return {"success": False, "errors": ["Ошибка генерации API ключа"]}
 
+    async def set_user_active(self, user_id: str, is_active: bool) -> Dict[str, Any]:
+        """Активирует или деактивирует пользователя"""
+        try:
+            user = await self.session.get(User, user_id)
+            if not user:
+                return {"success": False, "errors": ["Пользователь не найден"]}
+
+            user.is_active = is_active
+            await self.session.commit()
+            # Деактивированный пользователь теряет доступ сразу, а не по TTL
+            await auth_cache.invalidate_user(user_id)
+
+            logger.info("User activity changed", user_id=user_id, is_active=is_active)
+
+            return {"success": True, "is_active": is_active}
+
+        except Exception as e:
+            await self.session.rollback()
+            logger.error("Failed to change user activity", user_id=user_id, error=str(e))
+            return {"success": False, "errors": ["Ошибка изменения статуса пользователя"]}
+
     async def add_domain(
         self, user_id: str, domain: str, region_id: str
     ) -> Dict[str, Any]:
@@ -527,48 +590,31 @@ class UserService:
             if not domain_obj:
                 return {"success": False, "errors": ["Домен не найден"]}
 
-            # Проверяем существует ли уже такое ключевое слово
-            existing_keyword = await self.session.execute(
-                select(UserKeyword).where(
-                    UserKeyword.user_id == user_id,
-                    UserKeyword.domain_id == domain_id,
-                    UserKeyword.keyword == keyword.strip(),
-                    UserKeyword.device_type == device_type,
-                )
-            )
-
-            if existing_keyword.scalar_one_or_none():
-                return {
-                    "success": False,
-                    "errors": ["Ключевое слово уже добавлено для этого домена"],
-                }
+            normalized = normalize_keyword(keyword)
+            if not normalized:
+                return {"success": False, "errors": ["Ключевое слово не может быть пустым"]}
 
-            # Добавляем ключевое слово (регион наследуется от домена)
-            user_keyword = UserKeyword(
+            # Добавляем ключевое слово (регион наследуется от домена);
+            # дубликат отсекает уникальный ключ без предварительного SELECT
+            keyword_id = await KeywordIngestService(self.session).add_one(
                 user_id=user_id,
                 domain_id=domain_id,
-                keyword=keyword.strip(),
+                keyword=normalized,
                 device_type=device_type,
                 check_frequency=check_frequency,
                 is_active=is_active,
             )
 
-            self.session.add(user_keyword)
-            await self.session.commit()
-            await self.session.refresh(user_keyword)
-
-            logger.info(
-                "Keyword added",
-                user_id=user_id,
-                domain_id=domain_id,
-                keyword=keyword,
-                keyword_id=str(user_keyword.id),
-            )
+            if not keyword_id:
+                return {
+                    "success": False,
+                    "errors": ["Ключевое слово уже добавлено для этого домена"],
+                }
 
             return {
                 "success": True,
-                "keyword_id": str(user_keyword.id),
-                "keyword": user_keyword.keyword,
+                "keyword_id": keyword_id,
+                "keyword": normalized,
                 "region_id": str(domain_obj.region_id),  # Возвращаем регион из домена
             }
 
@@ -584,9 +630,29 @@ class UserService:
             return {"success": False, "errors": [str(e)]}
 
     async def get_domain_keywords(
-        self, user_id: str, domain_id: str
-    ) -> List[Dict[str, Any]]:
-        """Возвращает ключевые слова для домена с информацией о регионе"""
+        self,
+        user_id: str,
+        domain_id: str,
+        limit: int = KEYWORDS_PAGE_LIMIT,
+        cursor: Optional[str] = None,
+        sort_by: str = "created_at",
+        include_total: bool = False,
+    ) -> Dict[str, Any]:
+        """Возвращает страницу ключевых слов домена с регионом и последней позицией.
+
+        Пагинация keyset по (ключ сортировки, id): страница читается одним
+        индексным запросом с LEFT JOIN keyword_latest_positions независимо от
+        числа ключевых слов в домене. Некорректный курсор - ValueError.
+        """
+        if sort_by not in KEYWORD_SORT_KEYS:
+            raise ValueError(f"Неподдерживаемая сортировка: {sort_by}")
+
+        sort_key = KEYWORD_SORT_KEYS[sort_by]
+        descending = sort_by == "created_at"
+        position_after = _decode_keyword_cursor(cursor, sort_by) if cursor else None
+
+        empty = {"keywords": [], "next_cursor": None, "total": 0 if include_total else None}
+
         try:
             # Получаем домен и его регион
             domain_query = await self.session.execute(
@@ -597,25 +663,64 @@ class UserService:
 
             domain_result = domain_query.first()
             if not domain_result:
-                return []
+                return empty
 
             domain, region = domain_result
+            region_data = {
+                "id": str(region.id),
+                "code": region.region_code,
+                "name": region.display_name or region.region_name,
+                "country_code": region.country_code,
+                "region_type": region.region_type,
+            }
 
-            # Получаем ключевые слова для домена
-            keywords = await self.session.execute(
-                select(UserKeyword)
-                .where(
-                    and_(
-                        UserKeyword.domain_id == domain_id,
-                        UserKeyword.user_id == user_id,
-                    )
+            conditions = [
+                UserKeyword.domain_id == domain_id,
+                UserKeyword.user_id == user_id,
+            ]
+
+            total = None
+            if include_total:
+                total_result = await self.session.execute(
+                    select(func.count(UserKeyword.id)).where(and_(*conditions))
+                )
+                total = total_result.scalar()
+
+            if position_after:
+                row_key = tuple_(sort_key, UserKeyword.id)
+                conditions.append(
+                    row_key < tuple_(*position_after)
+                    if descending
+                    else row_key > tuple_(*position_after)
                 )
-                .order_by(UserKeyword.created_at.desc())
+
+            order = (
+                [sort_key.desc(), UserKeyword.id.desc()]
+                if descending
+                else [sort_key.asc(), UserKeyword.id.asc()]
             )
 
-            result = []
-            for keyword in keywords.scalars():
-                result.append(
+            rows = (
+                await self.session.execute(
+                    select(UserKeyword, KeywordLatestPosition, sort_key)
+                    .outerjoin(
+                        KeywordLatestPosition,
+                        KeywordLatestPosition.keyword_id == UserKeyword.id,
+                    )
+                    .where(and_(*conditions))
+                    .order_by(*order)
+                    .limit(limit + 1)
+                )
+            ).all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = _encode_keyword_cursor(rows[-1][2], rows[-1][0].id)
+
+            keywords = []
+            for keyword, latest, _ in rows:
+                keywords.append(
                     {
                         "id": str(keyword.id),
                         "keyword": keyword.keyword,
@@ -623,17 +728,26 @@ class UserService:
                         "is_active": keyword.is_active,
                         "check_frequency": keyword.check_frequency,
                         "created_at": keyword.created_at.isoformat(),
-                        "region": {
-                            "id": str(region.id),
-                            "code": region.region_code,
-                            "name": region.display_name or region.region_name,
-                            "country_code": region.country_code,
-                            "region_type": region.region_type,
-                        },
+                        "region": region_data,
+                        "position": latest.position if latest else None,
+                        "previous_position": (
+                            latest.previous_position if latest else None
+                        ),
+                        "position_change": latest.position_change if latest else None,
+                        "best_position_30d": (
+                            latest.best_position_30d if latest else None
+                        ),
+                        "worst_position_30d": (
+                            latest.worst_position_30d if latest else None
+                        ),
+                        "url": latest.url if latest else None,
+                        "last_check_date": (
+                            latest.last_check_date.isoformat() if latest else None
+                        ),
                     }
                 )
 
-            return result
+            return {"keywords": keywords, "next_cursor": next_cursor, "total": total}
 
         except Exception as e:
             logger.error(
@@ -642,7 +756,7 @@ class UserService:
                 domain_id=domain_id,
                 error=str(e),
             )
-            return []
+            return empty
 
     async def delete_keyword(self, user_id: str, keyword_id: str) -> Dict[str, Any]:
         """Удаляет ключевое слово"""
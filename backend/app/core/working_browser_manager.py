@@ -1,7 +1,5 @@
 # backend/app/core/browser_manager.py - ПОЛНАЯ РЕАЛИЗАЦИЯ:
 from sqlalchemy import func
-import os
-import subprocess
 import asyncio
 import random
 import socket
@@ -18,6 +16,9 @@ from .fingerprint_generator import FingerprintGenerator
 from ..models.profile import DeviceType
 from playwright.async_api import Browser, BrowserContext
 from .vnc_manager import vnc_manager
+from .display_pool import display_pool
+from .profile_health import profile_health_scorer
+from app.config import settings
 
 logger = structlog.get_logger(__name__)
 
@@ -49,53 +50,9 @@ class BrowserManager:
             async with async_session_maker() as session:
                 return session
 
-    def _setup_display_environment(self, vnc_session=None):
-        """Настройка окружения для отображения"""
-        if vnc_session:
-            # Для debug режима используем VNC дисплей
-            display_env = f":{vnc_session.display_num}"
-            os.environ["DISPLAY"] = display_env
-            logger.info(f"Using VNC display: {display_env}")
-        else:
-            # Для обычного режима используем виртуальный дисплей
-            if not os.environ.get("DISPLAY"):
-                # Запускаем Xvfb если его нет
-                self._ensure_xvfb_running()
-                os.environ["DISPLAY"] = ":99"
-                logger.info("Using Xvfb display: :99")
-
-    def _ensure_xvfb_running(self):
-        """Обеспечивает запуск Xvfb для headless режима"""
-        try:
-            # Проверяем, запущен ли Xvfb
-            result = subprocess.run(
-                ["pgrep", "-f", "Xvfb :99"], capture_output=True, text=True
-            )
-
-            if result.returncode != 0:
-                # Xvfb не запущен, запускаем его
-                logger.info("Starting Xvfb on display :99")
-                subprocess.Popen(
-                    [
-                        "Xvfb",
-                        ":99",
-                        "-screen",
-                        "0",
-                        "1920x1080x24",
-                        "-ac",
-                        "+extension",
-                        "GLX",
-                    ]
-                )
-                # Ждем немного для запуска
-                import time
-
-                time.sleep(2)
-            else:
-                logger.info("Xvfb already running on display :99")
-
-        except Exception as e:
-            logger.warning(f"Failed to ensure Xvfb running: {e}")
+    def _vnc_display_env(self, vnc_session) -> Dict[str, str]:
+        """Окружение браузера для VNC дисплея debug сессии"""
+        return display_pool.env(display_name=f":{vnc_session.display_num}")
 
     # ===================== СОЗДАНИЕ ПРОФИЛЕЙ =====================
 
@@ -154,7 +111,9 @@ class BrowserManager:
         session = await self.get_session()
 
         try:
-            # Ищем готовый профиль указанного типа
+            # Берем несколько самых здоровых готовых профилей (индекс
+            # idx_profiles_ready_health) и выбираем из них с весом по оценке,
+            # чтобы нагрузка не ложилась целиком на один лучший профиль
             result = await session.execute(
                 select(Profile)
                 .where(
@@ -164,22 +123,31 @@ class BrowserManager:
                         Profile.is_warmed_up == True,
                     )
                 )
-                .order_by(Profile.last_used.asc().nullsfirst())
-                .limit(1)
+                .order_by(
+                    Profile.health_score.desc(), Profile.last_used.asc().nullsfirst()
+                )
+                .limit(settings.profile_health_selection_pool)
             )
 
-            profile = result.scalar_one_or_none()
+            candidates = result.scalars().all()
+            profile = None
+
+            if candidates:
+                profile = random.choices(
+                    candidates,
+                    weights=[max(c.health_score or 0, 0.01) for c in candidates],
+                )[0]
 
-            if profile:
                 # Обновляем время последнего использования
+                # (счетчик использований ведет profile_health_scorer)
                 profile.last_used = datetime.utcnow()
-                profile.total_usage_count += 1
                 await session.commit()
 
                 logger.info(
                     "Ready profile found",
                     profile_id=str(profile.id),
                     device_type=device_type.value,
+                    health_score=profile.health_score,
                 )
 
             return profile
@@ -281,9 +249,6 @@ class BrowserManager:
         """Запуск браузера с настройками профиля"""
         browser_settings = profile.browser_settings or {}
 
-        # Настраиваем окружение для отображения
-        self._setup_display_environment()
-
         # Настройки запуска браузера
         launch_options = {
             "headless": False,  # НЕ headless для обхода детекции
@@ -313,7 +278,8 @@ class BrowserManager:
             ],
         }
 
-        return await playwright.chromium.launch(**launch_options)
+        # Дисплей из пула Xvfb передается через env запуска
+        return await display_pool.launch(playwright, **launch_options)
 
     async def _create_context(
         self, browser: Browser, profile: Profile
@@ -453,14 +419,13 @@ class BrowserManager:
     ) -> Browser:
         """Запускает браузер с привязкой к VNC дисплею"""
 
-        # Настраиваем окружение для VNC
-        self._setup_display_environment(vnc_session)
-
         browser_settings = profile.browser_settings or {}
 
         # Специальные настройки для дебага
         launch_options = {
             "headless": False,  # Обязательно НЕ headless для VNC
+            # Дисплей VNC сессии только для этого браузера
+            "env": self._vnc_display_env(vnc_session),
             "slow_mo": 500,  # Замедление для наблюдения
             "devtools": True,  # Включаем DevTools
             "args": [
@@ -486,7 +451,7 @@ class BrowserManager:
                 "--disable-extensions",
                 "--mute-audio",
                 f"--user-agent={profile.user_agent}",
-                f"--display={os.environ.get('DISPLAY')}",
+                f"--display=:{vnc_session.display_num}",
                 # Настройки окна для адаптации под разрешение
                 f"--window-size={vnc_session.resolution.replace('x', ',')}",
                 "--start-maximized",
@@ -508,7 +473,7 @@ class BrowserManager:
 
             logger.info(
                 "Debug browser configured",
-                display=os.environ.get("DISPLAY"),
+                display=f":{vnc_session.display_num}",
                 resolution=vnc_session.resolution,
                 task_id=vnc_session.task_id,
             )
@@ -645,40 +610,17 @@ class BrowserManager:
 
     # ===================== УПРАВЛЕНИЕ ПРОФИЛЯМИ =====================
 
-    async def _update_profile_usage(self, profile: Profile, success: bool):
-        """Обновляет статистику использования профиля"""
-        session = await self.get_session()
-
-        try:
-            profile.total_usage_count += 1
-            profile.last_used = datetime.utcnow()
-
-            if success:
-                # Обновляем success rate
-                if profile.total_usage_count > 0:
-                    success_count = (
-                        int(
-                            profile.success_rate * (profile.total_usage_count - 1) / 100
-                        )
-                        + 1
-                    )
-                    profile.success_rate = (
-                        success_count / profile.total_usage_count
-                    ) * 100
-            else:
-                # Пересчитываем success rate
-                if profile.total_usage_count > 0:
-                    success_count = int(
-                        profile.success_rate * (profile.total_usage_count - 1) / 100
-                    )
-                    profile.success_rate = (
-                        success_count / profile.total_usage_count
-                    ) * 100
-
-            await session.commit()
-
-        except Exception as e:
-            logger.error(f"Failed to update profile usage: {e}")
+    async def _update_profile_usage(
+        self,
+        profile: Profile,
+        success: bool,
+        captcha: bool = False,
+        latency_ms: Optional[float] = None,
+    ):
+        """Учитывает использование профиля в оценке его здоровья"""
+        profile_health_scorer.record(
+            str(profile.id), success, captcha=captcha, latency_ms=latency_ms
+        )
 
     async def maintain_warm_profiles(self, target_count: int = 1000):
         """Поддержание целевого количества теплых профилей"""
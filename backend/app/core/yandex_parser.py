@@ -1,6 +1,7 @@
 import asyncio
 import random
 import re
+import time
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from urllib.parse import urljoin, urlparse
@@ -11,7 +12,16 @@ import structlog
 
 from app.models import Profile, ParseResult, Task, UserKeyword, DeviceType
 from app.database import async_session_maker
+from app.config import settings
 from .browser_manager import BrowserManager
+from .profile_health import profile_health_scorer
+from .task_tracing import span
+from .pipeline_metrics import (
+    stage,
+    blocks_total,
+    captchas_total,
+    serp_pages_parsed_total,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -23,10 +33,10 @@ class YandexParser:
         self.db = db_session
         self.browser_manager = BrowserManager(db_session)
 
-        # URL для разных типов устройств
+        # URL для разных типов устройств (в бенчмарке - локальный fake-Яндекс)
         self.search_urls = {
-            DeviceType.DESKTOP: "https://yandex.ru/search/",
-            DeviceType.MOBILE: "https://yandex.ru/search/touch/"
+            DeviceType.DESKTOP: settings.yandex_search_url_desktop,
+            DeviceType.MOBILE: settings.yandex_search_url_mobile
         }
 
         # Селекторы для разных типов устройств
@@ -70,6 +80,7 @@ class YandexParser:
         """Парсинг поисковой выдачи Яндекса"""
         session = await self.get_session()
         results = []
+        started = time.monotonic()
 
         try:
             device_type = profile.device_type
@@ -83,26 +94,34 @@ class YandexParser:
                         region=region_code)
 
             async with async_playwright() as p:
-                browser = await self.browser_manager._launch_browser(p, profile)
-                context = await self.browser_manager._create_context(browser, profile)
-                page = await context.new_page()
+                with stage("browser_launch"):
+                    browser = await self.browser_manager.launch_browser(p, profile)
+                    context = await self.browser_manager.create_context(browser, profile)
+                    page = await context.new_page()
 
                 try:
                     # Устанавливаем регион в куки
-                    await self._set_region(page, region_code)
+                    async with span("set_region", region=region_code):
+                        await self._set_region(page, region_code)
 
                     # Переходим на страницу поиска
-                    await page.goto(search_url, wait_until="networkidle", timeout=30000)
+                    with stage("navigation"):
+                        await page.goto(search_url, wait_until="networkidle", timeout=30000)
 
                     # Проверяем на блокировки
                     if await self._check_for_blocks(page, selectors):
+                        await self._update_profile_usage(
+                            profile, False, captcha=True,
+                            latency_ms=(time.monotonic() - started) * 1000
+                        )
                         await self.browser_manager.mark_profile_corrupted(
                             profile, "Captcha or blocking detected during search"
                         )
                         return []
 
                     # Вводим поисковый запрос
-                    await self._perform_search(page, keyword, selectors, device_type)
+                    with stage("search"):
+                        await self._perform_search(page, keyword, selectors, device_type)
 
                     # Парсим результаты по страницам
                     for page_num in range(1, pages + 1):
@@ -113,8 +132,9 @@ class YandexParser:
                                         device_type=device_type.value)
 
                             # Ждем загрузки результатов
-                            await page.wait_for_selector(selectors["results_container"],
-                                                         timeout=15000)
+                            async with span("wait_results", page=page_num):
+                                await page.wait_for_selector(selectors["results_container"],
+                                                             timeout=15000)
 
                             # Проверяем на блокировки на странице результатов
                             if await self._check_for_blocks(page, selectors):
@@ -123,14 +143,22 @@ class YandexParser:
                                 break
 
                             # Парсим результаты текущей страницы
-                            page_results = await self._parse_page_results(
-                                page, selectors, keyword, page_num, device_type
-                            )
+                            with stage("extraction"):
+                                page_results = await self._parse_page_results(
+                                    page, selectors, keyword, page_num, device_type
+                                )
                             results.extend(page_results)
+                            serp_pages_parsed_total.labels(
+                                device_type=device_type.value
+                            ).inc()
 
                             # Переходим на следующую страницу
                             if page_num < pages:
-                                if not await self._go_to_next_page(page, selectors, device_type):
+                                with stage("pagination"):
+                                    has_next = await self._go_to_next_page(
+                                        page, selectors, device_type
+                                    )
+                                if not has_next:
                                     logger.info("No more pages available", page_number=page_num)
                                     break
 
@@ -140,10 +168,14 @@ class YandexParser:
                             continue
 
                     # Обновляем статистику использования профиля
-                    await self._update_profile_usage(profile, True)
+                    await self._update_profile_usage(
+                        profile, True, latency_ms=(time.monotonic() - started) * 1000
+                    )
 
                 except Exception as e:
-                    await self._update_profile_usage(profile, False)
+                    await self._update_profile_usage(
+                        profile, False, latency_ms=(time.monotonic() - started) * 1000
+                    )
                     logger.error("Error during SERP parsing", error=str(e))
                     raise
 
@@ -200,6 +232,8 @@ class YandexParser:
             captcha_element = await page.query_selector(selectors["captcha"])
             if captcha_element:
                 logger.warning("Captcha detected")
+                captchas_total.labels(source="parser").inc()
+                blocks_total.labels(source="parser", kind="captcha").inc()
                 return True
 
             # Проверяем URL на признаки блокировки
@@ -207,6 +241,7 @@ class YandexParser:
             if any(keyword in current_url.lower() for keyword in
                    ["captcha", "blocked", "robot", "verify"]):
                 logger.warning("Blocking URL detected", url=current_url)
+                blocks_total.labels(source="parser", kind="url").inc()
                 return True
 
             # Проверяем заголовок страницы
@@ -214,6 +249,7 @@ class YandexParser:
             if any(keyword in title.lower() for keyword in
                    ["captcha", "blocked", "robot", "verify", "ошибка"]):
                 logger.warning("Blocking title detected", title=title)
+                blocks_total.labels(source="parser", kind="title").inc()
                 return True
 
             return False
@@ -235,26 +271,28 @@ class YandexParser:
             await search_input.fill("")
 
             # Печатаем запрос с человеческими задержками
-            for char in keyword:
-                await search_input.type(char)
-                await asyncio.sleep(random.uniform(0.05, 0.15))
+            async with span("typing", chars=len(keyword)):
+                for char in keyword:
+                    await search_input.type(char)
+                    await asyncio.sleep(random.uniform(0.05, 0.15))
 
-            # Небольшая пауза перед отправкой
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+                # Небольшая пауза перед отправкой
+                await asyncio.sleep(random.uniform(0.5, 1.5))
 
             # Отправляем запрос (Enter или кнопка)
-            if device_type == DeviceType.MOBILE or random.random() < 0.3:
-                # На мобильных или иногда на десктопе нажимаем кнопку
-                search_button = await page.query_selector(selectors["search_button"])
-                if search_button:
-                    await search_button.click()
+            async with span("submit"):
+                if device_type == DeviceType.MOBILE or random.random() < 0.3:
+                    # На мобильных или иногда на десктопе нажимаем кнопку
+                    search_button = await page.query_selector(selectors["search_button"])
+                    if search_button:
+                        await search_button.click()
+                    else:
+                        await search_input.press("Enter")
                 else:
                     await search_input.press("Enter")
-            else:
-                await search_input.press("Enter")
 
-            # Ждем загрузки результатов
-            await page.wait_for_load_state("networkidle")
+                # Ждем загрузки результатов
+                await page.wait_for_load_state("networkidle")
 
             logger.debug("Search performed", keyword=keyword)
 
@@ -436,28 +474,13 @@ class YandexParser:
                            device_type=device_type.value, error=str(e))
             return False
 
-    async def _update_profile_usage(self, profile: Profile, success: bool):
-        """Обновляет статистику использования профиля"""
-        session = await self.get_session()
-
-        try:
-            profile.total_usage_count += 1
-            profile.last_used = datetime.utcnow()
-
-            # Обновляем success rate
-            if profile.total_usage_count > 0:
-                if success:
-                    current_success = profile.success_rate * (profile.total_usage_count - 1)
-                    profile.success_rate = (current_success + 1) / profile.total_usage_count
-                else:
-                    current_success = profile.success_rate * (profile.total_usage_count - 1)
-                    profile.success_rate = current_success / profile.total_usage_count
-
-            await session.commit()
-
-        except Exception as e:
-            logger.error("Failed to update profile usage",
-                         profile_id=str(profile.id), error=str(e))
+    async def _update_profile_usage(self, profile: Profile, success: bool,
+                                    captcha: bool = False,
+                                    latency_ms: Optional[float] = None):
+        """Учитывает использование профиля в оценке его здоровья"""
+        profile_health_scorer.record(
+            str(profile.id), success, captcha=captcha, latency_ms=latency_ms
+        )
 
     async def check_position(self, keyword: str, target_domain: str, profile: Profile,
                              region_code: str = "213", max_pages: int = 10) -> Optional[int]:
@@ -1,8 +1,9 @@
 import structlog
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from app.api.admin.debug import router as debug_router
+from app.api.admin.cache import router as admin_cache_router
 from .api import (
     auth,
     domains,
@@ -13,8 +14,17 @@ from .api import (
     profiles,
     strategy_proxy,
     existing_tasks_debug,
+    analytics,
+    exports,
 )
 from .config import settings
+from .core.keyword_file_extractor import keyword_file_extractor
+from .core.region_search_index import region_search_index
+from .core.billing_cache import billing_cache
+from .core.auth_cache import auth_cache
+from .core.response_cache import response_cache
+from .core.pipeline_metrics import render_metrics
+from .core.resource_sampler import resource_sampler
 
 # Настройка логирования
 structlog.configure(
@@ -64,8 +74,11 @@ app.include_router(proxies.router, prefix="/api/v1")
 app.include_router(strategies.router, prefix="/api/v1")
 app.include_router(strategy_proxy.router, prefix="/api/v1")
 app.include_router(profiles.router, prefix="/api/v1")
+app.include_router(analytics.router, prefix="/api/v1")
+app.include_router(exports.router, prefix="/api/v1")
 
 app.include_router(debug_router, prefix="/api/v1/admin")
+app.include_router(admin_cache_router, prefix="/api/v1/admin")
 
 
 @app.exception_handler(Exception)
@@ -84,6 +97,34 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Загружаем индекс регионов, подписываемся на инвалидацию кэшей тарифов,
+    аутентификации и ответов, запускаем сэмплер ресурсов"""
+    try:
+        await region_search_index.load()
+    except Exception as e:
+        # Поиск регионов работает через БД, пока индекс не загрузится
+        logger.error("Failed to load region search index", error=str(e))
+    region_search_index.start()
+    billing_cache.start()
+    auth_cache.start()
+    response_cache.start()
+    # История ресурсов этого процесса для /analytics/resources/recent
+    resource_sampler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Останавливаем фоновые компоненты"""
+    keyword_file_extractor.shutdown()
+    await region_search_index.stop()
+    await billing_cache.stop()
+    await auth_cache.stop()
+    await response_cache.stop()
+    await resource_sampler.stop()
+
+
 @app.get("/")
 async def root():
     """Корневой endpoint"""
@@ -100,6 +141,13 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики Prometheus"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
 
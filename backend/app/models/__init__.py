@@ -14,6 +14,7 @@ from .analytics import (
     BackupSchedule,
     BackupHistory,
     CacheSettings,
+    AnalyticsWatermark,
 )
 from .base import Base
 from .profile import (
@@ -23,6 +24,7 @@ from .profile import (
     ServerConfig,
     WorkerNode,
     DeviceType,
+    ProfileWarmupQueue,
 )
 from .proxy import (
     ProjectProxy,
@@ -32,12 +34,20 @@ from .proxy import (
     ProxyProtocol,
     ProxyStatus,
 )
-from .task import Task, ParseResult, PositionHistory
+from .task import (
+    Task,
+    ParseResult,
+    PositionHistory,
+    KeywordLatestPosition,
+    TaskArchive,
+    CheckSchedulerBucket,
+)
 from .user import (
     User,
     TariffPlan,
     UserBalance,
     BalanceTransaction,
+    BillingLedgerEntry,
     Region,
     UserDomain,
     UserKeyword,
@@ -53,6 +63,7 @@ from .strategies import (
     StrategyDataSource,
     ProjectStrategy,
     StrategyExecutionLog,
+    StrategyNurtureCounter,
 )
 
 from .strategy_proxy import (
@@ -73,6 +84,7 @@ __all__ = [
     "User",
     "UserBalance",
     "BalanceTransaction",
+    "BillingLedgerEntry",
     "UserDomain",
     "UserKeyword",
     "UserDomainSettings",
@@ -82,11 +94,15 @@ __all__ = [
     "Profile",
     "ProfileFingerprint",
     "ProfileLifecycle",
+    "ProfileWarmupQueue",
     "DeviceType",
     # Task models
     "Task",
     "ParseResult",
     "PositionHistory",
+    "KeywordLatestPosition",
+    "TaskArchive",
+    "CheckSchedulerBucket",
     # Analytics models
     "SystemConfig",
     "SystemLog",
@@ -98,6 +114,7 @@ __all__ = [
     "UserActivityStats",
     "TaskAnalytics",
     "ParsingAnalytics",
+    "AnalyticsWatermark",
     # Infrastructure models
     "BackupSchedule",
     "BackupHistory",
@@ -115,6 +132,7 @@ __all__ = [
     "StrategyDataSource",
     "ProjectStrategy",
     "StrategyExecutionLog",
+    "StrategyNurtureCounter",
     # Alert and Debug models
     "AlertRule",
     "AlertHistory",
@@ -92,8 +92,8 @@ class AlertHistory(Base, UUIDMixin, TimestampMixin):
 class DebugVNCSession(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "debug_vnc_sessions"
 
-    # Связь с задачей
-    task_id = Column(UUID(as_uuid=True), ForeignKey("tasks.id"), nullable=False)
+    # Связь с задачей (без внешнего ключа: задача может уйти в tasks_archive)
+    task_id = Column(UUID(as_uuid=True), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     # VNC параметры
@@ -135,4 +135,6 @@ class DebugVNCSession(Base, UUIDMixin, TimestampMixin):
 
     # Relationships
     user = relationship("User")
-    task = relationship("Task")
+    task = relationship(
+        "Task", primaryjoin="foreign(DebugVNCSession.task_id) == Task.id"
+    )
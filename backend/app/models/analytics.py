@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey, JSON, Numeric, Date, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, ForeignKey, JSON, Numeric, Date, Boolean, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin, UUIDMixin
@@ -86,9 +86,19 @@ class FinancialTransactionsLog(Base, UUIDMixin, TimestampMixin):
 
 class PerformanceMetrics(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "performance_metrics"
+    __table_args__ = (
+        Index(
+            "ix_performance_metrics_server_resolution_time",
+            "server_id",
+            "resolution",
+            "measurement_time",
+        ),
+    )
 
     server_id = Column(String(255), nullable=False)
     metric_type = Column(String(100), nullable=False)  # cpu, ram, queue_size, response_time
+    # Разрешение агрегата: 1m (среднее за минуту) или 1h (см. ResourceMonitor)
+    resolution = Column(String(10), nullable=False, default="1m", server_default="1m")
     value = Column(Numeric(10, 2), nullable=False)
     measurement_time = Column(DateTime, default=datetime.utcnow)
     details = Column(JSON)
@@ -96,6 +106,9 @@ class PerformanceMetrics(Base, UUIDMixin, TimestampMixin):
 
 class BusinessMetrics(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "business_metrics"
+    __table_args__ = (
+        UniqueConstraint("date", "metric_name", name="uq_business_metrics_date_metric"),
+    )
 
     date = Column(Date, default=date.today)
     metric_name = Column(String(100), nullable=False)  # registrations, conversions, arpu, retention
@@ -105,6 +118,9 @@ class BusinessMetrics(Base, UUIDMixin, TimestampMixin):
 
 class UserActivityStats(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "user_activity_stats"
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_user_activity_stats_user_date"),
+    )
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     date = Column(Date, default=date.today)
@@ -120,6 +136,9 @@ class UserActivityStats(Base, UUIDMixin, TimestampMixin):
 
 class TaskAnalytics(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "task_analytics"
+    __table_args__ = (
+        UniqueConstraint("date", "task_type", "server_id", name="uq_task_analytics_date_type_server"),
+    )
 
     date = Column(Date, default=date.today)
     task_type = Column(String(50), nullable=False)
@@ -127,11 +146,14 @@ class TaskAnalytics(Base, UUIDMixin, TimestampMixin):
     total_completed = Column(Integer, default=0)
     total_failed = Column(Integer, default=0)
     avg_execution_time = Column(Numeric(10, 2))
-    server_id = Column(String(255))
+    server_id = Column(String(255), nullable=False, default="unassigned")
 
 
 class ParsingAnalytics(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "parsing_analytics"
+    __table_args__ = (
+        UniqueConstraint("date", "user_id", "domain_id", name="uq_parsing_analytics_date_user_domain"),
+    )
 
     date = Column(Date, default=date.today)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -147,6 +169,16 @@ class ParsingAnalytics(Base, UUIDMixin, TimestampMixin):
     domain = relationship("UserDomain")
 
 
+class AnalyticsWatermark(Base, UUIDMixin, TimestampMixin):
+    """Позиция, до которой источник уже свернут в дневные агрегаты"""
+    __tablename__ = "analytics_watermarks"
+
+    source = Column(String(100), unique=True, nullable=False)  # tasks, position_history
+    last_timestamp = Column(DateTime)
+    last_id = Column(String(64))  # второй ключ для строк с одинаковым временем
+    rows_processed = Column(BigInteger, default=0)
+
+
 class BackupSchedule(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "backup_schedule"
 
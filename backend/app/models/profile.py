@@ -59,11 +59,19 @@ class Profile(Base, UUIDMixin, TimestampMixin):
     warmup_sites_visited = Column(Integer, default=0)
     status = Column(
         String(50), default="new"
-    )  # new, warming, ready, blocked, corrupted
+    )  # new, warming, ready, blocked, corrupted, retired
 
     # Метрики использования
     total_usage_count = Column(Integer, default=0)
-    success_rate = Column(Float, default=0.0)  # процент успешных использований
+    success_rate = Column(Float, default=0.0)  # доля успешных использований (0-1)
+
+    # Здоровье профиля: экспоненциально затухающие метрики (см. profile_health)
+    health_score = Column(Float, default=0.8, nullable=False)  # 0-1
+    health_weight = Column(Float, default=0.0, nullable=False)  # затухающее число событий
+    decayed_success = Column(Float, default=1.0, nullable=False)
+    decayed_captcha = Column(Float, default=0.0, nullable=False)
+    decayed_latency_ms = Column(Float, default=0.0, nullable=False)
+    health_updated_at = Column(DateTime)
 
     # Relationships
     lifecycle = relationship("ProfileLifecycle", back_populates="profile")
@@ -189,9 +197,36 @@ class WorkerNode(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "worker_nodes"
 
     node_id = Column(String(255), unique=True, nullable=False)
+    server_id = Column(String(255), index=True)  # UserServerPreferences.preferred_server_id
     hostname = Column(String(255), nullable=False)
     location = Column(String(100))
     status = Column(String(50), default="offline")  # online, offline, busy, maintenance
     max_workers = Column(Integer, default=10)
+    active_tasks = Column(Integer, default=0)
+    free_slots = Column(Integer, default=0)
     last_heartbeat = Column(DateTime)
-    capabilities = Column(JSON)  # браузеры, прокси и т.д.
+    # Устройства, регионы, прокси и прогретые профили (см. app/core/node_registry.py)
+    capabilities = Column(JSON)
+
+
+class ProfileWarmupQueue(Base, UUIDMixin, TimestampMixin):
+    """Отложенные запросы на догуливание профилей (не более одного на профиль)"""
+
+    __tablename__ = "profile_warmup_queue"
+
+    profile_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("profiles.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    device_type = Column(String(20), nullable=False, default="desktop")
+    reason = Column(String(50), default="cascade")  # cascade, retry
+    request_count = Column(Integer, default=1)  # сколько запросов схлопнуто
+    attempts = Column(Integer, default=0)  # неудачные попытки догуливания
+    first_requested_at = Column(DateTime, nullable=False)
+    last_requested_at = Column(DateTime, nullable=False)
+    not_before = Column(DateTime, nullable=False)
+
+    # Relationships
+    profile = relationship("Profile")
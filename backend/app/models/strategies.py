@@ -1,6 +1,15 @@
 # backend/app/models/strategies.py
 
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import (
+    Column,
+    String,
+    Boolean,
+    DateTime,
+    Integer,
+    Text,
+    ForeignKey,
+    JSON,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -150,7 +159,8 @@ class StrategyExecutionLog(Base):
     strategy_id = Column(
         UUID(as_uuid=True), ForeignKey("user_strategies.id"), nullable=False
     )
-    task_id = Column(UUID(as_uuid=True), ForeignKey("tasks.id"))
+    # Без внешнего ключа: задача может быть перенесена в tasks_archive
+    task_id = Column(UUID(as_uuid=True))
     # Values: 'warmup', 'position_check'
     execution_type = Column(String(50), nullable=False)
     profile_id = Column(UUID(as_uuid=True), ForeignKey("profiles.id"))
@@ -164,3 +174,26 @@ class StrategyExecutionLog(Base):
 
     # Relationships - только внутренние между стратегиями
     strategy = relationship("UserStrategy", back_populates="execution_logs")
+
+
+class StrategyNurtureCounter(Base):
+    """Счетчики задач нагула стратегии.
+
+    Обновляются в той же транзакции, что меняет статус задачи
+    (см. app/core/strategy_nurture_counters.py). pending/running - текущее
+    число задач, nurtured/failed - накопленное: задачи, ушедшие в
+    tasks_archive, из счетчиков не вычитаются.
+    """
+
+    __tablename__ = "strategy_nurture_counters"
+
+    strategy_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user_strategies.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    pending = Column(Integer, nullable=False, server_default="0")
+    running = Column(Integer, nullable=False, server_default="0")
+    nurtured = Column(Integer, nullable=False, server_default="0")
+    failed = Column(Integer, nullable=False, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -5,11 +5,18 @@ from sqlalchemy import (
     Column,
     String,
     Integer,
+    SmallInteger,
+    BigInteger,
+    Float,
+    Identity,
     DateTime,
     Text,
     ForeignKey,
     JSON,
+    LargeBinary,
     Numeric,
+    Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -21,6 +28,43 @@ from datetime import datetime
 
 class Task(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Очередь расчетов: завершенные задачи с резервом, еще не списанные
+        Index(
+            "ix_tasks_unsettled",
+            "user_id",
+            "completed_at",
+            postgresql_where=text("settled_at IS NULL AND reserved_amount > 0"),
+        ),
+        # Последние сохраненные трассы (см. app/core/task_tracing.py)
+        Index(
+            "ix_tasks_traced",
+            "created_at",
+            postgresql_where=text("trace IS NOT NULL"),
+        ),
+        # Очередь и выполняющиеся задачи; завершенные в индекс не попадают
+        # и со временем уходят в tasks_archive (см. app/core/task_archive.py)
+        Index(
+            "ix_tasks_live",
+            "status",
+            text("priority DESC"),
+            "created_at",
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+        # Пересчет счетчиков стратегий (см. app/core/strategy_nurture_counters.py)
+        Index(
+            "ix_tasks_strategy_status",
+            "strategy_id",
+            "status",
+            postgresql_where=text("strategy_id IS NOT NULL"),
+        ),
+        # Поиск просроченной аренды reaper'ом (см. app/core/task_leases.py)
+        Index(
+            "ix_tasks_running_lease",
+            "lease_expires_at",
+            postgresql_where=text("status = 'running'"),
+        ),
+    )
 
     task_type = Column(
         String(50), nullable=False
@@ -53,18 +97,28 @@ class Task(Base, UUIDMixin, TimestampMixin):
     # Результаты
     result = Column(JSON)
     error_message = Column(Text)
+    # Трасса выполнения по спанам (только отобранные, см. app/core/task_tracing.py)
+    trace = Column(JSON)
 
     # Временные метки
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
+    # Резерв списан или снят (см. app/services/billing_settlement_service.py)
+    settled_at = Column(DateTime)
 
     # Связи
     profile_id = Column(UUID(as_uuid=True), ForeignKey("profiles.id"))
     worker_id = Column(String(255))
+    # Аренда исполнителя; продлевается, пока воркер жив
+    lease_expires_at = Column(DateTime)
 
     # Relationships
     profile = relationship("Profile")
-    parse_results = relationship("ParseResult", back_populates="task")
+    parse_results = relationship(
+        "ParseResult",
+        primaryjoin="foreign(ParseResult.task_id) == Task.id",
+        back_populates="task",
+    )
     strategy = relationship("UserStrategy", foreign_keys=[strategy_id])
 
     @property
@@ -138,7 +192,8 @@ class Task(Base, UUIDMixin, TimestampMixin):
 class ParseResult(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "parse_results"
 
-    task_id = Column(UUID(as_uuid=True), ForeignKey("tasks.id"), nullable=False)
+    # Без внешнего ключа: задача может быть перенесена в tasks_archive
+    task_id = Column(UUID(as_uuid=True), nullable=False)
     keyword = Column(String(500), nullable=False)
     position = Column(Integer)
     url = Column(Text)
@@ -149,25 +204,150 @@ class ParseResult(Base, UUIDMixin, TimestampMixin):
     parsed_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
-    task = relationship("Task", back_populates="parse_results")
+    task = relationship(
+        "Task",
+        primaryjoin="foreign(ParseResult.task_id) == Task.id",
+        back_populates="parse_results",
+    )
+
+
+class TaskArchive(Base):
+    """Архив завершенных задач.
+
+    Таблица секционирована по месяцам (RANGE по created_at), секции создает
+    TaskArchiver при переносе. parameters, result и trace хранятся одним
+    сжатым zlib JSON (payload) - читаются только при запросе конкретной
+    задачи, поэтому в списках и статистике не распаковываются.
+    """
 
+    __tablename__ = "tasks_archive"
+    __table_args__ = (
+        Index("ix_tasks_archive_id", "id"),
+        Index("ix_tasks_archive_user_created", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    created_at = Column(DateTime, primary_key=True, nullable=False)
+
+    task_type = Column(String(50), nullable=False)
+    device_type = Column(String(20))
+    status = Column(String(50), nullable=False)
+    priority = Column(Integer)
+    user_id = Column(UUID(as_uuid=True))
+    strategy_id = Column(UUID(as_uuid=True))
+    profile_id = Column(UUID(as_uuid=True))
+    worker_id = Column(String(255))
+    reserved_amount = Column(Numeric(10, 2))
+    error_message = Column(Text)
+
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    settled_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # zlib(JSON {"parameters", "result", "trace"})
+    payload = Column(LargeBinary)
+    payload_size = Column(Integer)  # размер до сжатия
+
+
+class PositionHistory(Base):
+    """История позиций в режиме временного ряда.
+
+    Таблица секционирована по месяцам (RANGE по check_date), секции создает
+    и удаляет PositionHistoryPartitionManager. Внешних ключей нет, чтобы не
+    платить за их проверку на каждой вставке и не мешать удалению ключевых
+    слов - старые строки уходят вместе с секциями по retention.
+    """
 
-class PositionHistory(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "position_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (check_date)"}
+
+    id = Column(BigInteger, Identity(always=True), primary_key=True)
+    check_date = Column(
+        DateTime, primary_key=True, nullable=False, default=datetime.utcnow
+    )
+
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    domain_id = Column(UUID(as_uuid=True), nullable=False)
+    keyword_id = Column(UUID(as_uuid=True), nullable=False)
+    position = Column(SmallInteger)  # NULL - домен не найден в выдаче
+    url = Column(Text)
+    serp_features = Column(JSON)  # дополнительные данные о выдаче
 
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    domain_id = Column(
-        UUID(as_uuid=True), ForeignKey("user_domains.id"), nullable=False
+    # Relationships
+    user = relationship(
+        "User",
+        primaryjoin="foreign(PositionHistory.user_id) == User.id",
+        viewonly=True,
+    )
+    domain = relationship(
+        "UserDomain",
+        primaryjoin="foreign(PositionHistory.domain_id) == UserDomain.id",
+        viewonly=True,
+    )
+    keyword = relationship(
+        "UserKeyword",
+        primaryjoin="foreign(PositionHistory.keyword_id) == UserKeyword.id",
+        viewonly=True,
+    )
+
+
+class KeywordLatestPosition(Base, TimestampMixin):
+    """Последняя позиция ключевого слова для дашбордов.
+
+    Обновляется в той же транзакции, что пишет PositionHistory
+    (см. app/core/keyword_positions.py), поэтому список ключевых слов с
+    текущей позицией и изменением строится одним запросом без чтения истории.
+    """
+
+    __tablename__ = "keyword_latest_positions"
+    __table_args__ = (
+        Index("ix_keyword_latest_positions_domain", "domain_id"),
     )
+
     keyword_id = Column(
-        UUID(as_uuid=True), ForeignKey("user_keywords.id"), nullable=False
+        UUID(as_uuid=True),
+        ForeignKey("user_keywords.id", ondelete="CASCADE"),
+        primary_key=True,
     )
-    position = Column(Integer)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    domain_id = Column(UUID(as_uuid=True), nullable=False)
+
+    position = Column(SmallInteger)  # NULL - домен не найден в выдаче
     url = Column(Text)
-    check_date = Column(DateTime, default=datetime.utcnow)
-    serp_features = Column(JSON)  # дополнительные данные о выдаче
+    last_check_date = Column(DateTime, nullable=False)
+
+    previous_position = Column(SmallInteger)
+    previous_check_date = Column(DateTime)
+
+    # Лучшая/худшая найденная позиция за 30 дней до последней проверки
+    best_position_30d = Column(SmallInteger)
+    worst_position_30d = Column(SmallInteger)
 
     # Relationships
-    user = relationship("User")
-    domain = relationship("UserDomain")
-    keyword = relationship("UserKeyword")
+    keyword = relationship("UserKeyword", back_populates="latest_position")
+
+    @property
+    def position_change(self) -> Optional[int]:
+        """Изменение позиции (положительное - рост в выдаче)"""
+        if self.position is None or self.previous_position is None:
+            return None
+        return self.previous_position - self.position
+
+
+class CheckSchedulerBucket(Base):
+    """Token bucket пары (регион, устройство) планировщика проверок.
+
+    Состояние хранится в БД и меняется только под advisory lock тика
+    (см. app/core/check_scheduler.py), поэтому лимит общий для всех
+    процессов, а не умножается на их число. tokens - остаток на момент
+    updated_at, пополнение считается при чтении.
+    """
+
+    __tablename__ = "check_scheduler_buckets"
+
+    region_code = Column(String(20), primary_key=True)
+    device_type = Column(String(20), primary_key=True)  # desktop, mobile
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
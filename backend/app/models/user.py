@@ -8,6 +8,9 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     JSON,
+    UniqueConstraint,
+    Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -25,6 +28,7 @@ class User(Base, UUIDMixin, TimestampMixin):
     password_hash = Column(String(255), nullable=False)
     subscription_plan = Column(String(50), default="basic")
     api_key = Column(String(255), unique=True, index=True)
+    api_key_hash = Column(String(64), unique=True, index=True)  # sha256(api_key)
     balance = Column(Numeric(10, 2), default=0.00)
     is_active = Column(Boolean, default=True)
 
@@ -44,7 +48,11 @@ class User(Base, UUIDMixin, TimestampMixin):
         foreign_keys="BalanceTransaction.user_id",
         back_populates="user",
     )
-    position_history = relationship("PositionHistory", back_populates="user")
+    position_history = relationship(
+        "PositionHistory",
+        primaryjoin="User.id == foreign(PositionHistory.user_id)",
+        viewonly=True,
+    )
     server_preferences = relationship("UserServerPreferences", back_populates="user")
     activity_stats = relationship("UserActivityStats", back_populates="user")
 
@@ -136,6 +144,26 @@ class BalanceTransaction(Base, UUIDMixin, TimestampMixin):
     admin = relationship("User", foreign_keys=[admin_id])
 
 
+class BillingLedgerEntry(Base, UUIDMixin, TimestampMixin):
+    """Расчет по резерву задачи.
+
+    idempotency_key уникален ("task:<id>"), поэтому повторный расчет той же
+    задачи (падение посреди пакета, два воркера) не спишет деньги дважды.
+    """
+
+    __tablename__ = "billing_ledger"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    task_id = Column(UUID(as_uuid=True), nullable=True)
+    idempotency_key = Column(String(100), nullable=False, unique=True)
+    reserved_amount = Column(Numeric(10, 2), nullable=False, default=0)
+    charged_amount = Column(Numeric(10, 2), nullable=False, default=0)
+    # Пакетное списание, в которое вошла запись
+    transaction_id = Column(
+        UUID(as_uuid=True), ForeignKey("balance_transactions.id"), nullable=True
+    )
+
+
 class Region(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "regions"
 
@@ -164,6 +192,20 @@ class UserDomain(Base, UUIDMixin, TimestampMixin):
 
 class UserKeyword(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "user_keywords"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id",
+            "domain_id",
+            "keyword",
+            "device_type",
+            name="uq_user_keywords_user_domain_keyword_device",
+        ),
+        Index(
+            "ix_user_keywords_next_check_active",
+            "next_check_at",
+            postgresql_where=text("is_active"),
+        ),
+    )
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     domain_id = Column(
@@ -180,10 +222,15 @@ class UserKeyword(Base, UUIDMixin, TimestampMixin):
 
     is_active = Column(Boolean, default=True)
     check_frequency = Column(String(20), default="daily")  # daily, weekly, monthly
+    # Когда ключ созреет для следующей регулярной проверки (NULL - сразу)
+    next_check_at = Column(DateTime, nullable=True)
 
     # Relationships
     user = relationship("User")
     domain = relationship("UserDomain", back_populates="keywords")
+    latest_position = relationship(
+        "KeywordLatestPosition", back_populates="keyword", uselist=False
+    )
     # region = relationship("Region")
     # region = relationship("YandexRegion")
 
@@ -216,6 +263,14 @@ class UserDomainSettings(Base, UUIDMixin, TimestampMixin):
 
 class UserServerPreferences(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "user_server_preferences"
+    __table_args__ = (
+        # Привязка ищется при выборе каждой задачи (см. app/core/node_registry.py)
+        Index(
+            "ix_user_server_preferences_user_id",
+            "user_id",
+            postgresql_where=text("is_active"),
+        ),
+    )
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     preferred_server_id = Column(String(255), nullable=False)
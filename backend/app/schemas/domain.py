@@ -56,6 +56,21 @@ class KeywordResponse(BaseModel):
     check_frequency: str
     created_at: str
 
+    # Последняя проверка позиции (keyword_latest_positions)
+    position: Optional[int] = None
+    previous_position: Optional[int] = None
+    position_change: Optional[int] = None
+    best_position_30d: Optional[int] = None
+    worst_position_30d: Optional[int] = None
+    url: Optional[str] = None
+    last_check_date: Optional[str] = None
+
+
+class KeywordListResponse(BaseModel):
+    keywords: List[KeywordResponse]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
 
 class RegionResponse(BaseModel):
     id: str
@@ -69,7 +84,7 @@ class RegionResponse(BaseModel):
 
 
 class BulkKeywordsAdd(BaseModel):
-    keywords: List[str] = Field(..., min_items=1, max_items=1000)
+    keywords: List[str] = Field(..., min_items=1, max_items=100000)
     device_type: str = "desktop"
     check_frequency: str = "daily"
 
@@ -121,6 +136,31 @@ class WordFileLoad(BaseModel):
     url: str = Field(..., description="URL Word документа")
 
 
+class KeywordFileImport(BaseModel):
+    url: str = Field(..., description="URL файла с ключевыми словами")
+    file_type: str = Field(..., description="text, excel или word")
+    sheet: int = Field(default=1, ge=1, description="Номер листа (excel)")
+    start_row: int = Field(default=1, ge=1, description="Начальная строка (excel)")
+    device_type: str = "desktop"
+    check_frequency: str = "daily"
+
+    @validator("file_type")
+    def validate_file_type(cls, v):
+        v = v.lower()
+        valid_types = ["text", "excel", "word"]
+        if v not in valid_types:
+            raise ValueError(f"file_type должен быть одним из: {valid_types}")
+        return v
+
+    @validator("device_type")
+    def validate_device_type(cls, v):
+        v = v.lower()
+        valid_types = ["desktop", "mobile", "tablet"]
+        if v not in valid_types:
+            raise ValueError(f"device_type должен быть одним из: {valid_types}")
+        return v
+
+
 class KeywordUpdate(BaseModel):
     keyword: str = Field(..., min_length=1, max_length=500)
     device_type: str = "desktop"
@@ -126,7 +126,7 @@ class ParseResultResponse(BaseModel):
 
 
 class PositionHistoryResponse(BaseModel):
-    id: str
+    id: int
     user_id: str
     domain_id: str
     keyword_id: str
@@ -0,0 +1,466 @@
+# backend/app/services/analytics_rollup_service.py
+"""
+Инкрементальная свертка tasks и position_history в дневные агрегаты.
+
+Для каждого источника хранится водяной знак (время, id) последней
+обработанной строки. Очередная пачка строк после водяного знака дает набор
+затронутых ключей (день + тип задачи, день + пользователь), агрегаты по этим
+ключам пересчитываются целиком из исходных таблиц и записываются вместе с
+новым водяным знаком в одной транзакции. Поэтому повторная обработка той же
+пачки дает тот же результат, а прерванный проход продолжается с места
+последнего коммита.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Set, Tuple, Optional
+
+import structlog
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import AnalyticsWatermark
+
+logger = structlog.get_logger(__name__)
+
+# Сервер, на котором выполнялась задача: worker-<hostname>-<YYYYmmdd_HHMMSS>
+SERVER_ID_SQL = (
+    "COALESCE(substring(t.worker_id from '^worker-(.+)-[0-9]{8}_[0-9]{6}$'), "
+    "t.worker_id, 'unassigned')"
+)
+
+FETCH_TASKS_SQL = text(
+    """
+    SELECT id, task_type, user_id, created_at, completed_at, updated_at
+    FROM tasks
+    WHERE (updated_at, id) > (CAST(:last_ts AS timestamp), CAST(:last_id AS uuid))
+      AND updated_at < CAST(:until AS timestamp)
+    ORDER BY updated_at, id
+    LIMIT :limit
+    """
+)
+
+FETCH_POSITIONS_SQL = text(
+    """
+    SELECT id, check_date, user_id
+    FROM position_history
+    WHERE (check_date, id) > (CAST(:last_ts AS timestamp), CAST(:last_id AS bigint))
+      AND check_date < CAST(:until AS timestamp)
+    ORDER BY check_date, id
+    LIMIT :limit
+    """
+)
+
+DELETE_TASK_ANALYTICS_SQL = text(
+    """
+    DELETE FROM task_analytics ta
+    USING unnest(CAST(:days AS date[]), CAST(:task_types AS text[])) AS k(day, task_type)
+    WHERE ta.date = k.day AND ta.task_type = k.task_type
+    """
+)
+
+INSERT_TASK_ANALYTICS_SQL = text(
+    f"""
+    WITH keys AS (
+        SELECT * FROM unnest(CAST(:days AS date[]), CAST(:task_types AS text[]))
+            AS k(day, task_type)
+    ),
+    created AS (
+        SELECT k.day, k.task_type, {SERVER_ID_SQL} AS server_id,
+               count(*) AS total_created
+        FROM keys k
+        JOIN tasks t ON t.task_type = k.task_type
+            AND t.created_at >= k.day AND t.created_at < k.day + 1
+        GROUP BY 1, 2, 3
+    ),
+    finished AS (
+        SELECT k.day, k.task_type, {SERVER_ID_SQL} AS server_id,
+               count(*) FILTER (WHERE t.status = 'completed') AS total_completed,
+               count(*) FILTER (WHERE t.status = 'failed') AS total_failed,
+               avg(EXTRACT(EPOCH FROM (t.completed_at - t.started_at)))
+                   FILTER (WHERE t.status = 'completed' AND t.started_at IS NOT NULL)
+                   AS avg_execution_time
+        FROM keys k
+        JOIN tasks t ON t.task_type = k.task_type
+            AND t.completed_at >= k.day AND t.completed_at < k.day + 1
+        GROUP BY 1, 2, 3
+    )
+    INSERT INTO task_analytics (
+        id, date, task_type, server_id, total_created, total_completed,
+        total_failed, avg_execution_time, created_at, updated_at
+    )
+    SELECT gen_random_uuid(),
+           COALESCE(c.day, f.day),
+           COALESCE(c.task_type, f.task_type),
+           COALESCE(c.server_id, f.server_id),
+           COALESCE(c.total_created, 0),
+           COALESCE(f.total_completed, 0),
+           COALESCE(f.total_failed, 0),
+           round(f.avg_execution_time::numeric, 2),
+           now(), now()
+    FROM created c
+    FULL OUTER JOIN finished f
+        ON c.day = f.day AND c.task_type = f.task_type AND c.server_id = f.server_id
+    """
+)
+
+UPSERT_PARSING_ANALYTICS_SQL = text(
+    """
+    WITH keys AS (
+        SELECT * FROM unnest(CAST(:days AS date[]), CAST(:user_ids AS uuid[]))
+            AS k(day, user_id)
+    ),
+    history AS (
+        SELECT k.day, d.user_id, d.id AS domain_id,
+               count(h.id) AS checks,
+               avg(h.position) AS avg_position
+        FROM keys k
+        JOIN user_domains d ON d.user_id = k.user_id
+        JOIN position_history h ON h.domain_id = d.id
+            AND h.check_date >= k.day AND h.check_date < k.day + 1
+        GROUP BY 1, 2, 3
+    ),
+    task_checks AS (
+        SELECT k.day, t.user_id, kw.domain_id,
+               count(*) FILTER (WHERE e->>'error' IS NOT NULL) AS failed,
+               sum(
+                   CASE WHEN e->>'error' IS NULL
+                   THEN COALESCE(t.reserved_amount, 0)
+                        / GREATEST(json_array_length(t.result->'results'), 1)
+                   ELSE 0 END
+               ) AS cost
+        FROM keys k
+        JOIN tasks t ON t.user_id = k.user_id
+            AND t.task_type = 'check_positions'
+            AND t.completed_at >= k.day AND t.completed_at < k.day + 1
+        CROSS JOIN LATERAL json_array_elements(
+            COALESCE(t.result->'results', '[]'::json)
+        ) AS e
+        JOIN user_keywords kw ON kw.id = CAST(e->>'keyword_id' AS uuid)
+        GROUP BY 1, 2, 3
+    )
+    INSERT INTO parsing_analytics (
+        id, date, user_id, domain_id, successful_checks, failed_checks,
+        total_cost, avg_position, regions_count, created_at, updated_at
+    )
+    SELECT gen_random_uuid(),
+           COALESCE(h.day, c.day),
+           COALESCE(h.user_id, c.user_id),
+           COALESCE(h.domain_id, c.domain_id),
+           COALESCE(h.checks, 0),
+           COALESCE(c.failed, 0),
+           round(COALESCE(c.cost, 0)::numeric, 2),
+           round(h.avg_position::numeric, 2),
+           CASE WHEN d.region_id IS NULL THEN 0 ELSE 1 END,
+           now(), now()
+    FROM history h
+    FULL OUTER JOIN task_checks c
+        ON h.day = c.day AND h.user_id = c.user_id AND h.domain_id = c.domain_id
+    JOIN user_domains d ON d.id = COALESCE(h.domain_id, c.domain_id)
+    ON CONFLICT (date, user_id, domain_id) DO UPDATE SET
+        successful_checks = EXCLUDED.successful_checks,
+        failed_checks = EXCLUDED.failed_checks,
+        total_cost = EXCLUDED.total_cost,
+        avg_position = EXCLUDED.avg_position,
+        regions_count = EXCLUDED.regions_count,
+        updated_at = now()
+    """
+)
+
+UPSERT_USER_ACTIVITY_SQL = text(
+    """
+    WITH keys AS (
+        SELECT * FROM unnest(CAST(:days AS date[]), CAST(:user_ids AS uuid[]))
+            AS k(day, user_id)
+    )
+    INSERT INTO user_activity_stats (
+        id, user_id, date, checks_count, domains_count, total_spent,
+        created_at, updated_at
+    )
+    SELECT gen_random_uuid(),
+           k.user_id,
+           k.day,
+           (
+               SELECT count(*)
+               FROM user_domains d
+               JOIN position_history h ON h.domain_id = d.id
+               WHERE d.user_id = k.user_id
+                 AND h.check_date >= k.day AND h.check_date < k.day + 1
+           ),
+           (SELECT count(*) FROM user_domains d WHERE d.user_id = k.user_id),
+           (
+               SELECT COALESCE(-sum(bt.amount), 0)
+               FROM balance_transactions bt
+               WHERE bt.user_id = k.user_id
+                 AND bt.type = 'charge'
+                 AND bt.created_at >= k.day AND bt.created_at < k.day + 1
+           ),
+           now(), now()
+    FROM keys k
+    JOIN users u ON u.id = k.user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        checks_count = EXCLUDED.checks_count,
+        domains_count = EXCLUDED.domains_count,
+        total_spent = EXCLUDED.total_spent,
+        updated_at = now()
+    """
+)
+
+UPSERT_BUSINESS_METRICS_SQL = text(
+    """
+    WITH days AS (
+        SELECT unnest(CAST(:days AS date[])) AS day
+    ),
+    metrics AS (
+        SELECT day, 'registrations' AS metric_name,
+               (SELECT count(*) FROM users
+                WHERE created_at >= day AND created_at < day + 1)::numeric AS value
+        FROM days
+        UNION ALL
+        SELECT day, 'active_users',
+               (SELECT count(DISTINCT user_id) FROM tasks
+                WHERE user_id IS NOT NULL
+                  AND created_at >= day AND created_at < day + 1)::numeric
+        FROM days
+        UNION ALL
+        SELECT day, 'position_checks',
+               (SELECT count(*) FROM position_history
+                WHERE check_date >= day AND check_date < day + 1)::numeric
+        FROM days
+        UNION ALL
+        SELECT day, 'revenue',
+               (SELECT COALESCE(-sum(amount), 0) FROM balance_transactions
+                WHERE type = 'charge'
+                  AND created_at >= day AND created_at < day + 1)
+        FROM days
+        UNION ALL
+        SELECT day, 'topups',
+               (SELECT COALESCE(sum(amount), 0) FROM balance_transactions
+                WHERE type = 'topup'
+                  AND created_at >= day AND created_at < day + 1)
+        FROM days
+    )
+    INSERT INTO business_metrics (id, date, metric_name, value, created_at, updated_at)
+    SELECT gen_random_uuid(), day, metric_name, value, now(), now()
+    FROM metrics
+    ON CONFLICT (date, metric_name) DO UPDATE SET
+        value = EXCLUDED.value,
+        updated_at = now()
+    """
+)
+
+# Минимальные значения водяного знака для пустого источника
+EPOCH = datetime(1970, 1, 1)
+ZERO_UUID = "00000000-0000-0000-0000-000000000000"
+
+
+class AnalyticsRollupService:
+    """Инкрементальная свертка сырых таблиц в дневные агрегаты"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def run(
+        self,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Обрабатывает новые строки всех источников"""
+        batch_size = batch_size or settings.analytics_rollup_batch_size
+        max_batches = max_batches or settings.analytics_rollup_max_batches
+
+        stats = {"tasks": 0, "position_history": 0, "batches": 0}
+
+        for _ in range(max_batches):
+            processed = await self._process_tasks_batch(batch_size)
+            stats["tasks"] += processed
+            stats["batches"] += int(processed > 0)
+            if processed < batch_size:
+                break
+
+        for _ in range(max_batches):
+            processed = await self._process_positions_batch(batch_size)
+            stats["position_history"] += processed
+            stats["batches"] += int(processed > 0)
+            if processed < batch_size:
+                break
+
+        if stats["batches"]:
+            logger.info("Analytics rollup completed", **stats)
+
+        return stats
+
+    # ===================== ИСТОЧНИКИ =====================
+
+    async def _process_tasks_batch(self, batch_size: int) -> int:
+        if not await self._try_lock("tasks"):
+            return 0
+
+        watermark = await self._get_watermark("tasks")
+        result = await self.session.execute(
+            FETCH_TASKS_SQL,
+            {
+                "last_ts": watermark.last_timestamp or EPOCH,
+                "last_id": watermark.last_id or ZERO_UUID,
+                "until": self._until(),
+                "limit": batch_size,
+            },
+        )
+        rows = result.all()
+
+        if not rows:
+            await self.session.rollback()
+            return 0
+
+        task_keys: Set[Tuple[date, str]] = set()
+        user_days: Set[Tuple[date, str]] = set()
+
+        for row in rows:
+            task_keys.add((row.created_at.date(), row.task_type))
+            if row.completed_at:
+                task_keys.add((row.completed_at.date(), row.task_type))
+            if row.user_id:
+                user_days.add((row.created_at.date(), str(row.user_id)))
+                if row.completed_at:
+                    user_days.add((row.completed_at.date(), str(row.user_id)))
+
+        await self._rollup_task_analytics(task_keys)
+        await self._rollup_user_days(user_days)
+        await self._rollup_business_metrics(
+            {day for day, _ in task_keys} | {day for day, _ in user_days}
+        )
+
+        last = rows[-1]
+        self._advance(watermark, last.updated_at, str(last.id), len(rows))
+        await self.session.commit()
+        return len(rows)
+
+    async def _process_positions_batch(self, batch_size: int) -> int:
+        if not await self._try_lock("position_history"):
+            return 0
+
+        watermark = await self._get_watermark("position_history")
+        result = await self.session.execute(
+            FETCH_POSITIONS_SQL,
+            {
+                "last_ts": watermark.last_timestamp or EPOCH,
+                "last_id": int(watermark.last_id or 0),
+                "until": self._until(),
+                "limit": batch_size,
+            },
+        )
+        rows = result.all()
+
+        if not rows:
+            await self.session.rollback()
+            return 0
+
+        user_days = {(row.check_date.date(), str(row.user_id)) for row in rows}
+
+        await self._rollup_user_days(user_days)
+        await self._rollup_business_metrics({day for day, _ in user_days})
+
+        last = rows[-1]
+        self._advance(watermark, last.check_date, str(last.id), len(rows))
+        await self.session.commit()
+        return len(rows)
+
+    # ===================== АГРЕГАТЫ =====================
+
+    async def _rollup_task_analytics(self, keys: Set[Tuple[date, str]]):
+        """Пересчитывает статистику задач по (день, тип задачи)"""
+        if not keys:
+            return
+        days, task_types = self._unzip(keys)
+        params = {"days": days, "task_types": task_types}
+
+        # Строки по серверам внутри ключа могли исчезнуть (задача сменила
+        # сервер), поэтому ключ заменяется целиком
+        await self.session.execute(DELETE_TASK_ANALYTICS_SQL, params)
+        await self.session.execute(INSERT_TASK_ANALYTICS_SQL, params)
+
+    async def _rollup_user_days(self, keys: Set[Tuple[date, str]]):
+        """Пересчитывает статистику парсинга и активности по (день, пользователь)"""
+        if not keys:
+            return
+        days, user_ids = self._unzip(keys)
+        params = {"days": days, "user_ids": user_ids}
+
+        await self.session.execute(UPSERT_PARSING_ANALYTICS_SQL, params)
+        await self.session.execute(UPSERT_USER_ACTIVITY_SQL, params)
+
+    async def _rollup_business_metrics(self, days: Set[date]):
+        """Пересчитывает бизнес-метрики за дни"""
+        if not days:
+            return
+        await self.session.execute(
+            UPSERT_BUSINESS_METRICS_SQL, {"days": sorted(days)}
+        )
+
+    # ===================== ВОДЯНЫЕ ЗНАКИ =====================
+
+    async def get_watermarks(self) -> List[Dict[str, Any]]:
+        """Возвращает состояние водяных знаков"""
+        result = await self.session.execute(
+            select(AnalyticsWatermark).order_by(AnalyticsWatermark.source)
+        )
+        return [
+            {
+                "source": wm.source,
+                "last_timestamp": (
+                    wm.last_timestamp.isoformat() if wm.last_timestamp else None
+                ),
+                "last_id": wm.last_id,
+                "rows_processed": wm.rows_processed,
+                "lag_seconds": (
+                    int((datetime.utcnow() - wm.last_timestamp).total_seconds())
+                    if wm.last_timestamp
+                    else None
+                ),
+            }
+            for wm in result.scalars().all()
+        ]
+
+    async def _get_watermark(self, source: str) -> AnalyticsWatermark:
+        await self.session.execute(
+            insert(AnalyticsWatermark)
+            .values(
+                source=source,
+                rows_processed=0,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(index_elements=["source"])
+        )
+        result = await self.session.execute(
+            select(AnalyticsWatermark).where(AnalyticsWatermark.source == source)
+        )
+        return result.scalar_one()
+
+    async def _try_lock(self, source: str) -> bool:
+        """Один источник обрабатывает только один воркер"""
+        result = await self.session.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"analytics_rollup:{source}"},
+        )
+        locked = bool(result.scalar())
+        if not locked:
+            await self.session.rollback()
+        return locked
+
+    @staticmethod
+    def _advance(watermark: AnalyticsWatermark, ts: datetime, row_id: str, count: int):
+        watermark.last_timestamp = ts
+        watermark.last_id = row_id
+        watermark.rows_processed = (watermark.rows_processed or 0) + count
+
+    @staticmethod
+    def _until() -> datetime:
+        # Строки моложе лага могут еще принадлежать незакоммиченным транзакциям
+        return datetime.utcnow() - timedelta(seconds=settings.analytics_rollup_lag_seconds)
+
+    @staticmethod
+    def _unzip(keys: Set[Tuple[date, str]]) -> Tuple[List[date], List[str]]:
+        ordered = sorted(keys)
+        return [day for day, _ in ordered], [value for _, value in ordered]
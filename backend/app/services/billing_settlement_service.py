@@ -0,0 +1,224 @@
+# backend/app/services/billing_settlement_service.py
+"""
+Пакетный расчет по резервам завершенных задач.
+
+При создании задачи сумма только резервируется (BillingService.reserve_balance).
+Этот сервис периодически забирает завершенные задачи с резервом и для
+каждого пользователя одной транзакцией:
+  - пишет по записи в billing_ledger на задачу с ключом "task:<id>"
+    (ON CONFLICT DO NOTHING - повторный расчет ничего не спишет);
+  - одним UPDATE списывает стоимость выполненных задач и снимает резерв
+    всех задач пакета (у неудачных резерв просто освобождается);
+  - создает одну BalanceTransaction и одну запись FinancialTransactionsLog
+    на весь пакет;
+  - отмечает задачи settled_at.
+Так 10 000 проверок пользователя дают одну строку в журнале операций и один
+апдейт баланса, а не 10 000 коммитов с блокировкой строки баланса.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List
+
+import structlog
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import (
+    Task,
+    User,
+    UserBalance,
+    BalanceTransaction,
+    BillingLedgerEntry,
+    FinancialTransactionsLog,
+)
+
+logger = structlog.get_logger(__name__)
+
+# Статусы, после которых задача уже не вернется в очередь
+SETTLED_STATUSES = ("completed", "failed")
+CHARGED_STATUS = "completed"
+
+
+def task_idempotency_key(task_id) -> str:
+    return f"task:{task_id}"
+
+
+class BillingSettlementService:
+    """Пакетное списание резервов завершенных задач"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _unsettled_filter(self, cutoff: datetime):
+        # Задержка cutoff дает _schedule_retry_if_needed вернуть упавшую
+        # задачу в очередь до того, как ее резерв будет снят
+        return and_(
+            Task.settled_at.is_(None),
+            Task.reserved_amount > 0,
+            Task.status.in_(SETTLED_STATUSES),
+            Task.completed_at <= cutoff,
+        )
+
+    async def run(self) -> Dict[str, Any]:
+        """Один проход расчетов по всем пользователям с завершенными задачами"""
+        cutoff = datetime.utcnow() - timedelta(
+            seconds=settings.billing_settlement_lag_seconds
+        )
+
+        result = await self.session.execute(
+            select(Task.user_id)
+            .where(Task.user_id.is_not(None), self._unsettled_filter(cutoff))
+            .group_by(Task.user_id)
+            .limit(settings.billing_settlement_max_users)
+        )
+        user_ids = [row.user_id for row in result.all()]
+        await self.session.commit()
+
+        stats = {"users": 0, "tasks": 0, "charged": 0.0, "released": 0.0}
+        for user_id in user_ids:
+            try:
+                settled = await self.settle_user(user_id, cutoff)
+            except Exception as e:
+                await self.session.rollback()
+                logger.error(
+                    "Failed to settle user tasks", user_id=str(user_id), error=str(e)
+                )
+                continue
+
+            if settled["tasks"]:
+                stats["users"] += 1
+                stats["tasks"] += settled["tasks"]
+                stats["charged"] += settled["charged"]
+                stats["released"] += settled["released"]
+
+        if stats["tasks"]:
+            logger.info("Billing settlement completed", **stats)
+        return stats
+
+    async def settle_user(self, user_id, cutoff: datetime) -> Dict[str, Any]:
+        """Расчет по завершенным задачам одного пользователя в одной транзакции"""
+        result = await self.session.execute(
+            select(Task.id, Task.status, Task.reserved_amount)
+            .where(Task.user_id == user_id, self._unsettled_filter(cutoff))
+            .order_by(Task.completed_at)
+            .limit(settings.billing_settlement_batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        tasks = result.all()
+        if not tasks:
+            await self.session.commit()
+            return {"tasks": 0, "charged": 0.0, "released": 0.0}
+
+        # Записи журнала; уже рассчитанные задачи не вернутся из RETURNING
+        inserted = await self.session.execute(
+            insert(BillingLedgerEntry)
+            .values(
+                [
+                    {
+                        "user_id": user_id,
+                        "task_id": task.id,
+                        "idempotency_key": task_idempotency_key(task.id),
+                        "reserved_amount": task.reserved_amount,
+                        "charged_amount": (
+                            task.reserved_amount
+                            if task.status == CHARGED_STATUS
+                            else Decimal("0")
+                        ),
+                    }
+                    for task in tasks
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(
+                BillingLedgerEntry.id,
+                BillingLedgerEntry.reserved_amount,
+                BillingLedgerEntry.charged_amount,
+            )
+        )
+        entries = inserted.all()
+
+        reserved = sum((entry.reserved_amount for entry in entries), Decimal("0"))
+        charged = sum((entry.charged_amount for entry in entries), Decimal("0"))
+
+        if entries:
+            balance = await self.session.execute(
+                update(UserBalance)
+                .where(UserBalance.user_id == user_id)
+                .values(
+                    current_balance=UserBalance.current_balance - charged,
+                    reserved_balance=func.greatest(
+                        UserBalance.reserved_balance - reserved, 0
+                    ),
+                )
+                .returning(UserBalance.current_balance)
+                .execution_options(synchronize_session=False)
+            )
+            new_balance = balance.scalar_one_or_none()
+
+            charged_entries = [entry for entry in entries if entry.charged_amount > 0]
+            if charged_entries and new_balance is not None:
+                await self._record_charge(user_id, charged, new_balance, charged_entries)
+
+        await self.session.execute(
+            update(Task)
+            .where(Task.id.in_([task.id for task in tasks]))
+            .values(settled_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+        await self.session.commit()
+
+        return {
+            "tasks": len(tasks),
+            "charged": float(charged),
+            "released": float(reserved - charged),
+        }
+
+    async def _record_charge(
+        self,
+        user_id,
+        charged: Decimal,
+        new_balance: Decimal,
+        entries: List,
+    ):
+        """Одна операция списания на весь пакет"""
+        description = f"Списание за выполненные задачи ({len(entries)} шт.)"
+
+        # Обновляем баланс в модели User (для совместимости)
+        await self.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(balance=new_balance)
+            .execution_options(synchronize_session=False)
+        )
+
+        transaction = BalanceTransaction(
+            user_id=user_id,
+            amount=-charged,  # Отрицательная сумма для списания
+            type="charge",
+            description=description,
+        )
+        self.session.add(transaction)
+        await self.session.flush()
+
+        self.session.add(
+            FinancialTransactionsLog(
+                user_id=user_id,
+                transaction_id=transaction.id,
+                amount=-charged,
+                balance_before=new_balance + charged,
+                balance_after=new_balance,
+                operation_type="charge",
+                description=description,
+            )
+        )
+
+        await self.session.execute(
+            update(BillingLedgerEntry)
+            .where(BillingLedgerEntry.id.in_([entry.id for entry in entries]))
+            .values(transaction_id=transaction.id)
+            .execution_options(synchronize_session=False)
+        )
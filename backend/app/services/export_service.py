@@ -0,0 +1,315 @@
+# backend/app/services/export_service.py
+"""
+Потоковая выгрузка истории позиций и результатов парсинга.
+
+Строки читаются серверным курсором (AsyncSession.stream + yield_per) пачками
+по EXPORT_CHUNK_SIZE и сразу кодируются в выходной формат, поэтому память
+не зависит от размера выгрузки:
+  - csv / ndjson - каждая пачка отдается клиенту отдельным куском ответа;
+  - xlsx - openpyxl в режиме write_only (в отдельном потоке) сбрасывает
+    строки во временный файл в export_tmp_dir, готовая книга отдается
+    кусками по мере чтения файла. Первый байт xlsx уходит только после
+    сборки книги - для очень больших выгрузок лучше csv/ndjson.
+Между пачками генератор возвращает управление event loop, так что длинная
+выгрузка не мешает остальным запросам.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, List, Optional, Sequence
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select, and_
+from sqlalchemy.sql import Select
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import PositionHistory, ParseResult, Task, UserKeyword
+
+logger = structlog.get_logger(__name__)
+
+EXPORT_CHUNK_SIZE = 5000
+FILE_READ_CHUNK_SIZE = 256 * 1024
+
+# Строк на листе xlsx (без заголовка); дальше - следующий лист
+XLSX_MAX_SHEET_ROWS = 1_048_575
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+@dataclass
+class ExportSpec:
+    """Что выгружать: запрос, заголовки колонок и базовое имя файла"""
+
+    query: Select
+    columns: List[str]
+    filename: str
+
+
+def _day_range(date_from: date, date_to: date):
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    return start, end
+
+
+def position_history_export(
+    user_id: str, domain_id: str, date_from: date, date_to: date
+) -> ExportSpec:
+    """История позиций домена за период (секции отсекаются по check_date)"""
+    start, end = _day_range(date_from, date_to)
+
+    query = (
+        select(
+            PositionHistory.check_date,
+            UserKeyword.keyword,
+            UserKeyword.device_type,
+            PositionHistory.position,
+            PositionHistory.url,
+        )
+        .outerjoin(UserKeyword, UserKeyword.id == PositionHistory.keyword_id)
+        .where(
+            and_(
+                PositionHistory.user_id == user_id,
+                PositionHistory.domain_id == domain_id,
+                PositionHistory.check_date >= start,
+                PositionHistory.check_date < end,
+            )
+        )
+        .order_by(PositionHistory.check_date, PositionHistory.id)
+    )
+
+    return ExportSpec(
+        query=query,
+        columns=["check_date", "keyword", "device_type", "position", "url"],
+        filename=f"positions_{date_from.isoformat()}_{date_to.isoformat()}",
+    )
+
+
+def parse_results_export(
+    user_id: str,
+    date_from: date,
+    date_to: date,
+    task_id: Optional[str] = None,
+    domain: Optional[str] = None,
+) -> ExportSpec:
+    """Результаты парсинга задач пользователя за период"""
+    start, end = _day_range(date_from, date_to)
+
+    conditions = [
+        Task.user_id == user_id,
+        ParseResult.parsed_at >= start,
+        ParseResult.parsed_at < end,
+    ]
+    if task_id:
+        conditions.append(ParseResult.task_id == task_id)
+    if domain:
+        conditions.append(ParseResult.domain == domain)
+
+    query = (
+        select(
+            ParseResult.parsed_at,
+            ParseResult.task_id,
+            ParseResult.keyword,
+            ParseResult.page_number,
+            ParseResult.position,
+            ParseResult.domain,
+            ParseResult.url,
+            ParseResult.title,
+            ParseResult.snippet,
+        )
+        .join(Task, Task.id == ParseResult.task_id)
+        .where(and_(*conditions))
+        .order_by(ParseResult.parsed_at, ParseResult.id)
+    )
+
+    return ExportSpec(
+        query=query,
+        columns=[
+            "parsed_at",
+            "task_id",
+            "keyword",
+            "page_number",
+            "position",
+            "domain",
+            "url",
+            "title",
+            "snippet",
+        ],
+        filename=f"parse_results_{date_from.isoformat()}_{date_to.isoformat()}",
+    )
+
+
+def _cell(value: Any) -> Any:
+    """Значение колонки в виде, пригодном для csv/json/xlsx"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+async def iter_row_chunks(spec: ExportSpec) -> AsyncIterator[List[Sequence[Any]]]:
+    """Пачки строк серверного курсора"""
+    async with async_session_maker() as session:
+        result = await session.stream(
+            spec.query.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for partition in result.partitions():
+            yield [[_cell(value) for value in row] for row in partition]
+
+
+async def stream_csv(spec: ExportSpec) -> AsyncIterator[bytes]:
+    # BOM - чтобы Excel открыл кириллицу без выбора кодировки
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(spec.columns)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    async for rows in iter_row_chunks(spec):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_ndjson(spec: ExportSpec) -> AsyncIterator[bytes]:
+    async for rows in iter_row_chunks(spec):
+        yield "".join(
+            json.dumps(dict(zip(spec.columns, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+
+class XlsxBuilder:
+    """Книга xlsx в режиме write_only; методы вызываются вне event loop"""
+
+    def __init__(self, columns: Sequence[str]):
+        import openpyxl
+
+        self.columns = columns
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.worksheet = None
+        self.sheet_rows = XLSX_MAX_SHEET_ROWS
+
+    def append_rows(self, rows: List[Sequence[Any]]):
+        for row in rows:
+            if self.sheet_rows >= XLSX_MAX_SHEET_ROWS:
+                self.worksheet = self.workbook.create_sheet()
+                self.worksheet.append(self.columns)
+                self.sheet_rows = 0
+            self.worksheet.append(row)
+            self.sheet_rows += 1
+
+    def save(self, path: str):
+        if self.worksheet is None:
+            self.workbook.create_sheet().append(self.columns)
+        self.workbook.save(path)
+
+
+async def stream_xlsx(spec: ExportSpec) -> AsyncIterator[bytes]:
+    # xlsx - zip архив, отдать его можно только после сборки всей книги;
+    # сериализация строк и сжатие идут в потоке, event loop свободен
+    builder = await asyncio.to_thread(XlsxBuilder, spec.columns)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx", dir=settings.export_tmp_dir)
+    os.close(fd)
+    try:
+        async for rows in iter_row_chunks(spec):
+            await asyncio.to_thread(builder.append_rows, rows)
+
+        await asyncio.to_thread(builder.save, path)
+
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, FILE_READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "xlsx": stream_xlsx,
+}
+
+
+class ExportSlot:
+    """Занятый слот выгрузки; освобождается ровно один раз.
+
+    Если клиент отключился до первого чтения тела ответа, генератор
+    выгрузки так и не запускается и его finally не выполняется - тогда
+    слот возвращает __del__, когда ответ со слотом собирается сборщиком.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore):
+        self._semaphore = semaphore
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._semaphore.release()
+
+    def __del__(self):
+        self.release()
+
+
+class ExportLimiter:
+    """Ограничение числа одновременных выгрузок"""
+
+    def __init__(self):
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.export_max_concurrent)
+        return self._semaphore
+
+    async def try_acquire(self) -> Optional[ExportSlot]:
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            return None
+        await semaphore.acquire()
+        return ExportSlot(semaphore)
+
+    async def stream(
+        self, spec: ExportSpec, export_format: str, slot: ExportSlot
+    ) -> AsyncIterator[bytes]:
+        """Поток выгрузки; слот освобождается по завершении или обрыву"""
+        started = datetime.utcnow()
+        sent = 0
+        try:
+            async for chunk in STREAMERS[export_format](spec):
+                sent += len(chunk)
+                yield chunk
+        finally:
+            slot.release()
+            logger.info(
+                "Export finished",
+                filename=spec.filename,
+                format=export_format,
+                bytes=sent,
+                duration_ms=int((datetime.utcnow() - started).total_seconds() * 1000),
+            )
+
+
+# Глобальный ограничитель выгрузок
+export_limiter = ExportLimiter()
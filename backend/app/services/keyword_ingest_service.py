@@ -0,0 +1,157 @@
+# backend/app/services/keyword_ingest_service.py
+"""
+Пакетное добавление ключевых слов.
+
+Ключевые слова нормализуются и дедуплицируются в памяти, затем вставляются
+чанками INSERT ... ON CONFLICT DO NOTHING RETURNING по уникальному ключу
+(user_id, domain_id, keyword, device_type). Уже существующие строки
+отсекает сама БД, поэтому нет ни SELECT на каждое слово, ни гонки между
+проверкой и вставкой, а счетчики добавленных/пропущенных точные.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+import structlog
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import UserKeyword, DeviceType
+
+logger = structlog.get_logger(__name__)
+
+# asyncpg ограничивает запрос 32767 параметрами, на строку уходит 9
+# (все колонки UserKeyword в insert ниже): 2000 * 9 = 18000
+INSERT_CHUNK_SIZE = 2000
+
+MAX_KEYWORD_LENGTH = 500
+
+# Сколько пропущенных слов возвращать в ответе
+MAX_REPORTED_SKIPPED = 1000
+
+UNIQUE_CONSTRAINT = "uq_user_keywords_user_domain_keyword_device"
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Убирает крайние пробелы и схлопывает пробелы внутри фразы"""
+    return " ".join(keyword.split())
+
+
+class KeywordIngestService:
+    """Сервис пакетного добавления ключевых слов"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def ingest(
+        self,
+        user_id: str,
+        domain_id: str,
+        keywords: Iterable[str],
+        device_type: DeviceType = DeviceType.DESKTOP,
+        check_frequency: str = "daily",
+        is_active: bool = True,
+        commit: bool = True,
+    ) -> Dict[str, Any]:
+        """Добавляет ключевые слова домена, пропуская уже существующие.
+
+        Принадлежность домена пользователю проверяет вызывающий код.
+        """
+        stats = {
+            "total_keywords": 0,
+            "added_keywords": 0,
+            "skipped_keywords": 0,
+            "duplicate_keywords": 0,
+            "invalid_keywords": 0,
+        }
+
+        unique: Dict[str, None] = {}
+        for raw in keywords:
+            stats["total_keywords"] += 1
+            keyword = normalize_keyword(raw or "")
+            if not keyword or len(keyword) > MAX_KEYWORD_LENGTH:
+                stats["invalid_keywords"] += 1
+                continue
+            if keyword in unique:
+                stats["duplicate_keywords"] += 1
+                continue
+            unique[keyword] = None
+
+        added_ids: List[str] = []
+        skipped: List[str] = []
+        pending = list(unique)
+        now = datetime.utcnow()
+
+        for start in range(0, len(pending), INSERT_CHUNK_SIZE):
+            chunk = pending[start : start + INSERT_CHUNK_SIZE]
+            result = await self.session.execute(
+                insert(UserKeyword)
+                .values(
+                    [
+                        {
+                            "id": uuid.uuid4(),
+                            "user_id": user_id,
+                            "domain_id": domain_id,
+                            "keyword": keyword,
+                            "device_type": device_type,
+                            "check_frequency": check_frequency,
+                            "is_active": is_active,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for keyword in chunk
+                    ]
+                )
+                .on_conflict_do_nothing(constraint=UNIQUE_CONSTRAINT)
+                .returning(UserKeyword.id, UserKeyword.keyword)
+            )
+
+            inserted = {keyword: keyword_id for keyword_id, keyword in result.all()}
+            added_ids.extend(str(keyword_id) for keyword_id in inserted.values())
+
+            for keyword in chunk:
+                if keyword not in inserted:
+                    stats["skipped_keywords"] += 1
+                    if len(skipped) < MAX_REPORTED_SKIPPED:
+                        skipped.append(keyword)
+
+        stats["added_keywords"] = len(added_ids)
+
+        if commit:
+            await self.session.commit()
+
+        logger.info(
+            "Keywords ingested",
+            user_id=str(user_id),
+            domain_id=str(domain_id),
+            device_type=device_type.value,
+            **stats,
+        )
+
+        return {
+            "success": True,
+            "stats": stats,
+            "added_keyword_ids": added_ids,
+            "skipped_keywords": skipped,
+        }
+
+    async def add_one(
+        self,
+        user_id: str,
+        domain_id: str,
+        keyword: str,
+        device_type: DeviceType = DeviceType.DESKTOP,
+        check_frequency: str = "daily",
+        is_active: bool = True,
+    ) -> Optional[str]:
+        """Добавляет одно ключевое слово. Возвращает ID или None, если оно уже есть"""
+        result = await self.ingest(
+            user_id=user_id,
+            domain_id=domain_id,
+            keywords=[keyword],
+            device_type=device_type,
+            check_frequency=check_frequency,
+            is_active=is_active,
+        )
+        return result["added_keyword_ids"][0] if result["added_keyword_ids"] else None
@@ -1,12 +1,16 @@
 # backend/app/services/profile_nurture_limits_service.py
 
-from typing import Dict, List, Optional
-from sqlalchemy import select, func, and_
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import Task
 from app.core.task_manager import TaskManager
-from app.models import Profile, UserStrategy, ProjectStrategy
+from app.core.strategy_nurture_counters import (
+    strategy_nurture_counters,
+    empty_counters,
+    COUNTER_COLUMNS,
+)
+from app.models import Profile, UserStrategy, ProjectStrategy, StrategyNurtureCounter
 from app.constants.strategies import StrategyType as StrategyTypeEnum
 import structlog
 from datetime import datetime, timedelta
@@ -23,27 +27,8 @@ class ProfileNurtureLimitsService:
 
     async def get_nurtured_profiles_count(self, strategy_id: str) -> int:
         """Получить количество нагуленных профилей для стратегии"""
-
-        # ИСПРАВЛЕНИЕ: правильная работа с JSON полем
-        completed_tasks_query = select(func.count(Task.id)).where(
-            and_(
-                Task.task_type == "profile_nurture",
-                Task.parameters.op("->>")("strategy_id")
-                == strategy_id,  # Правильный оператор для JSONB
-                Task.status == "completed",
-            )
-        )
-
-        result = await self.session.execute(completed_tasks_query)
-        completed_tasks_count = result.scalar() or 0
-
-        logger.debug(
-            "Counted nurtured profiles",
-            strategy_id=strategy_id,
-            count=completed_tasks_count,
-        )
-
-        return completed_tasks_count
+        counters = await strategy_nurture_counters.get(self.session, strategy_id)
+        return counters["nurtured"]
 
     async def get_strategy_limits(self, strategy_id: str) -> Dict[str, int]:
         """Получить лимиты для стратегии"""
@@ -63,7 +48,12 @@ class ProfileNurtureLimitsService:
             print(f"❌ Strategy not found: {strategy_id}")
             return {"min_limit": 0, "max_limit": 0}
 
-        config = strategy.config or {}
+        return self.limits_from_config(strategy_id, strategy.config)
+
+    @staticmethod
+    def limits_from_config(strategy_id, config: Optional[Dict]) -> Dict[str, int]:
+        """Лимиты профилей из конфигурации стратегии"""
+        config = config or {}
 
         # ✅ ИСПРАВЛЕНО: Используем правильные поля из конфигурации
         # Поскольку в конфигурации нет min_profiles_limit и max_profiles_limit,
@@ -89,10 +79,12 @@ class ProfileNurtureLimitsService:
             "max_limit": max_limit,
         }
 
-    async def check_strategy_status(self, strategy_id: str) -> Dict[str, any]:
-        """Проверить статус стратегии относительно лимитов"""
-        current_count = await self.get_nurtured_profiles_count(strategy_id)
-        limits = await self.get_strategy_limits(strategy_id)
+    @staticmethod
+    def evaluate_status(
+        limits: Dict[str, int], counters: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """Статус стратегии по лимитам и счетчикам задач"""
+        current_count = counters["nurtured"]
 
         status = "normal"
         if current_count < limits["min_limit"]:
@@ -102,57 +94,73 @@ class ProfileNurtureLimitsService:
 
         return {
             "current_count": current_count,
+            "pending": counters["pending"],
+            "running": counters["running"],
+            "failed": counters["failed"],
             "min_limit": limits["min_limit"],
             "max_limit": limits["max_limit"],
             "status": status,
             "needs_nurture": current_count < limits["max_limit"],
         }
 
-    async def get_all_strategies_status(self, user_id: str) -> List[Dict[str, any]]:
-        """Получить статус всех стратегий нагула пользователя"""
-        query = select(UserStrategy).where(
-            and_(
-                UserStrategy.user_id == user_id,
+    async def check_strategy_status(self, strategy_id: str) -> Dict[str, any]:
+        """Проверить статус стратегии относительно лимитов"""
+        counters = await strategy_nurture_counters.get(self.session, strategy_id)
+        limits = await self.get_strategy_limits(strategy_id)
+        return self.evaluate_status(limits, counters)
+
+    async def get_strategies_status(
+        self, user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Статус всех активных стратегий нагула (пользователя или всех) одним запросом"""
+        query = (
+            select(
+                UserStrategy.id,
+                UserStrategy.user_id,
+                UserStrategy.name,
+                UserStrategy.config,
+                *[getattr(StrategyNurtureCounter, column) for column in COUNTER_COLUMNS],
+            )
+            .outerjoin(
+                StrategyNurtureCounter,
+                StrategyNurtureCounter.strategy_id == UserStrategy.id,
+            )
+            .where(
                 UserStrategy.strategy_type == StrategyTypeEnum.PROFILE_NURTURE,
                 UserStrategy.is_active == True,
             )
         )
+        if user_id is not None:
+            query = query.where(UserStrategy.user_id == user_id)
+
         result = await self.session.execute(query)
-        strategies = result.scalars().all()
 
         statuses = []
-        for strategy in strategies:
-            try:
-                status = await self.check_strategy_status(str(strategy.id))
-                status["strategy_id"] = str(strategy.id)
-                status["strategy_name"] = strategy.name
-                statuses.append(status)
-            except Exception as e:
-                logger.error(
-                    "Error checking strategy status",
-                    strategy_id=str(strategy.id),
-                    error=str(e),
-                )
-                # Добавляем стратегию с ошибкой
-                statuses.append(
-                    {
-                        "strategy_id": str(strategy.id),
-                        "strategy_name": strategy.name,
-                        "current_count": 0,
-                        "min_limit": 0,
-                        "max_limit": 0,
-                        "status": "error",
-                        "needs_nurture": False,
-                        "error": str(e),
-                    }
-                )
+        for row in result.all():
+            counters = empty_counters()
+            for column in COUNTER_COLUMNS:
+                counters[column] = getattr(row, column) or 0
+
+            limits = self.limits_from_config(str(row.id), row.config)
+            status = self.evaluate_status(limits, counters)
+            status["strategy_id"] = str(row.id)
+            status["strategy_name"] = row.name
+            status["user_id"] = str(row.user_id)
+            statuses.append(status)
 
         return statuses
 
-    async def spawn_nurture_tasks_if_needed(self, strategy_id: str) -> Dict[str, any]:
-        """Создать задачи нагула если нужно"""
+    async def get_all_strategies_status(self, user_id: str) -> List[Dict[str, any]]:
+        """Получить статус всех стратегий нагула пользователя"""
+        return await self.get_strategies_status(user_id)
+
+    async def spawn_nurture_tasks_if_needed(
+        self, strategy_id: str, status: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, any]:
+        """Создать задачи нагула если нужно (status - уже посчитанный статус)"""
         try:
-            status = await self.check_strategy_status(strategy_id)
+            if status is None:
+                status = await self.check_strategy_status(strategy_id)
 
             # print(f"Status: {status}")
 
@@ -164,8 +172,21 @@ class ProfileNurtureLimitsService:
                     "status": status,
                 }
 
-            # Рассчитываем сколько профилей нужно создать
-            needed_profiles = status["max_limit"] - status["current_count"]
+            # Рассчитываем сколько профилей нужно создать: задачи, которые
+            # уже ждут или выполняются, тоже дадут профили
+            needed_profiles = (
+                status["max_limit"]
+                - status["current_count"]
+                - status.get("pending", 0)
+                - status.get("running", 0)
+            )
+            if needed_profiles <= 0:
+                return {
+                    "success": True,
+                    "message": "Задачи нагула уже в очереди",
+                    "tasks_created": 0,
+                    "status": status,
+                }
 
             # Ограничиваем количество одновременно создаваемых задач
             max_batch_size = 50  # Не создаем больше 50 задач за раз
@@ -209,9 +230,11 @@ class ProfileNurtureLimitsService:
                 "error": str(e),
             }
 
-    async def auto_maintain_all_strategies(self, user_id: str) -> Dict[str, any]:
-        """Автоматически поддерживать все стратегии пользователя"""
-        strategies_status = await self.get_all_strategies_status(user_id)
+    async def auto_maintain_all_strategies(
+        self, user_id: Optional[str] = None
+    ) -> Dict[str, any]:
+        """Автоматически поддерживать все стратегии пользователя (None - всех)"""
+        strategies_status = await self.get_strategies_status(user_id)
 
         results = []
         total_tasks_created = 0
@@ -219,7 +242,7 @@ class ProfileNurtureLimitsService:
         for strategy_status in strategies_status:
             if strategy_status.get("needs_nurture", False):
                 result = await self.spawn_nurture_tasks_if_needed(
-                    strategy_status["strategy_id"]
+                    strategy_status["strategy_id"], strategy_status
                 )
                 results.append(
                     {
@@ -0,0 +1,44 @@
+# backend/app/tasks/analytics_rollup_scheduler.py
+
+import asyncio
+from app.config import settings
+from app.database import async_session_maker
+from app.services.analytics_rollup_service import AnalyticsRollupService
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class AnalyticsRollupScheduler:
+    """Планировщик инкрементальной свертки аналитики"""
+
+    def __init__(self):
+        self.running = False
+        self.check_interval = settings.analytics_rollup_interval
+
+    async def start(self):
+        """Запустить планировщик"""
+        self.running = True
+        logger.info("Analytics rollup scheduler started")
+
+        while self.running:
+            try:
+                await self.run_once()
+                await asyncio.sleep(self.check_interval)
+            except Exception as e:
+                logger.error("Error in analytics rollup scheduler", error=str(e))
+                await asyncio.sleep(60)  # Короткая пауза при ошибке
+
+    async def stop(self):
+        """Остановить планировщик"""
+        self.running = False
+        logger.info("Analytics rollup scheduler stopped")
+
+    async def run_once(self):
+        """Один проход свертки по всем источникам"""
+        async with async_session_maker() as session:
+            return await AnalyticsRollupService(session).run()
+
+
+# Глобальный экземпляр планировщика
+analytics_rollup_scheduler = AnalyticsRollupScheduler()
@@ -0,0 +1,44 @@
+# backend/app/tasks/billing_settlement_scheduler.py
+
+import asyncio
+from app.config import settings
+from app.database import async_session_maker
+from app.services.billing_settlement_service import BillingSettlementService
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class BillingSettlementScheduler:
+    """Планировщик пакетного расчета по резервам задач"""
+
+    def __init__(self):
+        self.running = False
+        self.check_interval = settings.billing_settlement_interval
+
+    async def start(self):
+        """Запустить планировщик"""
+        self.running = True
+        logger.info("Billing settlement scheduler started")
+
+        while self.running:
+            try:
+                await self.run_once()
+                await asyncio.sleep(self.check_interval)
+            except Exception as e:
+                logger.error("Error in billing settlement scheduler", error=str(e))
+                await asyncio.sleep(60)  # Короткая пауза при ошибке
+
+    async def stop(self):
+        """Остановить планировщик"""
+        self.running = False
+        logger.info("Billing settlement scheduler stopped")
+
+    async def run_once(self):
+        """Одно окно расчетов"""
+        async with async_session_maker() as session:
+            return await BillingSettlementService(session).run()
+
+
+# Глобальный экземпляр планировщика
+billing_settlement_scheduler = BillingSettlementScheduler()
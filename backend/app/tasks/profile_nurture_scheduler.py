@@ -1,12 +1,8 @@
 # backend/app/tasks/profile_nurture_scheduler.py
 
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.core.database import get_session
-from app.models import User, UserStrategy
+from app.database import async_session_maker
 from app.services.profile_nurture_limits_service import ProfileNurtureLimitsService
-from app.constants.strategies import StrategyType
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -38,47 +34,22 @@ class ProfileNurtureScheduler:
         logger.info("Profile nurture scheduler stopped")
 
     async def check_all_strategies(self):
-        """Проверить все стратегии и создать задачи при необходимости"""
-        async with get_session() as session:
-            # Получаем всех пользователей с активными стратегиями нагула
-            query = (
-                select(User.id)
-                .join(UserStrategy, UserStrategy.user_id == User.id)
-                .where(
-                    UserStrategy.strategy_type == StrategyType.PROFILE_NURTURE,
-                    UserStrategy.is_active == True,
-                )
-                .distinct()
-            )
+        """Проверить все стратегии и создать задачи при необходимости.
 
-            result = await session.execute(query)
-            user_ids = result.scalars().all()
+        Статусы всех активных стратегий берутся одним запросом по
+        strategy_nurture_counters, задачи создаются только там, где не
+        хватает профилей с учетом уже стоящих в очереди задач.
+        """
+        async with async_session_maker() as session:
+            limits_service = ProfileNurtureLimitsService(session)
+            result = await limits_service.auto_maintain_all_strategies()
 
             logger.info(
-                "Checking profile nurture strategies", users_count=len(user_ids)
+                "Checked profile nurture strategies",
+                strategies_maintained=result["maintained_strategies"],
+                tasks_created=result["total_tasks_created"],
             )
-
-            limits_service = ProfileNurtureLimitsService(session)
-
-            for user_id in user_ids:
-                try:
-                    result = await limits_service.auto_maintain_all_strategies(
-                        str(user_id)
-                    )
-
-                    if result["maintained_strategies"] > 0:
-                        logger.info(
-                            "Maintained strategies for user",
-                            user_id=user_id,
-                            strategies_count=result["maintained_strategies"],
-                        )
-
-                except Exception as e:
-                    logger.error(
-                        "Error maintaining strategies for user",
-                        user_id=user_id,
-                        error=str(e),
-                    )
+            return result
 
 
 # Создаем глобальный экземпляр планировщика
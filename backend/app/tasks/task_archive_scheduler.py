@@ -0,0 +1,44 @@
+# backend/app/tasks/task_archive_scheduler.py
+
+import asyncio
+from app.config import settings
+from app.database import async_session_maker
+from app.core.task_archive import task_archiver
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class TaskArchiveScheduler:
+    """Планировщик переноса завершенных задач в архив"""
+
+    def __init__(self):
+        self.running = False
+        self.check_interval = settings.task_archive_interval
+
+    async def start(self):
+        """Запустить планировщик"""
+        self.running = True
+        logger.info("Task archive scheduler started")
+
+        while self.running:
+            try:
+                await self.run_once()
+                await asyncio.sleep(self.check_interval)
+            except Exception as e:
+                logger.error("Error in task archive scheduler", error=str(e))
+                await asyncio.sleep(60)  # Короткая пауза при ошибке
+
+    async def stop(self):
+        """Остановить планировщик"""
+        self.running = False
+        logger.info("Task archive scheduler stopped")
+
+    async def run_once(self):
+        """Один проход архивации"""
+        async with async_session_maker() as session:
+            return await task_archiver.run(session)
+
+
+# Глобальный экземпляр планировщика
+task_archive_scheduler = TaskArchiveScheduler()
@@ -0,0 +1,44 @@
+# backend/app/tasks/task_reaper_scheduler.py
+
+import asyncio
+from app.config import settings
+from app.database import async_session_maker
+from app.core.task_leases import task_lease_manager
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class TaskReaperScheduler:
+    """Планировщик возврата задач потерянных воркеров"""
+
+    def __init__(self):
+        self.running = False
+        self.check_interval = settings.task_reaper_interval
+
+    async def start(self):
+        """Запустить планировщик"""
+        self.running = True
+        logger.info("Task reaper scheduler started")
+
+        while self.running:
+            try:
+                await self.run_once()
+                await asyncio.sleep(self.check_interval)
+            except Exception as e:
+                logger.error("Error in task reaper scheduler", error=str(e))
+                await asyncio.sleep(60)  # Короткая пауза при ошибке
+
+    async def stop(self):
+        """Остановить планировщик"""
+        self.running = False
+        logger.info("Task reaper scheduler stopped")
+
+    async def run_once(self):
+        """Один проход reaper'а"""
+        async with async_session_maker() as session:
+            return await task_lease_manager.reap(session)
+
+
+# Глобальный экземпляр планировщика
+task_reaper_scheduler = TaskReaperScheduler()
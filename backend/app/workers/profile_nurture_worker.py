@@ -5,7 +5,7 @@ import structlog
 from typing import Dict, Any, Optional, List, Union
 from datetime import datetime, timezone
 import random
-import os
+import time
 import aiohttp
 import re
 from urllib.parse import urlparse
@@ -18,6 +18,16 @@ from sqlalchemy.orm import selectinload
 from app.database import async_session_maker
 from app.core.task_manager import TaskManager, TaskType, TaskStatus
 from app.core.browser_manager import BrowserManager
+from app.core.display_pool import display_pool
+from app.core.profile_snapshot_store import profile_snapshot_store
+from app.core.task_leases import task_lease_manager
+from app.core.pipeline_metrics import (
+    stage,
+    track_task,
+    record_task_finished,
+    nurture_visits_total,
+)
+from app.config import settings
 from app.models import Task, Profile, DeviceType
 from app.constants.strategies import ProfileNurtureType
 from playwright.async_api import ViewportSize
@@ -34,15 +44,21 @@ class ProfileNurtureWorker:
     def __init__(self):
         self.is_running = False
         self.worker_id = f"nurture_worker_{random.randint(1000, 9999)}"
+        self._last_snapshot_gc: Optional[datetime] = None
+        # Выполняющиеся задачи (id -> asyncio задача) для продления аренды
+        self._active_tasks: Dict[str, asyncio.Task] = {}
+        self._lease_task: Optional[asyncio.Task] = None
 
     async def start(self):
         """Запустить worker"""
         self.is_running = True
+        self._lease_task = asyncio.create_task(self._lease_loop())
         logger.info("Profile nurture worker started", worker_id=self.worker_id)
 
         while self.is_running:
             try:
                 await self._process_batch()
+                await self._collect_snapshot_garbage_if_needed()
                 await asyncio.sleep(5)  # Пауза между обработками
             except Exception as e:
                 logger.error(
@@ -53,8 +69,46 @@ class ProfileNurtureWorker:
     async def stop(self):
         """Остановить worker"""
         self.is_running = False
+        if self._lease_task:
+            self._lease_task.cancel()
+            self._lease_task = None
         logger.info("Profile nurture worker stopped", worker_id=self.worker_id)
 
+    async def _lease_loop(self):
+        """Продление аренды выполняющихся задач нагула"""
+        while self.is_running:
+            try:
+                await asyncio.sleep(settings.task_lease_renew_interval)
+                async with async_session_maker() as session:
+                    lost = await task_lease_manager.renew(
+                        session, self.worker_id, list(self._active_tasks)
+                    )
+
+                # Задачу вернул в очередь reaper - прекращаем ее выполнение
+                for task_id in lost:
+                    running = self._active_tasks.pop(task_id, None)
+                    if running is not None:
+                        running.cancel()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(
+                    "Error in lease loop", worker_id=self.worker_id, error=str(e)
+                )
+
+    async def _collect_snapshot_garbage_if_needed(self):
+        """Периодически чистит старые снапшоты профилей"""
+        now = datetime.utcnow()
+        if (
+            self._last_snapshot_gc
+            and (now - self._last_snapshot_gc).total_seconds()
+            < settings.profile_snapshot_gc_interval
+        ):
+            return
+
+        self._last_snapshot_gc = now
+        await profile_snapshot_store.collect_garbage()
+
     async def _process_batch(self):
         """Обработать пакет задач"""
         async with async_session_maker() as session:
@@ -79,65 +133,78 @@ class ProfileNurtureWorker:
 
     async def _process_task(self, task: Task):
         """Обработать одну задачу нагула"""
-        async with async_session_maker() as session:
-            task_manager = TaskManager(session)
-            browser_manager = BrowserManager(session)
+        started = time.monotonic()
 
-            try:
-                # Отмечаем задачу как запущенную
-                success = await task_manager.mark_task_started(
-                    str(task.id), self.worker_id
-                )
-                if not success:
-                    logger.warning(
-                        "Failed to mark task as started", task_id=str(task.id)
+        with track_task(task.task_type):
+            async with async_session_maker() as session:
+                task_manager = TaskManager(session)
+                browser_manager = BrowserManager(session)
+
+                try:
+                    # Отмечаем задачу как запущенную
+                    success = await task_manager.mark_task_started(
+                        str(task.id), self.worker_id
                     )
-                    return
+                    if not success:
+                        logger.warning(
+                            "Failed to mark task as started", task_id=str(task.id)
+                        )
+                        return
+
+                    self._active_tasks[str(task.id)] = asyncio.current_task()
+
+                    # Проверяем, нужен ли debug режим
+                    debug_enabled = task.parameters.get("debug_enabled", False)
+                    device_type = DeviceType(task.device_type)
+
+                    if debug_enabled:
+                        logger.info(
+                            "🔍 Starting task in DEBUG mode",
+                            task_id=str(task.id),
+                            worker_id=self.worker_id,
+                            device_type=device_type.value,
+                        )
+                        result = await self._execute_debug_task(
+                            task, browser_manager, device_type
+                        )
+                    else:
+                        logger.info(
+                            "Starting profile nurture task",
+                            task_id=str(task.id),
+                            worker_id=self.worker_id,
+                            strategy_id=task.parameters.get("strategy_id"),
+                        )
+                        result = await self._execute_normal_task(
+                            task, browser_manager, device_type
+                        )
 
-                # Проверяем, нужен ли debug режим
-                debug_enabled = task.parameters.get("debug_enabled", False)
-                device_type = DeviceType(task.device_type)
+                    # Отмечаем задачу как завершенную
+                    await task_manager.mark_task_completed(str(task.id), result)
+                    record_task_finished(
+                        task.task_type, TaskStatus.COMPLETED.value, time.monotonic() - started
+                    )
 
-                if debug_enabled:
                     logger.info(
-                        "🔍 Starting task in DEBUG mode",
+                        "Profile nurture task completed",
                         task_id=str(task.id),
                         worker_id=self.worker_id,
-                        device_type=device_type.value,
-                    )
-                    result = await self._execute_debug_task(
-                        task, browser_manager, device_type
+                        debug_mode=debug_enabled,
+                        cookies_collected=result.get("cookies_collected", 0),
                     )
-                else:
-                    logger.info(
-                        "Starting profile nurture task",
+
+                except Exception as e:
+                    logger.error(
+                        "Profile nurture task failed",
                         task_id=str(task.id),
                         worker_id=self.worker_id,
-                        strategy_id=task.parameters.get("strategy_id"),
+                        error=str(e),
                     )
-                    result = await self._execute_normal_task(
-                        task, browser_manager, device_type
+                    await task_manager.mark_task_failed(str(task.id), str(e))
+                    record_task_finished(
+                        task.task_type, TaskStatus.FAILED.value, time.monotonic() - started
                     )
-
-                # Отмечаем задачу как завершенную
-                await task_manager.mark_task_completed(str(task.id), result)
-
-                logger.info(
-                    "Profile nurture task completed",
-                    task_id=str(task.id),
-                    worker_id=self.worker_id,
-                    debug_mode=debug_enabled,
-                    cookies_collected=result.get("cookies_collected", 0),
-                )
-
-            except Exception as e:
-                logger.error(
-                    "Profile nurture task failed",
-                    task_id=str(task.id),
-                    worker_id=self.worker_id,
-                    error=str(e),
-                )
-                await task_manager.mark_task_failed(str(task.id), str(e))
+                finally:
+                    self._active_tasks.pop(str(task.id), None)
 
     # Исправленная структура _execute_debug_task с правильным finally
     async def _execute_debug_task(
@@ -179,15 +246,16 @@ class ProfileNurtureWorker:
 
             logger.info("🔍 Step 4: Selecting proxy")
             # Выбираем и назначаем прокси из стратегии
-            selected_proxy = await self._select_and_assign_proxy(profile)
+            with stage("proxy_select"):
+                selected_proxy = await self._select_and_assign_proxy(profile)
             if selected_proxy:
                 logger.info(
                     f"🌐 Using proxy for debug task: {selected_proxy.get('host')}:{selected_proxy.get('port')}"
                 )
 
             logger.info("🔍 Step 5: Setting up VNC environment")
-            # Настраиваем окружение для VNC
-            os.environ["DISPLAY"] = f":{vnc_session.display_num}"
+            # Дисплей VNC передается только этому браузеру (через env запуска)
+            display_env = display_pool.env(display_name=f":{vnc_session.display_num}")
 
             # Создаем временную директорию профиля
             profile_temp_dir = f"/var/www/topflight/data/profiles_temp/{profile.id}"
@@ -231,6 +299,7 @@ class ProfileNurtureWorker:
             # Запускаем браузер с VNC настройками и временной папкой профиля
             async with async_playwright() as p:
                 browser = await p.chromium.launch(
+                    env=display_env,
                     headless=False,  # ВАЖНО: НЕ headless для VNC
                     slow_mo=1500,  # Замедление для наблюдения
                     devtools=False,  # Включаем DevTools
@@ -596,7 +665,7 @@ class ProfileNurtureWorker:
         browser_manager: BrowserManager,
         device_type: DeviceType,
     ) -> Dict[str, Any]:
-        """Выполнить поисковый нагул с временной папкой профиля"""
+        """Выполнить поисковый нагул с восстановленной из снапшота папкой профиля"""
 
         profile_temp_dir = None
         exception_to_raise = None
@@ -612,15 +681,15 @@ class ProfileNurtureWorker:
                 profile = await browser_manager.create_profile(device_type=device_type)
 
             # Выбираем и назначаем прокси из стратегии
-            selected_proxy = await self._select_and_assign_proxy(profile)
+            with stage("proxy_select"):
+                selected_proxy = await self._select_and_assign_proxy(profile)
             if selected_proxy:
                 logger.info(
                     f"🌐 Using proxy for nurture task: {selected_proxy.get('host')}:{selected_proxy.get('port')}"
                 )
 
-            # Создаем временную директорию профиля
-            profile_temp_dir = f"/var/www/topflight/data/profiles_temp/{profile.id}"
-            Path(profile_temp_dir).mkdir(parents=True, exist_ok=True)
+            # Восстанавливаем полный user-data-dir профиля из снапшота в tmpfs
+            profile_temp_dir = await profile_snapshot_store.restore(str(profile.id))
 
             # Подготавливаем аргументы браузера
             browser_args = [
@@ -633,7 +702,6 @@ class ProfileNurtureWorker:
                 "--no-first-run",
                 "--no-default-browser-check",
                 "--disable-features=TranslateUI",
-                # f"--user-data-dir={profile_temp_dir}",
             ]
 
             # Добавляем прокси аргументы если прокси назначена
@@ -641,12 +709,28 @@ class ProfileNurtureWorker:
                 proxy_args = self._build_proxy_args(selected_proxy)
                 browser_args.extend(proxy_args)
 
-            # Запускаем браузер с временной папкой профиля
+            # Получаем viewport из fingerprint профиля или используем дефолтные значения
+            viewport_width = 1920
+            viewport_height = 1080
+
+            if hasattr(profile, "fingerprint_data") and profile.fingerprint_data:
+                if profile.fingerprint_data.viewport_size:
+                    viewport_parts = profile.fingerprint_data.viewport_size.split("x")
+                    if len(viewport_parts) == 2:
+                        viewport_width = int(viewport_parts[0])
+                        viewport_height = int(viewport_parts[1])
+
+            # Запускаем браузер с восстановленной папкой профиля
             async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,  # Headless для продакшена
-                    args=browser_args,
-                )
+                with stage("browser_launch"):
+                    context = await p.chromium.launch_persistent_context(
+                        str(profile_temp_dir),
+                        headless=True,  # Headless для продакшена
+                        args=browser_args,
+                        user_agent=profile.user_agent,
+                        viewport=ViewportSize(width=viewport_width, height=viewport_height),
+                    )
+                context_closed = False
 
                 try:
                     # Получаем параметры нагула
@@ -671,40 +755,15 @@ class ProfileNurtureWorker:
                     cookies_collected = 0
                     sites_visited = []
 
-                    # Получаем viewport из fingerprint профиля или используем дефолтные значения
-                    viewport_width = 1920
-                    viewport_height = 1080
-
-                    if (
-                        hasattr(profile, "fingerprint_data")
-                        and profile.fingerprint_data
-                    ):
-                        if profile.fingerprint_data.viewport_size:
-                            viewport_parts = (
-                                profile.fingerprint_data.viewport_size.split("x")
-                            )
-                            if len(viewport_parts) == 2:
-                                viewport_width = int(viewport_parts[0])
-                                viewport_height = int(viewport_parts[1])
+                    # Cookies из БД досыпаем поверх снапшота (профиль мог быть
+                    # создан до появления снапшотов)
+                    if profile.cookies:
+                        await context.add_cookies(profile.cookies)
 
-                    # Создаем контекст браузера с восстановлением cookies
-                    context = await browser.new_context(
-                        user_agent=profile.user_agent,
-                        viewport=ViewportSize(
-                            width=viewport_width, height=viewport_height
-                        ),
-                        storage_state=(
-                            {
-                                "cookies": profile.cookies if profile.cookies else [],
-                                "origins": [],
-                            }
-                            if profile.cookies
-                            else None
-                        ),
+                    page = (
+                        context.pages[0] if context.pages else await context.new_page()
                     )
 
-                    page = await context.new_page()
-
                     for i, query in enumerate(queries[:target_count]):
                         if cookies_collected >= target_count:
                             break
@@ -730,7 +789,14 @@ class ProfileNurtureWorker:
                     # Сохраняем cookies в профиль
                     await self._save_cookies_to_profile(profile, cookies)
 
+                    # Закрываем контекст до снапшота, чтобы Chromium сбросил
+                    # LevelDB/SQLite на диск
                     await context.close()
+                    context_closed = True
+
+                    snapshot = await profile_snapshot_store.snapshot(
+                        str(profile.id), profile_temp_dir
+                    )
 
                     result = {
                         "success": True,
@@ -741,28 +807,23 @@ class ProfileNurtureWorker:
                         "sites_visited": len(sites_visited),
                         "sites_list": sites_visited,
                         "queries_used": len(queries),
+                        "snapshot_id": snapshot.snapshot_id if snapshot else None,
                         "completed_at": datetime.utcnow().isoformat(),
                     }
 
                 finally:
-                    await browser.close()
+                    if not context_closed:
+                        await context.close()
 
         except Exception as e:
             logger.error(f"❌ Search based nurture failed: {e}")
             exception_to_raise = e
 
         finally:
-            # Очищаем временную директорию профиля
-            if profile_temp_dir and Path(profile_temp_dir).exists():
-                try:
-                    shutil.rmtree(profile_temp_dir)
-                    logger.info(
-                        f"🗑️ Cleaned up profile temp directory: {profile_temp_dir}"
-                    )
-                except Exception as cleanup_error:
-                    logger.warning(
-                        f"⚠️ Failed to clean up profile directory {profile_temp_dir}: {cleanup_error}"
-                    )
+            # Освобождаем рабочую папку профиля в tmpfs
+            if profile_temp_dir:
+                await profile_snapshot_store.release(profile_temp_dir)
+                logger.info(f"🗑️ Released profile runtime directory: {profile_temp_dir}")
 
         # После finally - проверяем что делать
         if exception_to_raise:
@@ -1033,6 +1094,7 @@ class ProfileNurtureWorker:
 
             # Получаем текущие куки
             current_cookies = await page.context.cookies()
+            nurture_visits_total.labels(kind="search", result="success").inc()
 
             return {
                 "cookies_added": len(current_cookies),
@@ -1043,6 +1105,7 @@ class ProfileNurtureWorker:
 
         except Exception as e:
             logger.error(f"Error performing search: {e}")
+            nurture_visits_total.labels(kind="search", result="error").inc()
             return {
                 "cookies_added": 0,
                 "sites_visited": [],
@@ -1107,6 +1170,7 @@ class ProfileNurtureWorker:
             logger.info(
                 f"Successfully visited {site}, collected {len(current_cookies)} cookies"
             )
+            nurture_visits_total.labels(kind="direct", result="success").inc()
 
             return {
                 "cookies_added": len(current_cookies),
@@ -1116,6 +1180,7 @@ class ProfileNurtureWorker:
 
         except Exception as e:
             logger.error(f"Error performing direct visit to {site}: {e}")
+            nurture_visits_total.labels(kind="direct", result="error").inc()
             return {
                 "cookies_added": 0,
                 "visit_successful": False,
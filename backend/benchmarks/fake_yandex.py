@@ -0,0 +1,254 @@
+# backend/benchmarks/fake_yandex.py
+"""
+Локальный fake-Яндекс для нагрузочных тестов парсера.
+
+Отдает страницы по фикстурам из benchmarks/fixtures (разметка выдачи
+desktop и touch с теми же классами, что ищет YandexParser):
+  /search/        - desktop: без text - форма поиска, с text - выдача
+  /search/touch/  - mobile, то же самое
+Страница выдачи выбирается параметром p (0, 1, ...), ссылка "дальше"
+есть на всех страницах, кроме последней. Ответ задерживается на
+latency_ms +- jitter_ms; с заданной вероятностью вместо выдачи отдается
+капча или 429. Целевой домен стоит на позиции target_position.
+
+Запуск отдельным процессом (для воркера на другой машине):
+    python -m benchmarks.fake_yandex --port 8765 --latency-ms 200
+    YANDEX_SEARCH_URL_DESKTOP=http://host:8765/search/ \\
+    YANDEX_SEARCH_URL_MOBILE=http://host:8765/search/touch/ python run_worker.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+from dataclasses import dataclass, field, asdict
+from html import escape
+from pathlib import Path
+from string import Template
+from typing import Dict, Optional
+from urllib.parse import quote_plus
+
+from aiohttp import web
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+DESKTOP_PATH = "/search/"
+MOBILE_PATH = "/search/touch/"
+
+
+def _load(name: str) -> Template:
+    return Template((FIXTURES_DIR / name).read_text(encoding="utf-8"))
+
+
+@dataclass
+class FakeYandexConfig:
+    latency_ms: float = 150.0
+    jitter_ms: float = 100.0
+    pages: int = 3  # страниц выдачи на запрос
+    results_per_page: int = 10
+    captcha_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    target_domain: str = "bench-target.example"
+    target_position: int = 7  # 0 - целевого домена нет в выдаче
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeYandexStats:
+    requests: int = 0
+    search_forms: int = 0
+    serp_pages: int = 0
+    captchas: int = 0
+    rate_limited: int = 0
+    by_device: Dict[str, int] = field(default_factory=dict)
+
+
+class FakeYandexServer:
+    """aiohttp сервер, имитирующий поисковую выдачу"""
+
+    def __init__(self, config: FakeYandexConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.host = host
+        self.port = port
+        self.stats = FakeYandexStats()
+        self._rng = random.Random(config.seed)
+        self._runner: Optional[web.AppRunner] = None
+
+        self._templates = {
+            "form": _load("search_form.html"),
+            "captcha": _load("captcha.html"),
+            "desktop": _load("serp_desktop.html"),
+            "desktop_item": _load("serp_desktop_item.html"),
+            "mobile": _load("serp_mobile.html"),
+            "mobile_item": _load("serp_mobile_item.html"),
+        }
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def desktop_url(self) -> str:
+        return self.base_url + DESKTOP_PATH
+
+    @property
+    def mobile_url(self) -> str:
+        return self.base_url + MOBILE_PATH
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(DESKTOP_PATH, self._handle_desktop)
+        app.router.add_get(MOBILE_PATH, self._handle_mobile)
+        app.router.add_get("/favicon.ico", lambda request: web.Response(status=204))
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        # При port=0 порт выбирает система
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_desktop(self, request: web.Request) -> web.Response:
+        return await self._handle(request, "desktop", DESKTOP_PATH)
+
+    async def _handle_mobile(self, request: web.Request) -> web.Response:
+        return await self._handle(request, "mobile", MOBILE_PATH)
+
+    async def _handle(self, request: web.Request, device: str, path: str) -> web.Response:
+        stats = self.stats
+        stats.requests += 1
+        stats.by_device[device] = stats.by_device.get(device, 0) + 1
+
+        config = self.config
+        delay = max(0.0, config.latency_ms + self._rng.uniform(-1, 1) * config.jitter_ms)
+        await asyncio.sleep(delay / 1000)
+
+        query = request.query.get("text")
+        if not query:
+            stats.search_forms += 1
+            return self._html(
+                self._templates["form"].substitute(
+                    action=path, region=request.query.get("lr", "213")
+                )
+            )
+
+        if self._rng.random() < config.rate_limit_rate:
+            stats.rate_limited += 1
+            return web.Response(
+                status=429, text="Too Many Requests", headers={"Retry-After": "5"}
+            )
+
+        if self._rng.random() < config.captcha_rate:
+            stats.captchas += 1
+            return self._html(self._templates["captcha"].substitute())
+
+        page = max(0, int(request.query.get("p", "0") or 0))
+        if page >= config.pages:
+            raise web.HTTPNotFound()
+
+        stats.serp_pages += 1
+        return self._html(self._render_serp(device, path, query, page))
+
+    def _render_serp(self, device: str, path: str, query: str, page: int) -> str:
+        config = self.config
+        escaped_query = escape(query, quote=True)
+        # Домены выдачи детерминированы запросом: повторные проверки стабильны
+        query_hash = hashlib.md5(query.encode("utf-8")).hexdigest()[:8]
+
+        items = []
+        for index in range(config.results_per_page):
+            position = page * config.results_per_page + index + 1
+            if position == config.target_position:
+                domain = config.target_domain
+            else:
+                domain = f"site-{query_hash}-{position}.example"
+
+            items.append(
+                self._templates[f"{device}_item"].substitute(
+                    index=position,
+                    url=f"https://{domain}/page-{position}",
+                    domain=domain,
+                    title=f"{escaped_query} — результат {position}",
+                    snippet=f"Описание страницы {position} по запросу {escaped_query}.",
+                )
+            )
+
+        pager = ""
+        if page + 1 < config.pages:
+            next_url = f"{path}?text={quote_plus(query)}&p={page + 1}"
+            if device == "desktop":
+                pager = (
+                    f'<a class="pager__item pager__item_kind_next" '
+                    f'href="{next_url}">дальше</a>'
+                )
+            else:
+                pager = (
+                    f'<a class="button2 button2_theme_next" '
+                    f'href="{next_url}">Ещё результаты</a>'
+                )
+
+        return self._templates[device].substitute(
+            query=escaped_query, action=path, items="\n".join(items), pager=pager
+        )
+
+    @staticmethod
+    def _html(body: str) -> web.Response:
+        return web.Response(text=body, content_type="text/html", charset="utf-8")
+
+    def get_stats(self) -> Dict:
+        return {"config": asdict(self.config), **asdict(self.stats)}
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Общие параметры fake-сервера для CLI и бенчмарка"""
+    defaults = FakeYandexConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--serp-pages", type=int, default=defaults.pages)
+    parser.add_argument("--captcha-rate", type=float, default=defaults.captcha_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument("--target-domain", default=defaults.target_domain)
+    parser.add_argument("--target-position", type=int, default=defaults.target_position)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeYandexConfig:
+    return FakeYandexConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        pages=args.serp_pages,
+        captcha_rate=args.captcha_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        target_domain=args.target_domain,
+        target_position=args.target_position,
+        seed=args.seed,
+    )
+
+
+async def serve(args: argparse.Namespace):
+    server = FakeYandexServer(config_from_args(args), host=args.host, port=args.port)
+    await server.start()
+    print(f"Fake Yandex: desktop {server.desktop_url}, mobile {server.mobile_url}")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            print(f"  {server.get_stats()}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный fake-Яндекс")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,151 @@
+# backend/benchmarks/keyword_file_benchmark.py
+"""
+Бенчмарк потокового извлечения ключевых слов из файлов.
+
+Генерирует xlsx (openpyxl write_only), docx и txt с заданным числом строк
+(по умолчанию 1M) и замеряет время разбора и пиковое потребление памяти
+(tracemalloc) потоковыми читателями из app.core.keyword_file_extractor.
+С --compare-full дополнительно замеряет прежний вариант - полную загрузку
+книги openpyxl.load_workbook, чтобы увидеть разницу по памяти.
+
+Запуск:
+    python -m benchmarks.keyword_file_benchmark --rows 1000000
+    python -m benchmarks.keyword_file_benchmark --rows 200000 --compare-full
+    python -m benchmarks.keyword_file_benchmark --formats excel --keep-files
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Callable
+from xml.sax.saxutils import escape
+
+import openpyxl
+
+from app.core.keyword_file_extractor import extract_excel, extract_text, extract_word
+
+WORDS = [
+    "купить", "цена", "недорого", "москва", "доставка", "отзывы", "ремонт",
+    "квартира", "ноутбук", "телефон", "спб", "интернет", "магазин", "услуги",
+    "заказать", "онлайн", "лучший", "2025", "бу", "новый",
+]
+
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+# Каждый DUPLICATE_EVERY-й ряд повторяет предыдущую фразу
+DUPLICATE_EVERY = 10
+
+
+def generate_phrases(rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    previous = None
+    for index in range(rows):
+        if previous and index % DUPLICATE_EVERY == 0:
+            yield previous
+            continue
+        previous = " ".join(rng.sample(WORDS, rng.randint(2, 5))) + f" {index}"
+        yield previous
+
+
+def write_excel(path: str, rows: int):
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    for phrase in generate_phrases(rows):
+        worksheet.append([phrase])
+    workbook.save(path)
+
+
+def write_text(path: str, rows: int):
+    with open(path, "w", encoding="utf-8") as f:
+        for phrase in generate_phrases(rows):
+            f.write(phrase + "\n")
+
+
+def write_word(path: str, rows: int):
+    """Минимальный docx: достаточно word/document.xml для потокового читателя"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("word/document.xml", "w") as document:
+            document.write(
+                f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<w:document xmlns:w="{WORD_NS}"><w:body>'.encode("utf-8")
+            )
+            for phrase in generate_phrases(rows):
+                document.write(
+                    f"<w:p><w:r><w:t>{escape(phrase)}</w:t></w:r></w:p>".encode("utf-8")
+                )
+            document.write(b"</w:body></w:document>")
+
+
+def extract_excel_full(path: str, max_rows: int):
+    """Прежний вариант: полная загрузка книги в память"""
+    workbook = openpyxl.load_workbook(path)
+    worksheet = workbook.worksheets[0]
+    keywords = []
+    for row in worksheet.iter_rows(min_row=1, max_col=1, values_only=True):
+        if row[0] and isinstance(row[0], str):
+            keywords.append(row[0].strip())
+    return keywords
+
+
+def measure(label: str, func: Callable, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    keywords = result if isinstance(result, list) else result.keywords
+    print(
+        f"  {label:<22} {elapsed:8.2f} с   пик памяти {peak / 1024 / 1024:8.1f} МБ"
+        f"   ключевых слов {len(keywords)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк извлечения ключевых слов")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--formats", nargs="+", default=["excel", "text", "word"],
+        choices=["excel", "text", "word"],
+    )
+    parser.add_argument("--compare-full", action="store_true")
+    parser.add_argument("--keep-files", action="store_true")
+    args = parser.parse_args()
+
+    writers = {"excel": write_excel, "text": write_text, "word": write_word}
+    suffixes = {"excel": ".xlsx", "text": ".txt", "word": ".docx"}
+    extractors = {"excel": extract_excel, "text": extract_text, "word": extract_word}
+    max_rows = args.rows + 1
+
+    workdir = tempfile.mkdtemp(prefix="keyword_bench_")
+    print(f"Строк: {args.rows}, каталог: {workdir}")
+
+    for file_format in args.formats:
+        path = os.path.join(workdir, f"keywords{suffixes[file_format]}")
+
+        started = time.perf_counter()
+        writers[file_format](path, args.rows)
+        print(
+            f"\n{file_format}: файл {os.path.getsize(path) / 1024 / 1024:.1f} МБ, "
+            f"сгенерирован за {time.perf_counter() - started:.1f} с"
+        )
+
+        measure("потоковый разбор", extractors[file_format], path, max_rows)
+
+        if file_format == "excel" and args.compare_full:
+            measure("load_workbook (full)", extract_excel_full, path, max_rows)
+
+        if not args.keep_files:
+            os.unlink(path)
+
+    if not args.keep_files:
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# backend/benchmarks/position_history_benchmark.py
+"""
+Бенчмарк секционированной истории позиций.
+
+Заполняет position_history синтетическими проверками (по умолчанию 100M
+строк за последние 12 месяцев, генерация на стороне PostgreSQL), затем
+замеряет пропускную способность вставки пачками, как это делает
+TaskManager, и задержку 90-дневных запросов трендов по ключу и по домену.
+
+Запуск:
+    python -m benchmarks.position_history_benchmark --rows 100000000
+    python -m benchmarks.position_history_benchmark --skip-seed
+    python -m benchmarks.position_history_benchmark --cleanup
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import insert, text
+
+from app.core.position_history_partitions import (
+    month_start,
+    partition_ddl,
+    position_history_partitions,
+)
+from app.database import async_session_maker
+from app.models import PositionHistory
+
+# Фиксированные идентификаторы синтетических пользователя и доменов
+BENCH_USER_ID = uuid.UUID("00000000-0000-0000-0000-00000000b001")
+BENCH_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-00000000b002")
+
+KEYWORDS_PER_DOMAIN = 1000
+
+
+def bench_domain_id(index: int) -> uuid.UUID:
+    return uuid.uuid5(BENCH_NAMESPACE, f"domain-{index}")
+
+
+async def ensure_history_partitions(months_back: int):
+    """Создает секции за весь период тестовых данных"""
+    today = datetime.utcnow().date()
+    async with async_session_maker() as session:
+        for shift in range(months_back, 0, -1):
+            await session.execute(text(partition_ddl(month_start(today, -shift))))
+        await session.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"'))
+        await session.commit()
+    await position_history_partitions.maintain()
+
+
+async def seed(rows: int, keywords: int, months: int):
+    """Генерирует проверки равномерно по времени на стороне БД"""
+    await ensure_history_partitions(months)
+
+    domains = max(keywords // KEYWORDS_PER_DOMAIN, 1)
+    period_seconds = months * 30 * 86400
+    batch_size = 5_000_000
+
+    print(f"Генерация {rows} строк: {keywords} ключей, {domains} доменов")
+    started = time.perf_counter()
+
+    async with async_session_maker() as session:
+        for offset in range(0, rows, batch_size):
+            size = min(batch_size, rows - offset)
+            await session.execute(
+                text(
+                    """
+                    INSERT INTO position_history (
+                        check_date, user_id, domain_id, keyword_id, position
+                    )
+                    SELECT
+                        now() - make_interval(
+                            secs => :period * (1 - (:offset + g)::float8 / :rows)
+                        ),
+                        :user_id,
+                        uuid_generate_v5(:namespace, 'domain-' || (g % :domains)),
+                        uuid_generate_v5(:namespace, 'keyword-' || (g % :keywords)),
+                        CASE WHEN g % 7 = 0 THEN NULL ELSE (1 + g % 100)::smallint END
+                    FROM generate_series(1, :size) AS g
+                    """
+                ),
+                {
+                    "period": period_seconds,
+                    "offset": offset,
+                    "rows": rows,
+                    "user_id": BENCH_USER_ID,
+                    "namespace": BENCH_NAMESPACE,
+                    "domains": domains,
+                    "keywords": keywords,
+                    "size": size,
+                },
+            )
+            await session.commit()
+            print(f"  {offset + size}/{rows}")
+
+        await session.execute(text("ANALYZE position_history"))
+        await session.commit()
+
+    print(f"Генерация заняла {time.perf_counter() - started:.1f} с")
+
+
+async def bench_insert(rows: int, batch: int, keywords: int) -> float:
+    """Вставка пачками через ORM insert (как при массовой проверке позиций)"""
+    domains = max(keywords // KEYWORDS_PER_DOMAIN, 1)
+    started = time.perf_counter()
+
+    async with async_session_maker() as session:
+        for _ in range(0, rows, batch):
+            values = [
+                {
+                    "check_date": datetime.utcnow(),
+                    "user_id": BENCH_USER_ID,
+                    "domain_id": bench_domain_id(random.randrange(domains)),
+                    "keyword_id": uuid.uuid5(
+                        BENCH_NAMESPACE, f"keyword-{random.randrange(keywords)}"
+                    ),
+                    "position": random.randint(1, 100),
+                }
+                for _ in range(batch)
+            ]
+            await session.execute(insert(PositionHistory), values)
+            await session.commit()
+
+    return rows / (time.perf_counter() - started)
+
+
+async def bench_query(sql: str, params_factory, iterations: int) -> List[float]:
+    timings = []
+    async with async_session_maker() as session:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await session.execute(text(sql), params_factory())
+            timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+
+KEYWORD_TREND_SQL = """
+SELECT date_trunc('day', check_date) AS day, avg(position), min(position)
+FROM position_history
+WHERE keyword_id = :keyword_id
+  AND check_date >= now() - interval '90 days'
+GROUP BY 1
+ORDER BY 1
+"""
+
+DOMAIN_TREND_SQL = """
+SELECT date_trunc('day', check_date) AS day,
+       avg(position) FILTER (WHERE position IS NOT NULL),
+       count(*) FILTER (WHERE position <= 10)
+FROM position_history
+WHERE domain_id = :domain_id
+  AND check_date >= now() - interval '90 days'
+GROUP BY 1
+ORDER BY 1
+"""
+
+
+def report(name: str, timings: List[float]):
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(
+        f"{name:<28} p50={statistics.median(timings):8.1f} мс  "
+        f"p99={p99:8.1f} мс"
+    )
+
+
+async def cleanup():
+    async with async_session_maker() as session:
+        result = await session.execute(
+            text("DELETE FROM position_history WHERE user_id = :user_id"),
+            {"user_id": BENCH_USER_ID},
+        )
+        await session.commit()
+        print(f"Удалено строк: {result.rowcount}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк истории позиций")
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--keywords", type=int, default=200_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--insert-rows", type=int, default=200_000)
+    parser.add_argument("--insert-batch", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        await cleanup()
+        return
+
+    if not args.skip_seed:
+        await seed(args.rows, args.keywords, args.months)
+
+    throughput = await bench_insert(args.insert_rows, args.insert_batch, args.keywords)
+    print(f"\nВставка: {throughput:,.0f} строк/с (пачки по {args.insert_batch})")
+
+    domains = max(args.keywords // KEYWORDS_PER_DOMAIN, 1)
+    report(
+        "тренд ключа за 90 дней",
+        await bench_query(
+            KEYWORD_TREND_SQL,
+            lambda: {
+                "keyword_id": uuid.uuid5(
+                    BENCH_NAMESPACE, f"keyword-{random.randrange(args.keywords)}"
+                )
+            },
+            args.iterations,
+        ),
+    )
+    report(
+        "тренд домена за 90 дней",
+        await bench_query(
+            DOMAIN_TREND_SQL,
+            lambda: {"domain_id": bench_domain_id(random.randrange(domains))},
+            args.iterations,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
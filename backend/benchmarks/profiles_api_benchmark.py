@@ -0,0 +1,207 @@
+# backend/benchmarks/profiles_api_benchmark.py
+"""
+Бенчмарк списка и статистики профилей на большом наборе данных.
+
+Заполняет таблицу profiles синтетическими профилями (generate_series на
+стороне PostgreSQL), прогоняет get_profiles и запрос статистики
+get_profiles_stats (без кэша ответа) и сравнивает перцентили времени ответа с бюджетами.
+
+Запуск:
+    python -m benchmarks.profiles_api_benchmark --profiles 300000
+    python -m benchmarks.profiles_api_benchmark --cleanup
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import text
+
+from app.api.profiles import get_profiles, _load_profiles_stats
+from app.database import async_session_maker
+
+BENCH_PREFIX = "bench_profile_"
+
+# Бюджеты времени ответа (p95, мс)
+BUDGETS_MS = {
+    "first_page": 150,
+    "deep_keyset_page": 150,
+    "search": 300,
+    "stats_summary": 250,
+}
+
+
+async def seed_profiles(count: int):
+    """Создает синтетические профили пачками на стороне БД"""
+    async with async_session_maker() as session:
+        existing = await session.scalar(
+            text("SELECT count(*) FROM profiles WHERE name LIKE :prefix"),
+            {"prefix": f"{BENCH_PREFIX}%"},
+        )
+        to_create = max(count - existing, 0)
+        print(f"Существующих тестовых профилей: {existing}, создаем: {to_create}")
+
+        batch_size = 50000
+        for offset in range(0, to_create, batch_size):
+            size = min(batch_size, to_create - offset)
+            await session.execute(
+                text(
+                    """
+                    INSERT INTO profiles (
+                        id, name, device_type, user_agent, is_warmed_up, status,
+                        warmup_sites_visited, total_usage_count, success_rate,
+                        last_used, created_at, updated_at
+                    )
+                    SELECT
+                        gen_random_uuid(),
+                        :prefix || (:offset + g),
+                        CASE WHEN g % 3 = 0 THEN 'MOBILE'::devicetype
+                             ELSE 'DESKTOP'::devicetype END,
+                        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/'
+                            || (100 + g % 30) || '.0.' || g || '.0',
+                        g % 2 = 0,
+                        (ARRAY['new', 'warming', 'ready', 'blocked'])[1 + g % 4],
+                        g % 50,
+                        g % 200,
+                        0.0,
+                        CASE WHEN g % 5 = 0 THEN NULL
+                             ELSE now() - (g || ' minutes')::interval END,
+                        now() - (g || ' seconds')::interval,
+                        now()
+                    FROM generate_series(1, :size) AS g
+                    """
+                ),
+                {"prefix": BENCH_PREFIX, "offset": existing + offset, "size": size},
+            )
+            await session.commit()
+            print(f"  создано {offset + size}/{to_create}")
+
+        await session.execute(text("ANALYZE profiles"))
+        await session.commit()
+
+
+async def cleanup_profiles():
+    """Удаляет синтетические профили"""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            text("DELETE FROM profiles WHERE name LIKE :prefix"),
+            {"prefix": f"{BENCH_PREFIX}%"},
+        )
+        await session.commit()
+        print(f"Удалено тестовых профилей: {result.rowcount}")
+
+
+def list_params(**overrides) -> Dict:
+    """Параметры get_profiles (вызываем эндпоинт напрямую, без Query)"""
+    params = {
+        "page": 1,
+        "per_page": 50,
+        "cursor": None,
+        "include_total": False,
+        "search": None,
+        "device_type": None,
+        "status": None,
+        "is_warmed_up": None,
+        "sort_by": "created_at",
+        "sort_order": "desc",
+        "current_user": None,
+    }
+    params.update(overrides)
+    return params
+
+
+async def measure(
+    name: str, call: Callable[..., Awaitable], iterations: int
+) -> Dict[str, float]:
+    """Замеряет время выполнения вызова в отдельных сессиях"""
+    timings: List[float] = []
+
+    for _ in range(iterations):
+        async with async_session_maker() as session:
+            started = time.perf_counter()
+            await call(session)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    return {
+        "name": name,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(p95, 2),
+        "budget_ms": BUDGETS_MS[name],
+    }
+
+
+async def find_deep_cursor(pages: int) -> str:
+    """Проходит keyset пагинацией вглубь и возвращает курсор"""
+    cursor = None
+    async with async_session_maker() as session:
+        for _ in range(pages):
+            response = await get_profiles(
+                **list_params(cursor=cursor, per_page=100), session=session
+            )
+            if not response.next_cursor:
+                break
+            cursor = response.next_cursor
+    return cursor
+
+
+async def run_benchmark(iterations: int) -> bool:
+    deep_cursor = await find_deep_cursor(pages=200)
+
+    scenarios = [
+        (
+            "first_page",
+            lambda s: get_profiles(**list_params(include_total=True), session=s),
+        ),
+        (
+            "deep_keyset_page",
+            lambda s: get_profiles(**list_params(cursor=deep_cursor), session=s),
+        ),
+        (
+            "search",
+            lambda s: get_profiles(**list_params(search="chrome/117.0.4"), session=s),
+        ),
+        (
+            # Мимо response_cache: иначе все итерации, кроме первой, - попадания
+            # в локальный кэш, а не SQL статистики
+            "stats_summary",
+            lambda s: _load_profiles_stats(s),
+        ),
+    ]
+
+    all_ok = True
+    print(f"\n{'сценарий':<20}{'p50, мс':>10}{'p95, мс':>10}{'бюджет':>10}")
+    for name, call in scenarios:
+        stats = await measure(name, call, iterations)
+        ok = stats["p95_ms"] <= stats["budget_ms"]
+        all_ok = all_ok and ok
+        print(
+            f"{name:<20}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+            f"{stats['budget_ms']:>10}  {'✅' if ok else '❌'}"
+        )
+
+    return all_ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк API профилей")
+    parser.add_argument("--profiles", type=int, default=300000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        await cleanup_profiles()
+        return
+
+    await seed_profiles(args.profiles)
+    ok = await run_benchmark(args.iterations)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,507 @@
+# backend/benchmarks/serp_load_benchmark.py
+"""
+Нагрузочный бенчмарк проверки позиций на локальном fake-Яндексе.
+
+Поднимает benchmarks.fake_yandex в том же процессе, направляет на него
+YandexParser (settings.yandex_search_url_*), создает синтетические
+ключи, готовые профили и задачи CHECK_POSITIONS, затем прогоняет их через
+TaskManager (основной цикл _main_task_loop с max_concurrent_tasks =
+--concurrency) - так же, как это делает воркер. Замеряет:
+  - проверок в минуту на узел;
+  - p50/p99 длительности задачи (started_at -> completed_at);
+  - RSS на браузер (сумма RSS процессов chromium / число браузеров);
+  - запросов к БД на проверку (события before_cursor_execute движка).
+Человекоподобные паузы парсера входят в замер - как и в реальной работе.
+
+Результат пишется в JSON (по умолчанию benchmarks/results/), с --baseline
+выводится сравнение с прошлым прогоном, чтобы регрессии между релизами
+были видны.
+
+Бенчмарк берет из очереди любые pending задачи, поэтому запускать его
+нужно на отдельной БД; при наличии чужих задач он отказывается стартовать.
+
+Запуск:
+    python -m benchmarks.serp_load_benchmark --tasks 20 --concurrency 5
+    python -m benchmarks.serp_load_benchmark --device mobile --captcha-rate 0.05
+    python -m benchmarks.serp_load_benchmark --baseline benchmarks/results/prev.json
+    python -m benchmarks.serp_load_benchmark --cleanup
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psutil
+from sqlalchemy import event, func, select, text, update
+
+from app.config import settings
+from app.core.browser_manager import BrowserManager
+from app.core.task_manager import TaskManager, TaskStatus, TaskType
+from app.database import async_session_maker, engine
+from app.models import (
+    DeviceType,
+    Profile,
+    Task,
+    User,
+    UserDomain,
+    UserKeyword,
+    YandexRegion,
+)
+from benchmarks.fake_yandex import (
+    FakeYandexServer,
+    add_server_arguments,
+    config_from_args,
+)
+
+BENCH_EMAIL = "serp-load-bench@bench.local"
+BENCH_PROFILE_PREFIX = "bench_serp_"
+BENCH_REGION_CODE = "213"
+BENCH_TASK_PRIORITY = 1000
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Метрики для сравнения с базовым прогоном: (ключ, больше - лучше)
+COMPARED_METRICS = [
+    ("checks_per_minute", True),
+    ("task_latency_p50_s", False),
+    ("task_latency_p99_s", False),
+    ("rss_per_browser_mb_avg", False),
+    ("db_queries_per_check", False),
+]
+
+
+class QueryCounter:
+    """Счетчик SQL запросов движка приложения"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        return False
+
+
+class BrowserMemorySampler:
+    """Периодический замер RSS процессов chromium, запущенных бенчмарком"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            sample = await asyncio.to_thread(self._sample)
+            if sample:
+                self.samples.append(sample)
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    def _sample() -> Optional[Dict[str, float]]:
+        total_rss = 0
+        browsers = 0
+        for process in psutil.Process().children(recursive=True):
+            try:
+                name = process.name().lower()
+                if "chrom" not in name and "headless_shell" not in name:
+                    continue
+                total_rss += process.memory_info().rss
+                # Главный процесс браузера - без --type= (renderer, gpu и т.п.)
+                if not any(arg.startswith("--type=") for arg in process.cmdline()):
+                    browsers += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        if not browsers:
+            return None
+        return {"browsers": browsers, "rss_mb": total_rss / 1024 / 1024}
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {
+                "rss_per_browser_mb_avg": None,
+                "rss_per_browser_mb_max": None,
+                "browsers_max": 0,
+            }
+        per_browser = [s["rss_mb"] / s["browsers"] for s in self.samples]
+        return {
+            "rss_per_browser_mb_avg": round(statistics.mean(per_browser), 1),
+            "rss_per_browser_mb_max": round(max(per_browser), 1),
+            "browsers_max": int(max(s["browsers"] for s in self.samples)),
+        }
+
+
+def percentile(values: List[float], share: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(int(len(ordered) * share + 0.5) - 1, 0)]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# ===================== ДАННЫЕ =====================
+
+
+async def _get_or_create_user(session) -> User:
+    user = await session.scalar(select(User).where(User.email == BENCH_EMAIL))
+    if user is None:
+        user = User(email=BENCH_EMAIL, password_hash="!", is_active=True)
+        session.add(user)
+        await session.flush()
+    return user
+
+
+async def _get_or_create_region(session) -> YandexRegion:
+    region = await session.scalar(
+        select(YandexRegion).where(YandexRegion.region_code == BENCH_REGION_CODE)
+    )
+    if region is None:
+        region = YandexRegion(region_code=BENCH_REGION_CODE, region_name="Москва")
+        session.add(region)
+        await session.flush()
+    return region
+
+
+async def seed(args, devices: List[DeviceType]) -> List[str]:
+    """Ключи, профили и задачи проверки; возвращает ID задач"""
+    async with async_session_maker() as session:
+        foreign = await session.scalar(
+            select(func.count(Task.id)).where(Task.status == TaskStatus.PENDING.value)
+        )
+        if foreign:
+            raise SystemExit(
+                f"В очереди {foreign} pending задач - запустите бенчмарк на отдельной БД "
+                "или выполните --cleanup"
+            )
+
+        user = await _get_or_create_user(session)
+        region = await _get_or_create_region(session)
+
+        domain = UserDomain(
+            user_id=user.id, domain=args.target_domain, region_id=region.id
+        )
+        session.add(domain)
+        await session.flush()
+
+        run_tag = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        task_ids = []
+        for task_index in range(args.tasks):
+            device_type = devices[task_index % len(devices)]
+            keywords = [
+                UserKeyword(
+                    user_id=user.id,
+                    domain_id=domain.id,
+                    keyword=f"bench {run_tag} {task_index} {keyword_index}",
+                    device_type=device_type,
+                    is_active=False,  # не попадать в регулярный планировщик
+                )
+                for keyword_index in range(args.keywords_per_task)
+            ]
+            session.add_all(keywords)
+            await session.flush()
+
+            task = Task(
+                task_type=TaskType.CHECK_POSITIONS.value,
+                device_type=device_type.value,
+                status=TaskStatus.PENDING.value,
+                priority=BENCH_TASK_PRIORITY,
+                user_id=user.id,
+                parameters={
+                    "keyword_ids": [str(keyword.id) for keyword in keywords],
+                    "device_type": device_type.value,
+                    "benchmark": True,
+                },
+            )
+            session.add(task)
+            await session.flush()
+            task_ids.append(str(task.id))
+
+        await session.commit()
+
+    # Готовые профили: по одному на слот параллельности для каждого устройства
+    async with async_session_maker() as session:
+        browser_manager = BrowserManager(session)
+        for device_type in devices:
+            existing = await session.scalar(
+                select(func.count(Profile.id)).where(
+                    Profile.name.like(f"{BENCH_PROFILE_PREFIX}{device_type.value}_%")
+                )
+            )
+            for index in range(existing or 0, args.profiles):
+                await browser_manager.create_profile(
+                    device_type=device_type,
+                    name=f"{BENCH_PROFILE_PREFIX}{device_type.value}_{index}",
+                )
+
+        await session.execute(
+            update(Profile)
+            .where(Profile.name.like(f"{BENCH_PROFILE_PREFIX}%"))
+            .values(status="ready", is_warmed_up=True, health_score=1.0)
+        )
+        await session.commit()
+
+    return task_ids
+
+
+async def cleanup():
+    async with async_session_maker() as session:
+        user_id = await session.scalar(select(User.id).where(User.email == BENCH_EMAIL))
+        if user_id is not None:
+            params = {"user_id": user_id}
+            for sql in (
+                "DELETE FROM tasks WHERE user_id = :user_id",
+                "DELETE FROM position_history WHERE user_id = :user_id",
+                "DELETE FROM keyword_latest_positions WHERE keyword_id IN "
+                "(SELECT id FROM user_keywords WHERE user_id = :user_id)",
+                "DELETE FROM user_keywords WHERE user_id = :user_id",
+                "DELETE FROM user_domains WHERE user_id = :user_id",
+                "DELETE FROM users WHERE id = :user_id",
+            ):
+                await session.execute(text(sql), params)
+
+        result = await session.execute(
+            text("DELETE FROM profiles WHERE name LIKE :prefix"),
+            {"prefix": f"{BENCH_PROFILE_PREFIX}%"},
+        )
+        await session.commit()
+        print(f"Данные бенчмарка удалены (профилей: {result.rowcount})")
+
+
+# ===================== ПРОГОН =====================
+
+
+async def wait_for_tasks(task_ids: List[str], timeout: float) -> int:
+    """Ждет завершения задач; возвращает число опросов БД"""
+    deadline = time.monotonic() + timeout
+    polls = 0
+    while time.monotonic() < deadline:
+        polls += 1
+        async with async_session_maker() as session:
+            unfinished = await session.scalar(
+                select(func.count(Task.id)).where(
+                    Task.id.in_(task_ids),
+                    Task.status.in_(
+                        [TaskStatus.PENDING.value, TaskStatus.RUNNING.value]
+                    ),
+                )
+            )
+        if not unfinished:
+            return polls
+        await asyncio.sleep(2)
+    print(f"Таймаут {timeout:.0f} с: часть задач не завершилась")
+    return polls
+
+
+async def collect(task_ids: List[str]) -> Dict[str, Any]:
+    async with async_session_maker() as session:
+        result = await session.execute(select(Task).where(Task.id.in_(task_ids)))
+        tasks = result.scalars().all()
+
+    latencies = []
+    checks = 0
+    positions_found = 0
+    completed = failed = 0
+    for task in tasks:
+        if task.status == TaskStatus.COMPLETED.value:
+            completed += 1
+            for item in (task.result or {}).get("results", []):
+                checks += 1
+                if item.get("position") is not None:
+                    positions_found += 1
+        elif task.status == TaskStatus.FAILED.value:
+            failed += 1
+
+        if task.started_at and task.completed_at:
+            latencies.append((task.completed_at - task.started_at).total_seconds())
+
+    return {
+        "tasks_completed": completed,
+        "tasks_failed": failed,
+        "checks": checks,
+        "positions_found": positions_found,
+        "task_latency_p50_s": (
+            round(statistics.median(latencies), 2) if latencies else None
+        ),
+        "task_latency_p99_s": (
+            round(percentile(latencies, 0.99), 2) if latencies else None
+        ),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    devices = (
+        [DeviceType.DESKTOP, DeviceType.MOBILE]
+        if args.device == "both"
+        else [DeviceType(args.device)]
+    )
+
+    server = FakeYandexServer(config_from_args(args))
+    await server.start()
+    settings.yandex_search_url_desktop = server.desktop_url
+    settings.yandex_search_url_mobile = server.mobile_url
+    print(f"Fake Yandex: {server.base_url}")
+
+    try:
+        task_ids = await seed(args, devices)
+        print(
+            f"Задач: {len(task_ids)} x {args.keywords_per_task} ключей, "
+            f"параллельно {args.concurrency}"
+        )
+
+        sampler = BrowserMemorySampler()
+        async with async_session_maker() as session:
+            # Как в воркере: одна сессия менеджера на основной цикл
+            manager = TaskManager(session)
+            manager.max_concurrent_tasks = args.concurrency
+            manager.running = True
+
+            with QueryCounter() as queries:
+                sampler.start()
+                started = time.perf_counter()
+                loop_task = asyncio.create_task(manager._main_task_loop())
+                polls = 0
+                try:
+                    polls = await wait_for_tasks(task_ids, args.timeout)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    manager.running = False
+                    await loop_task
+                    await sampler.stop()
+
+        results = await collect(task_ids)
+        checks = results["checks"]
+        # Опросы статуса задач самим бенчмарком в счет не идут
+        db_queries = queries.count - polls
+        results.update(
+            {
+                "duration_s": round(elapsed, 1),
+                "checks_per_minute": round(checks / (elapsed / 60), 2) if elapsed else None,
+                "db_queries": db_queries,
+                "db_queries_per_check": round(db_queries / checks, 1) if checks else None,
+                **sampler.summary(),
+            }
+        )
+    finally:
+        await server.stop()
+
+    return {
+        "benchmark": "serp_load",
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": git_commit(),
+        "node": socket.gethostname(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "tasks": args.tasks,
+            "keywords_per_task": args.keywords_per_task,
+            "concurrency": args.concurrency,
+            "profiles": args.profiles,
+            "device": args.device,
+        },
+        "fake_server": server.get_stats(),
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline_path: str):
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    print(
+        f"\nСравнение с {baseline_path} "
+        f"({baseline.get('git_commit')} от {baseline.get('timestamp')}):"
+    )
+    for key, higher_is_better in COMPARED_METRICS:
+        old = baseline.get("results", {}).get(key)
+        new = report["results"].get(key)
+        if old in (None, 0) or new is None:
+            print(f"  {key:<26} {old!s:>10} -> {new!s:>10}")
+            continue
+        change = (new - old) / old * 100
+        worse = change < 0 if higher_is_better else change > 0
+        mark = "  регрессия" if worse and abs(change) >= 5 else ""
+        print(f"  {key:<26} {old:>10} -> {new:>10}  ({change:+.1f}%){mark}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк проверки позиций")
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--keywords-per-task", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--profiles", type=int, default=None, help="По умолчанию = concurrency")
+    parser.add_argument("--device", choices=["desktop", "mobile", "both"], default="desktop")
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--output", default=None, help="JSON с результатами")
+    parser.add_argument("--baseline", default=None, help="JSON прошлого прогона")
+    parser.add_argument("--cleanup", action="store_true")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        await cleanup()
+        return
+
+    args.profiles = args.profiles or args.concurrency
+
+    report = await run(args)
+
+    results = report["results"]
+    print(
+        f"\nЗадач: {results['tasks_completed']} выполнено, {results['tasks_failed']} с ошибкой"
+        f"\nПроверок: {results['checks']} за {results['duration_s']} с"
+        f" -> {results['checks_per_minute']} проверок/мин"
+        f"\nДлительность задачи: p50={results['task_latency_p50_s']} с"
+        f"  p99={results['task_latency_p99_s']} с"
+        f"\nRSS на браузер: {results['rss_per_browser_mb_avg']} МБ"
+        f" (макс {results['rss_per_browser_mb_max']}, браузеров до {results['browsers_max']})"
+        f"\nЗапросов к БД на проверку: {results['db_queries_per_check']}"
+    )
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"serp_load_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nРезультаты: {output}")
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,13 @@ import signal
 import sys
 from app.core.task_manager import TaskManager
 from app.core.resource_monitor import ResourceMonitor
+from app.core.display_pool import display_pool
+from app.tasks.analytics_rollup_scheduler import analytics_rollup_scheduler
+from app.tasks.billing_settlement_scheduler import billing_settlement_scheduler
+from app.tasks.task_reaper_scheduler import task_reaper_scheduler
+from app.tasks.task_archive_scheduler import task_archive_scheduler
+from app.core.pipeline_metrics import start_metrics_server, mark_process_dead
+from app.config import settings
 from app.database import async_session_maker
 import structlog
 
@@ -45,6 +52,12 @@ class Worker:
 
             self.resource_monitor = ResourceMonitor(self.task_manager.server_id)
 
+            # Xvfb серверы заранее: первый браузер с окном не ждет их запуска
+            await display_pool.start()
+
+            # Метрики конвейера задач для Prometheus
+            start_metrics_server(settings.metrics_worker_port)
+
             # Настраиваем обработку сигналов
             self._setup_signal_handlers()
 
@@ -54,6 +67,10 @@ class Worker:
             await asyncio.gather(
                 self.task_manager.start(),
                 self.resource_monitor.start_monitoring(),
+                analytics_rollup_scheduler.start(),
+                billing_settlement_scheduler.start(),
+                task_reaper_scheduler.start(),
+                task_archive_scheduler.start(),
                 return_exceptions=True
             )
 
@@ -76,6 +93,15 @@ class Worker:
         if self.resource_monitor:
             await self.resource_monitor.stop_monitoring()
 
+        await analytics_rollup_scheduler.stop()
+        await billing_settlement_scheduler.stop()
+        await task_reaper_scheduler.stop()
+        await task_archive_scheduler.stop()
+
+        # Xvfb серверы пула дисплеев
+        await display_pool.stop()
+
+        mark_process_dead()
         logger.info("Worker stopped")
 
     def _setup_signal_handlers(self):
@@ -178,8 +178,8 @@ class ApiClient {
         return this.client.get('/domains/regions')
     }
 
-    async getDomainKeywords(domainId: string) {
-        return this.client.get(`/domains/${domainId}/keywords`)
+    async getDomainKeywords(domainId: string, params: { limit?: number; cursor?: string; sort_by?: string } = {}) {
+        return this.client.get(`/domains/${domainId}/keywords`, { params })
     }
 
     async addKeyword(domainId: string, keyword: string, regionId: string, deviceType: string) {
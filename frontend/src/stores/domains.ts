@@ -27,6 +27,13 @@ export interface Keyword {
     is_active: boolean
     check_frequency: string
     created_at: string
+    position?: number | null
+    previous_position?: number | null
+    position_change?: number | null
+    best_position_30d?: number | null
+    worst_position_30d?: number | null
+    url?: string | null
+    last_check_date?: string | null
 }
 
 export const useDomainsStore = defineStore('domains', () => {
@@ -145,8 +152,14 @@ export const useDomainsStore = defineStore('domains', () => {
     async function fetchDomainKeywords(domainId: string) {
         try {
             loading.value = true
-            const response = await api.getDomainKeywords(domainId)
-            selectedDomainKeywords.value = response.data
+            const keywords: Keyword[] = []
+            let cursor: string | undefined
+            do {
+                const response = await api.getDomainKeywords(domainId, { limit: 1000, cursor })
+                keywords.push(...response.data.keywords)
+                cursor = response.data.next_cursor || undefined
+            } while (cursor)
+            selectedDomainKeywords.value = keywords
         } catch (err: any) {
             error.value = err.response?.data?.detail || 'Ошибка загрузки ключевых слов'
             throw err